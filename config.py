@@ -97,6 +97,50 @@ DEFAULT_THINKING_MODE_THINKDEEP = os.getenv("DEFAULT_THINKING_MODE_THINKDEEP", "
 # as files to bypass MCP's token constraints.
 MCP_PROMPT_SIZE_LIMIT = 50_000  # 50K characters
 
+# File watcher
+# FILE_WATCHER: set to "true" to watch the sandbox directories with inotify (Linux only).
+# Cached file contents, token estimates and path resolutions are then invalidated by
+# change events instead of being re-validated with stat calls on every lookup.
+# FILE_WATCHER_MAX_WATCHES caps the number of watched directories; files in directories
+# beyond the cap keep using stat validation.
+FILE_WATCHER_ENABLED = os.getenv("FILE_WATCHER", "false").lower() == "true"
+FILE_WATCHER_MAX_WATCHES = int(os.getenv("FILE_WATCHER_MAX_WATCHES", "8192"))
+
+# Tool call scheduling
+# TOOL_MAX_CONCURRENCY: tool calls that may run at once. Further calls wait in a queue,
+# where chat is admitted ahead of batch tools (analyze, codereview, precommit, ...),
+# and one slot is kept free of batch tools so chat can start while they run.
+# get_version and get_token_usage are never queued.
+# TOOL_ADMISSION_TOKENS: combined estimated size (prompt, files, directories) of running
+# calls; calls wait while admitting them would exceed it. A larger call still runs alone.
+# TOOL_QUEUE_TIMEOUT: seconds a call may wait for admission before failing (0 = no limit)
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+TOOL_ADMISSION_TOKENS = int(os.getenv("TOOL_ADMISSION_TOKENS", "1000000"))
+TOOL_QUEUE_TIMEOUT = float(os.getenv("TOOL_QUEUE_TIMEOUT", "120"))
+
+# Request deadlines
+# TOOL_DEADLINE_SECONDS: how long a tool call may take, from arrival through thread
+# reconstruction, file reading, git and the model call, before it is abandoned
+# (0 = no deadline). TOOL_DEADLINES overrides it per tool as comma-separated
+# tool=seconds pairs, e.g. "chat=120,precommit=900". Clients can pass
+# deadline_seconds to override both for a single request.
+TOOL_DEADLINE_SECONDS = float(os.getenv("TOOL_DEADLINE_SECONDS", "600"))
+TOOL_DEADLINES = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (pair.partition("=") for pair in os.getenv("TOOL_DEADLINES", "").split(","))
+    if name.strip() and seconds.strip()
+}
+
+# MCP transport
+# MCP_TRANSPORT: "stdio" (default) serves a single client over stdin/stdout, the way
+# MCP clients launch the server as a subprocess. "http" runs one long-lived server on
+# MCP_HTTP_HOST:MCP_HTTP_PORT that any number of clients share, keeping provider
+# clients and caches warm between sessions: streamable HTTP at /mcp, and the older
+# SSE transport at /sse for clients that don't support it yet.
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio").strip().lower()
+MCP_HTTP_HOST = os.getenv("MCP_HTTP_HOST", "127.0.0.1")
+MCP_HTTP_PORT = int(os.getenv("MCP_HTTP_PORT", "8765"))
+
 # Threading configuration
 # Simple Redis-based conversation threading for stateless MCP environment
 # Set REDIS_URL environment variable to connect to your Redis instance
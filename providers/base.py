@@ -167,6 +167,7 @@ class ModelProvider(ABC):
         system_prompt: Optional[str] = None,
         temperature: float = 0.7,
         max_output_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
         **kwargs,
     ) -> ModelResponse:
         """Generate content using the model.
@@ -177,6 +178,7 @@ class ModelProvider(ABC):
             system_prompt: Optional system prompt for model behavior
             temperature: Sampling temperature (0-2)
             max_output_tokens: Maximum tokens to generate
+            timeout: Seconds before the HTTP request is aborted (None for the client default)
             **kwargs: Provider-specific parameters
 
         Returns:
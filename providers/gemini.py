@@ -2,9 +2,6 @@
 
 from typing import Optional
 
-from google import genai
-from google.genai import types
-
 from .base import ModelCapabilities, ModelProvider, ModelResponse, ProviderType, RangeTemperatureConstraint
 
 
@@ -48,6 +45,9 @@ class GeminiModelProvider(ModelProvider):
     def client(self):
         """Lazy initialization of Gemini client."""
         if self._client is None:
+            # Imported on first use: the SDK takes most of the server's import time
+            from google import genai
+
             self._client = genai.Client(api_key=self.api_key)
         return self._client
 
@@ -84,6 +84,7 @@ class GeminiModelProvider(ModelProvider):
         temperature: float = 0.7,
         max_output_tokens: Optional[int] = None,
         thinking_mode: str = "medium",
+        timeout: Optional[float] = None,
         **kwargs,
     ) -> ModelResponse:
         """Generate content using Gemini model."""
@@ -91,11 +92,7 @@ class GeminiModelProvider(ModelProvider):
         resolved_name = self._resolve_model_name(model_name)
         self.validate_parameters(resolved_name, temperature)
 
-        # Combine system prompt with user prompt if provided
-        if system_prompt:
-            full_prompt = f"{system_prompt}\n\n{prompt}"
-        else:
-            full_prompt = prompt
+        from google.genai import types
 
         # Prepare generation config
         generation_config = types.GenerateContentConfig(
@@ -103,10 +100,19 @@ class GeminiModelProvider(ModelProvider):
             candidate_count=1,
         )
 
+        # Pass the system prompt as a system instruction rather than prepending it
+        # to the prompt, which would copy the entire (potentially multi-megabyte) payload
+        if system_prompt:
+            generation_config.system_instruction = system_prompt
+
         # Add max output tokens if specified
         if max_output_tokens:
             generation_config.max_output_tokens = max_output_tokens
 
+        # Abort the request at the caller's deadline (the SDK takes milliseconds)
+        if timeout is not None:
+            generation_config.http_options = types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+
         # Add thinking configuration for models that support it
         capabilities = self.get_capabilities(resolved_name)
         if capabilities.supports_extended_thinking and thinking_mode in self.THINKING_BUDGETS:
@@ -121,7 +127,7 @@ class GeminiModelProvider(ModelProvider):
             # Generate content
             response = self.client.models.generate_content(
                 model=resolved_name,
-                contents=full_prompt,
+                contents=prompt,
                 config=generation_config,
             )
 
@@ -207,6 +213,9 @@ class GeminiModelProvider(ModelProvider):
                 usage["input_tokens"] = metadata.prompt_token_count
             if hasattr(metadata, "candidates_token_count"):
                 usage["output_tokens"] = metadata.candidates_token_count
+            thoughts_token_count = getattr(metadata, "thoughts_token_count", None)
+            if isinstance(thoughts_token_count, int):
+                usage["thinking_tokens"] = thoughts_token_count
             if "input_tokens" in usage and "output_tokens" in usage:
                 usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
 
@@ -3,8 +3,6 @@
 import logging
 from typing import Optional
 
-from openai import OpenAI
-
 from .base import (
     FixedTemperatureConstraint,
     ModelCapabilities,
@@ -41,6 +39,9 @@ class OpenAIModelProvider(ModelProvider):
     def client(self):
         """Lazy initialization of OpenAI client."""
         if self._client is None:
+            # Imported on first use: the SDK takes most of the server's import time
+            from openai import OpenAI
+
             client_kwargs = {"api_key": self.api_key}
             if self.base_url:
                 client_kwargs["base_url"] = self.base_url
@@ -84,6 +85,7 @@ class OpenAIModelProvider(ModelProvider):
         system_prompt: Optional[str] = None,
         temperature: float = 0.7,
         max_output_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
         **kwargs,
     ) -> ModelResponse:
         """Generate content using OpenAI model."""
@@ -107,6 +109,10 @@ class OpenAIModelProvider(ModelProvider):
         if max_output_tokens:
             completion_params["max_tokens"] = max_output_tokens
 
+        # Abort the request at the caller's deadline
+        if timeout is not None:
+            completion_params["timeout"] = timeout
+
         # Add any additional OpenAI-specific parameters
         for key, value in kwargs.items():
             if key in ["top_p", "frequency_penalty", "presence_penalty", "seed", "stop"]:
@@ -174,4 +180,10 @@ class OpenAIModelProvider(ModelProvider):
             usage["output_tokens"] = response.usage.completion_tokens
             usage["total_tokens"] = response.usage.total_tokens
 
+            # Reasoning models report hidden thinking tokens as part of completion tokens
+            details = getattr(response.usage, "completion_tokens_details", None)
+            reasoning_tokens = getattr(details, "reasoning_tokens", None)
+            if isinstance(reasoning_tokens, int):
+                usage["thinking_tokens"] = reasoning_tokens
+
         return usage
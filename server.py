@@ -15,32 +15,48 @@ Key Components:
 - Configuration: Manages API keys and model settings
 
 The server runs on stdio (standard input/output) and communicates using JSON-RPC messages
-as defined by the MCP protocol.
+as defined by the MCP protocol. With MCP_TRANSPORT=http it instead runs as a long-lived
+HTTP server (streamable HTTP and SSE) shared by many clients.
 """
 
 import asyncio
+import importlib
+import json
 import logging
 import os
 import sys
+import threading
 import time
+from collections.abc import Iterator, Mapping
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Optional
 
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
-from mcp.types import ServerCapabilities, TextContent, Tool, ToolsCapability
-
-from config import DEFAULT_MODEL, MAX_CONTEXT_TOKENS, __author__, __updated__, __version__
-from tools import (
-    AnalyzeTool,
-    ChatTool,
-    CodeReviewTool,
-    DebugIssueTool,
-    Precommit,
-    ThinkDeepTool,
+from mcp.types import TextContent, Tool
+
+from config import (
+    DEFAULT_MODEL,
+    MAX_CONTEXT_TOKENS,
+    TOOL_ADMISSION_TOKENS,
+    TOOL_DEADLINE_SECONDS,
+    TOOL_DEADLINES,
+    TOOL_MAX_CONCURRENCY,
+    TOOL_QUEUE_TIMEOUT,
+    __author__,
+    __updated__,
+    __version__,
 )
 from tools.models import ToolOutput
+from utils.execution_context import (
+    DeadlineExceededError,
+    ExecutionContext,
+    RequestCancelledError,
+    execution_context,
+)
+from utils.scheduler import QueueTimeoutError, ToolScheduler, estimate_request_tokens
+from utils.single_flight import SingleFlight, request_fingerprint
 
 # Configure logging for server operations
 # Can be controlled via LOG_LEVEL environment variable (DEBUG, INFO, WARNING, ERROR)
@@ -78,15 +94,16 @@ for handler in logging.getLogger().handlers:
     handler.setFormatter(LocalTimeFormatter(log_format))
 
 # Add file handler for Docker log monitoring
+# delay=True opens the files on the first record rather than while the server is importing
 try:
-    file_handler = logging.FileHandler("/tmp/mcp_server.log")
+    file_handler = logging.FileHandler("/tmp/mcp_server.log", delay=True)
     file_handler.setLevel(getattr(logging, log_level, logging.INFO))
     file_handler.setFormatter(LocalTimeFormatter(log_format))
     logging.getLogger().addHandler(file_handler)
 
     # Create a special logger for MCP activity tracking
     mcp_logger = logging.getLogger("mcp_activity")
-    mcp_file_handler = logging.FileHandler("/tmp/mcp_activity.log")
+    mcp_file_handler = logging.FileHandler("/tmp/mcp_activity.log", delay=True)
     mcp_file_handler.setLevel(logging.INFO)
     mcp_file_handler.setFormatter(LocalTimeFormatter("%(asctime)s - %(message)s"))
     mcp_logger.addHandler(mcp_file_handler)
@@ -99,19 +116,70 @@ logger = logging.getLogger(__name__)
 
 # Create the MCP server instance with a unique name identifier
 # This name is used by MCP clients to identify and connect to this specific server
-server: Server = Server("zen-server")
+server: Server = Server("zen", version=__version__)
+
+
+class ToolRegistry(Mapping):
+    """
+    Tool instances by name, created on first lookup.
+
+    Tool names are known up front, so membership checks and listing names import
+    nothing; a tool's module is imported and the tool instantiated the first time
+    it is looked up (by list_tools or a call to it), keeping server startup cheap.
+    """
+
+    def __init__(self, tool_classes: dict[str, str]):
+        self._tool_classes = tool_classes
+        self._instances: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str):
+        class_name = self._tool_classes[name]
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = getattr(importlib.import_module("tools"), class_name)()
+            return self._instances[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._tool_classes
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tool_classes)
+
+    def __len__(self) -> int:
+        return len(self._tool_classes)
+
 
 # Initialize the tool registry with all available AI-powered tools
 # Each tool provides specialized functionality for different development tasks
-# Tools are instantiated once and reused across requests (stateless design)
-TOOLS = {
-    "thinkdeep": ThinkDeepTool(),  # Extended reasoning for complex problems
-    "codereview": CodeReviewTool(),  # Comprehensive code review and quality analysis
-    "debug": DebugIssueTool(),  # Root cause analysis and debugging assistance
-    "analyze": AnalyzeTool(),  # General-purpose file and code analysis
-    "chat": ChatTool(),  # Interactive development chat and brainstorming
-    "precommit": Precommit(),  # Pre-commit validation of git changes
-}
+# Tools are instantiated once, on first use, and reused across requests (stateless design)
+TOOLS = ToolRegistry(
+    {
+        "thinkdeep": "ThinkDeepTool",  # Extended reasoning for complex problems
+        "codereview": "CodeReviewTool",  # Comprehensive code review and quality analysis
+        "debug": "DebugIssueTool",  # Root cause analysis and debugging assistance
+        "analyze": "AnalyzeTool",  # General-purpose file and code analysis
+        "chat": "ChatTool",  # Interactive development chat and brainstorming
+        "precommit": "Precommit",  # Pre-commit validation of git changes
+    }
+)
+
+# Utility tools answered by the server itself
+UTILITY_TOOLS = ("get_version", "get_token_usage")
+
+# Admission control in front of tool dispatch: bounded concurrency and content size,
+# interactive tools first, and a limit on how long a call may wait in the queue
+SCHEDULER = ToolScheduler(
+    max_concurrency=TOOL_MAX_CONCURRENCY,
+    capacity_tokens=TOOL_ADMISSION_TOKENS,
+    queue_timeout=TOOL_QUEUE_TIMEOUT or None,
+)
+
+# Identical tool calls in flight at the same time run one pipeline and share its result
+IN_FLIGHT = SingleFlight()
+
+# Tool list returned by list_tools, per (auto mode, default model) configuration
+_TOOL_LIST_CACHE: dict[tuple[bool, str], list[Tool]] = {}
 
 
 def configure_providers():
@@ -170,7 +238,22 @@ async def handle_list_tools() -> list[Tool]:
     Returns:
         List of Tool objects representing all available tools
     """
+    import config
+
     logger.debug("MCP client requested tool list")
+
+    # Schemas only change with the model configuration; build them once per configuration
+    cache_key = (config.IS_AUTO_MODE, config.DEFAULT_MODEL)
+    if cache_key not in _TOOL_LIST_CACHE:
+        _TOOL_LIST_CACHE[cache_key] = build_tool_list()
+    tools = _TOOL_LIST_CACHE[cache_key]
+
+    logger.debug(f"Returning {len(tools)} tools to MCP client")
+    return list(tools)
+
+
+def build_tool_list() -> list[Tool]:
+    """Build the Tool entries, with their input schemas, for every registered tool."""
     tools = []
 
     # Add all registered AI-powered tools from the TOOLS registry
@@ -195,10 +278,17 @@ async def handle_list_tools() -> list[Tool]:
                 ),
                 inputSchema={"type": "object", "properties": {}},
             ),
+            Tool(
+                name="get_token_usage",
+                description=(
+                    "TOKEN USAGE STATISTICS - Get a rolling aggregate of where the context budget of recent "
+                    "tool calls went: system prompt, conversation history, embedded and skipped files, new content, "
+                    "and provider-reported input, output and thinking tokens, per tool and overall."
+                ),
+                inputSchema={"type": "object", "properties": {}},
+            ),
         ]
     )
-
-    logger.debug(f"Returning {len(tools)} tools to MCP client")
     return tools
 
 
@@ -211,6 +301,27 @@ async def handle_call_tool(name: str, arguments: dict[str, Any]) -> list[TextCon
     appropriate handlers. It supports both AI-powered tools (from TOOLS registry)
     and utility tools (implemented as static functions).
 
+    Scheduling:
+    Calls are admitted by the SCHEDULER before any work starts, so thread
+    reconstruction and file reading count against the concurrency limit too.
+    A call that isn't admitted within TOOL_QUEUE_TIMEOUT gets an error response.
+    Utility tools are answered right away, so get_version can report on a busy
+    scheduler.
+
+    Coalescing:
+    A call identical to one still in flight (same tool, arguments and file
+    contents, and no continuation_id) waits for that call's pipeline instead of
+    starting its own, and its response is marked with metadata["coalesced"].
+    A continuation offer in the shared response points each caller at its own
+    copy of the new thread.
+
+    Deadlines and Cancellation:
+    Each call gets a deadline when it arrives (see resolve_deadline_seconds) and
+    runs on a worker thread under an execution context carrying it. When the
+    client cancels the request or the deadline passes, the context is cancelled:
+    git subprocesses are killed, file ingestion stops at the next file, and the
+    model request is aborted at its timeout and its response discarded.
+
     Thread Context Reconstruction:
     If the request contains a continuation_id, this function reconstructs
     the conversation history and injects it into the tool's context.
@@ -232,6 +343,200 @@ async def handle_call_tool(name: str, arguments: dict[str, Any]) -> list[TextCon
     except Exception:
         pass
 
+    # Handle unknown tool requests gracefully
+    if name not in TOOLS and name not in UTILITY_TOOLS:
+        return [TextContent(type="text", text=f"Unknown tool: {name}")]
+
+    # Identical requests already in flight share one pipeline (continuations never do)
+    fingerprint = await asyncio.to_thread(request_fingerprint, name, arguments) if name in TOOLS else None
+    if fingerprint is None:
+        return await run_admitted_call(name, arguments)
+
+    result, joined = await IN_FLIGHT.run(fingerprint, lambda: run_admitted_call(name, arguments))
+    if joined:
+        logger.info(f"Tool '{name}' call joined an identical request already in flight")
+        return await asyncio.to_thread(mark_coalesced, result)
+    return result
+
+
+async def run_admitted_call(name: str, arguments: dict[str, Any]) -> list[TextContent]:
+    """
+    Wait for admission by the SCHEDULER, then run the call under a fresh deadline.
+
+    Utility tools only read server state and are not queued.
+
+    Args:
+        name: The name of the tool to execute
+        arguments: Dictionary of arguments to pass to the tool
+
+    Returns:
+        List of TextContent objects containing the tool's response
+    """
+    deadline_seconds = resolve_deadline_seconds(name, arguments)
+    context = ExecutionContext(
+        tool_name=name,
+        deadline=time.monotonic() + deadline_seconds if deadline_seconds is not None else None,
+    )
+
+    if name in UTILITY_TOOLS:
+        return await run_tool_call(name, arguments, context)
+
+    try:
+        async with SCHEDULER.admit(name, estimate_request_tokens(arguments)) as waited:
+            if waited:
+                logger.debug(f"[SCHEDULER] {name} admitted after {waited * 1000:.0f} ms in queue")
+            return await run_tool_call(name, arguments, context)
+    except QueueTimeoutError as e:
+        logger.warning(f"Tool '{name}' was not admitted: {e}")
+        error_output = ToolOutput(
+            status="error",
+            content=f"Server busy: {e}. Please retry shortly.",
+            content_type="text",
+            metadata={"tool_name": name, "scheduler": SCHEDULER.stats()},
+        )
+        return [TextContent(type="text", text=error_output.model_dump_json())]
+
+
+def mark_coalesced(result: list[TextContent]) -> list[TextContent]:
+    """
+    Mark a shared response as coming from a pipeline another request started.
+
+    A response that offers to continue a new conversation thread names the
+    thread the pipeline created. Every caller sharing the response is an
+    independent client, so each follower gets its own copy of that thread;
+    otherwise their follow-ups would interleave in one thread. If the copy
+    can't be made, the follower's response carries no continuation offer.
+
+    Args:
+        result: The pipeline's response
+
+    Returns:
+        A copy of the response with metadata["coalesced"] set, or the response
+        unchanged if it isn't a ToolOutput
+    """
+    from utils.conversation_memory import fork_thread
+
+    try:
+        tool_output = ToolOutput.model_validate_json(result[0].text)
+    except (IndexError, ValueError):
+        return result
+    metadata = {**(tool_output.metadata or {}), "coalesced": True}
+
+    offer = tool_output.continuation_offer
+    if offer is not None:
+        thread_id = fork_thread(offer.continuation_id)
+        if thread_id is None:
+            tool_output.status = "success"
+            tool_output.continuation_offer = None
+            metadata.pop("thread_id", None)
+        else:
+            # Only the offer's own fields name the thread; the response content is left untouched
+            suggested_tool_params = offer.suggested_tool_params
+            if suggested_tool_params and "continuation_id" in suggested_tool_params:
+                suggested_tool_params = {**suggested_tool_params, "continuation_id": thread_id}
+            tool_output.continuation_offer = offer.model_copy(
+                update={
+                    "continuation_id": thread_id,
+                    "message_to_user": offer.message_to_user.replace(offer.continuation_id, thread_id),
+                    "suggested_tool_params": suggested_tool_params,
+                }
+            )
+            if "thread_id" in metadata:
+                metadata["thread_id"] = thread_id
+
+    tool_output.metadata = metadata
+    return [TextContent(type="text", text=tool_output.model_dump_json()), *result[1:]]
+
+
+def resolve_deadline_seconds(name: str, arguments: dict[str, Any]) -> Optional[float]:
+    """
+    Seconds a tool call may take: the request's deadline_seconds, else the tool's configured deadline.
+
+    Args:
+        name: The name of the tool being called
+        arguments: Raw arguments from the client
+
+    Returns:
+        Optional[float]: Seconds from arrival, or None for no deadline
+    """
+    requested = arguments.get("deadline_seconds")
+    if isinstance(requested, (int, float)) and not isinstance(requested, bool) and requested > 0:
+        return float(requested)
+    seconds = TOOL_DEADLINES.get(name, TOOL_DEADLINE_SECONDS)
+    return seconds if seconds > 0 else None
+
+
+async def run_tool_call(name: str, arguments: dict[str, Any], context: ExecutionContext) -> list[TextContent]:
+    """
+    Run an admitted call on a worker thread, under its execution context.
+
+    Tool pipelines read files, run git and call providers synchronously. On a
+    worker thread they don't hold up the event loop, so a cancel notification
+    (which cancels this coroutine) or the deadline is acted on right away: the
+    context is cancelled, the worker stops at its next check, and whatever it
+    produced is discarded. Until it stops, the worker still counts against the
+    scheduler's concurrency limit.
+
+    Args:
+        name: The name of the tool to execute
+        arguments: Dictionary of arguments to pass to the tool
+        context: Context carrying the call's deadline and cancellation flag
+
+    Returns:
+        List of TextContent objects containing the tool's response
+    """
+
+    def run() -> list[TextContent]:
+        with execution_context(context):
+            return asyncio.run(dispatch_tool_call(name, arguments))
+
+    worker = asyncio.ensure_future(asyncio.to_thread(run))
+    # An abandoned worker's outcome is never awaited; retrieve it so it isn't reported as lost
+    worker.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    def abandon() -> None:
+        context.cancel()
+        if name not in UTILITY_TOOLS:
+            # The thread runs on until its next check; keep it counted against the concurrency limit
+            SCHEDULER.track_abandoned(worker)
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(worker), context.time_remaining())
+    except (asyncio.TimeoutError, DeadlineExceededError):
+        abandon()
+        logger.warning(f"Tool '{name}' exceeded its deadline and was abandoned")
+        error_output = ToolOutput(
+            status="error",
+            content=(
+                f"{name} did not finish within its deadline and was abandoned. "
+                "Narrow the request (fewer files, a smaller diff) or pass a larger deadline_seconds."
+            ),
+            content_type="text",
+            metadata={"tool_name": name, "deadline_seconds": resolve_deadline_seconds(name, arguments)},
+        )
+        return [TextContent(type="text", text=error_output.model_dump_json())]
+    except asyncio.CancelledError:
+        abandon()
+        logger.info(f"Tool '{name}' was cancelled by the client")
+        raise
+    except RequestCancelledError:
+        error_output = ToolOutput(
+            status="error", content=f"{name} was cancelled", content_type="text", metadata={"tool_name": name}
+        )
+        return [TextContent(type="text", text=error_output.model_dump_json())]
+
+
+async def dispatch_tool_call(name: str, arguments: dict[str, Any]) -> list[TextContent]:
+    """
+    Run an admitted tool call: reconstruct thread context, then route it to its handler.
+
+    Args:
+        name: The name of the tool to execute (a TOOLS entry or a utility tool)
+        arguments: Dictionary of arguments to pass to the tool
+
+    Returns:
+        List of TextContent objects containing the tool's response
+    """
     # Handle thread context reconstruction if continuation_id is present
     if "continuation_id" in arguments and arguments["continuation_id"]:
         continuation_id = arguments["continuation_id"]
@@ -275,7 +580,12 @@ async def handle_call_tool(name: str, arguments: dict[str, Any]) -> list[TextCon
         logger.info(f"Utility tool '{name}' execution completed")
         return result
 
-    # Handle unknown tool requests gracefully
+    elif name == "get_token_usage":
+        logger.info(f"Executing utility tool '{name}'")
+        result = await handle_get_token_usage()
+        logger.info(f"Utility tool '{name}' execution completed")
+        return result
+
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
@@ -329,6 +639,32 @@ tool calls to maintain full conversation context across multiple exchanges.
 Remember: Only suggest follow-ups when they would genuinely add value to the discussion, and always instruct Claude to use the continuation_id when you do."""
 
 
+def _estimate_new_file_demand(files: Any, context) -> Any:
+    """
+    Estimate tokens for files in this request that the history doesn't already embed.
+
+    Args:
+        files: The request's "files" argument
+        context: ThreadContext of the thread being continued
+
+    Returns:
+        Estimated tokens, or None if the files can't be measured
+    """
+    if not files:
+        return 0
+
+    from utils.conversation_memory import get_conversation_file_list
+    from utils.file_utils import estimate_files_tokens, translate_file_paths
+
+    try:
+        embedded_files = set(get_conversation_file_list(context))
+        new_files = [path for path in files if path not in embedded_files]
+        return estimate_files_tokens(translate_file_paths(new_files) or [])
+    except Exception as e:
+        logger.debug(f"[CONVERSATION_DEBUG] Could not estimate file demand: {type(e).__name__}: {e}")
+        return None
+
+
 async def reconstruct_thread_context(arguments: dict[str, Any]) -> dict[str, Any]:
     """
     Reconstruct conversation context for thread continuation.
@@ -342,7 +678,8 @@ async def reconstruct_thread_context(arguments: dict[str, Any]) -> dict[str, Any
     Returns:
         Modified arguments with conversation history injected
     """
-    from utils.conversation_memory import add_turn, build_conversation_history, get_thread
+    from utils.conversation_memory import add_turn, build_conversation_history, estimate_history_demand, get_thread
+    from utils.token_utils import estimate_tokens
 
     continuation_id = arguments["continuation_id"]
 
@@ -388,14 +725,6 @@ async def reconstruct_thread_context(arguments: dict[str, Any]) -> dict[str, Any
 
     model_context = ModelContext.from_arguments(arguments)
 
-    # Build conversation history with model-specific limits
-    logger.debug(f"[CONVERSATION_DEBUG] Building conversation history for thread {continuation_id}")
-    logger.debug(f"[CONVERSATION_DEBUG] Thread has {len(context.turns)} turns, tool: {context.tool_name}")
-    logger.debug(f"[CONVERSATION_DEBUG] Using model: {model_context.model_name}")
-    conversation_history, conversation_tokens = build_conversation_history(context, model_context)
-    logger.debug(f"[CONVERSATION_DEBUG] Conversation history built: {conversation_tokens:,} tokens")
-    logger.debug(f"[CONVERSATION_DEBUG] Conversation history length: {len(conversation_history)} chars")
-
     # Add dynamic follow-up instructions based on turn count
     follow_up_instructions = get_follow_up_instructions(len(context.turns))
     logger.debug(f"[CONVERSATION_DEBUG] Follow-up instructions added for turn {len(context.turns)}")
@@ -405,6 +734,29 @@ async def reconstruct_thread_context(arguments: dict[str, Any]) -> dict[str, Any
     logger.debug("[CONVERSATION_DEBUG] Extracting user input from 'prompt' field")
     logger.debug(f"[CONVERSATION_DEBUG] User input length: {len(original_prompt)} chars")
 
+    # Split the content budget between history, new files and the new request by
+    # what each actually needs rather than by fixed ratios
+    token_budget_plan = model_context.plan_token_budget(
+        {
+            "new_content": estimate_tokens(original_prompt) + estimate_tokens(follow_up_instructions),
+            "files": _estimate_new_file_demand(arguments.get("files"), context),
+            "history": estimate_history_demand(context, model_context),
+        }
+    )
+
+    # Build conversation history with model-specific limits
+    logger.debug(f"[CONVERSATION_DEBUG] Building conversation history for thread {continuation_id}")
+    logger.debug(f"[CONVERSATION_DEBUG] Thread has {len(context.turns)} turns, tool: {context.tool_name}")
+    logger.debug(f"[CONVERSATION_DEBUG] Using model: {model_context.model_name}")
+    conversation_history, conversation_tokens = build_conversation_history(
+        context, model_context, budget_plan=token_budget_plan
+    )
+    logger.debug(f"[CONVERSATION_DEBUG] Conversation history built: {conversation_tokens:,} tokens")
+    logger.debug(f"[CONVERSATION_DEBUG] Conversation history length: {len(conversation_history)} chars")
+
+    # Hand whatever the history didn't use back to the other segments
+    token_budget_plan = token_budget_plan.settle("history", conversation_tokens)
+
     # Merge original context with new prompt and follow-up instructions
     if conversation_history:
         enhanced_prompt = (
@@ -420,20 +772,17 @@ async def reconstruct_thread_context(arguments: dict[str, Any]) -> dict[str, Any
     enhanced_arguments["prompt"] = enhanced_prompt
     logger.debug("[CONVERSATION_DEBUG] Storing enhanced prompt in 'prompt' field")
 
-    # Calculate remaining token budget based on current model
-    # (model_context was already created above for history building)
-    token_allocation = model_context.calculate_token_allocation()
-
-    # Calculate remaining tokens for files/new content
-    # History has already consumed some of the content budget
-    remaining_tokens = token_allocation.content_tokens - conversation_tokens
-    enhanced_arguments["_remaining_tokens"] = max(0, remaining_tokens)  # Ensure non-negative
+    # Remaining tokens for new files: the files allocation plus anything nobody claimed
+    remaining_tokens = token_budget_plan.allocation("files") + token_budget_plan.unallocated
+    enhanced_arguments["_remaining_tokens"] = remaining_tokens
+    enhanced_arguments["_history_tokens"] = conversation_tokens  # Reported in the tool's token accounting
+    enhanced_arguments["_token_budget_plan"] = token_budget_plan  # Reported in the tool's token accounting
     enhanced_arguments["_model_context"] = model_context  # Pass context for use in tools
 
     logger.debug("[CONVERSATION_DEBUG] Token budget calculation:")
     logger.debug(f"[CONVERSATION_DEBUG]   Model: {model_context.model_name}")
-    logger.debug(f"[CONVERSATION_DEBUG]   Total capacity: {token_allocation.total_tokens:,}")
-    logger.debug(f"[CONVERSATION_DEBUG]   Content allocation: {token_allocation.content_tokens:,}")
+    logger.debug(f"[CONVERSATION_DEBUG]   Content allocation: {token_budget_plan.content_tokens:,}")
+    logger.debug(f"[CONVERSATION_DEBUG]   Plan allocations: {token_budget_plan.allocations}")
     logger.debug(f"[CONVERSATION_DEBUG]   Conversation tokens: {conversation_tokens:,}")
     logger.debug(f"[CONVERSATION_DEBUG]   Remaining tokens: {remaining_tokens:,}")
 
@@ -477,6 +826,8 @@ async def handle_get_version() -> list[TextContent]:
     """
     # Import thinking mode here to avoid circular imports
     from config import DEFAULT_THINKING_MODE_THINKDEEP
+    from utils.file_utils import get_file_cache_stats
+    from utils.file_watcher import get_file_watcher_stats
 
     # Gather comprehensive server information
     uptime = datetime.now(timezone.utc) - SERVER_START_TIME
@@ -490,8 +841,37 @@ async def handle_get_version() -> list[TextContent]:
         "python_version": f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
         "server_started": SERVER_START_TIME.astimezone().isoformat(),
         "uptime_seconds": int(uptime.total_seconds()),
-        "available_tools": list(TOOLS.keys()) + ["get_version"],
+        "available_tools": list(TOOLS.keys()) + list(UTILITY_TOOLS),
     }
+    watcher = get_file_watcher_stats()
+    caches = get_file_cache_stats()
+    if watcher["active"]:
+        watcher_text = (
+            f"- File Watcher: watching {watcher['watched_directories']:,} directories "
+            f"({watcher['events']:,} events, {watcher['overflows']:,} overflows, "
+            f"{watcher['watch_limit_hits']:,} watch limit hits)"
+        )
+    else:
+        watcher_text = "- File Watcher: off (caches validated with stat)"
+    scheduler = SCHEDULER.stats()
+    scheduler_text = (
+        f"- Scheduler: {scheduler['running']}/{scheduler['max_concurrency']} running "
+        f"({scheduler['running_batch']} batch, {scheduler['reserved_interactive']} reserved for interactive, "
+        f"{scheduler['abandoned']} abandoned still stopping) "
+        f"({scheduler['tokens_in_use']:,}/{scheduler['capacity_tokens']:,} tokens), "
+        f"{scheduler['queued']} queued ({scheduler['queued_interactive']} interactive, "
+        f"{scheduler['queued_batch']} batch), wait avg {scheduler['wait_ms_avg']:g} ms / "
+        f"p95 {scheduler['wait_ms_p95']:g} ms / max {scheduler['wait_ms_max']:g} ms, "
+        f"{scheduler['timeouts']:,} queue timeouts"
+    )
+    in_flight = IN_FLIGHT.stats()
+    coalescing_text = (
+        f"- Coalesced Requests: {in_flight['joined']:,} joined {in_flight['started']:,} pipelines "
+        f"({in_flight['in_flight']} in flight)"
+    )
+    cache_text = ", ".join(
+        f"{name} {stats['entries']:,} entries/{stats['hits']:,} hits" for name, stats in caches.items()
+    )
 
     # Format the information in a human-readable way
     text = f"""Zen MCP Server v{__version__}
@@ -505,6 +885,10 @@ Configuration:
 - Python: {version_info["python_version"]}
 - Started: {version_info["server_started"]}
 - Uptime: {version_info["uptime_seconds"]} seconds
+{watcher_text}
+{scheduler_text}
+{coalescing_text}
+- File Caches: {cache_text}
 
 Available Tools:
 {chr(10).join(f"  - {tool}" for tool in version_info["available_tools"])}
@@ -517,20 +901,145 @@ For updates, visit: https://github.com/BeehiveInnovations/zen-mcp-server"""
     return [TextContent(type="text", text=tool_output.model_dump_json())]
 
 
+async def handle_get_token_usage() -> list[TextContent]:
+    """
+    Get the rolling aggregate of per-request token accounting.
+
+    Each completed tool call records estimated tokens for the system prompt,
+    conversation history, embedded and skipped files and new content, along
+    with the usage reported by the provider. This returns totals and averages
+    over the most recent requests, per tool and overall.
+
+    Returns:
+        JSON summary of recent token usage
+    """
+    from utils.token_accounting import get_token_usage_summary
+
+    summary = get_token_usage_summary()
+    tool_output = ToolOutput(
+        status="success",
+        content=json.dumps(summary, indent=2),
+        content_type="json",
+        metadata={"tool_name": "get_token_usage"},
+    )
+
+    return [TextContent(type="text", text=tool_output.model_dump_json())]
+
+
+def get_initialization_options() -> InitializationOptions:
+    """
+    Options sent to clients in the initialize response.
+
+    The streamable HTTP session manager builds them from the Server itself, so
+    every transport uses the Server's name, version and the capabilities of
+    its registered handlers (tools).
+    """
+    return server.create_initialization_options()
+
+
+def create_http_app(host: str, port: int):
+    """
+    Build the ASGI app serving this MCP server over HTTP.
+
+    Streamable HTTP is served at /mcp; the older SSE transport at /sse, with
+    client messages posted to /messages/. Every session runs against the same
+    Server instance, so tools, provider clients and caches are shared.
+    When bound to a loopback address, requests whose Host or Origin header
+    names another host are rejected, so web pages can't reach the server
+    through DNS rebinding.
+
+    Args:
+        host: Interface the server listens on
+        port: Port the server listens on
+
+    Returns:
+        Starlette: The application, with the session manager run by its lifespan
+    """
+    from contextlib import asynccontextmanager
+
+    from mcp.server.sse import SseServerTransport
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from mcp.server.transport_security import TransportSecuritySettings
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    security_settings = None
+    if host in ("127.0.0.1", "localhost", "::1"):
+        local_hosts = ["127.0.0.1", "localhost", "[::1]"]
+        security_settings = TransportSecuritySettings(
+            enable_dns_rebinding_protection=True,
+            allowed_hosts=[f"{name}:{port}" for name in local_hosts],
+            allowed_origins=[f"http://{name}:{port}" for name in local_hosts],
+        )
+
+    session_manager = StreamableHTTPSessionManager(app=server, security_settings=security_settings)
+    sse = SseServerTransport("/messages/", security_settings=security_settings)
+
+    class StreamableHTTPEndpoint:
+        # A class instance, so Starlette routes the raw ASGI call instead of a Request
+        async def __call__(self, scope, receive, send):
+            await session_manager.handle_request(scope, receive, send)
+
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, get_initialization_options())
+        return Response()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            yield
+
+    return Starlette(
+        routes=[
+            Route("/mcp", endpoint=StreamableHTTPEndpoint(), methods=["GET", "POST", "DELETE"]),
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+        ],
+        lifespan=lifespan,
+    )
+
+
+async def run_http_server(host: str, port: int):
+    """
+    Serve MCP over HTTP until the process is stopped.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on
+    """
+    import uvicorn
+
+    # log_config=None keeps the server's own logging configuration
+    config = uvicorn.Config(create_http_app(host, port), host=host, port=port, log_config=None)
+    await uvicorn.Server(config).serve()
+
+
 async def main():
     """
     Main entry point for the MCP server.
 
     Initializes the Gemini API configuration and starts the server using
-    stdio transport. The server will continue running until the client
-    disconnects or an error occurs.
+    the transport selected by MCP_TRANSPORT. With stdio (the default) the
+    server runs until the client disconnects or an error occurs; with http
+    it keeps serving clients until the process is stopped.
 
-    The server communicates via standard input/output streams using the
-    MCP protocol's JSON-RPC message format.
+    Both transports carry the MCP protocol's JSON-RPC message format.
     """
     # Validate and configure providers based on available API keys
     configure_providers()
 
+    # Optionally watch the sandbox so file caches are invalidated by change events
+    from config import FILE_WATCHER_ENABLED, FILE_WATCHER_MAX_WATCHES
+
+    if FILE_WATCHER_ENABLED:
+        from utils.file_utils import EXCLUDED_DIRS, PROJECT_ROOT
+        from utils.file_watcher import start_file_watcher
+
+        if start_file_watcher([str(PROJECT_ROOT)], frozenset(EXCLUDED_DIRS), FILE_WATCHER_MAX_WATCHES):
+            logger.info(f"File watcher started for {PROJECT_ROOT}")
+
     # Log startup message for Docker log monitoring
     logger.info("Zen MCP Server starting up...")
     logger.info(f"Log level: {log_level}")
@@ -544,25 +1053,26 @@ async def main():
         logger.info(f"Model mode: Fixed model '{DEFAULT_MODEL}'")
 
     # Import here to avoid circular imports
-    from config import DEFAULT_THINKING_MODE_THINKDEEP
+    from config import DEFAULT_THINKING_MODE_THINKDEEP, MCP_HTTP_HOST, MCP_HTTP_PORT, MCP_TRANSPORT
+
+    if MCP_TRANSPORT not in ("stdio", "http"):
+        raise ValueError(f"MCP_TRANSPORT must be 'stdio' or 'http', got '{MCP_TRANSPORT}'")
 
     logger.info(f"Default thinking mode (ThinkDeep): {DEFAULT_THINKING_MODE_THINKDEEP}")
 
     logger.info(f"Available tools: {list(TOOLS.keys())}")
     logger.info("Server ready - waiting for tool requests...")
 
+    if MCP_TRANSPORT == "http":
+        # Long-running server shared by every client, with caches and provider clients kept warm
+        logger.info(f"Serving MCP over HTTP at http://{MCP_HTTP_HOST}:{MCP_HTTP_PORT}/mcp (SSE at /sse)")
+        await run_http_server(MCP_HTTP_HOST, MCP_HTTP_PORT)
+        return
+
     # Run the server using stdio transport (standard input/output)
     # This allows the server to be launched by MCP clients as a subprocess
     async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="zen",
-                server_version=__version__,
-                capabilities=ServerCapabilities(tools=ToolsCapability()),  # Advertise tool support capability
-            ),
-        )
+        await server.run(read_stream, write_stream, get_initialization_options())
 
 
 if __name__ == "__main__":
@@ -37,6 +37,9 @@ importlib.reload(config)
 test_root = tempfile.mkdtemp(prefix="zen_mcp_test_")
 os.environ["MCP_PROJECT_ROOT"] = test_root
 
+# Keep the persistent workspace index out of the user's cache directory
+os.environ["ZEN_CACHE_DIR"] = tempfile.mkdtemp(prefix="zen_mcp_cache_")
+
 # Configure asyncio for Windows compatibility
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -20,6 +20,7 @@ from utils.conversation_memory import (
     create_thread,
     get_thread,
 )
+from utils.file_utils import read_files
 
 
 class TestConversationMemory:
@@ -736,5 +737,136 @@ class TestConversationFlow:
                 assert large_file in history
 
 
+class TestChangedFileDiffs:
+    """Test content hashes per turn and diff-only re-embedding of changed files"""
+
+    @pytest.fixture
+    def store(self):
+        data = {}
+        client = Mock()
+        client.setex.side_effect = lambda key, ttl, value: data.__setitem__(key, value)
+        client.expire.side_effect = lambda key, ttl: key in data
+        client.get.side_effect = data.get
+        with patch("utils.conversation_memory.get_redis_client", return_value=client):
+            yield data
+
+    def _embed(self, *paths, **kwargs):
+        hashes = {}
+        read_files([str(path) for path in paths], embedded_hashes=hashes, **kwargs)
+        return hashes
+
+    def _history(self, file_path, file_hashes):
+        context = ThreadContext(
+            thread_id="12345678-1234-1234-1234-123456789012",
+            created_at="2023-01-01T00:00:00Z",
+            last_updated_at="2023-01-01T00:01:00Z",
+            tool_name="codereview",
+            turns=[
+                ConversationTurn(
+                    role="assistant",
+                    content="Found an off-by-one in total()",
+                    timestamp="2023-01-01T00:01:00Z",
+                    files=[file_path],
+                    tool_name="codereview",
+                    file_hashes=file_hashes,
+                )
+            ],
+            initial_context={},
+        )
+        history, _ = build_conversation_history(context, model_context=None)
+        return history
+
+    def test_embedded_files_are_snapshotted(self, store, project_path):
+        source = project_path / "calc.py"
+        source.write_text("def total(items):\n    return sum(items)\n")
+        package = project_path / "pkg"
+        package.mkdir()
+        (package / "util.py").write_text("X = 1\n")
+
+        hashes = self._embed(source, f"{source}:1-2", package)
+        assert set(hashes) == {str(source), str(package / "util.py")}
+        assert store[f"content:{hashes[str(source)]}"] == source.read_text()
+
+    def test_files_skipped_for_budget_are_not_snapshotted(self, store, project_path):
+        small = project_path / "small.py"
+        small.write_text("x = 1\n")
+        large = project_path / "large.py"
+        large.write_text("value = 1\n" * 2000)
+
+        hashes = self._embed(small, large, max_tokens=200, reserve_tokens=0)
+        assert list(hashes) == [str(small)]
+
+    def test_stored_snapshot_is_not_uploaded_again(self, store, project_path):
+        source = project_path / "calc.py"
+        source.write_text("def total(items):\n    return sum(items)\n")
+        self._embed(source)
+        with patch("utils.conversation_memory.get_redis_client") as get_client:
+            get_client.return_value.expire.return_value = True
+            self._embed(source)
+        get_client.return_value.setex.assert_not_called()
+
+    def test_unchanged_file_embedded_once_in_full(self, store, project_path):
+        source = project_path / "calc.py"
+        source.write_text("def total(items):\n    return sum(items)\n")
+        history = self._history(str(source), self._embed(source))
+
+        assert f"--- BEGIN FILE: {source} ---" in history
+        assert "CHANGES SINCE TURN" not in history
+
+    def test_changed_file_embedded_as_diff(self, store, project_path):
+        source = project_path / "calc.py"
+        lines = [f"def helper_{i}():\n    return {i}\n\n" for i in range(50)]
+        source.write_text("".join(lines) + "def total(items):\n    return sum(items[1:])\n")
+        hashes = self._embed(source)
+        source.write_text("".join(lines) + "def total(items):\n    return sum(items)\n")
+
+        history = self._history(str(source), hashes)
+        assert f"--- CHANGES SINCE TURN 1: {source} ---" in history
+        assert "embedded in full in turn 1" in history
+        assert "-    return sum(items[1:])\n+    return sum(items)\n" in history
+        # Only the diff is embedded, not either full version
+        assert f"--- BEGIN FILE: {source}" not in history
+        assert "def helper_0" not in history
+
+    def test_changed_file_in_embedded_directory_embedded_as_diff(self, store, project_path):
+        package = project_path / "pkg"
+        package.mkdir()
+        source = package / "calc.py"
+        lines = [f"def helper_{i}():\n    return {i}\n\n" for i in range(50)]
+        source.write_text("".join(lines) + "def total(items):\n    return sum(items[1:])\n")
+        (package / "util.py").write_text("X = 1\n")
+        hashes = self._embed(package)
+        source.write_text("".join(lines) + "def total(items):\n    return sum(items)\n")
+
+        history = self._history(str(package), hashes)
+        assert f"--- CHANGES SINCE TURN 1: {source} ---" in history
+        assert "-    return sum(items[1:])\n+    return sum(items)\n" in history
+        assert f"--- BEGIN FILE: {source}" not in history
+        assert "def helper_0" not in history
+        # The unchanged file in the directory is still embedded in full
+        assert f"--- BEGIN FILE: {package / 'util.py'} ---" in history
+
+    def test_rewritten_file_embedded_in_full(self, store, project_path):
+        source = project_path / "calc.py"
+        source.write_text("".join(f"a_{i} = {i}\n" for i in range(20)))
+        hashes = self._embed(source)
+        source.write_text("".join(f"b_{i} = {i}\n" for i in range(20)))
+
+        history = self._history(str(source), hashes)
+        assert f"--- BEGIN FILE: {source} ---\nb_0 = 0\n" in history
+        assert "CHANGES SINCE TURN" not in history
+
+    def test_expired_snapshot_falls_back_to_full_file(self, store, project_path):
+        source = project_path / "calc.py"
+        source.write_text("old\n")
+        hashes = self._embed(source)
+        store.clear()
+        source.write_text("new\n")
+
+        history = self._history(str(source), hashes)
+        assert f"--- BEGIN FILE: {source} ---\nnew\n" in history
+        assert "CHANGES SINCE TURN" not in history
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,225 @@
+"""
+Tests for request deadlines and cancellation propagation
+"""
+
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from server import handle_call_tool, resolve_deadline_seconds
+from tests.mock_helpers import create_mock_provider
+from utils.execution_context import (
+    DeadlineExceededError,
+    ExecutionContext,
+    RequestCancelledError,
+    check_cancelled,
+    execution_context,
+    time_remaining,
+)
+from utils.file_utils import expand_paths
+from utils.git_utils import _communicate, run_git_command
+
+
+def _sleeper():
+    return subprocess.Popen(
+        [sys.executable, "-c", "import time; time.sleep(30)"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+class TestExecutionContextDeadlines:
+    """Test cancellation checks and deadline-bounded waits"""
+
+    def test_check_and_time_remaining(self):
+        assert time_remaining(5) == 5
+        with execution_context(ExecutionContext("chat", deadline=time.monotonic() + 10)) as context:
+            check_cancelled()
+            assert 9 < time_remaining() <= 10
+            assert time_remaining(2) == 2
+            context.cancel()
+            with pytest.raises(RequestCancelledError):
+                check_cancelled()
+
+        with execution_context(ExecutionContext("chat", deadline=time.monotonic() - 1)):
+            assert time_remaining(5) == 0
+            with pytest.raises(DeadlineExceededError):
+                check_cancelled()
+
+    def test_cancelled_subprocess_is_killed(self):
+        process = _sleeper()
+        context = ExecutionContext("precommit")
+        threading.Timer(0.1, context.cancel).start()
+
+        started = time.monotonic()
+        with execution_context(context), pytest.raises(RequestCancelledError):
+            _communicate(process, 30)
+        assert time.monotonic() - started < 5
+        assert process.returncode is not None
+
+    def test_subprocess_killed_at_deadline(self):
+        process = _sleeper()
+        with (
+            execution_context(ExecutionContext("precommit", deadline=time.monotonic() + 0.2)),
+            pytest.raises(DeadlineExceededError),
+        ):
+            _communicate(process, time_remaining(30))
+        assert process.returncode is not None
+
+    def test_subprocess_timeout_without_context(self):
+        process = _sleeper()
+        with pytest.raises(subprocess.TimeoutExpired):
+            _communicate(process, 0.2)
+        assert process.returncode is not None
+
+    def test_cancelled_request_runs_no_git_and_reads_no_files(self, tmp_path):
+        context = ExecutionContext("analyze")
+        context.cancel()
+        with execution_context(context):
+            with pytest.raises(RequestCancelledError):
+                run_git_command(str(tmp_path), ["status"])
+            with pytest.raises(RequestCancelledError):
+                expand_paths([str(tmp_path)])
+
+
+class TestServerDeadlines:
+    """Test deadline resolution, expiry and client cancellation in the dispatcher"""
+
+    def test_resolve_deadline_seconds(self):
+        with patch("server.TOOL_DEADLINES", {"chat": 60}), patch("server.TOOL_DEADLINE_SECONDS", 600):
+            assert resolve_deadline_seconds("chat", {}) == 60
+            assert resolve_deadline_seconds("analyze", {}) == 600
+            assert resolve_deadline_seconds("analyze", {"deadline_seconds": 5}) == 5
+            assert resolve_deadline_seconds("analyze", {"deadline_seconds": 0}) == 600
+        with patch("server.TOOL_DEADLINE_SECONDS", 0):
+            assert resolve_deadline_seconds("analyze", {}) is None
+
+    @pytest.mark.asyncio
+    @patch("tools.base.BaseTool.get_model_provider")
+    async def test_provider_timeout_follows_deadline(self, mock_get_provider):
+        mock_provider = create_mock_provider()
+        mock_provider.generate_content.return_value = Mock(
+            content="Chat response", usage={}, model_name="gemini-2.5-flash-preview-05-20", metadata={}
+        )
+        mock_get_provider.return_value = mock_provider
+
+        await handle_call_tool("chat", {"prompt": "Hello", "deadline_seconds": 30})
+
+        timeout = mock_provider.generate_content.call_args.kwargs["timeout"]
+        assert 0 < timeout <= 30
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_abandons_the_call(self):
+        stopped = threading.Event()
+
+        async def slow_execute(arguments):
+            # Blocking work that checks for cancellation, like file ingestion does
+            try:
+                while True:
+                    check_cancelled()
+                    time.sleep(0.01)
+            except RequestCancelledError:
+                stopped.set()
+                raise
+
+        with patch("server.TOOLS", {"analyze": Mock(execute=slow_execute)}):
+            started = time.monotonic()
+            result = await handle_call_tool("analyze", {"prompt": "x", "deadline_seconds": 0.2})
+
+        assert time.monotonic() - started < 2
+        output = json.loads(result[0].text)
+        assert output["status"] == "error"
+        assert "deadline" in output["content"]
+        assert stopped.wait(2)
+
+    @pytest.mark.asyncio
+    async def test_client_cancellation_stops_the_worker(self):
+        started, stopped = threading.Event(), threading.Event()
+
+        async def slow_execute(arguments):
+            started.set()
+            try:
+                while True:
+                    check_cancelled()
+                    time.sleep(0.01)
+            except RequestCancelledError:
+                stopped.set()
+                raise
+
+        with patch("server.TOOLS", {"analyze": Mock(execute=slow_execute)}):
+            call = asyncio.create_task(handle_call_tool("analyze", {"prompt": "x"}))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+
+            # The pipeline task is cancelled on the loop, then the worker notices at its next check
+            for _ in range(200):
+                if stopped.is_set():
+                    break
+                await asyncio.sleep(0.01)
+        assert stopped.is_set()
+
+    @pytest.mark.asyncio
+    async def test_abandoned_worker_keeps_its_slot_until_it_stops(self):
+        from utils.scheduler import ToolScheduler
+
+        started, finish = threading.Event(), threading.Event()
+
+        async def stuck_execute(arguments):
+            # Blocking work that doesn't check for cancellation, like a provider request in flight
+            started.set()
+            finish.wait(5)
+            return []
+
+        scheduler = ToolScheduler(max_concurrency=1, capacity_tokens=1_000, queue_timeout=None)
+        with patch("server.TOOLS", {"analyze": Mock(execute=stuck_execute)}), patch("server.SCHEDULER", scheduler):
+            call = asyncio.create_task(handle_call_tool("analyze", {"prompt": "x"}))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+            # The pipeline task is cancelled on the loop after the call
+            for _ in range(100):
+                if scheduler.stats()["abandoned"]:
+                    break
+                await asyncio.sleep(0.01)
+            assert (scheduler.stats()["running"], scheduler.stats()["abandoned"]) == (0, 1)
+
+            started.clear()
+            second = asyncio.create_task(handle_call_tool("analyze", {"prompt": "y"}))
+            await asyncio.sleep(0.1)
+            # Not admitted while the abandoned worker still runs
+            assert not started.is_set()
+            assert scheduler.stats()["queued"] == 1
+
+            finish.set()
+            await second
+        assert scheduler.stats()["abandoned"] == 0
+
+    @pytest.mark.asyncio
+    @patch("tools.base.BaseTool.get_model_provider")
+    async def test_no_retry_after_cancellation(self, mock_get_provider):
+        from utils.execution_context import current_execution_context
+
+        def failing_call(**kwargs):
+            current_execution_context().cancel()
+            raise RuntimeError("500 INTERNAL. Please retry")
+
+        mock_provider = create_mock_provider()
+        mock_provider.generate_content.side_effect = failing_call
+        mock_get_provider.return_value = mock_provider
+
+        result = await handle_call_tool("chat", {"prompt": "Hello"})
+
+        assert mock_provider.generate_content.call_count == 1
+        assert "cancelled" in json.loads(result[0].text)["content"]
@@ -0,0 +1,72 @@
+"""
+Tests for per-invocation execution contexts on shared tool instances
+"""
+
+import asyncio
+import json
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+from tools.chat import ChatTool
+from utils.execution_context import ExecutionContext, current_execution_context, execution_context
+from utils.model_context import TokenAllocation
+
+
+def _model_context(name, capacity):
+    model_context = Mock(model_name=name)
+    model_context.calculate_token_allocation.return_value = TokenAllocation.for_capacity(capacity)
+    return model_context
+
+
+def test_context_is_restored_on_exit():
+    assert current_execution_context() is None
+    with execution_context(ExecutionContext("chat")) as outer:
+        with execution_context(ExecutionContext("analyze")):
+            assert current_execution_context().tool_name == "analyze"
+        assert current_execution_context() is outer
+    assert current_execution_context() is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_to_one_tool_keep_their_own_state():
+    """Test that interleaved executions of a shared tool instance don't share budgets or models"""
+    tool = ChatTool()
+    original_build_prompt = tool.build_prompt
+    observed = {}
+
+    async def interleaved_build_prompt(request):
+        # The first call yields until the second has started, as slow file reads would
+        if request.prompt == "first":
+            await asyncio.sleep(0.05)
+        budget, _ = tool._calculate_file_token_budget(
+            remaining_budget=None, max_tokens=None, reserve_tokens=0, arguments=None
+        )
+        observed[request.prompt] = budget
+        return await original_build_prompt(request)
+
+    def generate_content(prompt, model_name, **kwargs):
+        context = current_execution_context()
+        observed[f"{model_name}-context"] = context.model_name
+        return MagicMock(content=f"reply from {model_name}", usage={}, metadata={"finish_reason": "STOP"})
+
+    provider = MagicMock()
+    provider.get_provider_type.return_value = MagicMock(value="google")
+    provider.supports_thinking_mode.return_value = False
+    provider.generate_content.side_effect = generate_content
+
+    with (
+        patch.object(tool, "build_prompt", interleaved_build_prompt),
+        patch.object(tool, "get_model_provider", return_value=provider),
+    ):
+        first, second = await asyncio.gather(
+            tool.execute({"prompt": "first", "model": "o3", "_model_context": _model_context("o3", 200_000)}),
+            tool.execute({"prompt": "second", "model": "flash", "_model_context": _model_context("flash", 1_000_000)}),
+        )
+
+    assert observed["first"] < observed["second"]
+    assert observed["first"] <= TokenAllocation.for_capacity(200_000).content_tokens
+    assert observed["o3-context"] == "o3" and observed["flash-context"] == "flash"
+    assert "reply from o3" in json.loads(first[0].text)["content"]
+    assert "reply from flash" in json.loads(second[0].text)["content"]
+    assert current_execution_context() is None
@@ -0,0 +1,96 @@
+"""
+Tests for directory expansion (git listing, scandir walk and ceilings)
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+from utils.file_utils import expand_paths
+
+
+def _init_repo(path):
+    subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+
+
+class TestExpandPathsGit:
+    """Test the git ls-files fast path"""
+
+    @pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+    def test_gitignored_files_are_not_listed(self, project_path):
+        repo = project_path / "repo"
+        (repo / "src").mkdir(parents=True)
+        (repo / "generated").mkdir()
+        _init_repo(repo)
+        (repo / ".gitignore").write_text("generated/\n*.log.py\n")
+        (repo / "src" / "app.py").write_text("print('app')\n")
+        (repo / "src" / "debug.log.py").write_text("print('ignored')\n")
+        (repo / "generated" / "bundle.js").write_text("var x = 1;\n")
+        (repo / "src" / ".hidden.py").write_text("secret = 1\n")
+
+        files = expand_paths([str(repo)])
+
+        assert files == [str(repo / "src" / "app.py")]
+
+    @pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+    def test_subdirectory_of_worktree_lists_only_that_directory(self, project_path):
+        repo = project_path / "repo"
+        (repo / "a").mkdir(parents=True)
+        (repo / "b").mkdir()
+        _init_repo(repo)
+        (repo / "a" / "one.py").write_text("x = 1\n")
+        (repo / "b" / "two.py").write_text("y = 2\n")
+
+        assert expand_paths([str(repo / "a")]) == [str(repo / "a" / "one.py")]
+
+    @pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+    def test_explicitly_requested_ignored_directory_is_walked(self, project_path):
+        repo = project_path / "repo"
+        (repo / "build").mkdir(parents=True)
+        _init_repo(repo)
+        (repo / ".gitignore").write_text("out/\n")
+        (repo / "out").mkdir()
+        (repo / "out" / "gen.py").write_text("z = 3\n")
+
+        assert expand_paths([str(repo / "out")]) == [str(repo / "out" / "gen.py")]
+
+
+class TestExpandPathsWalk:
+    """Test the scandir walker and expansion ceilings"""
+
+    def _make_tree(self, root):
+        (root / "pkg" / "sub").mkdir(parents=True)
+        (root / "node_modules" / "dep").mkdir(parents=True)
+        (root / ".cache").mkdir()
+        (root / "pkg" / "a.py").write_text("a = 1\n")
+        (root / "pkg" / "sub" / "b.py").write_text("b = 2\n")
+        (root / "pkg" / "notes.bin").write_text("ignored extension\n")
+        (root / "node_modules" / "dep" / "index.js").write_text("module.exports = 1\n")
+        (root / ".cache" / "c.py").write_text("c = 3\n")
+
+    def test_walk_skips_excluded_and_hidden_directories(self, project_path):
+        root = project_path / "tree"
+        self._make_tree(root)
+
+        files = expand_paths([str(root)])
+
+        assert files == [str(root / "pkg" / "a.py"), str(root / "pkg" / "sub" / "b.py")]
+
+    def test_file_ceiling_stops_expansion_early(self, project_path):
+        root = project_path / "many"
+        root.mkdir()
+        for index in range(10):
+            (root / f"f{index}.py").write_text("x = 1\n")
+
+        assert len(expand_paths([str(root)], max_files=3)) == 3
+
+    def test_byte_ceiling_stops_expansion_early(self, project_path):
+        root = project_path / "big"
+        root.mkdir()
+        for index in range(5):
+            (root / f"f{index}.py").write_text("x" * 100)
+
+        files = expand_paths([str(root)], max_bytes=250)
+
+        assert files == [str(root / "f0.py"), str(root / "f1.py")]
@@ -0,0 +1,98 @@
+"""
+Tests for binary/generated/minified file classification
+"""
+
+from utils.file_classifier import classify_file, classify_sample
+from utils.file_utils import expand_paths, read_files
+
+
+class TestClassifySample:
+    """Test classification rules on samples"""
+
+    def test_regular_source_is_not_flagged(self):
+        assert classify_sample("app.py", b"def main():\n    return 1\n") is None
+        assert classify_sample("empty.py", b"") is None
+
+    def test_lockfile_names(self):
+        assert classify_sample("package-lock.json", b"{}") == "lockfile"
+        assert classify_sample("pnpm-lock.yaml", b"lockfileVersion: 6\n") == "lockfile"
+
+    def test_binary_content(self):
+        assert classify_sample("data.json", b"\x89PNG\r\n\x1a\n\0\0\0") == "binary"
+        assert classify_sample("blob.txt", bytes(range(1, 9)) * 100) == "binary"
+
+    def test_utf8_text_is_not_binary(self):
+        assert classify_sample("readme.md", "Grüße – ünïcödé text\n".encode() * 50) is None
+
+    def test_minified_content(self):
+        assert classify_sample("vendor.js", b"var a=1;" * 1000) == "minified"
+        assert classify_sample("app.min.js", b"var a = 1;\n") == "minified"
+
+    def test_single_long_line_in_normal_file_is_not_minified(self):
+        sample = b"x = 1\n" * 200 + b"URL = '" + b"a" * 1500 + b"'\n" + b"y = 2\n" * 200
+        assert classify_sample("config.py", sample) is None
+
+    def test_generated_markers(self):
+        assert classify_sample("api_pb2.py", b"# Generated by the protocol buffer compiler.  DO NOT EDIT!\n") == (
+            "generated"
+        )
+        assert classify_sample("schema.go", b"// Code generated by sqlc. DO NOT EDIT.\n") == "generated"
+        assert classify_sample("Client.cs", b"// <auto-generated>\n// tool output\n") == "generated"
+        assert classify_sample("Store.java", b"/*\n * @generated by codegen\n */\nclass Store {}\n") == "generated"
+
+    def test_hand_written_file_mentioning_do_not_edit(self):
+        sample = b"# Do not edit this list without updating docs/tools.md\nTOOLS = ['chat']\n"
+        assert classify_sample("registry.py", sample) is None
+        # Markers after the first line of code don't count
+        sample = b"import os\n# Code generated by hand. DO NOT EDIT.\n"
+        assert classify_sample("notes.py", sample) is None
+        assert classify_sample("readme.md", b"This tool writes auto-generated clients.\n") is None
+
+    def test_classify_file_reads_head(self, tmp_path):
+        path = tmp_path / "bundle.js"
+        path.write_bytes(b"\0" + b"x" * 100)
+        assert classify_file(str(path)) == "binary"
+        assert classify_file(str(tmp_path / "missing.py")) is None
+
+
+class TestExpansionExclusion:
+    """Test that classified files are left out of directory expansion"""
+
+    def _make_tree(self, root):
+        root.mkdir()
+        (root / "app.py").write_text("def main():\n    return 1\n")
+        (root / "package-lock.json").write_text('{"lockfileVersion": 3}\n')
+        (root / "vendor.js").write_text("var a=1;" * 1000)
+        (root / "image.json").write_bytes(b"\0\1\2\3" * 100)
+
+    def test_directory_expansion_excludes_and_reports(self, project_path):
+        root = project_path / "src"
+        self._make_tree(root)
+
+        excluded = {}
+        files = expand_paths([str(root)], excluded=excluded)
+
+        assert files == [str(root / "app.py")]
+        assert excluded == {
+            str(root / "package-lock.json"): "dependency lockfile",
+            str(root / "vendor.js"): "minified or bundled code",
+            str(root / "image.json"): "binary content",
+        }
+
+    def test_explicit_files_and_opt_out_are_kept(self, project_path):
+        root = project_path / "src"
+        self._make_tree(root)
+
+        assert expand_paths([str(root / "vendor.js")]) == [str(root / "vendor.js")]
+        assert len(expand_paths([str(root)], skip_generated=False)) == 4
+
+    def test_read_files_notes_excluded_files(self, project_path):
+        root = project_path / "src"
+        self._make_tree(root)
+
+        content = read_files([str(root)])
+
+        assert "def main()" in content
+        assert "--- EXCLUDED FILES (BINARY/GENERATED) ---" in content
+        assert "package-lock.json (dependency lockfile)" in content
+        assert "var a=1;" not in content
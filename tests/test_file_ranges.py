@@ -0,0 +1,161 @@
+"""
+Tests for line-range file entries and outline-only degradation
+"""
+
+from utils.file_outline import extract_outline
+from utils.file_utils import parse_line_range, read_file_content, read_file_entry, read_files
+
+PYTHON_SOURCE = """import os
+
+
+class Service:
+    def start(self):
+        return True
+
+    async def stop(self):
+        pass
+
+
+def helper(value):
+    return value * 2
+"""
+
+
+class TestLineRanges:
+    """Test parsing and reading of /abs/path:START-END entries"""
+
+    def test_parse_line_range(self, project_path):
+        assert parse_line_range("/abs/path.py:120-340") == ("/abs/path.py", (120, 340))
+        assert parse_line_range("/abs/path.py:7") == ("/abs/path.py", (7, 7))
+        assert parse_line_range("/abs/path.py") == ("/abs/path.py", None)
+
+        # A file whose name really ends in a number suffix is not a range
+        odd = project_path / "weird:12"
+        odd.write_text("x\n")
+        assert parse_line_range(str(odd)) == (str(odd), None)
+
+    def test_read_range_across_scan_chunks(self, project_path):
+        path = project_path / "long.py"
+        path.write_text("".join(f"line_{i} = {i}  # {'pad' * 10}\n" for i in range(1, 5001)))
+
+        content, tokens = read_file_entry(f"{path}:4000-4002")
+
+        assert f"--- BEGIN FILE: {path} (lines 4000-4002) ---" in content
+        assert "line_4000 = 4000" in content
+        assert "line_4002 = 4002" in content
+        assert "line_3999 " not in content
+        assert "line_4003 " not in content
+        assert tokens > 0
+
+    def test_read_range_past_end_of_file(self, project_path):
+        path = project_path / "short.py"
+        path.write_text("a = 1\nb = 2\n")
+
+        content, _ = read_file_entry(f"{path}:10-20")
+        assert "fewer than 10 lines" in content
+
+        content, _ = read_file_entry(f"{path}:2-20")
+        assert "(lines 2-2)" in content
+        assert "b = 2" in content
+
+    def test_read_range_validates_path(self):
+        content, _ = read_file_entry("/etc/passwd:1-5")
+        assert "--- ERROR ACCESSING FILE:" in content
+
+    def test_read_files_embeds_ranges(self, project_path):
+        path = project_path / "mod.py"
+        path.write_text(PYTHON_SOURCE)
+
+        content = read_files([f"{path}:12-13"])
+
+        assert "def helper(value):" in content
+        assert "class Service" not in content
+
+
+class TestOutlines:
+    """Test outline extraction and degradation"""
+
+    def test_extract_outline(self, project_path):
+        path = project_path / "mod.py"
+        path.write_text(PYTHON_SOURCE)
+
+        outline = extract_outline(str(path))
+
+        assert outline.entries == [
+            (4, "class Service:"),
+            (5, "    def start(self):"),
+            (8, "    async def stop(self):"),
+            (12, "def helper(value):"),
+        ]
+        assert outline.total_lines == 13
+
+    def test_long_lines_are_not_loaded_whole(self, project_path):
+        path = project_path / "bundle.ts"
+        path.write_text("export function main() {\n" + "x" * 100_000 + "\n}\nexport class Thing {}\n")
+
+        outline = extract_outline(str(path))
+
+        assert [line for line, _ in outline.entries] == [1, 4]
+        assert outline.total_lines == 4
+
+    def test_oversized_file_gets_outline(self, project_path):
+        path = project_path / "huge.py"
+        path.write_text(PYTHON_SOURCE + "\n".join(f"# filler {i}" for i in range(20)))
+
+        content, _ = read_file_content(str(path), max_size=100)
+
+        assert "--- FILE TOO LARGE:" in content
+        assert "12: def helper(value):" in content
+        assert f"{path}:START-END" in content
+
+    def test_read_files_degrades_to_outline_when_over_budget(self, project_path):
+        path = project_path / "big.py"
+        body = "\n".join(f"    value_{i} = {i}" for i in range(2000))
+        path.write_text(f"class Big:\n    def run(self):\n{body}\n")
+
+        content = read_files([str(path)], max_tokens=500, reserve_tokens=0)
+
+        assert f"--- BEGIN FILE OUTLINE: {path} ---" in content
+        assert "2:     def run(self):" in content
+        assert "value_1999" not in content
+        assert "SKIPPED FILES" not in content
+
+
+class TestConversationHistoryDegradation:
+    """Test that history embedding keeps going after a file that doesn't fit"""
+
+    def test_large_file_does_not_stop_later_files(self, project_path):
+        from unittest.mock import Mock
+
+        from utils.conversation_memory import ConversationTurn, ThreadContext, build_conversation_history
+        from utils.model_context import TokenBudgetPlan
+
+        large = project_path / "large.txt"
+        large.write_text("no declarations here\n" * 5000)
+        small = project_path / "small.py"
+        small.write_text("def tiny():\n    return 1\n")
+
+        context = ThreadContext(
+            thread_id="12345678-1234-1234-1234-123456789012",
+            created_at="2023-01-01T00:00:00Z",
+            last_updated_at="2023-01-01T00:00:00Z",
+            tool_name="chat",
+            turns=[
+                ConversationTurn(
+                    role="user",
+                    content="Look at these",
+                    timestamp="2023-01-01T00:00:00Z",
+                    files=[str(large), str(small)],
+                )
+            ],
+            initial_context={},
+        )
+        model_context = Mock()
+        model_context.model_name = "test-model"
+        model_context.estimate_tokens.side_effect = lambda text: len(text) // 3
+        plan = TokenBudgetPlan(content_tokens=10_000, allocations={"history": 2_000})
+
+        history, _ = build_conversation_history(context, model_context, budget_plan=plan)
+
+        assert "def tiny():" in history
+        assert "1 additional file(s) were truncated" in history
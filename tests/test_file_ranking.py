@@ -0,0 +1,88 @@
+"""
+Tests for relevance-ranked file packing
+"""
+
+from utils.file_ranking import pack_files_by_relevance, rank_files, tokenize
+from utils.file_utils import read_files
+from utils.token_accounting import TokenAccounting
+
+
+class TestTokenize:
+    """Test term extraction"""
+
+    def test_splits_identifiers(self):
+        terms = tokenize("parseConfigFile load_user_session HTTPServer")
+        assert {"parse", "config", "parseconfigfile", "load", "user", "session", "http", "server"} <= set(terms)
+
+    def test_drops_stop_words(self):
+        assert tokenize("what does the file do") == []
+
+
+class TestRanking:
+    """Test BM25 ranking and greedy packing"""
+
+    def _make_files(self, project_path):
+        src = project_path / "src"
+        src.mkdir()
+        files = {
+            "auth.py": "def authenticate_user(token):\n    return verify_token(token)\n",
+            "billing.py": "def charge_invoice(invoice):\n    return invoice.total\n",
+            "utils.py": "def helper():\n    return 1\n",
+        }
+        paths = []
+        for name, content in files.items():
+            path = src / name
+            path.write_text(content)
+            paths.append(str(path))
+        return src, paths
+
+    def test_rank_prefers_matching_path_and_identifiers(self, project_path):
+        _, paths = self._make_files(project_path)
+        estimates = dict.fromkeys(paths, 100)
+        ranked = rank_files(paths, "How is the auth token verified?", estimates)
+        assert ranked[0].path.endswith("auth.py")
+        assert ranked[0].score > 0
+        assert all(item.score == 0 for item in ranked[1:])
+
+    def test_pack_keeps_relevant_files_and_explains_drops(self, project_path):
+        _, paths = self._make_files(project_path)
+        estimates = dict.fromkeys(paths, 100)
+        result = pack_files_by_relevance(paths, "review billing invoices", 150, estimates)
+        assert [p.rsplit("/", 1)[1] for p in result.selected] == ["billing.py"]
+        assert set(result.dropped) == {paths[0], paths[2]}
+        assert all("no match" in reason for reason in result.dropped.values())
+
+    def test_pinned_files_are_packed_first(self, project_path):
+        _, paths = self._make_files(project_path)
+        estimates = dict.fromkeys(paths, 100)
+        result = pack_files_by_relevance(paths, "auth", 150, estimates, pinned={paths[2]})
+        assert result.selected == [paths[2]]
+        assert "lower relevance" in result.dropped[paths[0]]
+
+    def test_read_files_ranks_directory_when_over_budget(self, project_path):
+        src, paths = self._make_files(project_path)
+        for index in range(20):
+            (src / f"a_module_{index}.py").write_text("value = 1\n" * 20)
+
+        accounting = TokenAccounting()
+        content = read_files(
+            [str(src)],
+            max_tokens=200,
+            reserve_tokens=0,
+            accounting=accounting,
+            relevance_query="check the billing invoice logic",
+        )
+
+        assert "billing.py" in content
+        assert "charge_invoice" in content
+        assert "--- SKIPPED FILES (TOKEN LIMIT) ---" in content
+        assert "no match for request terms" in content
+        assert paths[1] not in accounting.skipped_file_tokens
+        assert accounting.skipped_file_tokens
+
+    def test_read_files_keeps_path_order_when_everything_fits(self, project_path):
+        src, paths = self._make_files(project_path)
+        content = read_files([str(src)], relevance_query="billing")
+        positions = [content.index(path) for path in paths]
+        assert positions == sorted(positions)
+        assert "SKIPPED FILES" not in content
@@ -0,0 +1,207 @@
+"""
+Tests for the memory-bounded file reader
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from utils.file_reader import read_text
+from utils.file_utils import read_file_content
+
+LOG_LINES = [f"2024-01-01 00:00:{i % 60:02d} INFO request {i} handled\n" for i in range(2000)]
+
+
+class TestReadText:
+    """Test head, tail and pattern reads"""
+
+    def test_head_respects_byte_cap_at_line_boundary(self, project_path):
+        path = project_path / "data.txt"
+        path.write_text("".join(f"line {i}\n" for i in range(1000)))
+
+        result = read_text(path, max_bytes=100, header="<", footer=">")
+        assert result.truncated
+        assert result.bytes_read <= 100
+        assert result.text.startswith("<line 0\n")
+        assert result.text.endswith("\n>")
+        assert result.total_bytes == path.stat().st_size
+
+    def test_token_cap_converts_to_bytes(self, project_path):
+        path = project_path / "data.txt"
+        path.write_text("x" * 10_000)
+
+        result = read_text(path, max_tokens=100)
+        assert result.truncated
+        # A single long line has no boundary to cut at, so the cap is used as-is
+        assert result.bytes_read == 400
+
+    def test_tail_starts_at_line_boundary(self, project_path):
+        path = project_path / "data.txt"
+        path.write_text("".join(f"line {i}\n" for i in range(1000)))
+
+        result = read_text(path, mode="tail", max_bytes=50)
+        assert result.truncated
+        assert result.text.endswith("line 999\n")
+        assert result.text.startswith("line ")
+        assert "line 900\n" not in result.text
+
+    def test_pattern_windows_with_context(self, project_path):
+        lines = list(LOG_LINES)
+        lines[500] = "ERROR database connection lost\n"
+        lines[1500] = "Traceback (most recent call last):\n"
+        path = project_path / "app.log"
+        path.write_text("".join(lines))
+
+        result = read_text(path, mode="pattern", max_bytes=100_000, context_lines=2)
+        assert result.matches == 2
+        assert "ERROR database connection lost" in result.text
+        assert "Traceback" in result.text
+        assert "request 498 handled" in result.text
+        assert "request 497 handled" not in result.text
+        assert "\n...\n" in result.text
+        assert result.truncated
+
+    def test_empty_file(self, project_path):
+        path = project_path / "empty.txt"
+        path.write_text("")
+
+        result = read_text(path, header="[", footer="]")
+        assert result.text == "[]"
+        assert not result.truncated
+
+    def test_invalid_utf8_is_replaced(self, project_path):
+        path = project_path / "mixed.txt"
+        path.write_bytes(b"ok \xff\xfe done\n")
+
+        assert read_text(path).text == "ok �� done\n"
+
+
+class TestReadFileContent:
+    """Test that read_file_content keeps its envelope on the new reader"""
+
+    def test_envelope_unchanged(self, project_path):
+        path = project_path / "module.py"
+        path.write_text("def main():\n    return 1\n")
+
+        content, tokens = read_file_content(str(path))
+        assert content == (f"\n--- BEGIN FILE: {path} ---\ndef main():\n    return 1\n\n--- END FILE: {path} ---\n")
+        assert tokens == len(content) // 4
+
+    def test_oversized_log_shows_error_windows(self, project_path):
+        lines = list(LOG_LINES)
+        lines[1000] = "FATAL worker crashed\n"
+        path = project_path / "server.log"
+        path.write_text("".join(lines))
+
+        content, _ = read_file_content(str(path), max_size=10_000)
+        assert "--- FILE TOO LARGE:" in content
+        assert "FATAL worker crashed" in content
+        assert "request 0 handled" not in content
+        assert content.endswith("--- END FILE ---\n")
+
+    def test_oversized_log_without_errors_shows_tail(self, project_path):
+        path = project_path / "server.log.1"
+        path.write_text("".join(LOG_LINES))
+
+        content, _ = read_file_content(str(path), max_size=1_000)
+        assert "No error lines found" in content
+        assert "request 1999 handled" in content
+        assert "request 0 handled" not in content
+
+
+LARGE_FILE_BYTES = 8 * 1024 * 1024
+EXCERPT_BYTES = 100_000
+
+# Measures the RSS high-water mark of one read, above the process's RSS after imports.
+# Writing "5" to clear_refs resets VmHWM, so import-time peaks don't mask the read.
+RSS_SCRIPT = textwrap.dedent("""
+    import sys
+    sys.path.insert(0, {root!r})
+    from utils.file_utils import read_file_content
+
+    def status_kib(field):
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith(field))
+
+    path = {path!r}
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = status_kib("VmRSS:")
+    if sys.argv[1] == "legacy":
+        with open(path, encoding="utf-8", errors="replace") as f:
+            file_content = f.read()
+        formatted = f"\\n--- BEGIN FILE: {{path}} ---\\n{{file_content}}\\n--- END FILE: {{path}} ---\\n"
+    else:
+        formatted, _ = read_file_content(path, max_size={size})
+    print(status_kib("VmHWM:") - baseline)
+    """)
+
+
+def _write_large_log(project_path):
+    path = project_path / "large.log"
+    path.write_text("".join(LOG_LINES) * (LARGE_FILE_BYTES // len("".join(LOG_LINES))))
+    return path
+
+
+def _legacy_read(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        file_content = f.read()
+    return f"\n--- BEGIN FILE: {path} ---\n{file_content}\n--- END FILE: {path} ---\n"
+
+
+def _traced_peak(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+class TestPeakMemory:
+    """Benchmark peak memory per request against the previous read-everything-then-format approach"""
+
+    def test_full_read_peak_heap(self, project_path):
+        path = _write_large_log(project_path)
+
+        legacy_peak, legacy = _traced_peak(lambda: _legacy_read(path))
+        new_peak, (content, _) = _traced_peak(lambda: read_file_content(str(path), max_size=2 * LARGE_FILE_BYTES))
+
+        print(f"\nfull read peak heap: legacy {legacy_peak / 2**20:.1f} MiB, streamed {new_peak / 2**20:.1f} MiB")
+        assert content == legacy
+        # One envelope buffer plus the decoded string; never more than the old path
+        assert new_peak <= legacy_peak * 1.01
+
+    def test_capped_read_peak_heap(self, project_path):
+        path = _write_large_log(project_path)
+
+        legacy_peak, _ = _traced_peak(lambda: _legacy_read(path))
+        new_peak, _ = _traced_peak(lambda: read_file_content(str(path), max_size=EXCERPT_BYTES))
+
+        print(f"\ncapped read peak heap: legacy {legacy_peak / 2**20:.1f} MiB, streamed {new_peak / 2**20:.1f} MiB")
+        assert new_peak < 4 * EXCERPT_BYTES
+        assert new_peak < legacy_peak / 10
+
+    @pytest.mark.skipif(not os.access("/proc/self/clear_refs", os.W_OK), reason="needs Linux /proc peak RSS reset")
+    def test_capped_read_peak_rss(self, project_path):
+        path = _write_large_log(project_path)
+        root = str(Path(__file__).resolve().parent.parent)
+        script = RSS_SCRIPT.format(root=root, path=str(path), size=EXCERPT_BYTES)
+
+        def peak_rss_kib(variant):
+            result = subprocess.run(
+                [sys.executable, "-c", script, variant], capture_output=True, text=True, check=True, timeout=60
+            )
+            return int(result.stdout.strip().splitlines()[-1])
+
+        legacy_kib = peak_rss_kib("legacy")
+        new_kib = peak_rss_kib("streamed")
+        print(
+            f"\ncapped read peak RSS above baseline: legacy {legacy_kib / 1024:.1f} MiB, streamed {new_kib / 1024:.1f} MiB"
+        )
+        assert new_kib < legacy_kib
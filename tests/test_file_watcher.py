@@ -0,0 +1,142 @@
+"""
+Tests for the stat-validated file caches and the inotify file watcher
+"""
+
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+import utils.file_utils as file_utils
+from utils.file_cache import FileCache, file_signature
+from utils.file_watcher import IN_Q_OVERFLOW, get_file_watcher_stats, start_file_watcher, stop_file_watcher
+
+
+def _write_old(path, text):
+    """Write a file with an mtime outside the racy window, so stat validation may cache it."""
+    path.write_text(text)
+    old = time.time() - 60
+    os.utime(path, (old, old))
+
+
+@pytest.fixture
+def watcher(project_path):
+    started = start_file_watcher([str(project_path)], background=False)
+    if started is None:
+        pytest.skip("inotify is not available")
+    yield started
+    stop_file_watcher()
+
+
+class TestStatValidatedCache:
+    """Test FileCache without a watcher"""
+
+    def test_hit_until_file_changes(self, project_path):
+        cache = FileCache("test")
+        path = project_path / "a.py"
+        _write_old(path, "one")
+        cache.store(str(path), None, "one", file_signature(str(path)))
+        assert cache.lookup(str(path)) == "one"
+
+        path.write_text("two!")
+        assert cache.lookup(str(path)) is None
+        assert cache.stats()["entries"] == 0
+
+    def test_recently_modified_file_is_not_cached(self, project_path):
+        cache = FileCache("test")
+        path = project_path / "a.py"
+        path.write_text("fresh")
+        cache.store(str(path), None, "fresh", file_signature(str(path)))
+        assert cache.lookup(str(path)) is None
+
+    def test_weight_bound_evicts_oldest(self, project_path):
+        cache = FileCache("test", max_weight=10)
+        for name in ("a", "b", "c"):
+            path = project_path / name
+            _write_old(path, name)
+            cache.store(str(path), None, name, file_signature(str(path)), weight=4)
+        assert cache.lookup(str(project_path / "a")) is None
+        assert cache.lookup(str(project_path / "c")) == "c"
+
+    def test_read_file_content_served_from_cache(self, project_path):
+        path = project_path / "module.py"
+        _write_old(path, "x = 1\n")
+        first = file_utils.read_file_content(str(path))
+        hits = file_utils.get_file_cache_stats()["content"]["hits"]
+        assert file_utils.read_file_content(str(path)) == first
+        assert file_utils.get_file_cache_stats()["content"]["hits"] == hits + 1
+
+        _write_old(path, "x = 22\n")
+        assert "x = 22" in file_utils.read_file_content(str(path))[0]
+
+
+class TestFileWatcher:
+    """Test invalidation driven by inotify events"""
+
+    def test_covered_entries_skip_stat_and_see_changes(self, watcher, project_path):
+        cache = FileCache("test")
+        path = project_path / "a.py"
+        path.write_text("one")
+        signature = file_signature(str(path))
+        assert signature.watcher is watcher
+        # Trusted entries are cached even inside the racy window
+        cache.store(str(path), None, "one", signature)
+
+        with patch("utils.file_cache.file_signature") as stat_check:
+            assert cache.lookup(str(path)) == "one"
+            stat_check.assert_not_called()
+
+        path.write_text("one")  # Same size and content, still an event
+        assert cache.lookup(str(path)) is None
+        assert get_file_watcher_stats()["events"] > 0
+
+    def test_new_directories_are_watched(self, watcher, project_path):
+        (project_path / "pkg").mkdir()
+        watcher.drain()
+        assert watcher.covers(str(project_path / "pkg" / "mod.py"))
+
+    def test_structure_change_invalidates_path_cache(self, watcher, project_path):
+        target = project_path / "a.py"
+        target.write_text("x")
+        file_utils.resolve_and_validate_path(str(target))
+        assert file_utils._path_cache
+
+        (project_path / "b.py").write_text("y")
+        watcher.drain()
+        assert not file_utils._path_cache
+
+    def test_overflow_flushes_caches(self, watcher, project_path):
+        cache = FileCache("test")
+        path = project_path / "a.py"
+        path.write_text("one")
+        cache.store(str(path), None, "one", file_signature(str(path)))
+        watcher.drain()
+
+        watcher._handle_event(-1, IN_Q_OVERFLOW, "")
+        assert cache.stats()["entries"] == 0
+        assert watcher.stats()["overflows"] == 1
+
+    def test_watch_limit_falls_back_to_stat(self, project_path):
+        (project_path / "deep").mkdir()
+        limited = start_file_watcher([str(project_path)], max_watches=1, background=False)
+        if limited is None:
+            pytest.skip("inotify is not available")
+        try:
+            assert limited.stats()["watch_limit_hits"] >= 1
+            path = project_path / "deep" / "a.py"
+            _write_old(path, "one")
+            signature = file_signature(str(path))
+            assert signature.watcher is None
+
+            cache = FileCache("test")
+            cache.store(str(path), None, "one", signature)
+            assert cache.lookup(str(path)) == "one"
+            path.write_text("two!")
+            assert cache.lookup(str(path)) is None
+        finally:
+            stop_file_watcher()
+
+    def test_stopping_the_watcher_reports_inactive(self, watcher):
+        stop_file_watcher()
+        assert get_file_watcher_stats() == {"active": False}
@@ -0,0 +1,241 @@
+"""
+Tests for streaming, budget-aware git diff reading and the diff cache
+"""
+
+import os
+import subprocess
+import time
+from unittest.mock import patch
+
+import pytest
+
+from utils import git_utils
+from utils.git_utils import (
+    clear_diff_cache,
+    git_diff_numstat,
+    hunk_hash,
+    parse_numstat,
+    split_diff_hunks,
+    stream_git_diff,
+)
+
+
+def _git(repo, *args):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q", "-b", "main")
+    _git(tmp_path, "config", "user.email", "test@example.com")
+    _git(tmp_path, "config", "user.name", "Test")
+    (tmp_path / "keep.py").write_text("a = 1\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+    return tmp_path
+
+
+class TestStreamGitDiff:
+    """Test splitting, budgeting and early termination"""
+
+    def test_splits_sections_by_file(self, repo):
+        (repo / "keep.py").write_text("a = 2\n")
+        (repo / "name with spaces.py").write_text("b = 1\n")
+        (repo / "bin.dat").write_bytes(b"\0\1\2" * 10)
+        _git(repo, "add", ".")
+
+        stream = stream_git_diff(str(repo), ["diff", "--cached"], max_tokens=10_000)
+        assert stream.success and stream.complete
+        assert [f.path for f in stream.files] == ["bin.dat", "keep.py", "name with spaces.py"]
+        assert stream.files[1].text.startswith("diff --git a/keep.py b/keep.py\n")
+        assert "+a = 2" in stream.files[1].text
+        assert stream.truncated_files == []
+
+    def test_rename_and_delete_paths(self, repo):
+        _git(repo, "mv", "keep.py", "moved.py")
+        stream = stream_git_diff(str(repo), ["diff", "--cached", "-M"], max_tokens=10_000)
+        assert [f.path for f in stream.files] == ["moved.py"]
+
+        _git(repo, "rm", "-q", "--cached", "moved.py")
+        stream = stream_git_diff(str(repo), ["diff", "--cached"], max_tokens=10_000)
+        assert [f.path for f in stream.files] == ["keep.py"]
+
+    def test_oversized_file_is_skipped(self, repo):
+        (repo / "a_small.py").write_text("x = 1\n")
+        (repo / "b_large.py").write_text("y = 1\n" * 2000)
+        (repo / "c_small.py").write_text("z = 1\n")
+        _git(repo, "add", ".")
+
+        stream = stream_git_diff(str(repo), ["diff", "--cached"], max_tokens=1_000)
+        assert [f.path for f in stream.files] == ["a_small.py", "c_small.py"]
+        assert stream.truncated_files == ["b_large.py"]
+        assert stream.complete
+        assert sum(f.tokens for f in stream.files) <= 1_000
+
+    def test_per_file_overhead_counts_against_budget(self, repo):
+        for name in ("a.py", "b.py", "c.py"):
+            (repo / name).write_text("x = 1\n")
+        _git(repo, "add", ".")
+
+        stream = stream_git_diff(str(repo), ["diff", "--cached"], max_tokens=100, file_overhead_tokens=40)
+        assert [f.path for f in stream.files] == ["a.py"]
+        assert stream.truncated_files == ["b.py"]
+        assert not stream.complete
+
+    def test_stops_git_once_budget_is_used(self, repo):
+        for index in range(200):
+            (repo / f"vendor_{index:03}.py").write_text(f"value = {index}\n" * 500)
+        _git(repo, "add", ".")
+
+        stream = stream_git_diff(str(repo), ["diff", "--cached"], max_tokens=2_000)
+        assert stream.success
+        assert not stream.complete
+        seen = len(stream.files) + len(stream.truncated_files)
+        assert seen < 10
+        assert sum(f.tokens for f in stream.files) <= 2_000
+
+    def test_order_controls_packing(self, repo):
+        (repo / "a_first.py").write_text("x = 1\n" * 100)
+        (repo / "b_second.py").write_text("y = 1\n" * 100)
+        _git(repo, "add", ".")
+
+        stream = stream_git_diff(str(repo), ["diff", "--cached"], max_tokens=250, order=["b_second.py"])
+        assert [f.path for f in stream.files] == ["b_second.py"]
+        assert stream.truncated_files == ["a_first.py"]
+
+    def test_git_failure(self, repo):
+        stream = stream_git_diff(str(repo), ["diff", "no-such-ref...HEAD"], max_tokens=1_000)
+        assert not stream.success
+        assert "no-such-ref" in stream.error
+
+    def test_missing_repository(self, tmp_path):
+        stream = stream_git_diff(str(tmp_path / "missing"), ["diff"], max_tokens=1_000)
+        assert not stream.success
+
+
+def _age(repo, *paths):
+    """Backdate the index and the given files so their state can be cached."""
+    old = time.time() - 60
+    for path in (".git/index", *paths):
+        os.utime(repo / path, (old, old))
+
+
+class TestDiffCache:
+    """Test that diffs are reused while the repository state is unchanged"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self):
+        clear_diff_cache()
+        yield
+        clear_diff_cache()
+
+    def _diff(self, repo, command=("diff",), files=("keep.py",), refs=()):
+        return stream_git_diff(str(repo), list(command), 10_000, changed_files=list(files), refs=refs)
+
+    def test_unchanged_tree_reuses_result(self, repo):
+        (repo / "keep.py").write_text("a = 2\n")
+        _age(repo, "keep.py")
+        first = self._diff(repo)
+
+        with patch("utils.git_utils._read_diff_stream", side_effect=AssertionError("diff recomputed")):
+            assert self._diff(repo) is first
+
+    def test_edit_invalidates(self, repo):
+        (repo / "keep.py").write_text("a = 2\n")
+        _age(repo, "keep.py")
+        self._diff(repo)
+
+        (repo / "keep.py").write_text("a = 3\n")
+        _age(repo, "keep.py")
+        assert "+a = 3" in self._diff(repo).files[0].text
+
+    def test_staging_and_commit_invalidate(self, repo):
+        (repo / "keep.py").write_text("a = 2\n")
+        _age(repo, "keep.py")
+        assert len(self._diff(repo, ("diff", "--cached")).files) == 0
+
+        _git(repo, "add", "keep.py")
+        _age(repo, "keep.py")
+        assert len(self._diff(repo, ("diff", "--cached")).files) == 1
+
+        _git(repo, "commit", "-q", "-m", "second")
+        _age(repo, "keep.py")
+        assert len(self._diff(repo, ("diff", "--cached")).files) == 0
+
+    def test_compare_ref_oid_is_part_of_key(self, repo):
+        _git(repo, "branch", "base")
+        (repo / "keep.py").write_text("a = 2\n")
+        _git(repo, "commit", "-q", "-am", "second")
+        _age(repo, "keep.py")
+        command = ("diff", "base...HEAD")
+        assert len(self._diff(repo, command, refs=("base",)).files) == 1
+
+        _git(repo, "branch", "-f", "base", "HEAD")
+        _age(repo, "keep.py")
+        assert len(self._diff(repo, command, refs=("base",)).files) == 0
+
+    def test_recently_modified_files_are_not_cached(self, repo):
+        (repo / "keep.py").write_text("a = 2\n")
+        with patch("utils.git_utils._read_diff_stream", wraps=git_utils._read_diff_stream) as read:
+            self._diff(repo)
+            self._diff(repo)
+        assert read.call_count == 2
+
+    def test_no_caching_without_changed_files(self, repo):
+        (repo / "keep.py").write_text("a = 2\n")
+        _age(repo, "keep.py")
+        first = stream_git_diff(str(repo), ["diff"], 10_000)
+        assert stream_git_diff(str(repo), ["diff"], 10_000) is not first
+
+
+class TestNumstat:
+    """Test per-file changed line counts"""
+
+    def test_parse_numstat(self):
+        output = "3\t1\tsrc/app.py\0-\t-\tlogo.png\0" "2\t0\t\0old name.py\0new name.py\0"
+        stats = parse_numstat(output)
+        assert [(s.path, s.added, s.deleted) for s in stats] == [
+            ("src/app.py", 3, 1),
+            ("logo.png", None, None),
+            ("new name.py", 2, 0),
+        ]
+        assert stats[0].summary() == "src/app.py | +3 -1"
+        assert stats[1].summary() == "logo.png | binary"
+
+    def test_numstat_from_git(self, repo):
+        (repo / "keep.py").write_text("a = 2\nb = 3\n")
+        stats = git_diff_numstat(str(repo), ["diff"])
+        assert [(s.path, s.added, s.deleted) for s in stats] == [("keep.py", 2, 1)]
+
+
+class TestHunks:
+    """Test hunk splitting and position-independent hashing"""
+
+    DIFF = (
+        "diff --git a/app.py b/app.py\n"
+        "--- a/app.py\n"
+        "+++ b/app.py\n"
+        "@@ -1,2 +1,2 @@ def main():\n"
+        "-x = 1\n"
+        "+x = 2\n"
+        "@@ -40 +40 @@\n"
+        "-y = 1\n"
+        "+y = 2\n"
+    )
+
+    def test_split(self):
+        header, hunks = split_diff_hunks(self.DIFF)
+        assert header.endswith("+++ b/app.py\n")
+        assert [hunk.splitlines()[0] for hunk in hunks] == ["@@ -1,2 +1,2 @@ def main():", "@@ -40 +40 @@"]
+        assert header + "".join(hunks) == self.DIFF
+
+    def test_no_hunks(self):
+        text = "diff --git a/logo.png b/logo.png\nBinary files a/logo.png and b/logo.png differ\n"
+        assert split_diff_hunks(text) == (text, [])
+
+    def test_hash_ignores_line_numbers(self):
+        _, hunks = split_diff_hunks(self.DIFF)
+        moved = hunks[1].replace("@@ -40 +40 @@", "@@ -52 +53 @@")
+        assert hunk_hash("/repo", "app.py", hunks[1]) == hunk_hash("/repo", "app.py", moved)
+        assert hunk_hash("/repo", "app.py", hunks[1]) != hunk_hash("/repo", "app.py", hunks[1] + "+z = 3\n")
+        assert hunk_hash("/repo", "app.py", hunks[1]) != hunk_hash("/repo", "other.py", hunks[1])
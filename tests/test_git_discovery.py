@@ -0,0 +1,106 @@
+"""
+Tests for git repository discovery
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from utils import git_utils
+from utils.file_watcher import _notify
+from utils.git_utils import clear_repository_cache, find_git_repositories
+
+
+def _make_repo(path):
+    (path / ".git").mkdir(parents=True)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_repository_cache()
+    yield
+    clear_repository_cache()
+
+
+class TestFindGitRepositories:
+    """Test traversal, pruning and limits"""
+
+    def test_finds_nested_repositories(self, tmp_path):
+        expected = [_make_repo(tmp_path / "a"), _make_repo(tmp_path / "group" / "b")]
+        # Nested repositories inside a repository are not reported
+        _make_repo(tmp_path / "a" / "vendor" / "c")
+        assert find_git_repositories(str(tmp_path)) == sorted(expected)
+
+    def test_root_is_repository(self, tmp_path):
+        assert find_git_repositories(_make_repo(tmp_path)) == [str(tmp_path)]
+
+    def test_prunes_ignored_and_hidden_directories(self, tmp_path):
+        _make_repo(tmp_path / "node_modules" / "pkg")
+        _make_repo(tmp_path / ".cache" / "repo")
+        expected = _make_repo(tmp_path / "src" / "repo")
+        assert find_git_repositories(str(tmp_path)) == [expected]
+
+    def test_git_file_is_not_a_repository(self, tmp_path):
+        (tmp_path / "worktree").mkdir()
+        (tmp_path / "worktree" / ".git").write_text("gitdir: elsewhere\n")
+        assert find_git_repositories(str(tmp_path)) == []
+
+    def test_depth_limit(self, tmp_path):
+        shallow = _make_repo(tmp_path / "one")
+        _make_repo(tmp_path / "x" / "y" / "deep")
+        assert find_git_repositories(str(tmp_path), max_depth=2) == [shallow]
+        assert len(find_git_repositories(str(tmp_path), max_depth=3)) == 2
+
+    def test_repository_limit_keeps_shallowest(self, tmp_path):
+        shallow = _make_repo(tmp_path / "z")
+        _make_repo(tmp_path / "a" / "deep")
+        assert find_git_repositories(str(tmp_path), max_repositories=1) == [shallow]
+
+    def test_does_not_follow_symlinks(self, tmp_path):
+        real = _make_repo(tmp_path / "real")
+        os.symlink(tmp_path / "real", tmp_path / "link")
+        os.symlink(tmp_path, tmp_path / "loop")
+        assert find_git_repositories(str(tmp_path)) == [real]
+
+    def test_invalid_start_paths(self, tmp_path):
+        assert find_git_repositories("relative/path") == []
+        assert find_git_repositories(str(tmp_path / "missing")) == []
+
+
+class TestDiscoveryCache:
+    """Test that repeated discovery reuses results until invalidated"""
+
+    def test_results_are_cached(self, tmp_path):
+        first = _make_repo(tmp_path / "a")
+        assert find_git_repositories(str(tmp_path)) == [first]
+        second = _make_repo(tmp_path / "b")
+
+        with patch("utils.git_utils.os.scandir", side_effect=AssertionError("rescanned")):
+            assert find_git_repositories(str(tmp_path)) == [first]
+
+        # A different depth is a different cache entry
+        assert find_git_repositories(str(tmp_path), max_depth=4) == [first, second]
+
+    def test_ttl_expiry(self, tmp_path):
+        first = _make_repo(tmp_path / "a")
+        find_git_repositories(str(tmp_path))
+        second = _make_repo(tmp_path / "b")
+        with patch.object(git_utils, "DISCOVERY_CACHE_TTL_SECONDS", 0):
+            assert find_git_repositories(str(tmp_path)) == [first, second]
+
+    def test_structural_change_invalidates(self, tmp_path):
+        first = _make_repo(tmp_path / "a")
+        find_git_repositories(str(tmp_path))
+        second = _make_repo(tmp_path / "b")
+
+        _notify(str(tmp_path / "a" / "file.py"), False)
+        assert find_git_repositories(str(tmp_path)) == [first]
+        _notify(str(tmp_path / "b"), True)
+        assert find_git_repositories(str(tmp_path)) == [first, second]
+
+    def test_callers_cannot_modify_cached_results(self, tmp_path):
+        _make_repo(tmp_path / "a")
+        find_git_repositories(str(tmp_path)).append("/elsewhere")
+        assert find_git_repositories(str(tmp_path)) == [str(tmp_path / "a")]
@@ -0,0 +1,110 @@
+"""
+Tests for reading blobs at refs through persistent git cat-file workers
+"""
+
+import subprocess
+import time
+
+import pytest
+
+from utils.git_objects import CatFilePool, read_blob
+
+
+def _git(repo, *args):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q", "-b", "main")
+    _git(tmp_path, "config", "user.email", "test@example.com")
+    _git(tmp_path, "config", "user.name", "Test")
+    (tmp_path / "app.py").write_text("version = 1\n")
+    (tmp_path / "big.txt").write_text("x" * 10_000)
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+    (tmp_path / "app.py").write_text("version = 2\n")
+    _git(tmp_path, "commit", "-q", "-am", "bump")
+    return tmp_path
+
+
+@pytest.fixture
+def pool():
+    pool = CatFilePool()
+    yield pool
+    pool.close()
+
+
+class TestCatFilePool:
+    """Test reads, stream synchronisation and worker lifecycle"""
+
+    def test_reads_blobs_at_refs_with_one_worker(self, repo, pool):
+        assert pool.read(str(repo), "HEAD:app.py") == b"version = 2\n"
+        assert pool.read(str(repo), "HEAD~1:app.py") == b"version = 1\n"
+        assert pool.stats() == {"workers": 1, "started": 1}
+
+    def test_missing_and_non_blob_objects(self, repo, pool):
+        assert pool.read(str(repo), "HEAD:missing.py") is None
+        assert pool.read(str(repo), "HEAD") is None  # A commit, not a blob
+        assert pool.read(str(repo), "HEAD:app.py") == b"version = 2\n"
+
+    def test_oversized_blob_is_skipped_without_desync(self, repo, pool):
+        assert pool.read(str(repo), "HEAD:big.txt", max_bytes=100) is None
+        assert pool.read(str(repo), "HEAD:app.py") == b"version = 2\n"
+        assert len(pool.read(str(repo), "HEAD:big.txt")) == 10_000
+
+    def test_dead_worker_is_restarted(self, repo, pool):
+        pool.read(str(repo), "HEAD:app.py")
+        worker = next(iter(pool._workers.values()))
+        worker._process.kill()
+        worker._process.wait()
+
+        assert pool.read(str(repo), "HEAD:app.py") == b"version = 2\n"
+        assert pool.stats()["started"] == 2
+
+    def test_least_recently_used_worker_is_evicted(self, tmp_path, pool):
+        pool.max_workers = 1
+        repos = []
+        for name in ("one", "two"):
+            path = tmp_path / name
+            path.mkdir()
+            _git(path, "init", "-q")
+            _git(path, "config", "user.email", "test@example.com")
+            _git(path, "config", "user.name", "Test")
+            (path / "name.txt").write_text(name)
+            _git(path, "add", ".")
+            _git(path, "commit", "-q", "-m", "initial")
+            repos.append(path)
+
+        first = pool._worker(str(repos[0]))
+        assert pool.read(str(repos[1]), "HEAD:name.txt") == b"two"
+        assert pool.stats()["workers"] == 1
+        assert not first.alive
+
+    def test_idle_workers_are_reaped(self, repo):
+        pool = CatFilePool(idle_seconds=0.2)
+        try:
+            pool.read(str(repo), "HEAD:app.py")
+            worker = next(iter(pool._workers.values()))
+            deadline = time.monotonic() + 5
+            while (pool.stats()["workers"] or worker.alive) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert pool.stats()["workers"] == 0
+            assert not worker.alive
+        finally:
+            pool.close()
+
+
+class TestReadBlob:
+    """Test decoding and binary detection"""
+
+    def test_read_blob(self, repo):
+        assert read_blob(str(repo), "HEAD~1", "app.py") == "version = 1\n"
+        assert read_blob(str(repo), "HEAD", "missing.py") is None
+
+    def test_binary_blob_is_none(self, repo):
+        (repo / "image.bin").write_bytes(b"\x89PNG\0\0data")
+        _git(repo, "add", "image.bin")
+        _git(repo, "commit", "-q", "-m", "binary")
+
+        assert read_blob(str(repo), "HEAD", "image.bin") is None
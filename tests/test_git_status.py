@@ -0,0 +1,100 @@
+"""
+Tests for porcelain v2 git status parsing
+"""
+
+import subprocess
+
+import pytest
+
+from utils.git_utils import get_git_status, parse_porcelain_v2
+
+SHA = "0" * 40
+
+
+def _ordinary(xy, path):
+    return f"1 {xy} N... 100644 100644 100644 {SHA} {SHA} {path}"
+
+
+class TestParsePorcelainV2:
+    """Test the NUL-separated parser on hand-built output"""
+
+    def test_branch_headers(self):
+        output = "\0".join(
+            [
+                f"# branch.oid {SHA}",
+                "# branch.head feature/x",
+                "# branch.upstream origin/feature/x",
+                "# branch.ab +3 -1",
+                "",
+            ]
+        )
+        status = parse_porcelain_v2(output)
+        assert status["branch"] == "feature/x"
+        assert status["upstream"] == "origin/feature/x"
+        assert (status["ahead"], status["behind"]) == (3, 1)
+
+    def test_detached_head_without_upstream(self):
+        status = parse_porcelain_v2("# branch.oid (initial)\0# branch.head (detached)\0")
+        assert status["branch"] == ""
+        assert status["upstream"] == ""
+        assert (status["ahead"], status["behind"]) == (0, 0)
+
+    def test_entries(self):
+        output = "\0".join(
+            [
+                _ordinary("M.", "staged only.py"),
+                _ordinary(".M", "unstaged.py"),
+                _ordinary("MM", "both.py"),
+                _ordinary("A.", "new.py"),
+                _ordinary(".D", "removed.py"),
+                f"2 R. N... 100644 100644 100644 {SHA} {SHA} R100 new -> name.py",
+                "old name.py",
+                f"u UU N... 100644 100644 100644 100644 {SHA} {SHA} {SHA} conflict.py",
+                "? notes with\nnewline.txt",
+                "",
+            ]
+        )
+        status = parse_porcelain_v2(output)
+        assert status["staged_files"] == ["staged only.py", "both.py", "new.py", "new -> name.py"]
+        assert status["unstaged_files"] == ["unstaged.py", "both.py", "removed.py", "conflict.py"]
+        assert status["untracked_files"] == ["notes with\nnewline.txt"]
+        assert status["renamed_files"] == [("old name.py", "new -> name.py")]
+
+    def test_empty_output(self):
+        status = parse_porcelain_v2("")
+        assert status["staged_files"] == status["unstaged_files"] == status["untracked_files"] == []
+
+
+class TestGetGitStatus:
+    """Test against a real repository"""
+
+    @pytest.fixture
+    def repo(self, tmp_path):
+        def git(*args):
+            subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+        git("init", "-q", "-b", "main")
+        git("config", "user.email", "test@example.com")
+        git("config", "user.name", "Test")
+        (tmp_path / "old name.py").write_text("a = 1\n")
+        (tmp_path / "keep.py").write_text("b = 1\n")
+        git("add", ".")
+        git("commit", "-q", "-m", "initial")
+        git("mv", "old name.py", "new name.py")
+        (tmp_path / "keep.py").write_text("b = 2\n")
+        (tmp_path / "space file.txt").write_text("new\n")
+        return tmp_path
+
+    def test_single_call_status(self, repo):
+        status = get_git_status(str(repo))
+        assert status["branch"] == "main"
+        assert status["upstream"] == ""
+        assert status["staged_files"] == ["new name.py"]
+        assert status["renamed_files"] == [("old name.py", "new name.py")]
+        assert status["unstaged_files"] == ["keep.py"]
+        assert status["untracked_files"] == ["space file.txt"]
+
+    def test_not_a_repository(self, tmp_path):
+        status = get_git_status(str(tmp_path / "missing"))
+        assert status["branch"] == ""
+        assert status["staged_files"] == []
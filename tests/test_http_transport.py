@@ -0,0 +1,78 @@
+"""
+Tests for serving MCP over HTTP to several clients from one server process
+"""
+
+import asyncio
+import socket
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+import uvicorn
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from server import create_http_app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def running_server():
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_http_app("127.0.0.1", port), port=port, log_config=None))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        assert not task.done(), "HTTP server failed to start"
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+class TestHTTPTransport:
+    """Test the streamable HTTP and SSE endpoints"""
+
+    @pytest.mark.asyncio
+    # streamablehttp_client is deprecated in newer SDKs but available in every supported one
+    @pytest.mark.filterwarnings("ignore::DeprecationWarning")
+    async def test_clients_share_one_server(self):
+        async with running_server() as base_url:
+            for _ in range(2):
+                async with streamablehttp_client(f"{base_url}/mcp") as (read_stream, write_stream, _):
+                    async with ClientSession(read_stream, write_stream) as session:
+                        initialized = await session.initialize()
+                        assert initialized.serverInfo.name == "zen"
+
+                        tools = await session.list_tools()
+                        assert "chat" in [tool.name for tool in tools.tools]
+
+                        result = await session.call_tool("get_version", {})
+                        assert "Zen MCP Server" in result.content[0].text
+
+    @pytest.mark.asyncio
+    async def test_sse_client(self):
+        async with running_server() as base_url:
+            async with sse_client(f"{base_url}/sse") as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    tools = await session.list_tools()
+                    assert len(tools.tools) == 8
+
+    @pytest.mark.asyncio
+    async def test_rejects_foreign_host_header(self):
+        async with running_server() as base_url:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(
+                    f"{base_url}/mcp",
+                    headers={"Host": "attacker.example", "Accept": "application/json, text/event-stream"},
+                    json={"jsonrpc": "2.0", "id": 1, "method": "ping"},
+                )
+        assert response.status_code == 421
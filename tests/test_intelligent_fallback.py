@@ -96,7 +96,7 @@ class TestIntelligentFallback:
                 mock_context_instance = Mock()
                 mock_context_class.return_value = mock_context_instance
                 mock_context_instance.calculate_token_allocation.return_value = Mock(
-                    file_tokens=10000, history_tokens=5000
+                    content_tokens=20000, file_tokens=10000, history_tokens=5000
                 )
                 # Mock estimate_tokens to return integers for proper summing
                 mock_context_instance.estimate_tokens.return_value = 100
@@ -133,7 +133,7 @@ class TestIntelligentFallback:
                 mock_context_instance = Mock()
                 mock_context_class.return_value = mock_context_instance
                 mock_context_instance.calculate_token_allocation.return_value = Mock(
-                    file_tokens=10000, history_tokens=5000
+                    content_tokens=20000, file_tokens=10000, history_tokens=5000
                 )
                 # Mock estimate_tokens to return integers for proper summing
                 mock_context_instance.estimate_tokens.return_value = 100
@@ -166,7 +166,7 @@ class TestIntelligentFallback:
                 mock_context_instance = Mock()
                 mock_context_class.return_value = mock_context_instance
                 mock_context_instance.calculate_token_allocation.return_value = Mock(
-                    file_tokens=10000, history_tokens=5000
+                    content_tokens=20000, file_tokens=10000, history_tokens=5000
                 )
                 # Mock estimate_tokens to return integers for proper summing
                 mock_context_instance.estimate_tokens.return_value = 100
@@ -1,6 +1,6 @@
 import types
 
-from utils.model_context import ModelContext
+from utils.model_context import ModelContext, TokenAllocation, plan_token_budget
 
 
 def test_reserved_for_response_zero_respected():
@@ -9,3 +9,63 @@ def test_reserved_for_response_zero_respected():
     mc._capabilities = types.SimpleNamespace(max_tokens=1000)
     allocation = mc.calculate_token_allocation(reserved_for_response=0)
     assert allocation.response_tokens == 0
+
+
+def _allocation(total_tokens=1_000_000):
+    return TokenAllocation.for_capacity(total_tokens)
+
+
+def test_for_capacity_matches_model_context_ratios():
+    mc = ModelContext('dummy-model')
+    mc._capabilities = types.SimpleNamespace(max_tokens=1_000_000)
+    assert mc.calculate_token_allocation() == _allocation()
+    small = TokenAllocation.for_capacity(200_000)
+    assert (small.content_tokens, small.file_tokens, small.history_tokens) == (120_000, 36_000, 60_000)
+
+
+def test_unknown_demands_keep_baseline_shares():
+    allocation = _allocation()
+    plan = plan_token_budget(allocation, {})
+    assert plan.allocation("files") == allocation.file_tokens
+    assert plan.allocation("history") == allocation.history_tokens
+    assert plan.allocation("new_content") == allocation.available_for_prompt
+    assert plan.unallocated == 0
+
+
+def test_short_history_frees_budget_for_large_files():
+    allocation = _allocation()  # 800K content: 320K files, 320K history, 160K new content
+    plan = plan_token_budget(allocation, {"new_content": 1_000, "files": 700_000, "history": 5_000})
+    assert plan.allocation("new_content") == 1_000
+    assert plan.allocation("history") == 5_000
+    assert plan.allocation("files") == 700_000
+    assert plan.unallocated == 800_000 - 706_000
+
+
+def test_long_history_uses_budget_files_do_not_need():
+    allocation = _allocation()
+    plan = plan_token_budget(allocation, {"new_content": 2_000, "files": 10_000, "history": 900_000})
+    assert plan.allocation("files") == 10_000
+    assert plan.allocation("history") == 800_000 - 12_000
+    assert plan.unallocated == 0
+
+
+def test_surplus_goes_to_higher_priority_segment_first():
+    allocation = _allocation()
+    plan = plan_token_budget(allocation, {"new_content": 0, "files": 1_000_000, "history": 1_000_000})
+    # Files outrank history for the surplus left by the empty request
+    assert plan.allocation("files") == allocation.file_tokens + allocation.available_for_prompt
+    assert plan.allocation("history") == allocation.history_tokens
+
+
+def test_plan_is_deterministic():
+    demands = {"new_content": 3_000, "files": 450_000, "history": 200_000}
+    assert plan_token_budget(_allocation(), demands) == plan_token_budget(_allocation(), dict(demands))
+
+
+def test_settle_returns_unused_history_to_files():
+    allocation = _allocation()
+    plan = plan_token_budget(allocation, {"new_content": 1_000, "files": None, "history": 100_000})
+    settled = plan.settle("history", 60_000)
+    assert settled.allocation("history") == 60_000
+    assert settled.allocation("files") == plan.allocation("files") + 40_000
+    assert settled.to_metadata()["allocations"]["history"] == 60_000
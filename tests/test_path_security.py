@@ -0,0 +1,142 @@
+"""
+Security test matrix for path resolution, run against the cached and uncached resolvers
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+import utils.file_utils as file_utils
+from utils.file_utils import _resolve_and_validate_path_uncached, invalidate_path_cache, resolve_and_validate_path
+
+
+def _build_cases(root, outside):
+    (outside / "secret.txt").write_text("secret")
+    (root / "src").mkdir()
+    (root / "src" / "app.py").write_text("print('hi')")
+    (root / "escape").symlink_to(outside / "secret.txt")
+    (root / "escape_dir").symlink_to(outside)
+    (root / "alias.py").symlink_to(root / "src" / "app.py")
+
+    return {
+        "file inside root": (str(root / "src" / "app.py"), None),
+        "missing file inside root": (str(root / "src" / "new.py"), None),
+        "dot segments staying inside": (str(root / "src" / ".." / "src" / "app.py"), None),
+        "symlink to file inside": (str(root / "alias.py"), None),
+        "relative path": ("src/app.py", ValueError),
+        "traversal out of root": (str(root / ".." / ".." / ".." / "etc" / "passwd"), PermissionError),
+        "absolute path outside": (str(outside / "secret.txt"), PermissionError),
+        "symlink escaping root": (str(root / "escape"), PermissionError),
+        "path through escaping directory symlink": (str(root / "escape_dir" / "secret.txt"), PermissionError),
+    }
+
+
+def _outcome(resolver, path_str):
+    try:
+        return resolver(path_str)
+    except (ValueError, PermissionError) as e:
+        return type(e)
+
+
+@pytest.fixture
+def outside(tmp_path):
+    """A directory outside the sandbox (project_path is inside it)"""
+    directory = tmp_path / "outside"
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def cases(project_path, outside):
+    invalidate_path_cache()
+    yield _build_cases(project_path, outside)
+    invalidate_path_cache()
+
+
+CASE_NAMES = [
+    "file inside root",
+    "missing file inside root",
+    "dot segments staying inside",
+    "symlink to file inside",
+    "relative path",
+    "traversal out of root",
+    "absolute path outside",
+    "symlink escaping root",
+    "path through escaping directory symlink",
+]
+
+
+class TestPathSecurityMatrix:
+    """Every case must behave identically with a cold cache, a warm cache and no cache"""
+
+    @pytest.mark.parametrize("case", CASE_NAMES)
+    def test_case(self, cases, case):
+        path_str, expected_error = cases[case]
+
+        uncached = _outcome(_resolve_and_validate_path_uncached, path_str)
+        cold = _outcome(resolve_and_validate_path, path_str)
+        warm = _outcome(resolve_and_validate_path, path_str)
+
+        assert uncached == cold == warm
+        if expected_error:
+            assert uncached is expected_error
+        else:
+            assert uncached.is_relative_to(file_utils.PROJECT_ROOT)
+
+
+class TestPathCacheInvalidation:
+    """Test that cached resolutions can't outlive a change that would make them unsafe"""
+
+    def test_retargeted_symlink_denied_after_invalidation(self, cases, project_path, outside):
+        link = project_path / "link.py"
+        link.symlink_to(project_path / "src" / "app.py")
+        assert resolve_and_validate_path(str(link)) == project_path / "src" / "app.py"
+
+        link.unlink()
+        link.symlink_to(outside / "secret.txt")
+        invalidate_path_cache()
+        with pytest.raises(PermissionError):
+            resolve_and_validate_path(str(link))
+
+    def test_entries_expire_after_ttl(self, cases, project_path):
+        path_str = str(project_path / "src" / "app.py")
+        with patch(
+            "utils.file_utils._resolve_and_validate_path_uncached", wraps=_resolve_and_validate_path_uncached
+        ) as spy:
+            with patch("utils.file_utils.time.monotonic", return_value=1000.0):
+                resolve_and_validate_path(path_str)
+                resolve_and_validate_path(path_str)
+            assert spy.call_count == 1
+            with patch("utils.file_utils.time.monotonic", return_value=1000.0 + file_utils.PATH_CACHE_TTL_SECONDS):
+                resolve_and_validate_path(path_str)
+            assert spy.call_count == 2
+
+    def test_errors_are_not_cached(self, cases, project_path, outside):
+        path_str = str(project_path / "later.py")
+        link = project_path / "later.py"
+        link.symlink_to(outside / "secret.txt")
+        with pytest.raises(PermissionError):
+            resolve_and_validate_path(path_str)
+
+        link.unlink()
+        link.write_text("now a regular file")
+        assert resolve_and_validate_path(path_str) == link
+
+    def test_cache_is_bounded(self, cases, project_path):
+        with patch("utils.file_utils.PATH_CACHE_MAX_ENTRIES", 3):
+            for i in range(10):
+                resolve_and_validate_path(str(project_path / f"file_{i}.py"))
+            assert len(file_utils._path_cache) == 3
+
+    def test_sandbox_change_is_not_served_from_cache(self, cases, project_path):
+        path_str = str(project_path / "src" / "app.py")
+        resolve_and_validate_path(path_str)
+        with patch("utils.file_utils.PROJECT_ROOT", project_path / "src" / "nested"):
+            with pytest.raises(PermissionError):
+                resolve_and_validate_path(path_str)
+
+
+def test_symlink_case_uses_real_symlinks(cases, project_path):
+    # Guard against a platform silently turning the symlink cases into plain files
+    assert os.path.islink(project_path / "escape")
@@ -8,6 +8,16 @@ from unittest.mock import Mock, patch
 import pytest
 
 from tools.precommit import Precommit, PrecommitRequest
+from utils.execution_context import ExecutionContext, execution_context
+from utils.git_utils import DiffStream, FileDiff
+
+
+def _diff_stream(*paths):
+    """Build a stream_git_diff result with one small diff per path."""
+    return DiffStream(
+        success=True,
+        files=[FileDiff(path=path, text=f"diff --git a/{path} b/{path}\n+print('hello')", tokens=5) for path in paths],
+    )
 
 
 class TestPrecommitTool:
@@ -97,10 +107,12 @@ class TestPrecommitTool:
     @pytest.mark.asyncio
     @patch("tools.precommit.find_git_repositories")
     @patch("tools.precommit.get_git_status")
+    @patch("tools.precommit.stream_git_diff")
     @patch("tools.precommit.run_git_command")
     async def test_staged_changes_review(
         self,
         mock_run_git,
+        mock_stream_diff,
         mock_status,
         mock_find_repos,
         tool,
@@ -117,12 +129,10 @@ class TestPrecommitTool:
         }
 
         # Mock git commands
+        mock_stream_diff.side_effect = [_diff_stream("main.py")]
+
         mock_run_git.side_effect = [
-            (True, "main.py\n"),  # staged files
-            (
-                True,
-                "diff --git a/main.py b/main.py\n+print('hello')",
-            ),  # diff for main.py
+            (True, "main.py\0"),  # staged files
             (True, ""),  # unstaged files (empty)
         ]
 
@@ -185,10 +195,12 @@ class TestPrecommitTool:
     @pytest.mark.asyncio
     @patch("tools.precommit.find_git_repositories")
     @patch("tools.precommit.get_git_status")
+    @patch("tools.precommit.stream_git_diff")
     @patch("tools.precommit.run_git_command")
     async def test_mixed_staged_unstaged_changes(
         self,
         mock_run_git,
+        mock_stream_diff,
         mock_status,
         mock_find_repos,
         tool,
@@ -204,11 +216,11 @@ class TestPrecommitTool:
         }
 
         # Mock git commands
+        mock_stream_diff.side_effect = [_diff_stream("file1.py"), _diff_stream("file2.py")]
+
         mock_run_git.side_effect = [
-            (True, "file1.py\n"),  # staged files
-            (True, "diff --git a/file1.py..."),  # diff for file1.py
-            (True, "file2.py\n"),  # unstaged files
-            (True, "diff --git a/file2.py..."),  # diff for file2.py
+            (True, "file1.py\0"),  # staged files
+            (True, "file2.py\0"),  # unstaged files
         ]
 
         request = PrecommitRequest(
@@ -227,10 +239,12 @@ class TestPrecommitTool:
     @pytest.mark.asyncio
     @patch("tools.precommit.find_git_repositories")
     @patch("tools.precommit.get_git_status")
+    @patch("tools.precommit.stream_git_diff")
     @patch("tools.precommit.run_git_command")
     async def test_files_parameter_with_context(
         self,
         mock_run_git,
+        mock_stream_diff,
         mock_status,
         mock_find_repos,
         tool,
@@ -246,9 +260,10 @@ class TestPrecommitTool:
         }
 
         # Mock git commands - need to match all calls in prepare_prompt
+        mock_stream_diff.return_value = _diff_stream("file1.py")
+
         mock_run_git.side_effect = [
-            (True, "file1.py\n"),  # staged files list
-            (True, "diff --git a/file1.py..."),  # diff for file1.py
+            (True, "file1.py\0"),  # staged files list
             (True, ""),  # unstaged files list (empty)
         ]
 
@@ -272,10 +287,12 @@ class TestPrecommitTool:
     @pytest.mark.asyncio
     @patch("tools.precommit.find_git_repositories")
     @patch("tools.precommit.get_git_status")
+    @patch("tools.precommit.stream_git_diff")
     @patch("tools.precommit.run_git_command")
     async def test_files_request_instruction(
         self,
         mock_run_git,
+        mock_stream_diff,
         mock_status,
         mock_find_repos,
         tool,
@@ -290,9 +307,10 @@ class TestPrecommitTool:
             "unstaged_files": [],
         }
 
+        mock_stream_diff.return_value = _diff_stream("file1.py")
+
         mock_run_git.side_effect = [
-            (True, "file1.py\n"),  # staged files
-            (True, "diff --git a/file1.py..."),  # diff for file1.py
+            (True, "file1.py\0"),  # staged files
             (True, ""),  # unstaged files (empty)
         ]
 
@@ -310,8 +328,7 @@ class TestPrecommitTool:
         # Need to reset mocks for second call
         mock_find_repos.return_value = ["/test/repo"]
         mock_run_git.side_effect = [
-            (True, "file1.py\n"),  # staged files
-            (True, "diff --git a/file1.py..."),  # diff for file1.py
+            (True, "file1.py\0"),  # staged files
             (True, ""),  # unstaged files (empty)
         ]
 
@@ -321,3 +338,32 @@ class TestPrecommitTool:
             result_with_files = await tool.prepare_prompt(request_with_files)
 
         assert "If you need additional context files" not in result_with_files
+
+    @pytest.mark.asyncio
+    @patch("tools.precommit.find_git_repositories")
+    @patch("tools.precommit.get_git_status")
+    @patch("tools.precommit.stream_git_diff")
+    @patch("tools.precommit.run_git_command")
+    async def test_diff_budget_follows_model_context(
+        self,
+        mock_run_git,
+        mock_stream_diff,
+        mock_status,
+        mock_find_repos,
+        tool,
+    ):
+        """Test that the diff budget comes from the selected model, not the global limit"""
+        from utils.model_context import TokenAllocation
+
+        mock_find_repos.return_value = ["/test/repo"]
+        mock_status.return_value = {"branch": "main", "ahead": 0, "behind": 0}
+        mock_run_git.side_effect = [(True, "file1.py\0"), (True, "")]
+        mock_stream_diff.return_value = _diff_stream("file1.py")
+
+        model_context = Mock(model_name="o3")
+        model_context.calculate_token_allocation.return_value = TokenAllocation.for_capacity(200_000)
+        with execution_context(ExecutionContext("precommit", {"_model_context": model_context})):
+            await tool.prepare_prompt(PrecommitRequest(path="/absolute/repo/path"))
+
+        budget = mock_stream_diff.call_args.args[2]
+        assert 0 < budget <= TokenAllocation.for_capacity(200_000).content_tokens
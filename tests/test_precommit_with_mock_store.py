@@ -11,6 +11,7 @@ from unittest.mock import patch
 import pytest
 
 from tools.precommit import Precommit, PrecommitRequest
+from utils.execution_context import ExecutionContext, execution_context
 
 
 class MockRedisClient:
@@ -249,6 +250,154 @@ TEMPERATURE_ANALYTICAL = 0.2  # For code review, debugging
         assert file_content.count("MAX_CONTENT_TOKENS = 800_000") == 1
         assert file_content.count('__version__ = "1.0.0"') == 1
 
+    @pytest.mark.asyncio
+    async def test_oversized_diff_is_listed_as_omitted(self, tool, temp_repo, mock_redis):
+        """Test that a diff too large for the budget is left out and named in the manifest"""
+        import subprocess
+
+        temp_dir, _ = temp_repo
+        with open(os.path.join(temp_dir, "big.py"), "w") as f:
+            f.write("VALUE = 1\n" * 5000)
+        subprocess.run(["git", "add", "big.py"], cwd=temp_dir, capture_output=True)
+
+        with patch.object(tool, "_calculate_file_token_budget", return_value=(2_000, "test budget")):
+            prompt = await tool.prepare_prompt(PrecommitRequest(path=temp_dir))
+
+        assert "- Diffs omitted: 1 files (see Omitted Diffs)" in prompt
+        assert "## Omitted Diffs" in prompt
+        assert "/ big.py | +5000 -0 (staged; did not fit the diff budget)" in prompt
+        assert "--- BEGIN DIFF: " in prompt and "/ config.py (unstaged) ---" in prompt
+        assert "/ big.py (staged)" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_non_ascii_path_is_not_listed_as_omitted(self, tool, temp_repo, mock_redis):
+        """Test that a file with a non-ASCII name is listed unquoted and matched to its diff"""
+        import subprocess
+
+        temp_dir, _ = temp_repo
+        with open(os.path.join(temp_dir, "café.py"), "w") as f:
+            f.write("VALUE = 1\n")
+        subprocess.run(["git", "add", "café.py"], cwd=temp_dir, capture_output=True)
+
+        prompt = await tool.prepare_prompt(PrecommitRequest(path=temp_dir))
+
+        assert "  - café.py\n" in prompt
+        assert "\\303" not in prompt
+        assert "/ café.py (staged) ---" in prompt
+        assert "## Omitted Diffs" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_source_diffs_packed_before_lockfiles(self, tool, temp_repo, mock_redis):
+        """Test that lockfile churn is dropped before source changes when the budget is tight"""
+        import subprocess
+
+        temp_dir, _ = temp_repo
+        with open(os.path.join(temp_dir, "yarn.lock"), "w") as f:
+            f.write("lodash@4.17.21\n" * 100)
+        with open(os.path.join(temp_dir, "zz_feature.py"), "w") as f:
+            # More changed lines than the lockfile, but fewer tokens
+            f.write("x = 1\n" * 150)
+        subprocess.run(["git", "add", "yarn.lock", "zz_feature.py"], cwd=temp_dir, capture_output=True)
+
+        # Room for either staged diff on its own, but not both
+        with patch.object(tool, "_calculate_file_token_budget", return_value=(600, "test budget")):
+            prompt = await tool.prepare_prompt(PrecommitRequest(path=temp_dir))
+
+        assert "/ zz_feature.py (staged) ---" in prompt
+        assert "/ yarn.lock (staged) ---" not in prompt
+        assert "/ yarn.lock | +100 -0 (staged; dependency lockfile, did not fit the diff budget)" in prompt
+
+    @pytest.mark.asyncio
+    async def test_continued_review_sends_only_new_hunks(self, tool, temp_repo, mock_redis):
+        """Test that a continued precommit skips hunks recorded as reviewed in the thread"""
+        import subprocess
+
+        from utils.conversation_memory import add_turn, create_thread, get_thread
+
+        temp_dir, config_path = temp_repo
+        with open(os.path.join(temp_dir, "other.py"), "w") as f:
+            f.write("print('untouched')\n")
+        subprocess.run(["git", "add", "other.py"], cwd=temp_dir, capture_output=True)
+
+        with execution_context(ExecutionContext("precommit")):
+            first_prompt = await tool.prepare_prompt(PrecommitRequest(path=temp_dir))
+            reviewed = tool.get_turn_hunk_hashes()
+        assert 'NEW_SETTING = "test"' in first_prompt
+        assert len(reviewed) == 2
+        assert tool.get_turn_hunk_hashes() is None
+
+        thread_id = create_thread("precommit", {"path": temp_dir})
+        assert add_turn(thread_id, "assistant", "Looks good", tool_name="precommit", hunk_hashes=reviewed)
+        assert get_thread(thread_id).turns[0].hunk_hashes == reviewed
+
+        # Fix something in config.py after the review; other.py stays as reviewed
+        with open(config_path, "a") as f:
+            f.write("FIXED = True\n")
+
+        with execution_context(ExecutionContext("precommit")) as context:
+            prompt = await tool.prepare_prompt(PrecommitRequest(path=temp_dir, continuation_id=thread_id))
+        assert "FIXED = True" in prompt
+        assert "## Previously Reviewed Changes" in prompt
+        assert "/ other.py (staged): 1 hunk" in prompt
+        assert "print('untouched')" not in prompt
+        # Everything sent now is recorded, so the next continuation can skip it too
+        assert len(context.hunk_hashes) == 2
+
+    @pytest.mark.asyncio
+    async def test_full_file_versions_at_compare_to(self, tool, temp_repo, mock_redis):
+        """Test that include_full_files attaches the before and after version of each changed file"""
+        import subprocess
+
+        temp_dir, _ = temp_repo
+        subprocess.run(["git", "commit", "-am", "Add setting"], cwd=temp_dir, capture_output=True)
+
+        prompt = await tool.prepare_prompt(
+            PrecommitRequest(path=temp_dir, compare_to="HEAD~1", include_full_files=True)
+        )
+
+        assert "## Full File Versions" in prompt
+        assert "/ config.py @ merge base of HEAD~1 (" in prompt
+        assert "/ config.py @ HEAD (after) ---" in prompt
+        before = prompt.split("(before) ---", 1)[1].split("--- END FILE", 1)[0]
+        assert "MAX_CONTENT_TOKENS" in before and "NEW_SETTING" not in before
+
+        prompt = await tool.prepare_prompt(PrecommitRequest(path=temp_dir, compare_to="HEAD~1"))
+        assert "## Full File Versions" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_full_file_versions_before_is_merge_base(self, tool, temp_repo, mock_redis):
+        """Test that the before version excludes upstream changes the three-dot diff doesn't show"""
+        import subprocess
+
+        temp_dir, config_path = temp_repo
+
+        def run(*args):
+            subprocess.run(["git", *args], cwd=temp_dir, capture_output=True)
+
+        run("checkout", "-q", "HEAD", "--", "config.py")
+        run("branch", "upstream")
+        run("checkout", "-q", "-b", "feature")
+        with open(os.path.join(temp_dir, "feature.py"), "w") as f:
+            f.write("FEATURE = True\n")
+        with open(config_path, "a") as f:
+            f.write("FEATURE_FLAG = 1\n")
+        run("add", ".")
+        run("commit", "-qm", "Feature")
+        run("checkout", "-q", "upstream")
+        with open(config_path, "a") as f:
+            f.write("UPSTREAM_ONLY = 1\n")
+        run("commit", "-qam", "Upstream change")
+        run("checkout", "-q", "feature")
+
+        prompt = await tool.prepare_prompt(
+            PrecommitRequest(path=temp_dir, compare_to="upstream", include_full_files=True)
+        )
+
+        before = prompt.split("/ config.py @ merge base of upstream (", 1)[1].split("--- END FILE", 1)[0]
+        assert "MAX_CONTENT_TOKENS" in before
+        assert "UPSTREAM_ONLY" not in prompt
+        assert "/ feature.py @ HEAD (after only; the before version is absent, binary or too large) ---" in prompt
+
 
 def test_mock_redis_basic_operations():
     """Test that our mock Redis implementation works correctly"""
@@ -0,0 +1,77 @@
+"""
+Tests for segment-based prompt assembly
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from prompts import CHAT_PROMPT
+from tools.chat import ChatTool
+from utils.prompt_builder import PromptBuilder
+from utils.token_utils import estimate_tokens
+
+
+class TestPromptBuilder:
+    """Test PromptBuilder segment handling"""
+
+    def test_build_joins_segments_in_order(self):
+        builder = PromptBuilder()
+        builder.add("a", "first ").add("b", "second ").add("a", "third")
+        assert builder.build() == "first second third"
+        assert str(builder) == "first second third"
+        assert len(builder) == len("first second third")
+
+    def test_empty_segments_are_ignored(self):
+        builder = PromptBuilder().add("a", "").add("b", None).add("c", "text")
+        assert [segment.name for segment in builder.segments] == ["c"]
+
+    def test_token_breakdown_sums_repeated_names(self):
+        files = "x" * 4000
+        builder = PromptBuilder().add("files", files).add("user_request", "y" * 400).add("files", files)
+        breakdown = builder.token_breakdown()
+        assert list(breakdown) == ["files", "user_request"]
+        assert breakdown["files"] == 2 * estimate_tokens(files)
+        assert breakdown["user_request"] == 100
+        assert builder.total_tokens == sum(breakdown.values())
+
+    def test_build_is_cached_until_modified(self):
+        builder = PromptBuilder().add("a", "x" * 1000)
+        first = builder.build()
+        assert builder.build() is first
+        builder.add("b", "tail")
+        assert builder.build().endswith("tail")
+
+
+class TestToolPromptSegments:
+    """Test that tools materialize prompts from segments"""
+
+    @pytest.mark.asyncio
+    async def test_execute_reports_segments_and_sends_system_prompt_once(self):
+        tool = ChatTool()
+
+        with patch.object(tool, "get_model_provider") as mock_get_provider:
+            mock_provider = MagicMock()
+            mock_provider.get_provider_type.return_value = MagicMock(value="google")
+            mock_provider.supports_thinking_mode.return_value = False
+            mock_provider.generate_content.return_value = MagicMock(
+                content="Response",
+                usage={"input_tokens": 10, "output_tokens": 20, "total_tokens": 30},
+                model_name="gemini-2.5-flash-preview-05-20",
+                metadata={"finish_reason": "STOP"},
+            )
+            mock_get_provider.return_value = mock_provider
+
+            result = await tool.execute({"prompt": "Explain generators", "use_websearch": False})
+
+        output = json.loads(result[0].text)
+        segments = output["metadata"]["prompt_segments"]
+        assert "user_request" in segments
+        assert "follow_up_instructions" in segments
+        assert output["metadata"]["prompt_tokens"] == sum(segments.values())
+
+        call_kwargs = mock_provider.generate_content.call_args[1]
+        assert call_kwargs["system_prompt"] == CHAT_PROMPT
+        assert CHAT_PROMPT not in call_kwargs["prompt"]
+        assert "Explain generators" in call_kwargs["prompt"]
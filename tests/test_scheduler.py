@@ -0,0 +1,177 @@
+"""
+Tests for tool call admission control and priority scheduling
+"""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from utils.scheduler import DIRECTORY_WEIGHT_TOKENS, QueueTimeoutError, ToolScheduler, estimate_request_tokens
+
+
+async def _hold(scheduler, tool_name, weight, release, order):
+    async with scheduler.admit(tool_name, weight):
+        order.append(tool_name)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestToolScheduler:
+    """Test concurrency limits, weighting, priorities and timeouts"""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_and_priority(self):
+        scheduler = ToolScheduler(max_concurrency=1, capacity_tokens=1_000, queue_timeout=None)
+        release = asyncio.Event()
+        order = []
+
+        running = asyncio.create_task(_hold(scheduler, "analyze", 0, release, order))
+        await _settle()
+        batch = asyncio.create_task(_hold(scheduler, "precommit", 0, release, order))
+        await _settle()
+        interactive = asyncio.create_task(_hold(scheduler, "chat", 0, release, order))
+        await _settle()
+
+        stats = scheduler.stats()
+        assert (stats["running"], stats["queued_batch"], stats["queued_interactive"]) == (1, 1, 1)
+
+        release.set()
+        await asyncio.gather(running, batch, interactive)
+        # chat arrived after precommit but was admitted first
+        assert order == ["analyze", "chat", "precommit"]
+        assert scheduler.stats()["running"] == 0
+        assert scheduler.stats()["admitted"] == 3
+
+    @pytest.mark.asyncio
+    async def test_weights_limit_admission(self):
+        scheduler = ToolScheduler(max_concurrency=4, capacity_tokens=1_000, queue_timeout=None)
+        release = asyncio.Event()
+        order = []
+
+        heavy = asyncio.create_task(_hold(scheduler, "analyze", 800, release, order))
+        await _settle()
+        second = asyncio.create_task(_hold(scheduler, "analyze", 800, release, order))
+        await _settle()
+        assert scheduler.stats()["running"] == 1
+        assert scheduler.stats()["tokens_in_use"] == 800
+
+        release.set()
+        await asyncio.gather(heavy, second)
+        assert order == ["analyze", "analyze"]
+
+    @pytest.mark.asyncio
+    async def test_oversized_call_runs_alone(self):
+        scheduler = ToolScheduler(max_concurrency=4, capacity_tokens=1_000, queue_timeout=None)
+        async with scheduler.admit("analyze", 50_000) as waited:
+            assert waited == 0.0
+            assert scheduler.stats()["tokens_in_use"] == 1_000
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        scheduler = ToolScheduler(max_concurrency=1, capacity_tokens=1_000, queue_timeout=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, "analyze", 0, release, []))
+        await _settle()
+
+        with pytest.raises(QueueTimeoutError):
+            async with scheduler.admit("codereview", 0):
+                pass
+
+        stats = scheduler.stats()
+        assert (stats["queued"], stats["timeouts"]) == (0, 1)
+        release.set()
+        await holder
+        assert scheduler.stats()["running"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_reserved_for_interactive_tools(self):
+        scheduler = ToolScheduler(max_concurrency=3, capacity_tokens=1_000, queue_timeout=None)
+        release = asyncio.Event()
+        order = []
+
+        batch = [asyncio.create_task(_hold(scheduler, "analyze", 0, release, order)) for _ in range(3)]
+        await _settle()
+        stats = scheduler.stats()
+        assert (stats["running"], stats["running_batch"], stats["queued_batch"]) == (2, 2, 1)
+
+        # The held-back slot lets chat start while the batch calls keep running
+        chat = asyncio.create_task(_hold(scheduler, "chat", 0, release, order))
+        await _settle()
+        assert order == ["analyze", "analyze", "chat"]
+        assert scheduler.stats()["running"] == 3
+
+        release.set()
+        await asyncio.gather(*batch, chat)
+        assert scheduler.stats()["running"] == 0
+
+    def test_single_slot_is_not_reserved(self):
+        assert ToolScheduler(max_concurrency=1, capacity_tokens=1_000, queue_timeout=None).reserved_interactive == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        scheduler = ToolScheduler(max_concurrency=1, capacity_tokens=1_000, queue_timeout=None)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, "analyze", 0, release, []))
+        await _settle()
+        waiter = asyncio.create_task(_hold(scheduler, "analyze", 0, release, []))
+        await _settle()
+        assert scheduler.stats()["queued"] == 1
+
+        waiter.cancel()
+        await _settle()
+        assert scheduler.stats()["queued"] == 0
+        release.set()
+        await holder
+        assert scheduler.stats()["running"] == 0
+
+
+def test_estimate_request_tokens(tmp_path):
+    source = tmp_path / "app.py"
+    source.write_text("x" * 4_000)
+    arguments = {"prompt": "y" * 400, "files": [str(source), str(tmp_path), str(tmp_path / "missing.py")]}
+
+    assert estimate_request_tokens(arguments) == 100 + 1_000 + DIRECTORY_WEIGHT_TOKENS
+    assert estimate_request_tokens({"path": str(tmp_path)}) >= DIRECTORY_WEIGHT_TOKENS
+
+
+@pytest.mark.asyncio
+async def test_server_reports_busy_when_queue_times_out():
+    from server import handle_call_tool
+
+    scheduler = ToolScheduler(max_concurrency=1, capacity_tokens=1_000, queue_timeout=0.05)
+    release = asyncio.Event()
+    with patch("server.SCHEDULER", scheduler):
+        holder = asyncio.create_task(_hold(scheduler, "analyze", 0, release, []))
+        await _settle()
+        result = await handle_call_tool("chat", {"prompt": "Hello"})
+        release.set()
+        await holder
+
+    output = json.loads(result[0].text)
+    assert output["status"] == "error"
+    assert output["content"].startswith("Server busy")
+    assert output["metadata"]["scheduler"]["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_utility_tools_bypass_full_scheduler():
+    from server import handle_call_tool
+
+    scheduler = ToolScheduler(max_concurrency=1, capacity_tokens=1_000, queue_timeout=0.05)
+    release = asyncio.Event()
+    with patch("server.SCHEDULER", scheduler):
+        holder = asyncio.create_task(_hold(scheduler, "analyze", 0, release, []))
+        await _settle()
+        result = await handle_call_tool("get_version", {})
+        release.set()
+        await holder
+
+    assert "Server busy" not in result[0].text
+    assert "- Scheduler: 1/1 running" in result[0].text
+    assert scheduler.stats()["timeouts"] == 0
@@ -27,9 +27,10 @@ class TestServerTools:
         assert "chat" in tool_names
         assert "precommit" in tool_names
         assert "get_version" in tool_names
+        assert "get_token_usage" in tool_names
 
-        # Should have exactly 7 tools
-        assert len(tools) == 7
+        # Should have exactly 8 tools
+        assert len(tools) == 8
 
         # Check descriptions are verbose
         for tool in tools:
@@ -81,3 +82,36 @@ class TestServerTools:
         assert "Zen MCP Server v" in response  # Version agnostic check
         assert "Available Tools:" in response
         assert "thinkdeep" in response
+        assert "- Scheduler: " in response
+        assert "- Coalesced Requests: " in response
+
+    @pytest.mark.asyncio
+    @patch("tools.base.BaseTool.get_model_provider")
+    async def test_handle_get_token_usage(self, mock_get_provider):
+        """Test that completed tool calls show up in the token usage aggregate"""
+        import json
+
+        from utils.token_accounting import reset_token_usage
+
+        reset_token_usage()
+
+        mock_provider = create_mock_provider()
+        mock_provider.generate_content.return_value = Mock(
+            content="Chat response",
+            usage={"input_tokens": 120, "output_tokens": 30, "thinking_tokens": 5, "total_tokens": 150},
+            model_name="gemini-2.5-flash-preview-05-20",
+            metadata={},
+        )
+        mock_get_provider.return_value = mock_provider
+
+        chat_result = await handle_call_tool("chat", {"prompt": "Hello Gemini"})
+        token_usage = json.loads(chat_result[0].text)["metadata"]["token_usage"]
+        assert token_usage["estimated"]["system_prompt"] > 0
+        assert token_usage["estimated"]["new_content"] > 0
+        assert token_usage["provider"]["thinking_tokens"] == 5
+
+        result = await handle_call_tool("get_token_usage", {})
+        summary = json.loads(json.loads(result[0].text)["content"])
+        assert summary["overall"]["requests"] == 1
+        assert summary["by_tool"]["chat"]["totals"]["input_tokens"] == 120
+        assert summary["by_tool"]["chat"]["totals"]["output_tokens"] == 30
@@ -0,0 +1,176 @@
+"""
+Tests for coalescing identical in-flight tool calls
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from mcp.types import TextContent
+
+from tests.mock_helpers import create_mock_provider
+from utils.single_flight import SingleFlight, request_fingerprint
+
+
+class TestRequestFingerprint:
+    """Test which requests are considered identical"""
+
+    def test_same_request_same_key(self, project_path):
+        source = project_path / "app.py"
+        source.write_text("print('v1')\n")
+        arguments = {"prompt": "Review", "files": [str(source)]}
+
+        key = request_fingerprint("codereview", arguments)
+        assert key == request_fingerprint("codereview", dict(arguments))
+        assert key == request_fingerprint("codereview", {**arguments, "_remaining_tokens": 5})
+        # A shared pipeline runs under one deadline, so calls with different deadlines don't share
+        assert key != request_fingerprint("codereview", {**arguments, "deadline_seconds": 30})
+        assert key != request_fingerprint("analyze", arguments)
+        assert key != request_fingerprint("codereview", {**arguments, "prompt": "Review again"})
+
+        source.write_text("print('v2')\n")
+        assert key != request_fingerprint("codereview", arguments)
+
+    def test_continuations_are_not_coalesced(self):
+        assert request_fingerprint("chat", {"prompt": "More", "continuation_id": "abc"}) is None
+
+
+class TestSingleFlight:
+    """Test sharing, cancellation and bookkeeping"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_run(self):
+        flights = SingleFlight()
+        runs = []
+
+        async def pipeline():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        first, second = await asyncio.gather(flights.run("key", pipeline), flights.run("key", pipeline))
+        assert (first, second) == (("result", False), ("result", True))
+        assert len(runs) == 1
+        assert flights.stats() == {"in_flight": 0, "started": 1, "joined": 1}
+
+        # A later call starts a new run
+        assert await flights.run("key", pipeline) == ("result", False)
+        assert len(runs) == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_pipeline_for_others(self):
+        flights = SingleFlight()
+        cancelled = []
+
+        async def pipeline():
+            try:
+                await asyncio.sleep(0.1)
+                return "result"
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        leader = asyncio.create_task(flights.run("key", pipeline))
+        follower = asyncio.create_task(flights.run("key", pipeline))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == ("result", True)
+        assert not cancelled
+
+        alone = asyncio.create_task(flights.run("other", pipeline))
+        await asyncio.sleep(0.01)
+        alone.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await alone
+        await asyncio.sleep(0.01)
+        assert cancelled == [1]
+        assert flights.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+@patch("tools.base.BaseTool.get_model_provider")
+async def test_identical_chat_calls_make_one_model_call(mock_get_provider):
+    mock_provider = create_mock_provider()
+
+    def slow_response(**kwargs):
+        time.sleep(0.2)
+        return Mock(content="Shared answer", usage={}, model_name="gemini-2.5-flash-preview-05-20", metadata={})
+
+    mock_provider.generate_content.side_effect = slow_response
+    mock_get_provider.return_value = mock_provider
+
+    from server import handle_call_tool
+
+    arguments = {"prompt": "What is 2 + 2?"}
+    first, second = await asyncio.gather(handle_call_tool("chat", arguments), handle_call_tool("chat", arguments))
+
+    assert mock_provider.generate_content.call_count == 1
+    first_output, second_output = json.loads(first[0].text), json.loads(second[0].text)
+    assert first_output["content"] == second_output["content"]
+    assert "coalesced" not in (first_output["metadata"] or {})
+    assert second_output["metadata"]["coalesced"] is True
+
+
+@pytest.mark.asyncio
+@patch("tools.base.BaseTool.get_model_provider")
+@patch.dict("os.environ", {"PYTEST_CURRENT_TEST": ""}, clear=False)
+async def test_coalesced_calls_get_their_own_threads(mock_get_provider):
+    store = {}
+    client = Mock()
+    client.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value)
+    client.get.side_effect = store.get
+
+    mock_provider = create_mock_provider()
+
+    def slow_response(**kwargs):
+        time.sleep(0.2)
+        return Mock(content="Shared answer", usage={}, model_name="gemini-2.5-flash-preview-05-20", metadata={})
+
+    mock_provider.generate_content.side_effect = slow_response
+    mock_get_provider.return_value = mock_provider
+
+    from server import handle_call_tool
+    from utils.conversation_memory import get_thread
+
+    arguments = {"prompt": "Explain the cache"}
+    with patch("utils.conversation_memory.get_redis_client", return_value=client):
+        first, second = await asyncio.gather(handle_call_tool("chat", arguments), handle_call_tool("chat", arguments))
+        first_output, second_output = json.loads(first[0].text), json.loads(second[0].text)
+
+        first_id = first_output["continuation_offer"]["continuation_id"]
+        second_id = second_output["continuation_offer"]["continuation_id"]
+        assert first_id != second_id
+        assert second_id in second_output["continuation_offer"]["message_to_user"]
+        assert second_output["continuation_offer"]["suggested_tool_params"]["continuation_id"] == second_id
+        assert second_output["metadata"]["thread_id"] == second_id
+        # Each caller's follow-ups go to a thread holding the same first turn
+        assert [turn.content for turn in get_thread(second_id).turns] == [
+            turn.content for turn in get_thread(first_id).turns
+        ]
+
+
+@patch("utils.conversation_memory.fork_thread", return_value="fork-id")
+def test_coalesced_offer_names_fork_without_rewriting_content(mock_fork):
+    from server import mark_coalesced
+    from tools.models import ContinuationOffer, ToolOutput
+
+    output = ToolOutput(
+        status="continuation_available",
+        content="Thread leader-id was mentioned by the model",
+        continuation_offer=ContinuationOffer(
+            continuation_id="leader-id",
+            message_to_user="Use the continuation_id 'leader-id' to continue.",
+            suggested_tool_params={"continuation_id": "leader-id", "prompt": "More"},
+            remaining_turns=3,
+        ),
+        metadata={"thread_id": "leader-id"},
+    )
+
+    marked = json.loads(mark_coalesced([TextContent(type="text", text=output.model_dump_json())])[0].text)
+    assert marked["content"] == "Thread leader-id was mentioned by the model"
+    assert marked["continuation_offer"]["continuation_id"] == "fork-id"
+    assert marked["continuation_offer"]["message_to_user"] == "Use the continuation_id 'fork-id' to continue."
+    assert marked["continuation_offer"]["suggested_tool_params"] == {"continuation_id": "fork-id", "prompt": "More"}
+    assert marked["metadata"] == {"thread_id": "fork-id", "coalesced": True}
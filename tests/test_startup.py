@@ -0,0 +1,96 @@
+"""
+Startup benchmark for the stdio server
+
+Stdio deployments start a server process per client session, so the time until
+the server answers ``initialize`` and ``list_tools`` is latency every session
+pays. The unit suite checks that startup skips the expensive imports. The
+timing test launches ``server.py`` the way MCP clients do, reports both times,
+and fails when they exceed the startup budget; wall-clock limits depend on the
+machine, so it is a benchmark and only runs with ``pytest -m benchmark``. Set
+ZEN_STARTUP_BUDGET_SCALE to scale the budget on slow machines.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Seconds from process launch to the initialize response, and for list_tools after it.
+# Importing the provider SDKs at startup roughly doubled the time to initialize.
+INITIALIZE_BUDGET_SECONDS = 1.0
+LIST_TOOLS_BUDGET_SECONDS = 0.25
+
+# Imported on first use by the providers and the tool registry, never at startup
+LAZY_MODULES = ("google.genai", "openai", "tools.base", "tools.chat")
+
+
+def _server_env() -> dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "GEMINI_API_KEY": "dummy-key-for-tests",
+            "OPENAI_API_KEY": "dummy-key-for-tests",
+            "LOG_LEVEL": "WARNING",
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+    )
+    env.pop("MCP_TRANSPORT", None)
+    return env
+
+
+def _budget(seconds: float) -> float:
+    return seconds * float(os.getenv("ZEN_STARTUP_BUDGET_SCALE", "1"))
+
+
+class TestStartup:
+    """Test how quickly a fresh server process becomes usable"""
+
+    def test_provider_sdks_and_tools_not_imported_at_startup(self):
+        code = f"import json, sys, server; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=REPO_ROOT,
+            env=_server_env(),
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert result.returncode == 0, result.stderr
+        assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+    @pytest.mark.benchmark
+    @pytest.mark.asyncio
+    async def test_time_to_initialize_and_list_tools(self):
+        # Warm the interpreter's bytecode and OS file caches so the measurement is of startup work
+        subprocess.run([sys.executable, "-c", "import server"], cwd=REPO_ROOT, env=_server_env(), timeout=60)
+
+        parameters = StdioServerParameters(
+            command=sys.executable, args=["server.py"], env=_server_env(), cwd=str(REPO_ROOT)
+        )
+        started = time.perf_counter()
+        async with stdio_client(parameters) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                initialized = time.perf_counter()
+                tools = await session.list_tools()
+                listed = time.perf_counter()
+
+        initialize_seconds = initialized - started
+        list_tools_seconds = listed - initialized
+        print(f"\nstartup: initialize {initialize_seconds * 1000:.0f}ms, list_tools {list_tools_seconds * 1000:.0f}ms")
+
+        assert len(tools.tools) == 8
+        assert initialize_seconds <= _budget(
+            INITIALIZE_BUDGET_SECONDS
+        ), f"initialize took {initialize_seconds:.2f}s, budget {_budget(INITIALIZE_BUDGET_SECONDS):.2f}s"
+        assert list_tools_seconds <= _budget(
+            LIST_TOOLS_BUDGET_SECONDS
+        ), f"list_tools took {list_tools_seconds:.2f}s, budget {_budget(LIST_TOOLS_BUDGET_SECONDS):.2f}s"
@@ -0,0 +1,64 @@
+"""
+Tests for per-request token accounting
+"""
+
+from utils.file_utils import read_files
+from utils.token_accounting import (
+    TokenAccounting,
+    get_token_usage_summary,
+    record_token_usage,
+    reset_token_usage,
+)
+
+
+class TestTokenAccounting:
+    """Test the per-request breakdown"""
+
+    def test_new_content_excludes_history_and_files(self):
+        accounting = TokenAccounting(history_tokens=100)
+        accounting.record_file("/a.py", 50)
+        accounting.prompt_tokens = 400
+        accounting.system_prompt_tokens = 30
+
+        estimated = accounting.to_metadata()["estimated"]
+        assert estimated["files"] == {"/a.py": 50}
+        assert estimated["new_content"] == 250
+        assert estimated["total_input"] == 430
+
+    def test_provider_usage_ignores_non_integer_values(self):
+        accounting = TokenAccounting()
+        accounting.record_provider_usage({"input_tokens": 10, "note": "x"})
+        assert accounting.provider_usage == {"input_tokens": 10}
+        accounting.record_provider_usage(None)
+        assert accounting.provider_usage == {"input_tokens": 10}
+
+    def test_read_files_records_embedded_and_skipped_files(self, project_path):
+        small = project_path / "small.py"
+        small.write_text("x = 1\n" * 10)
+        large = project_path / "large.py"
+        large.write_text("y = 2\n" * 2000)
+
+        accounting = TokenAccounting()
+        read_files([str(small), str(large)], max_tokens=200, reserve_tokens=0, accounting=accounting)
+
+        assert str(small) in accounting.file_tokens
+        assert str(large) in accounting.skipped_file_tokens
+        assert accounting.skipped_file_tokens[str(large)] > 0
+
+    def test_rolling_summary_groups_by_tool(self):
+        reset_token_usage()
+        first = TokenAccounting(history_tokens=10)
+        first.record_provider_usage({"input_tokens": 100, "output_tokens": 20})
+        second = TokenAccounting()
+        second.record_provider_usage({"input_tokens": 300, "output_tokens": 40})
+
+        record_token_usage("chat", "model-a", first)
+        record_token_usage("chat", "model-a", second)
+        record_token_usage("analyze", None, TokenAccounting())
+
+        summary = get_token_usage_summary()
+        assert summary["overall"]["requests"] == 3
+        assert summary["by_tool"]["chat"]["totals"]["input_tokens"] == 400
+        assert summary["by_tool"]["chat"]["averages"]["output_tokens"] == 30
+        assert summary["by_tool"]["chat"]["totals"]["history"] == 10
+        reset_token_usage()
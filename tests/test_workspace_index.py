@@ -0,0 +1,115 @@
+"""
+Tests for the persistent workspace metadata index
+"""
+
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from utils import file_utils
+from utils.workspace_index import WorkspaceIndex, close_workspace_index, get_workspace_index
+
+
+def _write_old(path, text):
+    """Write a file with an mtime old enough to be indexed."""
+    path.write_text(text)
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    return path.stat()
+
+
+@pytest.fixture
+def index(tmp_path):
+    workspace_index = WorkspaceIndex(tmp_path / "index.sqlite3")
+    yield workspace_index
+    workspace_index.close()
+
+
+class TestWorkspaceIndex:
+    """Test recording, freshness and persistence"""
+
+    def test_record_survives_reopen(self, tmp_path, project_path):
+        stat = _write_old(project_path / "a.py", "x = 1\n")
+        path = str(project_path / "a.py")
+
+        first = WorkspaceIndex(tmp_path / "index.sqlite3")
+        first.record(path, stat.st_size, stat.st_mtime_ns, classification="text", token_counts={"estimate_tokens": 1})
+        first.close()
+
+        reopened = WorkspaceIndex(tmp_path / "index.sqlite3")
+        record = reopened.lookup(path, stat.st_size, stat.st_mtime_ns)
+        assert record.classification == "text"
+        assert record.token_counts == {"estimate_tokens": 1}
+        reopened.close()
+
+    def test_changed_file_is_stale(self, index, project_path):
+        stat = _write_old(project_path / "a.py", "x = 1\n")
+        path = str(project_path / "a.py")
+        index.record(path, stat.st_size, stat.st_mtime_ns, content_hash="abc")
+        index.flush()
+
+        assert index.lookup(path, stat.st_size + 1, stat.st_mtime_ns) is None
+        assert index.lookup(path, stat.st_size, stat.st_mtime_ns + 1) is None
+
+    def test_fields_merge_for_same_version(self, index, project_path):
+        stat = _write_old(project_path / "a.py", "x = 1\n")
+        path = str(project_path / "a.py")
+        index.record(path, stat.st_size, stat.st_mtime_ns, classification="text")
+        index.flush()
+        index.record(path, stat.st_size, stat.st_mtime_ns, content_hash="abc")
+
+        record = index.lookup(path, stat.st_size, stat.st_mtime_ns)
+        assert (record.classification, record.content_hash) == ("text", "abc")
+        assert index.count() == 1
+
+    def test_recently_modified_file_is_not_recorded(self, index, project_path):
+        path = project_path / "a.py"
+        path.write_text("fresh")
+        stat = path.stat()
+        index.record(str(path), stat.st_size, stat.st_mtime_ns, classification="text")
+        assert index.lookup(str(path), stat.st_size, stat.st_mtime_ns) is None
+
+
+class TestIndexedFileOperations:
+    """Test that expansion, token estimates and hashing are answered from the index"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_index(self):
+        close_workspace_index()
+        yield
+        close_workspace_index()
+
+    def test_expansion_classifies_from_index(self, project_path):
+        src = project_path / "src"
+        src.mkdir()
+        _write_old(src / "app.py", "print('hi')\n")
+        _write_old(src / "bundle.js", "var a=1;" * 2000)
+
+        excluded = {}
+        assert file_utils.expand_paths([str(src)], excluded=excluded) == [str(src / "app.py")]
+
+        # Simulate a server restart: the index is reopened from disk
+        close_workspace_index()
+        with patch("utils.file_utils.classify_file", side_effect=AssertionError("file was opened")):
+            excluded_again = {}
+            assert file_utils.expand_paths([str(src)], excluded=excluded_again) == [str(src / "app.py")]
+        assert excluded_again == excluded
+
+    def test_token_estimate_uses_measured_count(self, project_path):
+        path = project_path / "unicode.py"
+        _write_old(path, "é" * 400)  # 800 bytes, 400 characters
+        file_utils.read_file_content(str(path))
+        get_workspace_index().flush()
+        file_utils._token_cache.invalidate()
+
+        assert file_utils._estimate_file_tokens(str(path)) == 100
+
+    def test_content_hash_from_index(self, project_path):
+        path = project_path / "a.py"
+        _write_old(path, "x = 1\n")
+        digest = file_utils.file_content_hash(str(path))
+
+        with patch("utils.file_utils.read_file_bytes", side_effect=AssertionError("file was read")):
+            assert file_utils.file_content_hash(str(path)) == digest
@@ -1,19 +1,26 @@
 """
 Tool implementations for Zen MCP Server
+
+Tool classes are imported from their modules on first access, so importing
+``tools.models`` (or this package) does not load every tool and its dependencies.
 """
 
-from .analyze import AnalyzeTool
-from .chat import ChatTool
-from .codereview import CodeReviewTool
-from .debug import DebugIssueTool
-from .precommit import Precommit
-from .thinkdeep import ThinkDeepTool
+import importlib
+
+# Exported tool class -> module that defines it
+_TOOL_MODULES = {
+    "ThinkDeepTool": ".thinkdeep",
+    "CodeReviewTool": ".codereview",
+    "DebugIssueTool": ".debug",
+    "AnalyzeTool": ".analyze",
+    "ChatTool": ".chat",
+    "Precommit": ".precommit",
+}
+
+__all__ = list(_TOOL_MODULES)
+
 
-__all__ = [
-    "ThinkDeepTool",
-    "CodeReviewTool",
-    "DebugIssueTool",
-    "AnalyzeTool",
-    "ChatTool",
-    "Precommit",
-]
+def __getattr__(name: str):
+    if name in _TOOL_MODULES:
+        return getattr(importlib.import_module(_TOOL_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -9,6 +9,7 @@ from pydantic import Field
 
 from config import TEMPERATURE_ANALYTICAL
 from prompts import ANALYZE_PROMPT
+from utils.prompt_builder import PromptBuilder
 
 from .base import BaseTool, ToolRequest
 from .models import ToolOutput
@@ -17,7 +18,10 @@ from .models import ToolOutput
 class AnalyzeRequest(ToolRequest):
     """Request model for analyze tool"""
 
-    files: list[str] = Field(..., description="Files or directories to analyze (must be absolute paths)")
+    files: list[str] = Field(
+        ...,
+        description="Files or directories to analyze (must be absolute paths; append :START-END to a file path to include only those lines)",
+    )
     prompt: str = Field(..., description="What to analyze or look for")
     analysis_type: Optional[str] = Field(
         None,
@@ -50,7 +54,7 @@ class AnalyzeTool(BaseTool):
                 "files": {
                     "type": "array",
                     "items": {"type": "string"},
-                    "description": "Files or directories to analyze (must be absolute paths)",
+                    "description": "Files or directories to analyze (must be absolute paths; append :START-END to a file path to include only those lines)",
                 },
                 "model": self.get_model_field_schema(),
                 "prompt": {
@@ -94,6 +98,11 @@ class AnalyzeTool(BaseTool):
                     "type": "string",
                     "description": "Thread continuation ID for multi-turn conversations. Can be used to continue conversations across different tools. Only provide this if continuing a previous conversation thread.",
                 },
+                "deadline_seconds": {
+                    "type": "number",
+                    "description": "Maximum seconds this request may take before it is abandoned (defaults to the server's deadline for this tool)",
+                    "exclusiveMinimum": 0,
+                },
             },
             "required": ["files", "prompt"] + (["model"] if IS_AUTO_MODE else []),
         }
@@ -125,6 +134,11 @@ class AnalyzeTool(BaseTool):
 
     async def prepare_prompt(self, request: AnalyzeRequest) -> str:
         """Prepare the analysis prompt"""
+        prompt_builder = await self.build_prompt(request)
+        return prompt_builder.build()
+
+    async def build_prompt(self, request: AnalyzeRequest) -> PromptBuilder:
+        """Build the analysis prompt segments"""
         # Check for prompt.txt in files
         prompt_content, updated_files = self.handle_prompt_file(request.files)
 
@@ -170,22 +184,25 @@ class AnalyzeTool(BaseTool):
 - Known issues or solutions for patterns you identify""",
         )
 
-        # Combine everything
-        full_prompt = f"""{self.get_system_prompt()}
-
-{focus_instruction}{websearch_instruction}
-
-=== USER QUESTION ===
-{request.prompt}
-=== END QUESTION ===
-
-=== FILES TO ANALYZE ===
-{file_content}
-=== END FILES ===
-
-Please analyze these files to answer the user's question."""
-
-        return full_prompt
+        # Combine everything as segments so the file content is never copied
+        prompt_builder = PromptBuilder()
+        if focus_instruction:
+            prompt_builder.add("instructions", focus_instruction)
+        if websearch_instruction:
+            prompt_builder.add(
+                "instructions", websearch_instruction if focus_instruction else websearch_instruction.lstrip("\n")
+            )
+        if focus_instruction or websearch_instruction:
+            prompt_builder.add("instructions", "\n\n")
+        prompt_builder.add("user_request", "=== USER QUESTION ===\n")
+        prompt_builder.add("user_request", request.prompt)
+        prompt_builder.add("user_request", "\n=== END QUESTION ===\n\n")
+        prompt_builder.add("files", "=== FILES TO ANALYZE ===\n")
+        prompt_builder.add("files", file_content)
+        prompt_builder.add("files", "\n=== END FILES ===\n\n")
+        prompt_builder.add("instructions", "Please analyze these files to answer the user's question.")
+
+        return prompt_builder
 
     def format_response(self, response: str, request: AnalyzeRequest, model_info: Optional[dict] = None) -> str:
         """Format the analysis response"""
@@ -17,7 +17,7 @@ import json
 import logging
 import os
 from abc import ABC, abstractmethod
-from typing import Any, Literal, Optional
+from typing import Any, Literal, Optional, Union
 
 from mcp.types import TextContent
 from pydantic import BaseModel, Field
@@ -32,7 +32,17 @@ from utils.conversation_memory import (
     get_conversation_file_list,
     get_thread,
 )
+from utils.execution_context import (
+    ExecutionContext,
+    RequestCancelledError,
+    current_execution_context,
+    execution_context,
+)
 from utils.file_utils import read_file_content, read_files, translate_path_for_environment
+from utils.model_context import TokenAllocation, plan_token_budget
+from utils.prompt_builder import PromptBuilder
+from utils.token_accounting import TokenAccounting, record_token_usage
+from utils.token_utils import estimate_tokens
 
 from .models import ClarificationRequest, ContinuationOffer, ToolOutput
 
@@ -67,6 +77,11 @@ class ToolRequest(BaseModel):
         None,
         description="Thread continuation ID for multi-turn conversations. Can be used to continue conversations across different tools. Only provide this if continuing a previous conversation thread.",
     )
+    deadline_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Maximum seconds this request may take before it is abandoned (defaults to the server's deadline for this tool)",
+    )
 
 
 class BaseTool(ABC):
@@ -198,6 +213,20 @@ class BaseTool(ABC):
         """
         return "medium"  # Default to medium thinking for better reasoning
 
+    def get_turn_hunk_hashes(self) -> Optional[list[str]]:
+        """
+        Return hashes of the diff hunks the current request sent for review.
+
+        Recorded on the conversation turn so a continued review can skip hunks
+        that were already reviewed. Tools that embed diffs store them on the
+        execution context.
+
+        Returns:
+            Optional[list[str]]: Hunk hashes, or None if the tool sends no diffs
+        """
+        context = current_execution_context()
+        return (context.hunk_hashes if context is not None else None) or None
+
     def get_conversation_embedded_files(self, continuation_id: Optional[str]) -> list[str]:
         """
         Get list of files already embedded in conversation history.
@@ -235,6 +264,10 @@ class BaseTool(ABC):
         while ensuring tools still have logical access to all requested files through
         conversation history references.
 
+        Files edited since they were embedded are filtered out as well: the
+        conversation history shows them as the embedded version plus a unified
+        diff (see build_conversation_history), so they are not embedded again.
+
         Args:
             requested_files: List of files requested for current tool execution
             continuation_id: Thread continuation ID, or None for new conversations
@@ -328,8 +361,8 @@ class BaseTool(ABC):
 
         # Extract remaining budget from arguments if available
         if remaining_budget is None:
-            # Use provided arguments or fall back to stored arguments from execute()
-            args_to_use = arguments or getattr(self, "_current_arguments", {})
+            # Use provided arguments or fall back to those of the running invocation
+            args_to_use = self._execution_arguments(arguments)
             remaining_budget = args_to_use.get("_remaining_tokens")
 
         effective_max_tokens, budget_source = self._calculate_file_token_budget(
@@ -372,9 +405,7 @@ class BaseTool(ABC):
                     "so the following file(s) could not be embedded in-line:"
                 ),
                 "\n".join(f"  - {path}" for path in files_to_embed),
-                (
-                    "If you still need their contents, restart the conversation or request a smaller subset of files."
-                ),
+                ("If you still need their contents, restart the conversation or request a smaller subset of files."),
                 "--- END NOTE ---",
             ]
             content_parts.append("\n".join(skipped_note_lines))
@@ -387,14 +418,17 @@ class BaseTool(ABC):
             )
             try:
                 file_content = read_files(
-                    files_to_embed, max_tokens=effective_max_tokens + reserve_tokens, reserve_tokens=reserve_tokens
+                    files_to_embed,
+                    max_tokens=effective_max_tokens + reserve_tokens,
+                    reserve_tokens=reserve_tokens,
+                    accounting=self._token_accounting(),
+                    relevance_query=self._get_relevance_query(arguments),
+                    embedded_hashes=self._embedded_file_hashes(),
                 )
                 self._validate_token_limit(file_content, context_description)
                 content_parts.append(file_content)
 
                 # Estimate tokens for debug logging
-                from utils.token_utils import estimate_tokens
-
                 content_tokens = estimate_tokens(file_content)
                 logger.debug(
                     f"{self.name} tool successfully embedded {len(files_to_embed)} files ({content_tokens:,} tokens)"
@@ -432,6 +466,25 @@ class BaseTool(ABC):
         logger.debug(f"[FILES] {self.name}: _prepare_file_content_for_prompt returning {len(result)} chars")
         return result
 
+    def _get_relevance_query(self, arguments: Optional[dict] = None) -> str:
+        """
+        Get the request text that directory files are ranked against.
+
+        Uses the new user input only (not reconstructed conversation history)
+        plus any focus areas the tool accepts.
+
+        Args:
+            arguments: Raw arguments passed to ``execute``
+
+        Returns:
+            str: Query text, possibly empty
+        """
+        args_to_use = self._execution_arguments(arguments)
+        prompt = args_to_use.get("prompt") or ""
+        if "=== NEW USER INPUT ===" in prompt:
+            prompt = prompt.rsplit("=== NEW USER INPUT ===", 1)[1]
+        return " ".join(part for part in (prompt, args_to_use.get("focus_on") or "") if part)
+
     def _calculate_file_token_budget(
         self,
         *,
@@ -472,36 +525,30 @@ class BaseTool(ABC):
 
         # Inspect any model context that server.py may have attached. Using the
         # context keeps file allocation aligned with the precise model budgets.
-        args_to_use = arguments or getattr(self, "_current_arguments", {})
+        args_to_use = self._execution_arguments(arguments)
         model_context = args_to_use.get("_model_context") if isinstance(args_to_use, dict) else None
         if model_context is None:
-            model_context = getattr(self, "_current_arguments", {}).get("_model_context")
+            model_context = self._execution_arguments().get("_model_context")
 
         if model_context is not None:
             try:
                 token_allocation = model_context.calculate_token_allocation()
-                available = max(0, token_allocation.file_tokens - reserve_tokens)
+                available = max(0, self._plan_file_token_budget(token_allocation, args_to_use) - reserve_tokens)
                 return available, f"model context for {getattr(model_context, 'model_name', 'unknown model')}"
             except Exception as exc:  # noqa: BLE001 - Provide detailed context upstream
-                logger.warning(
-                    f"[FILES] {self.name}: Unable to use model context for token budget calculation: {exc}"
-                )
+                logger.warning(f"[FILES] {self.name}: Unable to use model context for token budget calculation: {exc}")
 
         # Fall back to model capabilities for the currently selected model.
         from config import DEFAULT_MODEL
 
-        model_name = getattr(self, "_current_model_name", None) or DEFAULT_MODEL
+        context = current_execution_context()
+        model_name = (context.model_name if context is not None else None) or DEFAULT_MODEL
         try:
             provider = self.get_model_provider(model_name)
             capabilities = provider.get_capabilities(model_name)
+            token_allocation = TokenAllocation.for_capacity(capabilities.max_tokens)
 
-            if capabilities.max_tokens < 300_000:
-                # Smaller models dedicate a larger share to the response.
-                model_content_tokens = int(capabilities.max_tokens * 0.6)
-            else:
-                model_content_tokens = int(capabilities.max_tokens * 0.8)
-
-            available = max(0, model_content_tokens - reserve_tokens)
+            available = max(0, self._plan_file_token_budget(token_allocation, args_to_use) - reserve_tokens)
             return available, f"capabilities for {model_name}"
         except (ValueError, AttributeError) as exc:
             logger.warning(
@@ -516,6 +563,58 @@ class BaseTool(ABC):
         fallback_budget = max(0, min(MAX_CONTENT_TOKENS, 100_000) - reserve_tokens)
         return fallback_budget, "fallback token budget"
 
+    def _plan_file_token_budget(self, token_allocation: TokenAllocation, arguments: Optional[dict]) -> int:
+        """
+        Plan the content budget for a request without conversation history.
+
+        The new request is measured; the files demand is left open, so files get
+        everything the request itself doesn't need instead of a fixed share.
+
+        Args:
+            token_allocation: Baseline allocation for the model
+            arguments: Raw arguments passed to ``execute``
+
+        Returns:
+            int: Tokens planned for files, including anything left unallocated
+        """
+        prompt = arguments.get("prompt", "") if isinstance(arguments, dict) else ""
+        history_tokens = (arguments.get("_history_tokens") or 0) if isinstance(arguments, dict) else 0
+        plan = plan_token_budget(
+            token_allocation,
+            {"new_content": estimate_tokens(prompt or ""), "files": None, "history": history_tokens},
+        )
+
+        accounting = self._token_accounting()
+        if accounting is not None and accounting.budget_plan is None:
+            accounting.budget_plan = plan.to_metadata()
+
+        return plan.allocation("files") + plan.unallocated
+
+    def _execution_arguments(self, arguments: Optional[dict] = None) -> dict:
+        """
+        Return the explicit arguments, or those of the invocation running in this task.
+
+        Args:
+            arguments: Raw arguments passed by the caller, if any
+
+        Returns:
+            dict: Arguments to read budgets and model context from (empty outside execute)
+        """
+        if arguments:
+            return arguments
+        context = current_execution_context()
+        return context.arguments if context is not None else {}
+
+    def _token_accounting(self) -> Optional[TokenAccounting]:
+        """Return the token accounting of the invocation running in this task, if any."""
+        context = current_execution_context()
+        return context.token_accounting if context is not None else None
+
+    def _embedded_file_hashes(self) -> Optional[dict[str, str]]:
+        """Return where the invocation running in this task records the files it embedded, if any."""
+        context = current_execution_context()
+        return context.file_hashes if context is not None else None
+
     def get_websearch_instruction(self, use_websearch: bool, tool_specific: Optional[str] = None) -> str:
         """
         Generate standardized web search instruction based on the use_websearch parameter.
@@ -730,10 +829,29 @@ When recommending searches, be specific about what information you need and why
         Returns:
             List[TextContent]: Formatted response as MCP TextContent objects
         """
-        try:
-            # Store arguments for access by helper methods (like _prepare_file_content_for_prompt)
-            self._current_arguments = arguments
+        # Per-request state lives in an execution context, not on the shared tool instance, so
+        # concurrent calls to the same tool don't see each other's arguments or budgets.
+        # The token accounting tracks where the budget goes; server.py reports the history size.
+        context = ExecutionContext(
+            tool_name=self.name,
+            arguments=arguments,
+            token_accounting=TokenAccounting(history_tokens=arguments.get("_history_tokens") or 0),
+        )
+        if arguments.get("_token_budget_plan") is not None:
+            context.token_accounting.budget_plan = arguments["_token_budget_plan"].to_metadata()
+
+        # Keep the deadline and cancellation of the call server.py opened the context for
+        parent = current_execution_context()
+        if parent is not None:
+            context.deadline = parent.deadline
+            context.cancel_event = parent.cancel_event
 
+        with execution_context(context):
+            return await self._execute_in_context(arguments, context)
+
+    async def _execute_in_context(self, arguments: dict[str, Any], context: ExecutionContext) -> list[TextContent]:
+        """Run execute() with the invocation's context active."""
+        try:
             # Set up logger for this tool execution
             logger = logging.getLogger(f"tools.{self.name}")
             logger.info(f"Starting {self.name} tool execution with arguments: {list(arguments.keys())}")
@@ -765,7 +883,7 @@ When recommending searches, be specific about what information you need and why
                 logger.debug(f"Continuing {self.name} conversation with thread {continuation_id}")
 
                 # Store the original arguments to detect enhanced prompts
-                self._has_embedded_history = False
+                context.has_embedded_history = False
 
                 # Check if conversation history is already embedded in the prompt field
                 field_value = getattr(request, "prompt", "")
@@ -773,22 +891,22 @@ When recommending searches, be specific about what information you need and why
 
                 if "=== CONVERSATION HISTORY ===" in field_value:
                     # Conversation history is already embedded, use it directly
-                    prompt = field_value
-                    self._has_embedded_history = True
+                    prompt_builder = PromptBuilder().add("prompt", field_value)
+                    context.has_embedded_history = True
                     logger.debug(f"{self.name}: Using pre-embedded conversation history from {field_name}")
                 else:
                     # No embedded history, prepare prompt normally
-                    prompt = await self.prepare_prompt(request)
+                    prompt_builder = await self.build_prompt(request)
                     logger.debug(f"{self.name}: No embedded history found, prepared prompt normally")
             else:
                 # New conversation, prepare prompt normally
-                prompt = await self.prepare_prompt(request)
+                prompt_builder = await self.build_prompt(request)
 
                 # Add follow-up instructions for new conversations
                 from server import get_follow_up_instructions
 
                 follow_up_instructions = get_follow_up_instructions(0)  # New conversation, turn 0
-                prompt = f"{prompt}\n\n{follow_up_instructions}"
+                prompt_builder.add("follow_up_instructions", f"\n\n{follow_up_instructions}")
                 logger.debug(f"Added follow-up instructions for new {self.name} conversation")
 
             # Extract model configuration from request or use defaults
@@ -810,7 +928,7 @@ When recommending searches, be specific about what information you need and why
                 return [TextContent(type="text", text=error_output.model_dump_json())]
 
             # Store model name for use by helper methods like _prepare_file_content_for_prompt
-            self._current_model_name = model_name
+            context.model_name = model_name
 
             temperature = getattr(request, "temperature", None)
             if temperature is None:
@@ -832,6 +950,14 @@ When recommending searches, be specific about what information you need and why
             # Get system prompt for this tool
             system_prompt = self.get_system_prompt()
 
+            # Materialize the prompt exactly once, at the provider boundary
+            prompt = prompt_builder.build()
+            context.token_accounting.system_prompt_tokens = estimate_tokens(system_prompt)
+            context.token_accounting.prompt_tokens = prompt_builder.total_tokens
+
+            # Don't start a model call for a request nobody is waiting for
+            context.check()
+
             # Generate AI response using the provider
             logger.info(f"Sending request to {provider.get_provider_type().value} API for {self.name}")
             logger.info(f"Using model: {model_name} via {provider.get_provider_type().value} provider")
@@ -844,10 +970,14 @@ When recommending searches, be specific about what information you need and why
                 system_prompt=system_prompt,
                 temperature=temperature,
                 thinking_mode=thinking_mode if provider.supports_thinking_mode(model_name) else None,
+                timeout=context.time_remaining(),
             )
 
             logger.info(f"Received response from {provider.get_provider_type().value} API for {self.name}")
 
+            # A response to an abandoned request is discarded before it is recorded in the thread
+            context.check()
+
             # Process the model's response
             if model_response.content:
                 raw_text = model_response.content
@@ -856,6 +986,7 @@ When recommending searches, be specific about what information you need and why
                 # Pass model info for conversation tracking
                 model_info = {"provider": provider, "model_name": model_name, "model_response": model_response}
                 tool_output = self._parse_response(raw_text, request, model_info)
+                self._attach_token_usage(tool_output, prompt_builder, model_info)
                 logger.info(f"Successfully completed {self.name} tool execution")
 
             else:
@@ -872,6 +1003,9 @@ When recommending searches, be specific about what information you need and why
             # Return standardized JSON response for consistent client handling
             return [TextContent(type="text", text=tool_output.model_dump_json())]
 
+        except RequestCancelledError:
+            # Abandoned requests are reported by server.py; there is nothing to retry or record
+            raise
         except Exception as e:
             # Catch all exceptions to prevent server crashes
             # Return error information in standardized format
@@ -880,6 +1014,8 @@ When recommending searches, be specific about what information you need and why
 
             # Check if this is a 500 INTERNAL error that asks for retry
             if "500 INTERNAL" in error_msg and "Please retry" in error_msg:
+                # Don't spend another model call on a request that was abandoned meanwhile
+                context.check()
                 logger.warning(f"500 INTERNAL error in {self.name} - attempting retry")
                 try:
                     # Single retry attempt using provider
@@ -889,7 +1025,9 @@ When recommending searches, be specific about what information you need and why
                         system_prompt=system_prompt,
                         temperature=temperature,
                         thinking_mode=thinking_mode if provider.supports_thinking_mode(model_name) else None,
+                        timeout=context.time_remaining(),
                     )
+                    context.check()
 
                     if retry_response.content:
                         # If successful, process normally
@@ -899,8 +1037,11 @@ When recommending searches, be specific about what information you need and why
                             "model_response": retry_response,
                         }
                         tool_output = self._parse_response(retry_response.content, request, retry_model_info)
+                        self._attach_token_usage(tool_output, prompt_builder, retry_model_info)
                         return [TextContent(type="text", text=tool_output.model_dump_json())]
 
+                except RequestCancelledError:
+                    raise
                 except Exception as retry_e:
                     logger.error(f"Retry failed for {self.name} tool: {str(retry_e)}")
                     error_msg = f"Tool failed after retry: {str(retry_e)}"
@@ -914,6 +1055,32 @@ When recommending searches, be specific about what information you need and why
             )
             return [TextContent(type="text", text=error_output.model_dump_json())]
 
+    def _attach_token_usage(self, tool_output: ToolOutput, prompt_builder: PromptBuilder, model_info: dict) -> None:
+        """
+        Record the token breakdown of this request in the tool output metadata.
+
+        Adds the per-segment prompt breakdown and the per-request token accounting
+        (estimates plus provider-reported usage), and feeds the accounting into the
+        rolling aggregate served by the get_token_usage tool.
+
+        Args:
+            tool_output: Output returned to the client
+            prompt_builder: Builder the prompt was materialized from
+            model_info: Dict with provider, model_name and model_response
+        """
+        accounting = self._token_accounting() or TokenAccounting()
+        model_response = model_info.get("model_response")
+        if model_response is not None:
+            accounting.record_provider_usage(getattr(model_response, "usage", None))
+
+        if tool_output.metadata is None:
+            tool_output.metadata = {}
+        tool_output.metadata["prompt_segments"] = prompt_builder.token_breakdown()
+        tool_output.metadata["prompt_tokens"] = prompt_builder.total_tokens
+        tool_output.metadata["token_usage"] = accounting.to_metadata()
+
+        record_token_usage(self.name, model_info.get("model_name"), accounting)
+
     def _parse_response(self, raw_text: str, request, model_info: Optional[dict] = None) -> ToolOutput:
         """
         Parse the raw response and check for clarification requests.
@@ -992,6 +1159,8 @@ When recommending searches, be specific about what information you need and why
                 model_provider=model_provider,
                 model_name=model_name,
                 model_metadata=model_metadata,
+                file_hashes=self._embedded_file_hashes() or None,
+                hunk_hashes=self.get_turn_hunk_hashes(),
             )
             if not success:
                 logging.warning(f"Failed to add turn to thread {continuation_id} for {self.name}")
@@ -1104,6 +1273,8 @@ When recommending searches, be specific about what information you need and why
                 model_provider=model_provider,
                 model_name=model_name,
                 model_metadata=model_metadata,
+                file_hashes=self._embedded_file_hashes() or None,
+                hunk_hashes=self.get_turn_hunk_hashes(),
             )
 
             # Create continuation offer
@@ -1146,8 +1317,10 @@ When recommending searches, be specific about what information you need and why
         """
         Prepare the complete prompt for the Gemini model.
 
-        This method should combine the system prompt with the user's request
-        and any additional context (like file contents) needed for the task.
+        This method should combine the user's request with any additional
+        context (like file contents) needed for the task. The system prompt is
+        passed to the provider separately by execute() and should not be
+        repeated here.
 
         Args:
             request: The validated request object
@@ -1157,6 +1330,24 @@ When recommending searches, be specific about what information you need and why
         """
         pass
 
+    async def build_prompt(self, request) -> PromptBuilder:
+        """
+        Prepare the prompt as named segments for the model.
+
+        Tools that assemble large prompts override this to add their sections
+        (files, user request, instructions) as separate segments, which avoids
+        copying the full prompt at every layer and provides per-segment token
+        accounting. The default implementation wraps prepare_prompt() in a
+        single "prompt" segment.
+
+        Args:
+            request: The validated request object
+
+        Returns:
+            PromptBuilder: Prompt segments, materialized by execute() at the provider boundary
+        """
+        return PromptBuilder().add("prompt", await self.prepare_prompt(request))
+
     def format_response(self, response: str, request, model_info: Optional[dict] = None) -> str:
         """
         Format the model's response for display.
@@ -1175,7 +1366,7 @@ When recommending searches, be specific about what information you need and why
         """
         return response
 
-    def _validate_token_limit(self, text: str, context_type: str = "Context") -> None:
+    def _validate_token_limit(self, text: Union[str, PromptBuilder], context_type: str = "Context") -> None:
         """
         Validate token limit and raise ValueError if exceeded.
 
@@ -1183,13 +1374,17 @@ When recommending searches, be specific about what information you need and why
         in all prepare_prompt methods across tools.
 
         Args:
-            text: The text to check
+            text: The text to check, or a PromptBuilder whose segment token counts are used
             context_type: Description of what's being checked (for error message)
 
         Raises:
             ValueError: If text exceeds MAX_CONTEXT_TOKENS
         """
-        within_limit, estimated_tokens = check_token_limit(text)
+        if isinstance(text, PromptBuilder):
+            estimated_tokens = text.total_tokens
+            within_limit = estimated_tokens <= MAX_CONTEXT_TOKENS
+        else:
+            within_limit, estimated_tokens = check_token_limit(text)
         if not within_limit:
             raise ValueError(
                 f"{context_type} too large (~{estimated_tokens:,} tokens). Maximum is {MAX_CONTEXT_TOKENS:,} tokens."
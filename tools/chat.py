@@ -9,6 +9,7 @@ from pydantic import Field
 
 from config import TEMPERATURE_BALANCED
 from prompts import CHAT_PROMPT
+from utils.prompt_builder import PromptBuilder
 
 from .base import BaseTool, ToolRequest
 from .models import ToolOutput
@@ -23,7 +24,7 @@ class ChatRequest(ToolRequest):
     )
     files: Optional[list[str]] = Field(
         default_factory=list,
-        description="Optional files for context (must be absolute paths)",
+        description="Optional files for context (must be absolute paths; append :START-END to a file path to include only those lines)",
     )
 
 
@@ -56,7 +57,7 @@ class ChatTool(BaseTool):
                 "files": {
                     "type": "array",
                     "items": {"type": "string"},
-                    "description": "Optional files for context (must be absolute paths)",
+                    "description": "Optional files for context (must be absolute paths; append :START-END to a file path to include only those lines)",
                 },
                 "model": self.get_model_field_schema(),
                 "temperature": {
@@ -79,6 +80,11 @@ class ChatTool(BaseTool):
                     "type": "string",
                     "description": "Thread continuation ID for multi-turn conversations. Can be used to continue conversations across different tools. Only provide this if continuing a previous conversation thread.",
                 },
+                "deadline_seconds": {
+                    "type": "number",
+                    "description": "Maximum seconds this request may take before it is abandoned (defaults to the server's deadline for this tool)",
+                    "exclusiveMinimum": 0,
+                },
             },
             "required": ["prompt"] + (["model"] if IS_AUTO_MODE else []),
         }
@@ -110,6 +116,11 @@ class ChatTool(BaseTool):
 
     async def prepare_prompt(self, request: ChatRequest) -> str:
         """Prepare the chat prompt with optional context files"""
+        prompt_builder = await self.build_prompt(request)
+        return prompt_builder.build()
+
+    async def build_prompt(self, request: ChatRequest) -> PromptBuilder:
+        """Build the chat prompt segments with optional context files"""
         # Check for prompt.txt in files
         prompt_content, updated_files = self.handle_prompt_file(request.files)
 
@@ -120,17 +131,6 @@ class ChatTool(BaseTool):
         if updated_files is not None:
             request.files = updated_files
 
-        # Add context files if provided (using centralized file handling with filtering)
-        if request.files:
-            file_content = self._prepare_file_content_for_prompt(
-                request.files, request.continuation_id, "Context files"
-            )
-            if file_content:
-                user_content = f"{user_content}\n\n=== CONTEXT FILES ===\n{file_content}\n=== END CONTEXT ===="
-
-        # Check token limits
-        self._validate_token_limit(user_content, "Content")
-
         # Add web search instruction if enabled
         websearch_instruction = self.get_websearch_instruction(
             request.use_websearch,
@@ -141,16 +141,32 @@ class ChatTool(BaseTool):
 - Community discussions and solutions""",
         )
 
-        # Combine system prompt with user content
-        full_prompt = f"""{self.get_system_prompt()}{websearch_instruction}
+        prompt_builder = PromptBuilder()
+        if websearch_instruction:
+            prompt_builder.add("instructions", websearch_instruction.lstrip("\n"))
+            prompt_builder.add("instructions", "\n\n")
 
-=== USER REQUEST ===
-{user_content}
-=== END REQUEST ===
+        prompt_builder.add("user_request", "=== USER REQUEST ===\n")
+        prompt_builder.add("user_request", user_content)
 
-Please provide a thoughtful, comprehensive response:"""
+        # Add context files if provided (using centralized file handling with filtering)
+        if request.files:
+            file_content = self._prepare_file_content_for_prompt(
+                request.files, request.continuation_id, "Context files"
+            )
+            if file_content:
+                prompt_builder.add("files", "\n\n=== CONTEXT FILES ===\n")
+                prompt_builder.add("files", file_content)
+                prompt_builder.add("files", "\n=== END CONTEXT ====")
+
+        prompt_builder.add(
+            "instructions", "\n=== END REQUEST ===\n\nPlease provide a thoughtful, comprehensive response:"
+        )
+
+        # Check token limits
+        self._validate_token_limit(prompt_builder, "Content")
 
-        return full_prompt
+        return prompt_builder
 
     def format_response(self, response: str, request: ChatRequest, model_info: Optional[dict] = None) -> str:
         """Format the chat response"""
@@ -21,6 +21,7 @@ from pydantic import Field
 
 from config import TEMPERATURE_ANALYTICAL
 from prompts import CODEREVIEW_PROMPT
+from utils.prompt_builder import PromptBuilder
 
 from .base import BaseTool, ToolRequest
 from .models import ToolOutput
@@ -37,7 +38,7 @@ class CodeReviewRequest(ToolRequest):
 
     files: list[str] = Field(
         ...,
-        description="Code files or directories to review (must be absolute paths)",
+        description="Code files or directories to review (must be absolute paths; append :START-END to a file path to include only those lines)",
     )
     prompt: str = Field(
         ...,
@@ -90,7 +91,7 @@ class CodeReviewTool(BaseTool):
                 "files": {
                     "type": "array",
                     "items": {"type": "string"},
-                    "description": "Code files or directories to review (must be absolute paths)",
+                    "description": "Code files or directories to review (must be absolute paths; append :START-END to a file path to include only those lines)",
                 },
                 "model": self.get_model_field_schema(),
                 "prompt": {
@@ -137,6 +138,11 @@ class CodeReviewTool(BaseTool):
                     "type": "string",
                     "description": "Thread continuation ID for multi-turn conversations. Can be used to continue conversations across different tools. Only provide this if continuing a previous conversation thread.",
                 },
+                "deadline_seconds": {
+                    "type": "number",
+                    "description": "Maximum seconds this request may take before it is abandoned (defaults to the server's deadline for this tool)",
+                    "exclusiveMinimum": 0,
+                },
             },
             "required": ["files", "prompt"] + (["model"] if IS_AUTO_MODE else []),
         }
@@ -171,6 +177,19 @@ class CodeReviewTool(BaseTool):
         """
         Prepare the code review prompt with customized instructions.
 
+        Args:
+            request: The validated review request
+
+        Returns:
+            str: Complete prompt for the Gemini model
+        """
+        prompt_builder = await self.build_prompt(request)
+        return prompt_builder.build()
+
+    async def build_prompt(self, request: CodeReviewRequest) -> PromptBuilder:
+        """
+        Build the code review prompt segments with customized instructions.
+
         This method reads the requested files, validates token limits,
         and constructs a detailed prompt based on the review parameters.
 
@@ -178,7 +197,7 @@ class CodeReviewTool(BaseTool):
             request: The validated review request
 
         Returns:
-            str: Complete prompt for the Gemini model
+            PromptBuilder: Prompt segments for the Gemini model
 
         Raises:
             ValueError: If the code exceeds token limits
@@ -232,22 +251,26 @@ class CodeReviewTool(BaseTool):
 - Recent updates or deprecations in APIs used""",
         )
 
-        # Construct the complete prompt with system instructions and code
-        full_prompt = f"""{self.get_system_prompt()}{websearch_instruction}
-
-=== USER CONTEXT ===
-{request.prompt}
-=== END CONTEXT ===
-
-{focus_instruction}
-
-=== CODE TO REVIEW ===
-{file_content}
-=== END CODE ===
-
-Please provide a code review aligned with the user's context and expectations, following the format specified in the system prompt."""
+        # Assemble the prompt as segments so the file content is never copied
+        prompt_builder = PromptBuilder()
+        if websearch_instruction:
+            prompt_builder.add("instructions", websearch_instruction.lstrip("\n"))
+            prompt_builder.add("instructions", "\n\n")
+        prompt_builder.add("user_request", "=== USER CONTEXT ===\n")
+        prompt_builder.add("user_request", request.prompt)
+        prompt_builder.add("user_request", "\n=== END CONTEXT ===\n\n")
+        if focus_instruction:
+            prompt_builder.add("instructions", f"{focus_instruction}\n\n")
+        prompt_builder.add("files", "=== CODE TO REVIEW ===\n")
+        prompt_builder.add("files", file_content)
+        prompt_builder.add("files", "\n=== END CODE ===\n\n")
+        prompt_builder.add(
+            "instructions",
+            "Please provide a code review aligned with the user's context and expectations, "
+            "following the format specified in the system prompt.",
+        )
 
-        return full_prompt
+        return prompt_builder
 
     def format_response(self, response: str, request: CodeReviewRequest, model_info: Optional[dict] = None) -> str:
         """
@@ -9,6 +9,7 @@ from pydantic import Field
 
 from config import TEMPERATURE_ANALYTICAL
 from prompts import DEBUG_ISSUE_PROMPT
+from utils.prompt_builder import PromptBuilder
 
 from .base import BaseTool, ToolRequest
 from .models import ToolOutput
@@ -21,7 +22,7 @@ class DebugIssueRequest(ToolRequest):
     error_context: Optional[str] = Field(None, description="Stack trace, logs, or additional error context")
     files: Optional[list[str]] = Field(
         None,
-        description="Files or directories that might be related to the issue (must be absolute paths)",
+        description="Files or directories that might be related to the issue (must be absolute paths; append :START-END to a file path to include only those lines)",
     )
     runtime_info: Optional[str] = Field(None, description="Environment, versions, or runtime information")
     previous_attempts: Optional[str] = Field(None, description="What has been tried already")
@@ -67,7 +68,7 @@ class DebugIssueTool(BaseTool):
                 "files": {
                     "type": "array",
                     "items": {"type": "string"},
-                    "description": "Files or directories that might be related to the issue (must be absolute paths)",
+                    "description": "Files or directories that might be related to the issue (must be absolute paths; append :START-END to a file path to include only those lines)",
                 },
                 "runtime_info": {
                     "type": "string",
@@ -97,6 +98,11 @@ class DebugIssueTool(BaseTool):
                     "type": "string",
                     "description": "Thread continuation ID for multi-turn conversations. Can be used to continue conversations across different tools. Only provide this if continuing a previous conversation thread.",
                 },
+                "deadline_seconds": {
+                    "type": "number",
+                    "description": "Maximum seconds this request may take before it is abandoned (defaults to the server's deadline for this tool)",
+                    "exclusiveMinimum": 0,
+                },
             },
             "required": ["prompt"] + (["model"] if IS_AUTO_MODE else []),
         }
@@ -134,6 +140,11 @@ class DebugIssueTool(BaseTool):
 
     async def prepare_prompt(self, request: DebugIssueRequest) -> str:
         """Prepare the debugging prompt"""
+        prompt_builder = await self.build_prompt(request)
+        return prompt_builder.build()
+
+    async def build_prompt(self, request: DebugIssueRequest) -> PromptBuilder:
+        """Build the debugging prompt segments"""
         # Check for prompt.txt in files
         prompt_content, updated_files = self.handle_prompt_file(request.files)
 
@@ -148,17 +159,41 @@ class DebugIssueTool(BaseTool):
         if updated_files is not None:
             request.files = updated_files
 
+        # Add web search instruction if enabled
+        websearch_instruction = self.get_websearch_instruction(
+            request.use_websearch,
+            """When debugging issues, consider if searches for these would help:
+- The exact error message to find known solutions
+- Framework-specific error codes and their meanings
+- Similar issues in forums, GitHub issues, or Stack Overflow
+- Workarounds and patches for known bugs
+- Version-specific issues and compatibility problems""",
+        )
+
+        prompt_builder = PromptBuilder()
+        if websearch_instruction:
+            prompt_builder.add("instructions", websearch_instruction.lstrip("\n"))
+            prompt_builder.add("instructions", "\n\n")
+
         # Build context sections
-        context_parts = [f"=== ISSUE DESCRIPTION ===\n{request.prompt}\n=== END DESCRIPTION ==="]
+        prompt_builder.add("user_request", "=== ISSUE DESCRIPTION ===\n")
+        prompt_builder.add("user_request", request.prompt)
+        prompt_builder.add("user_request", "\n=== END DESCRIPTION ===")
 
         if request.error_context:
-            context_parts.append(f"\n=== ERROR CONTEXT/STACK TRACE ===\n{request.error_context}\n=== END CONTEXT ===")
+            prompt_builder.add("error_context", "\n\n=== ERROR CONTEXT/STACK TRACE ===\n")
+            prompt_builder.add("error_context", request.error_context)
+            prompt_builder.add("error_context", "\n=== END CONTEXT ===")
 
         if request.runtime_info:
-            context_parts.append(f"\n=== RUNTIME INFORMATION ===\n{request.runtime_info}\n=== END RUNTIME ===")
+            prompt_builder.add(
+                "runtime_info", f"\n\n=== RUNTIME INFORMATION ===\n{request.runtime_info}\n=== END RUNTIME ==="
+            )
 
         if request.previous_attempts:
-            context_parts.append(f"\n=== PREVIOUS ATTEMPTS ===\n{request.previous_attempts}\n=== END ATTEMPTS ===")
+            prompt_builder.add(
+                "previous_attempts", f"\n\n=== PREVIOUS ATTEMPTS ===\n{request.previous_attempts}\n=== END ATTEMPTS ==="
+            )
 
         # Add relevant files if provided
         if request.files:
@@ -167,33 +202,20 @@ class DebugIssueTool(BaseTool):
             file_content = self._prepare_file_content_for_prompt(request.files, continuation_id, "Code")
 
             if file_content:
-                context_parts.append(f"\n=== RELEVANT CODE ===\n{file_content}\n=== END CODE ===")
-
-        full_context = "\n".join(context_parts)
+                prompt_builder.add("files", "\n\n=== RELEVANT CODE ===\n")
+                prompt_builder.add("files", file_content)
+                prompt_builder.add("files", "\n=== END CODE ===")
 
         # Check token limits
-        self._validate_token_limit(full_context, "Context")
+        self._validate_token_limit(prompt_builder, "Context")
 
-        # Add web search instruction if enabled
-        websearch_instruction = self.get_websearch_instruction(
-            request.use_websearch,
-            """When debugging issues, consider if searches for these would help:
-- The exact error message to find known solutions
-- Framework-specific error codes and their meanings
-- Similar issues in forums, GitHub issues, or Stack Overflow
-- Workarounds and patches for known bugs
-- Version-specific issues and compatibility problems""",
+        prompt_builder.add(
+            "instructions",
+            "\n\nPlease debug this issue following the structured format in the system prompt.\n"
+            "Focus on finding the root cause and providing actionable solutions.",
         )
 
-        # Combine everything
-        full_prompt = f"""{self.get_system_prompt()}{websearch_instruction}
-
-{full_context}
-
-Please debug this issue following the structured format in the system prompt.
-Focus on finding the root cause and providing actionable solutions."""
-
-        return full_prompt
+        return prompt_builder
 
     def format_response(self, response: str, request: DebugIssueRequest, model_info: Optional[dict] = None) -> str:
         """Format the debugging response"""
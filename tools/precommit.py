@@ -8,21 +8,44 @@ Files may legitimately appear in both "Git Diffs" and "Additional Context Files"
 This provides comprehensive context for AI analysis - not a duplication bug.
 """
 
+import logging
 import os
+from dataclasses import dataclass, field
 from typing import Any, Literal, Optional
 
 from mcp.types import TextContent
 from pydantic import Field
 
-from config import MAX_CONTEXT_TOKENS
 from prompts.tool_prompts import PRECOMMIT_PROMPT
+from utils.conversation_memory import get_reviewed_hunk_hashes
+from utils.execution_context import current_execution_context
+from utils.file_classifier import CLASSIFICATION_REASONS, classify_file
 from utils.file_utils import translate_file_paths, translate_path_for_environment
-from utils.git_utils import find_git_repositories, get_git_status, run_git_command
+from utils.git_objects import read_blob
+from utils.git_utils import (
+    FileDiff,
+    find_git_repositories,
+    get_git_status,
+    git_diff_numstat,
+    hunk_hash,
+    run_git_command,
+    split_diff_hunks,
+    stream_git_diff,
+)
+from utils.prompt_builder import PromptBuilder
 from utils.token_utils import estimate_tokens
 
 from .base import BaseTool, ToolRequest
 from .models import ToolOutput
 
+logger = logging.getLogger(__name__)
+
+# Tokens held back from the diff budget for review parameters, summaries and instructions
+PROMPT_RESERVE_TOKENS = 2_000
+
+# Omitted files listed individually in the manifest; the rest are counted
+MAX_MANIFEST_ENTRIES = 200
+
 
 class PrecommitRequest(ToolRequest):
     """Request model for precommit tool"""
@@ -47,6 +70,10 @@ class PrecommitRequest(ToolRequest):
         True,
         description="Include uncommitted (unstaged) changes in the review. Only applies if 'compare_to' is not set.",
     )
+    include_full_files: bool = Field(
+        False,
+        description="When 'compare_to' is set, also include the full content of each changed file as it was at the merge base of 'compare_to' and HEAD (the base of the diff) and as it is at HEAD, as far as the token budget allows.",
+    )
     focus_on: Optional[str] = Field(
         None,
         description="Specific aspects to focus on (e.g., 'logic for user authentication', 'database query efficiency').",
@@ -73,10 +100,26 @@ class PrecommitRequest(ToolRequest):
     )
     files: Optional[list[str]] = Field(
         None,
-        description="Optional files or directories to provide as context (must be absolute paths). These files are not part of the changes but provide helpful context like configs, docs, or related code.",
+        description="Optional files or directories to provide as context (must be absolute paths; append :START-END to a file path to include only those lines). These files are not part of the changes but provide helpful context like configs, docs, or related code.",
     )
 
 
+@dataclass
+class HunkReview:
+    """
+    Hunk bookkeeping for one precommit request.
+
+    Attributes:
+        reviewed: Hunk hashes already reviewed earlier in the conversation
+        sent: Hashes of every hunk in the diffs embedded by this request
+        unchanged: Manifest lines for diffs (or parts of diffs) not resent
+    """
+
+    reviewed: set[str] = field(default_factory=set)
+    sent: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+
+
 class Precommit(BaseTool):
     """Tool for pre-commit validation of git changes across multiple repositories."""
 
@@ -153,6 +196,11 @@ class Precommit(BaseTool):
 
     async def prepare_prompt(self, request: PrecommitRequest) -> str:
         """Prepare the prompt with git diff information."""
+        prompt_builder = await self.build_prompt(request)
+        return prompt_builder.build()
+
+    async def build_prompt(self, request: PrecommitRequest) -> PromptBuilder:
+        """Build the prompt segments with git diff information."""
         # Check for prompt.txt in files
         prompt_content, updated_files = self.handle_prompt_file(request.files)
 
@@ -180,21 +228,41 @@ class Precommit(BaseTool):
         repositories = find_git_repositories(translated_path, request.max_depth)
 
         if not repositories:
-            return "No git repositories found in the specified path."
+            return PromptBuilder().add("status", "No git repositories found in the specified path.")
 
         # Collect all diffs directly
         all_diffs = []
         repo_summaries = []
         total_tokens = 0
-        max_tokens = MAX_CONTEXT_TOKENS - 50000  # Reserve tokens for prompt and response
+        omitted_manifest = []
+
+        # A continued review only resends hunks the thread hasn't reviewed yet
+        hunk_review = HunkReview()
+        if request.continuation_id:
+            hunk_review.reviewed = get_reviewed_hunk_hashes(request.continuation_id)
+        context = current_execution_context()
+        if context is not None:
+            context.hunk_hashes = hunk_review.sent
+
+        # Diffs and context files share the selected model's content budget
+        arguments = self._execution_arguments()
+        max_tokens, budget_source = self._calculate_file_token_budget(
+            remaining_budget=arguments.get("_remaining_tokens"),
+            max_tokens=None,
+            reserve_tokens=PROMPT_RESERVE_TOKENS,
+            arguments=arguments,
+        )
+        logger.debug(f"[PRECOMMIT] Diff budget {max_tokens:,} tokens from {budget_source}")
 
-        for repo_path in repositories:
-            repo_name = os.path.basename(repo_path) or "root"
+        version_sources = []
 
+        for repo_path in repositories:
             # Get status information
             status = get_git_status(repo_path)
             changed_files = []
 
+            omitted_files = []
+
             # Process based on mode
             if request.compare_to:
                 # Validate the ref
@@ -215,81 +283,60 @@ class Precommit(BaseTool):
                 # Get list of changed files
                 success, files_output = run_git_command(
                     repo_path,
-                    ["diff", "--name-only", f"{request.compare_to}...HEAD"],
+                    ["diff", "--name-only", "-z", f"{request.compare_to}...HEAD"],
                 )
                 if success and files_output.strip():
-                    changed_files = [f for f in files_output.strip().split("\n") if f]
-
-                    # Generate per-file diffs
-                    for file_path in changed_files:
-                        success, diff = run_git_command(
-                            repo_path,
-                            [
-                                "diff",
-                                f"{request.compare_to}...HEAD",
-                                "--",
-                                file_path,
-                            ],
-                        )
-                        if success and diff.strip():
-                            # Format diff with file header
-                            diff_header = (
-                                f"\n--- BEGIN DIFF: {repo_name} / {file_path} (compare to {request.compare_to}) ---\n"
-                            )
-                            diff_footer = f"\n--- END DIFF: {repo_name} / {file_path} ---\n"
-                            formatted_diff = diff_header + diff + diff_footer
-
-                            # Check token limit
-                            diff_tokens = estimate_tokens(formatted_diff)
-                            if total_tokens + diff_tokens <= max_tokens:
-                                all_diffs.append(formatted_diff)
-                                total_tokens += diff_tokens
+                    changed_files = [f for f in files_output.split("\0") if f]
+
+                    # Stream the diffs for all changed files from one git process
+                    diffs, diff_tokens, omitted = self._collect_diffs(
+                        repo_path,
+                        ["diff", f"{request.compare_to}...HEAD"],
+                        changed_files,
+                        f"compare to {request.compare_to}",
+                        max_tokens - total_tokens,
+                        hunk_review,
+                        refs=(request.compare_to,),
+                    )
+                    all_diffs.extend(diffs)
+                    total_tokens += diff_tokens
+                    omitted_files.extend(omitted)
+                    version_sources.extend((repo_path, file_path) for file_path in changed_files)
             else:
                 # Handle staged/unstaged changes
                 staged_files = []
                 unstaged_files = []
 
                 if request.include_staged:
-                    success, files_output = run_git_command(repo_path, ["diff", "--name-only", "--cached"])
+                    success, files_output = run_git_command(repo_path, ["diff", "--name-only", "-z", "--cached"])
                     if success and files_output.strip():
-                        staged_files = [f for f in files_output.strip().split("\n") if f]
-
-                        # Generate per-file diffs for staged changes
-                        # Each diff is wrapped with clear markers to distinguish from full file content
-                        for file_path in staged_files:
-                            success, diff = run_git_command(repo_path, ["diff", "--cached", "--", file_path])
-                            if success and diff.strip():
-                                # Use "BEGIN DIFF" markers (distinct from "BEGIN FILE" markers in utils/file_utils.py)
-                                # This allows AI to distinguish between diff context vs complete file content
-                                diff_header = f"\n--- BEGIN DIFF: {repo_name} / {file_path} (staged) ---\n"
-                                diff_footer = f"\n--- END DIFF: {repo_name} / {file_path} ---\n"
-                                formatted_diff = diff_header + diff + diff_footer
-
-                                # Check token limit
-                                diff_tokens = estimate_tokens(formatted_diff)
-                                if total_tokens + diff_tokens <= max_tokens:
-                                    all_diffs.append(formatted_diff)
-                                    total_tokens += diff_tokens
+                        staged_files = [f for f in files_output.split("\0") if f]
+
+                        # Stream the diffs for all staged changes from one git process
+                        diffs, diff_tokens, omitted = self._collect_diffs(
+                            repo_path,
+                            ["diff", "--cached"],
+                            staged_files,
+                            "staged",
+                            max_tokens - total_tokens,
+                            hunk_review,
+                        )
+                        all_diffs.extend(diffs)
+                        total_tokens += diff_tokens
+                        omitted_files.extend(omitted)
 
                 if request.include_unstaged:
-                    success, files_output = run_git_command(repo_path, ["diff", "--name-only"])
+                    success, files_output = run_git_command(repo_path, ["diff", "--name-only", "-z"])
                     if success and files_output.strip():
-                        unstaged_files = [f for f in files_output.strip().split("\n") if f]
+                        unstaged_files = [f for f in files_output.split("\0") if f]
 
-                        # Generate per-file diffs for unstaged changes
                         # Same clear marker pattern as staged changes above
-                        for file_path in unstaged_files:
-                            success, diff = run_git_command(repo_path, ["diff", "--", file_path])
-                            if success and diff.strip():
-                                diff_header = f"\n--- BEGIN DIFF: {repo_name} / {file_path} (unstaged) ---\n"
-                                diff_footer = f"\n--- END DIFF: {repo_name} / {file_path} ---\n"
-                                formatted_diff = diff_header + diff + diff_footer
-
-                                # Check token limit
-                                diff_tokens = estimate_tokens(formatted_diff)
-                                if total_tokens + diff_tokens <= max_tokens:
-                                    all_diffs.append(formatted_diff)
-                                    total_tokens += diff_tokens
+                        diffs, diff_tokens, omitted = self._collect_diffs(
+                            repo_path, ["diff"], unstaged_files, "unstaged", max_tokens - total_tokens, hunk_review
+                        )
+                        all_diffs.extend(diffs)
+                        total_tokens += diff_tokens
+                        omitted_files.extend(omitted)
 
                 # Combine unique files
                 changed_files = list(set(staged_files + unstaged_files))
@@ -304,11 +351,21 @@ class Precommit(BaseTool):
                         "behind": status["behind"],
                         "changed_files": len(changed_files),
                         "files": changed_files[:20],  # First 20 for summary
+                        "omitted_files": len(omitted_files),
                     }
                 )
+            omitted_manifest.extend(omitted_files)
+
+        if not all_diffs and not omitted_manifest and not hunk_review.unchanged:
+            return PromptBuilder().add("status", "No pending changes found in any of the git repositories.")
 
-        if not all_diffs:
-            return "No pending changes found in any of the git repositories."
+        # Full before/after versions of changed files, read through the persistent cat-file workers
+        file_versions = []
+        if request.compare_to and request.include_full_files and version_sources:
+            file_versions, versions_tokens = self._collect_file_versions(
+                version_sources, request.compare_to, max_tokens - total_tokens
+            )
+            total_tokens += versions_tokens
 
         # Process context files if provided using standardized file reading
         context_files_content = []
@@ -382,6 +439,9 @@ class Precommit(BaseTool):
                     if summary["changed_files"] > len(summary["files"]):
                         prompt_parts.append(f"  ... and {summary['changed_files'] - len(summary['files'])} more files")
 
+                if summary.get("omitted_files"):
+                    prompt_parts.append(f"- Diffs omitted: {summary['omitted_files']} files (see Omitted Diffs)")
+
         # Add context files summary if provided
         if context_files_summary:
             prompt_parts.append("\n## Context Files Summary\n")
@@ -392,13 +452,63 @@ class Precommit(BaseTool):
         if total_tokens > 0:
             prompt_parts.append(f"\nTotal context tokens used: ~{total_tokens:,}")
 
+        # Add web search instruction if enabled
+        websearch_instruction = self.get_websearch_instruction(
+            request.use_websearch,
+            """When validating changes, consider if searches for these would help:
+- Best practices for new features or patterns introduced
+- Security implications of the changes
+- Known issues with libraries or APIs being used
+- Migration guides if updating dependencies
+- Performance considerations for the implemented approach""",
+        )
+
+        # Assemble the prompt as segments so diffs and context files are never copied
+        prompt_builder = PromptBuilder()
+        if websearch_instruction:
+            prompt_builder.add("instructions", websearch_instruction.lstrip("\n"))
+            prompt_builder.add("instructions", "\n\n")
+        prompt_builder.add("review_context", "\n".join(prompt_parts))
+
         # Add the diff contents with clear section markers
         # Each diff is wrapped with "--- BEGIN DIFF: ... ---" and "--- END DIFF: ... ---"
-        prompt_parts.append("\n## Git Diffs\n")
-        if all_diffs:
-            prompt_parts.extend(all_diffs)
-        else:
-            prompt_parts.append("--- NO DIFFS FOUND ---")
+        prompt_builder.add("diffs", "\n\n## Git Diffs\n")
+        for diff in all_diffs:
+            prompt_builder.add("diffs", "\n")
+            prompt_builder.add("diffs", diff)
+
+        if file_versions:
+            prompt_builder.add("files", "\n\n## Full File Versions\n")
+            prompt_builder.add(
+                "files",
+                f"Complete versions of the changed files at the merge base of {request.compare_to} and HEAD "
+                "(before, the base of the diff) and at HEAD (after).\n",
+            )
+            for version in file_versions:
+                prompt_builder.add("files", "\n")
+                prompt_builder.add("files", version)
+
+        if hunk_review.unchanged:
+            prompt_builder.add(
+                "diffs",
+                "\n\n## Previously Reviewed Changes\n\n"
+                "These changes were reviewed earlier in this conversation and have not changed since, "
+                "so their hunks are not repeated above:\n",
+            )
+            prompt_builder.add("diffs", "\n".join(f"- {entry}" for entry in hunk_review.unchanged) + "\n")
+
+        # List every changed file whose diff is not shown, so omissions are never silent
+        if omitted_manifest:
+            prompt_builder.add(
+                "diffs",
+                "\n\n## Omitted Diffs\n\n"
+                "These changed files are not shown as diffs because they did not fit the token budget "
+                "(lockfiles and generated files are packed last). Counts are changed lines from git diff --numstat:\n",
+            )
+            listed = omitted_manifest[:MAX_MANIFEST_ENTRIES]
+            prompt_builder.add("diffs", "\n".join(f"- {entry}" for entry in listed) + "\n")
+            if len(omitted_manifest) > len(listed):
+                prompt_builder.add("diffs", f"- ... and {len(omitted_manifest) - len(listed)} more files\n")
 
         # Add context files content if provided
         # IMPORTANT: Files may legitimately appear in BOTH sections:
@@ -407,43 +517,216 @@ class Precommit(BaseTool):
         # This is intentional design for comprehensive AI analysis, not duplication bug.
         # Each file in this section is wrapped with "--- BEGIN FILE: ... ---" and "--- END FILE: ... ---"
         if context_files_content:
-            prompt_parts.append("\n## Additional Context Files")
-            prompt_parts.append(
-                "The following files are provided for additional context. They have NOT been modified.\n"
+            prompt_builder.add("files", "\n\n## Additional Context Files\n")
+            prompt_builder.add(
+                "files", "The following files are provided for additional context. They have NOT been modified.\n"
             )
-            prompt_parts.extend(context_files_content)
-
-        # Add web search instruction if enabled
-        websearch_instruction = self.get_websearch_instruction(
-            request.use_websearch,
-            """When validating changes, consider if searches for these would help:
-- Best practices for new features or patterns introduced
-- Security implications of the changes
-- Known issues with libraries or APIs being used
-- Migration guides if updating dependencies
-- Performance considerations for the implemented approach""",
-        )
+            for file_content in context_files_content:
+                prompt_builder.add("files", "\n")
+                prompt_builder.add("files", file_content)
 
         # Add review instructions
-        prompt_parts.append("\n## Review Instructions\n")
-        prompt_parts.append(
+        prompt_builder.add(
+            "instructions",
+            "\n\n## Review Instructions\n\n"
             "Please review these changes according to the system prompt guidelines. "
             "Pay special attention to alignment with the original request, completeness of implementation, "
-            "potential bugs, security issues, and any edge cases not covered."
+            "potential bugs, security issues, and any edge cases not covered.",
         )
 
         # Add instruction for requesting files if needed
         if not translated_files:
-            prompt_parts.append(
-                "\nIf you need additional context files to properly review these changes "
+            prompt_builder.add(
+                "instructions",
+                "\n\nIf you need additional context files to properly review these changes "
                 "(such as configuration files, documentation, or related code), "
-                "you may request them using the standardized JSON response format."
+                "you may request them using the standardized JSON response format.",
             )
 
-        # Combine with system prompt and websearch instruction
-        full_prompt = f"{self.get_system_prompt()}{websearch_instruction}\n\n" + "\n".join(prompt_parts)
+        return prompt_builder
+
+    def _collect_diffs(
+        self,
+        repo_path: str,
+        command: list[str],
+        changed_files: list[str],
+        label: str,
+        budget: int,
+        hunk_review: HunkReview,
+        refs: tuple[str, ...] = (),
+    ) -> tuple[list[str], int, list[str]]:
+        """
+        Stream one git diff command and wrap each file's diff in markers, within a token budget.
+
+        Diffs are produced in priority order so the budget goes to regular
+        source first and to lockfiles, generated and minified files last;
+        within each group, files with fewer changed lines come first. Files
+        whose diffs don't fit are listed with their changed line counts instead.
+        Hunks in hunk_review.reviewed are dropped from the embedded diffs and
+        counted in hunk_review.unchanged.
+
+        Args:
+            repo_path: Repository to run git in
+            command: git diff command covering all changed_files
+            changed_files: Files the command reports (from --name-only)
+            label: Shown in each diff header, e.g. "staged"
+            budget: Tokens available for these diffs, including their markers
+            hunk_review: Hunks reviewed earlier; receives the hunks sent now
+            refs: Revisions named in command (part of the diff cache key)
+
+        Returns:
+            tuple: (formatted diffs, tokens used, manifest lines for the files left out)
+        """
+        repo_name = os.path.basename(repo_path) or "root"
+
+        def header(file_path: str, note: str = "") -> str:
+            # Use "BEGIN DIFF" markers (distinct from "BEGIN FILE" markers in utils/file_utils.py)
+            # This allows AI to distinguish between diff context vs complete file content
+            return f"\n--- BEGIN DIFF: {repo_name} / {file_path} ({label}{note}) ---\n"
+
+        def footer(file_path: str) -> str:
+            return f"\n--- END DIFF: {repo_name} / {file_path} ---\n"
+
+        # Pack by priority: source before lockfiles and generated code, fewest changed lines first
+        stats = {stat.path: stat for stat in git_diff_numstat(repo_path, command, changed_files, refs) or []}
+        categories = {file_path: classify_file(os.path.join(repo_path, file_path)) for file_path in changed_files}
+
+        def priority(file_path: str) -> tuple[int, int, str]:
+            stat = stats.get(file_path)
+            low_signal = categories.get(file_path) is not None
+            return (int(low_signal), stat.changed_lines if stat else 0, file_path)
+
+        order = sorted(changed_files, key=priority)
+
+        # Reserve room for the longest markers so every included diff fits once wrapped
+        overhead = max(estimate_tokens(header(f) + footer(f)) for f in changed_files) + 1
+        # Cached on repository state, so re-running on an unchanged tree skips git diff
+        stream = stream_git_diff(
+            repo_path,
+            command,
+            budget,
+            file_overhead_tokens=overhead,
+            changed_files=changed_files,
+            refs=refs,
+            order=order,
+        )
+        if not stream.success:
+            logger.warning(f"git {' '.join(command)} failed in {repo_path}: {stream.error}")
+            return [], 0, []
+
+        diffs = []
+        used = 0
+        for file_diff in stream.files:
+            if not file_diff.text.strip():
+                continue
+            diff_text, note = self._without_reviewed_hunks(repo_path, file_diff, hunk_review)
+            if diff_text is None:
+                hunk_review.unchanged.append(f"{repo_name} / {file_diff.path} ({label}){note}")
+                continue
+            formatted_diff = header(file_diff.path, note) + diff_text + footer(file_diff.path)
+            diffs.append(formatted_diff)
+            used += estimate_tokens(formatted_diff)
+
+        omitted = set(stream.truncated_files)
+        if not stream.complete:
+            # git was stopped early; files it never reached were left out too
+            included = {file_diff.path for file_diff in stream.files}
+            omitted.update(f for f in changed_files if f not in included)
+
+        # Oversized diffs degrade to --stat style summaries in the omitted-files manifest
+        manifest = []
+        for file_path in sorted(omitted, key=priority):
+            stat = stats.get(file_path)
+            summary = stat.summary() if stat else file_path
+            category = categories.get(file_path)
+            reason = f"{CLASSIFICATION_REASONS[category]}, " if category else ""
+            manifest.append(f"{repo_name} / {summary} ({label}; {reason}did not fit the diff budget)")
+        return diffs, used, manifest
+
+    @staticmethod
+    def _collect_file_versions(sources: list[tuple[str, str]], compare_to: str, budget: int) -> tuple[list[str], int]:
+        """
+        Read changed files at the base of the diff and at HEAD, within a token budget.
+
+        The diff is ``compare_to...HEAD``, so the "before" version is read at the
+        merge base of compare_to and HEAD, resolved once per repository; reading
+        at the compare_to tip would mix in upstream changes the diff doesn't show.
+        Blobs are read through the pooled ``git cat-file --batch`` workers, so
+        this costs no process per file. A file's versions are included only if
+        all of them fit. A side that can't be read (the file was added or
+        deleted, is binary, or is too large) is left out, and the remaining
+        version is labelled as the only one shown.
+
+        Args:
+            sources: (repository, path) of each changed file
+            compare_to: The ref being compared against
+            budget: Tokens available
+
+        Returns:
+            tuple: (formatted file versions, tokens used)
+        """
+        versions = []
+        used = 0
+        merge_bases: dict[str, Optional[str]] = {}
+        for repo_path, file_path in sources:
+            remaining = budget - used
+            if remaining <= 0:
+                break
+            if repo_path not in merge_bases:
+                success, output = run_git_command(repo_path, ["merge-base", compare_to, "HEAD"])
+                merge_bases[repo_path] = output.strip() if success and output.strip() else None
+            merge_base = merge_bases[repo_path]
+            if merge_base is None:
+                # No common history: nothing in the diff has a "before" version to show
+                continue
 
-        return full_prompt
+            repo_name = os.path.basename(repo_path) or "root"
+            sides = [
+                (merge_base, f"merge base of {compare_to} ({merge_base[:12]})", "before"),
+                ("HEAD", "HEAD", "after"),
+            ]
+            contents = [read_blob(repo_path, ref, file_path, max_bytes=remaining * 4) for ref, _, _ in sides]
+            pair = []
+            for (_, ref_label, label), content, other in zip(sides, contents, reversed(contents)):
+                if content is None:
+                    continue
+                if other is None:
+                    missing = "after" if label == "before" else "before"
+                    label += f" only; the {missing} version is absent, binary or too large"
+                pair.append(
+                    f"--- BEGIN FILE: {repo_name} / {file_path} @ {ref_label} ({label}) ---\n"
+                    f"{content}\n--- END FILE: {repo_name} / {file_path} @ {ref_label} ---\n"
+                )
+            tokens = sum(estimate_tokens(version) for version in pair)
+            if pair and tokens <= remaining:
+                versions.extend(pair)
+                used += tokens
+        return versions, used
+
+    @staticmethod
+    def _without_reviewed_hunks(
+        repo_path: str, file_diff: FileDiff, hunk_review: HunkReview
+    ) -> tuple[Optional[str], str]:
+        """
+        Drop the hunks of a file diff that were already reviewed.
+
+        Returns:
+            tuple: (diff text to embed, or None if every hunk was reviewed; note for the header or manifest)
+        """
+        diff_header, hunks = split_diff_hunks(file_diff.text)
+        if not hunks:
+            # Binary or mode-only change: the section itself is the unit of review
+            diff_header, hunks = "", [file_diff.text]
+        hashes = [hunk_hash(repo_path, file_diff.path, hunk) for hunk in hunks]
+        hunk_review.sent.extend(hashes)
+
+        new_hunks = [hunk for hunk, digest in zip(hunks, hashes) if digest not in hunk_review.reviewed]
+        reviewed = len(hunks) - len(new_hunks)
+        if not reviewed:
+            return file_diff.text, ""
+        if not new_hunks:
+            return None, f": {reviewed} hunk{'s' if reviewed != 1 else ''}"
+        return diff_header + "".join(new_hunks), f"; new or changed hunks only, {reviewed} already reviewed"
 
     def format_response(self, response: str, request: PrecommitRequest, model_info: Optional[dict] = None) -> str:
         """Format the response with commit guidance"""
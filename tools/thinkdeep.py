@@ -9,6 +9,7 @@ from pydantic import Field
 
 from config import TEMPERATURE_CREATIVE
 from prompts import THINKDEEP_PROMPT
+from utils.prompt_builder import PromptBuilder
 
 from .base import BaseTool, ToolRequest
 from .models import ToolOutput
@@ -25,7 +26,7 @@ class ThinkDeepRequest(ToolRequest):
     )
     files: Optional[list[str]] = Field(
         None,
-        description="Optional file paths or directories for additional context (must be absolute paths)",
+        description="Optional file paths or directories for additional context (must be absolute paths; append :START-END to a file path to include only those lines)",
     )
 
 
@@ -70,7 +71,7 @@ class ThinkDeepTool(BaseTool):
                 "files": {
                     "type": "array",
                     "items": {"type": "string"},
-                    "description": "Optional file paths or directories for additional context (must be absolute paths)",
+                    "description": "Optional file paths or directories for additional context (must be absolute paths; append :START-END to a file path to include only those lines)",
                 },
                 "temperature": {
                     "type": "number",
@@ -92,6 +93,11 @@ class ThinkDeepTool(BaseTool):
                     "type": "string",
                     "description": "Thread continuation ID for multi-turn conversations. Can be used to continue conversations across different tools. Only provide this if continuing a previous conversation thread.",
                 },
+                "deadline_seconds": {
+                    "type": "number",
+                    "description": "Maximum seconds this request may take before it is abandoned (defaults to the server's deadline for this tool)",
+                    "exclusiveMinimum": 0,
+                },
             },
             "required": ["prompt"] + (["model"] if IS_AUTO_MODE else []),
         }
@@ -129,6 +135,11 @@ class ThinkDeepTool(BaseTool):
 
     async def prepare_prompt(self, request: ThinkDeepRequest) -> str:
         """Prepare the full prompt for extended thinking"""
+        prompt_builder = await self.build_prompt(request)
+        return prompt_builder.build()
+
+    async def build_prompt(self, request: ThinkDeepRequest) -> PromptBuilder:
+        """Build the prompt segments for extended thinking"""
         # Check for prompt.txt in files
         prompt_content, updated_files = self.handle_prompt_file(request.files)
 
@@ -139,31 +150,11 @@ class ThinkDeepTool(BaseTool):
         if updated_files is not None:
             request.files = updated_files
 
-        # Build context parts
-        context_parts = [f"=== CLAUDE'S CURRENT ANALYSIS ===\n{current_analysis}\n=== END ANALYSIS ==="]
-
-        if request.problem_context:
-            context_parts.append(f"\n=== PROBLEM CONTEXT ===\n{request.problem_context}\n=== END CONTEXT ===")
-
-        # Add reference files if provided
-        if request.files:
-            # Use centralized file processing logic
-            continuation_id = getattr(request, "continuation_id", None)
-            file_content = self._prepare_file_content_for_prompt(request.files, continuation_id, "Reference files")
-
-            if file_content:
-                context_parts.append(f"\n=== REFERENCE FILES ===\n{file_content}\n=== END FILES ===")
-
-        full_context = "\n".join(context_parts)
-
-        # Check token limits
-        self._validate_token_limit(full_context, "Context")
-
         # Add focus areas instruction if specified
         focus_instruction = ""
         if request.focus_areas:
             areas = ", ".join(request.focus_areas)
-            focus_instruction = f"\n\nFOCUS AREAS: Please pay special attention to {areas} aspects."
+            focus_instruction = f"FOCUS AREAS: Please pay special attention to {areas} aspects."
 
         # Add web search instruction if enabled
         websearch_instruction = self.get_websearch_instruction(
@@ -175,19 +166,53 @@ class ThinkDeepTool(BaseTool):
 - Official sources to verify assumptions or clarify technical details""",
         )
 
-        # Combine system prompt with context
-        full_prompt = f"""{self.get_system_prompt()}{focus_instruction}{websearch_instruction}
+        prompt_builder = PromptBuilder()
+        if focus_instruction:
+            prompt_builder.add("instructions", focus_instruction)
+        if websearch_instruction:
+            prompt_builder.add(
+                "instructions", websearch_instruction if focus_instruction else websearch_instruction.lstrip("\n")
+            )
+        if focus_instruction or websearch_instruction:
+            prompt_builder.add("instructions", "\n\n")
+
+        # Build context parts
+        prompt_builder.add("user_request", "=== CLAUDE'S CURRENT ANALYSIS ===\n")
+        prompt_builder.add("user_request", current_analysis)
+        prompt_builder.add("user_request", "\n=== END ANALYSIS ===")
+
+        if request.problem_context:
+            prompt_builder.add("problem_context", "\n\n=== PROBLEM CONTEXT ===\n")
+            prompt_builder.add("problem_context", request.problem_context)
+            prompt_builder.add("problem_context", "\n=== END CONTEXT ===")
+
+        # Add reference files if provided
+        if request.files:
+            # Use centralized file processing logic
+            continuation_id = getattr(request, "continuation_id", None)
+            file_content = self._prepare_file_content_for_prompt(request.files, continuation_id, "Reference files")
+
+            if file_content:
+                prompt_builder.add("files", "\n\n=== REFERENCE FILES ===\n")
+                prompt_builder.add("files", file_content)
+                prompt_builder.add("files", "\n=== END FILES ===")
+
+        # Check token limits
+        self._validate_token_limit(prompt_builder, "Context")
 
-{full_context}
+        prompt_builder.add(
+            "instructions",
+            """
 
 Please provide deep analysis that extends Claude's thinking with:
 1. Alternative approaches and solutions
 2. Edge cases and potential failure modes
 3. Critical evaluation of assumptions
 4. Concrete implementation suggestions
-5. Risk assessment and mitigation strategies"""
+5. Risk assessment and mitigation strategies""",
+        )
 
-        return full_prompt
+        return prompt_builder
 
     def format_response(self, response: str, request: ThinkDeepRequest, model_info: Optional[dict] = None) -> str:
         """Format the response with clear attribution and critical thinking prompt"""
@@ -46,6 +46,8 @@ USAGE EXAMPLE:
 This enables true AI-to-AI collaboration across the entire tool ecosystem.
 """
 
+import difflib
+import hashlib
 import logging
 import os
 import uuid
@@ -54,10 +56,16 @@ from typing import Any, Optional
 
 from pydantic import BaseModel
 
+from .execution_context import check_cancelled
+
 logger = logging.getLogger(__name__)
 
 # Configuration constants
 MAX_CONVERSATION_TURNS = 10  # Maximum turns allowed per conversation thread
+HISTORY_FRAME_TOKENS = 500  # Headers and instructions wrapped around the conversation history
+HISTORY_ITEM_OVERHEAD_TOKENS = 50  # Delimiters added around each embedded file or turn
+CONTENT_SNAPSHOT_MAX_BYTES = 1_000_000  # Larger files are not snapshotted and are always re-embedded in full
+CONTENT_SNAPSHOT_TTL_SECONDS = 3600  # Snapshots live as long as the threads that reference them
 
 
 class ConversationTurn(BaseModel):
@@ -76,6 +84,8 @@ class ConversationTurn(BaseModel):
         model_provider: Provider used (e.g., "google", "openai")
         model_name: Specific model used (e.g., "gemini-2.5-flash-preview-05-20", "o3-mini")
         model_metadata: Additional model-specific metadata (e.g., thinking mode, token usage)
+        file_hashes: Content hashes of the files as embedded in this turn, keyed by path
+        hunk_hashes: Hashes of the diff hunks reviewed in this turn (see utils.git_utils.hunk_hash)
     """
 
     role: str  # "user" or "assistant"
@@ -86,6 +96,8 @@ class ConversationTurn(BaseModel):
     model_provider: Optional[str] = None  # Model provider (google, openai, etc)
     model_name: Optional[str] = None  # Specific model used
     model_metadata: Optional[dict[str, Any]] = None  # Additional model info
+    file_hashes: Optional[dict[str, str]] = None  # SHA-256 of each embedded file, see store_file_snapshot()
+    hunk_hashes: Optional[list[str]] = None  # Diff hunks reviewed in this turn (precommit)
 
 
 class ThreadContext(BaseModel):
@@ -189,6 +201,37 @@ def create_thread(tool_name: str, initial_request: dict[str, Any], parent_thread
     return thread_id
 
 
+def fork_thread(thread_id: str) -> Optional[str]:
+    """
+    Copy a thread, with all its turns, under a new thread ID.
+
+    Used when one response is handed to several independent callers (see
+    server.mark_coalesced): each gets its own copy, so their follow-ups don't
+    interleave in one thread.
+
+    Args:
+        thread_id: UUID of the thread to copy
+
+    Returns:
+        Optional[str]: UUID of the copy, or None if the thread doesn't exist or storage failed
+    """
+    context = get_thread(thread_id)
+    if context is None:
+        return None
+
+    now = datetime.now(timezone.utc).isoformat()
+    fork = context.model_copy(update={"thread_id": str(uuid.uuid4()), "created_at": now, "last_updated_at": now})
+    try:
+        client = get_redis_client()
+        client.setex(f"thread:{fork.thread_id}", 3600, fork.model_dump_json())
+    except Exception as e:
+        logger.debug(f"[THREAD] Failed to fork thread {thread_id}: {type(e).__name__}")
+        return None
+
+    logger.debug(f"[THREAD] Forked thread {thread_id} as {fork.thread_id}")
+    return fork.thread_id
+
+
 def get_thread(thread_id: str) -> Optional[ThreadContext]:
     """
     Retrieve thread context from Redis
@@ -234,6 +277,8 @@ def add_turn(
     model_provider: Optional[str] = None,
     model_name: Optional[str] = None,
     model_metadata: Optional[dict[str, Any]] = None,
+    file_hashes: Optional[dict[str, str]] = None,
+    hunk_hashes: Optional[list[str]] = None,
 ) -> bool:
     """
     Add turn to existing thread
@@ -251,6 +296,8 @@ def add_turn(
         model_provider: Provider used (e.g., "google", "openai")
         model_name: Specific model used (e.g., "gemini-2.5-flash-preview-05-20", "o3-mini")
         model_metadata: Additional model info (e.g., thinking mode, token usage)
+        file_hashes: Optional content hashes of the embedded files (see store_file_snapshot)
+        hunk_hashes: Optional hashes of the diff hunks reviewed in this turn
 
     Returns:
         bool: True if turn was successfully added, False otherwise
@@ -288,6 +335,8 @@ def add_turn(
         model_provider=model_provider,  # Track model provider
         model_name=model_name,  # Track specific model
         model_metadata=model_metadata,  # Additional model info
+        file_hashes=file_hashes,  # Lets later turns detect and diff changed files
+        hunk_hashes=hunk_hashes,  # Lets later reviews skip hunks already reviewed
     )
 
     context.turns.append(turn)
@@ -304,6 +353,54 @@ def add_turn(
         return False
 
 
+def store_file_snapshot(content: str) -> Optional[str]:
+    """
+    Keep a copy of embedded file content in the content-addressed store.
+
+    read_files calls this for every file it embeds in full, so that a later
+    turn can tell which files changed since and show the change as a diff
+    against exactly what the model saw. Content is stored under its SHA-256
+    with the same TTL as threads; content that is already stored only has its
+    TTL refreshed, so unchanged files aren't uploaded again.
+
+    Args:
+        content: File content as embedded in the prompt
+
+    Returns:
+        Optional[str]: SHA-256 hex digest of the content, or None if it couldn't be stored
+    """
+    if len(content) > CONTENT_SNAPSHOT_MAX_BYTES:
+        return None
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    key = f"content:{content_hash}"
+    try:
+        client = get_redis_client()
+        if not client.expire(key, CONTENT_SNAPSHOT_TTL_SECONDS):
+            client.setex(key, CONTENT_SNAPSHOT_TTL_SECONDS, content)
+    except Exception as e:
+        logger.debug(f"[FILES] Failed to store file snapshot: {type(e).__name__}")
+        return None
+    return content_hash
+
+
+def load_file_snapshot(content_hash: str) -> Optional[str]:
+    """
+    Retrieve file content stored by store_file_snapshot.
+
+    Args:
+        content_hash: SHA-256 hex digest of the content
+
+    Returns:
+        Optional[str]: The stored content, or None if it expired or storage is unavailable
+    """
+    try:
+        client = get_redis_client()
+        data = client.get(f"content:{content_hash}")
+    except Exception:
+        return None
+    return data if isinstance(data, str) else None
+
+
 def get_thread_chain(thread_id: str, max_depth: int = 20) -> list[ThreadContext]:
     """
     Traverse the parent chain to get all threads in conversation sequence.
@@ -387,7 +484,173 @@ def get_conversation_file_list(context: ThreadContext) -> list[str]:
     return unique_files
 
 
-def build_conversation_history(context: ThreadContext, model_context=None, read_files_func=None) -> tuple[str, int]:
+def _collect_thread_turns_and_files(context: ThreadContext) -> tuple[list[ConversationTurn], list[str]]:
+    """
+    Collect turns and referenced files across the thread's parent chain.
+
+    Args:
+        context: ThreadContext of the thread being continued
+
+    Returns:
+        tuple[list[ConversationTurn], list[str]]: (all turns in order, unique files referenced)
+    """
+    if context.parent_thread_id:
+        # This thread has a parent, get the full chain
+        chain = get_thread_chain(context.thread_id)
+
+        # Collect all turns from all threads in chain
+        all_turns = []
+        all_files_set = set()
+        total_turns = 0
+
+        for thread in chain:
+            all_turns.extend(thread.turns)
+            total_turns += len(thread.turns)
+
+            # Collect files from this thread
+            for turn in thread.turns:
+                if turn.files:
+                    all_files_set.update(turn.files)
+
+        all_files = list(all_files_set)
+        logger.debug(f"[THREAD] Built history from {len(chain)} threads with {total_turns} total turns")
+    else:
+        # Single thread, no parent chain
+        all_turns = context.turns
+        all_files = get_conversation_file_list(context)
+
+    return all_turns, all_files
+
+
+def get_reviewed_hunk_hashes(thread_id: str) -> set[str]:
+    """
+    Collect the diff hunks reviewed anywhere in a thread and its parent chain.
+
+    Args:
+        thread_id: Thread being continued
+
+    Returns:
+        set[str]: Hunk hashes recorded by earlier turns (empty if the thread is gone)
+    """
+    context = get_thread(thread_id)
+    if not context:
+        return set()
+    turns, _ = _collect_thread_turns_and_files(context)
+    return {hunk for turn in turns for hunk in (turn.hunk_hashes or [])}
+
+
+def _latest_file_hashes(turns: list[ConversationTurn]) -> dict[str, tuple[str, int]]:
+    """Map each file to the content hash and turn number of the most recent turn that recorded it."""
+    latest = {}
+    for turn_number, turn in enumerate(turns, start=1):
+        for file_path, content_hash in (turn.file_hashes or {}).items():
+            latest[file_path] = (content_hash, turn_number)
+    return latest
+
+
+def _expand_directory_entries(file_paths: list[str]) -> list[str]:
+    """Replace directory entries with the files read_files expands them to, keeping order and dropping duplicates."""
+    from utils.file_utils import expand_paths
+
+    expanded = []
+    for file_path in file_paths:
+        if os.path.isdir(file_path):
+            expanded.extend(expand_paths([file_path]))
+        else:
+            expanded.append(file_path)
+    return list(dict.fromkeys(expanded))
+
+
+def _read_changed_file(file_path: str, content_hash: str, turn_number: int) -> Optional[tuple[str, int]]:
+    """
+    Format a file that changed since a turn as a unified diff against the version embedded then.
+
+    The diff shows exactly what was edited since the model saw the file, at a
+    fraction of the cost of embedding the new version.
+
+    Args:
+        file_path: File recorded in an earlier turn
+        content_hash: Hash of the content embedded in that turn
+        turn_number: Turn that recorded the hash
+
+    Returns:
+        Optional[tuple[str, int]]: (formatted_content, estimated_tokens), or None if the
+        file is unchanged, or if it should be embedded in full because the snapshot is
+        gone, the file can't be read or the diff costs more than the file itself
+    """
+    from utils.file_utils import file_content_hash, read_file_bytes
+    from utils.token_utils import estimate_tokens
+
+    # The workspace index answers this without reading files that haven't changed
+    if file_content_hash(file_path, CONTENT_SNAPSHOT_MAX_BYTES) in (None, content_hash):
+        return None
+    current = read_file_bytes(file_path, CONTENT_SNAPSHOT_MAX_BYTES)
+    if current is None:
+        return None
+    current_text = current.decode("utf-8", "replace")
+    if hashlib.sha256(current_text.encode("utf-8")).hexdigest() == content_hash:
+        # Same text as embedded; only bytes lost in decoding differ
+        return None
+    previous = load_file_snapshot(content_hash)
+    if previous is None:
+        logger.debug(f"[FILES] Snapshot of {file_path} from turn {turn_number} expired - embedding in full")
+        return None
+
+    diff_lines = difflib.unified_diff(
+        previous.splitlines(keepends=True),
+        current_text.splitlines(keepends=True),
+        fromfile=f"{file_path} (turn {turn_number})",
+        tofile=f"{file_path} (current)",
+    )
+    diff = "".join(line if line.endswith("\n") else line + "\n" for line in diff_lines)
+    formatted = (
+        f"\n--- CHANGES SINCE TURN {turn_number}: {file_path} ---\n"
+        f"Edited since it was embedded in full in turn {turn_number}; diff against that version:\n{diff}"
+        f"--- END CHANGES: {file_path} ---\n"
+    )
+    if len(formatted) >= len(current_text):
+        # Rewritten rather than edited; the new version alone is cheaper
+        return None
+
+    logger.debug(f"[FILES] {file_path} changed since turn {turn_number} - embedding a {len(diff):,} char diff")
+    return formatted, estimate_tokens(formatted)
+
+
+def estimate_history_demand(context: ThreadContext, model_context) -> int:
+    """
+    Estimate the tokens needed to embed the complete conversation history.
+
+    The estimate is deliberately generous - file sizes come from stat() and are
+    measured with the same conservative ratio that build_conversation_history
+    uses for its turn budget, plus per-file and per-turn formatting overhead.
+    Overestimating only means the unused part is handed back once the history
+    has been built (see TokenBudgetPlan.settle).
+
+    Args:
+        context: ThreadContext of the thread being continued
+        model_context: ModelContext used for token estimation
+
+    Returns:
+        int: Estimated tokens for history files and turns
+    """
+    all_turns, all_files = _collect_thread_turns_and_files(context)
+    if not all_turns:
+        return 0
+
+    demand = HISTORY_FRAME_TOKENS
+    for file_path in all_files:
+        try:
+            demand += os.path.getsize(file_path) // 3 + HISTORY_ITEM_OVERHEAD_TOKENS
+        except OSError:
+            continue
+    for turn in all_turns:
+        demand += model_context.estimate_tokens(turn.content) + HISTORY_ITEM_OVERHEAD_TOKENS
+    return demand
+
+
+def build_conversation_history(
+    context: ThreadContext, model_context=None, read_files_func=None, budget_plan=None
+) -> tuple[str, int]:
     """
     Build formatted conversation history for tool prompts with embedded file contents.
 
@@ -403,6 +666,9 @@ def build_conversation_history(context: ThreadContext, model_context=None, read_
         context: ThreadContext containing the complete conversation
         model_context: ModelContext for token allocation (optional, uses DEFAULT_MODEL if not provided)
         read_files_func: Optional function to read files (for testing)
+        budget_plan: Optional TokenBudgetPlan; its "history" allocation bounds the
+            history (files and turns). Without a plan the model's baseline history
+            share is used.
 
     Returns:
         tuple[str, int]: (formatted_conversation_history, total_tokens_used)
@@ -421,31 +687,8 @@ def build_conversation_history(context: ThreadContext, model_context=None, read_
         while preventing duplicate file embeddings.
     """
     # Get the complete thread chain
-    if context.parent_thread_id:
-        # This thread has a parent, get the full chain
-        chain = get_thread_chain(context.thread_id)
-
-        # Collect all turns from all threads in chain
-        all_turns = []
-        all_files_set = set()
-        total_turns = 0
-
-        for thread in chain:
-            all_turns.extend(thread.turns)
-            total_turns += len(thread.turns)
-
-            # Collect files from this thread
-            for turn in thread.turns:
-                if turn.files:
-                    all_files_set.update(turn.files)
-
-        all_files = list(all_files_set)
-        logger.debug(f"[THREAD] Built history from {len(chain)} threads with {total_turns} total turns")
-    else:
-        # Single thread, no parent chain
-        all_turns = context.turns
-        total_turns = len(context.turns)
-        all_files = get_conversation_file_list(context)
+    all_turns, all_files = _collect_thread_turns_and_files(context)
+    total_turns = len(all_turns)
 
     if not all_turns:
         return "", 0
@@ -468,9 +711,15 @@ def build_conversation_history(context: ThreadContext, model_context=None, read_
 
         model_context = ModelContext(model_name)
 
-    token_allocation = model_context.calculate_token_allocation()
-    max_file_tokens = token_allocation.file_tokens
-    max_history_tokens = token_allocation.history_tokens
+    if budget_plan is None:
+        from utils.model_context import plan_token_budget
+
+        # Nothing is known about the new request, so history keeps its baseline share
+        budget_plan = plan_token_budget(model_context.calculate_token_allocation(), {})
+
+    # History files and turns share the history allocation
+    max_history_tokens = budget_plan.allocation("history")
+    max_file_tokens = max_history_tokens
 
     logger.debug(f"[HISTORY] Using model-specific limits for {model_context.model_name}:")
     logger.debug(f"[HISTORY]   Max file tokens: {max_file_tokens:,}")
@@ -498,19 +747,28 @@ def build_conversation_history(context: ThreadContext, model_context=None, read_
         )
 
         if read_files_func is None:
-            from utils.file_utils import read_file_content
+            from utils.file_utils import read_file_entry, read_file_outline
 
             # Optimized: read files incrementally with token tracking
             file_contents = []
             total_tokens = 0
             files_included = 0
             files_truncated = 0
+            recorded_hashes = _latest_file_hashes(all_turns)
 
-            for file_path in all_files:
+            # Hashes are recorded per file, so directory entries are looked up by the files inside them
+            for file_path in _expand_directory_entries(all_files):
+                check_cancelled()
                 try:
                     logger.debug(f"[FILES] Processing file {file_path}")
+                    # Files edited since they were embedded are shown as a diff against that version
+                    changed = (
+                        _read_changed_file(file_path, *recorded_hashes[file_path])
+                        if file_path in recorded_hashes
+                        else None
+                    )
                     # Correctly unpack the tuple returned by read_file_content
-                    formatted_content, content_tokens = read_file_content(file_path)
+                    formatted_content, content_tokens = changed or read_file_entry(file_path)
                     if formatted_content:
                         # read_file_content already returns formatted content, use it directly
                         # Check if adding this file would exceed the limit
@@ -525,6 +783,18 @@ def build_conversation_history(context: ThreadContext, model_context=None, read_
                                 f"[FILES] Successfully embedded {file_path} - {content_tokens:,} tokens (total: {total_tokens:,})"
                             )
                         else:
+                            # Degrade to an outline; if even that doesn't fit, keep going with smaller files
+                            outline_content, outline_tokens = read_file_outline(
+                                file_path,
+                                f"The full file (~{content_tokens:,} tokens) does not fit the conversation history budget",
+                            )
+                            if outline_content and total_tokens + outline_tokens <= max_file_tokens:
+                                file_contents.append(outline_content)
+                                total_tokens += outline_tokens
+                                files_included += 1
+                                logger.debug(f"[FILES] Embedded outline of {file_path} - {outline_tokens:,} tokens")
+                                continue
+
                             files_truncated += 1
                             logger.debug(
                                 f"File truncated due to token limit: {file_path} ({content_tokens:,} tokens, would exceed {max_file_tokens:,} limit)"
@@ -532,8 +802,6 @@ def build_conversation_history(context: ThreadContext, model_context=None, read_
                             logger.debug(
                                 f"[FILES] File {file_path} would exceed token limit - skipping (would be {total_tokens + content_tokens:,} tokens)"
                             )
-                            # Stop processing more files
-                            break
                     else:
                         logger.debug(f"File skipped (empty content): {file_path}")
                         logger.debug(f"[FILES] File {file_path} has empty content - skipping")
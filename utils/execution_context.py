@@ -0,0 +1,143 @@
+"""
+Per-invocation state for tool executions
+
+server.py registers one instance of each tool and every call runs on that
+instance, so state derived from a single request (its arguments, the model it
+selected, the token accounting) can't live on ``self``: two concurrent calls to
+the same tool would overwrite each other's budgets. Instead ``BaseTool.execute``
+creates an ExecutionContext and activates it in a context variable. The
+helpers it calls (prompt preparation, file embedding, response parsing) read
+it back with current_execution_context().
+
+Each asyncio task starts with a copy of its parent's context variables, and the
+MCP server handles every request in its own task, so concurrent calls each see
+only their own context.
+
+A context also carries the request's deadline and cancellation flag. server.py
+opens a context when a call arrives, before thread reconstruction, and the
+tool's own context inherits both. Long-running work polls check_cancelled() and
+bounds its waits with time_remaining(): file ingestion checks between files,
+git subprocesses are killed, and provider calls time out at the deadline.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from .token_accounting import TokenAccounting
+
+
+class RequestCancelledError(Exception):
+    """Raised inside a tool invocation whose request was cancelled by the client."""
+
+
+class DeadlineExceededError(RequestCancelledError, TimeoutError):
+    """Raised inside a tool invocation that ran past its deadline."""
+
+
+@dataclass
+class ExecutionContext:
+    """
+    State for one tool invocation.
+
+    Attributes:
+        tool_name: Tool being executed
+        arguments: Raw arguments passed to ``execute``, including the private
+            ``_model_context``/``_remaining_tokens`` entries added by server.py
+        model_name: Model selected for the request, once resolved
+        has_embedded_history: Whether the prompt already carries conversation history
+        token_accounting: Where this request's token budget goes
+        hunk_hashes: Diff hunks sent for review, recorded on the conversation turn
+        file_hashes: Content hashes of the files embedded in full, keyed by path,
+            recorded on the conversation turn
+        deadline: time.monotonic() value after which the request is abandoned, if any
+        cancel_event: Set when the request is cancelled; shared with inheriting contexts
+    """
+
+    tool_name: str
+    arguments: dict[str, Any] = field(default_factory=dict)
+    model_name: Optional[str] = None
+    has_embedded_history: bool = False
+    token_accounting: TokenAccounting = field(default_factory=TokenAccounting)
+    hunk_hashes: Optional[list[str]] = None
+    file_hashes: dict[str, str] = field(default_factory=dict)
+    deadline: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """Ask the work running under this context (and contexts inheriting it) to stop."""
+        self.cancel_event.set()
+
+    def time_remaining(self) -> Optional[float]:
+        """Seconds until the deadline (never negative), or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self) -> None:
+        """
+        Raise if the request was cancelled or its deadline has passed.
+
+        Raises:
+            RequestCancelledError: If the request was cancelled
+            DeadlineExceededError: If the deadline has passed
+        """
+        if self.cancelled:
+            raise RequestCancelledError(f"{self.tool_name} request was cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceededError(f"{self.tool_name} request exceeded its deadline")
+
+
+_current: ContextVar[Optional[ExecutionContext]] = ContextVar("zen_execution_context", default=None)
+
+
+def current_execution_context() -> Optional[ExecutionContext]:
+    """Return the context of the tool invocation running in this task, if any."""
+    return _current.get()
+
+
+def check_cancelled() -> None:
+    """Raise if the invocation running in this task was cancelled or is past its deadline."""
+    context = _current.get()
+    if context is not None:
+        context.check()
+
+
+def time_remaining(limit: Optional[float] = None) -> Optional[float]:
+    """
+    Bound a wait by the running invocation's deadline.
+
+    Args:
+        limit: The wait's own limit in seconds, or None
+
+    Returns:
+        Optional[float]: The smaller of limit and the time left, or None if neither applies
+    """
+    context = _current.get()
+    remaining = context.time_remaining() if context is not None else None
+    if remaining is None:
+        return limit
+    return remaining if limit is None else min(limit, remaining)
+
+
+@contextmanager
+def execution_context(context: ExecutionContext) -> Iterator[ExecutionContext]:
+    """
+    Activate a context for the duration of a tool invocation.
+
+    Args:
+        context: Context to activate; the previous one is restored on exit
+    """
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
@@ -0,0 +1,195 @@
+"""
+Per-file caches validated by stat signature or by the file watcher
+
+A FileCache maps a file (and an optional variant, e.g. the size limit it was
+read with) to a value derived from its content. Each entry remembers the
+file's stat signature from before the value was computed. A lookup compares it
+with a fresh stat, unless the entry was stored while the file watcher covered
+the file's directory; then the watcher's queued events are drained instead and
+the entry stays valid until an event for the file invalidates it.
+
+Files modified within RACY_WINDOW_SECONDS of being signed are not cached under
+stat validation: on coarse-timestamp filesystems a second write in the same
+tick would keep size and mtime unchanged and go unnoticed.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .file_watcher import FileWatcher, add_invalidation_listener, get_file_watcher
+
+# Modifications this recent can't be detected reliably by comparing stat results
+RACY_WINDOW_SECONDS = 2.0
+
+
+@dataclass(frozen=True)
+class FileSignature:
+    """stat() fields that change when a file is modified, plus the watcher that covered it."""
+
+    mtime_ns: int
+    size: int
+    inode: int
+    ctime_ns: int
+    watcher: Optional[FileWatcher]
+
+    def matches(self, other: "FileSignature") -> bool:
+        return (self.mtime_ns, self.size, self.inode, self.ctime_ns) == (
+            other.mtime_ns,
+            other.size,
+            other.inode,
+            other.ctime_ns,
+        )
+
+
+def file_signature(path: str) -> Optional[FileSignature]:
+    """
+    Sign a file before reading it.
+
+    Args:
+        path: Resolved file path
+
+    Returns:
+        Optional[FileSignature]: The signature, or None if the file can't be stat'ed
+    """
+    watcher = get_file_watcher()
+    covering = watcher if watcher is not None and watcher.covers(path) else None
+    if covering is not None:
+        # Consume events from before the signature so they don't invalidate the new entry
+        covering.drain()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return FileSignature(stat.st_mtime_ns, stat.st_size, stat.st_ino, stat.st_ctime_ns, covering)
+
+
+@dataclass
+class _Entry:
+    signature: FileSignature
+    value: Any
+    weight: int
+
+
+class FileCache:
+    """
+    Bounded LRU of values derived from file contents.
+
+    Args:
+        name: Name used in stats
+        max_entries: Maximum number of entries
+        max_weight: Maximum total weight (e.g. characters of cached content), or None
+    """
+
+    def __init__(self, name: str, max_entries: int = 4096, max_weight: Optional[int] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, Hashable], _Entry] = OrderedDict()
+        self._variants: dict[str, set[Hashable]] = {}
+        self._weight = 0
+        self._lock = threading.Lock()
+        add_invalidation_listener(self._on_change)
+
+    def lookup(self, path: str, variant: Hashable = None) -> Optional[Any]:
+        """
+        Return the cached value for a file if it is still valid.
+
+        Args:
+            path: Resolved file path
+            variant: Distinguishes values derived differently from the same file
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss
+        """
+        key = (path, variant)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        watcher = entry.signature.watcher
+        if watcher is not None and watcher is get_file_watcher() and watcher.covers(path):
+            # Apply pending change events, which may invalidate this entry
+            watcher.drain()
+            valid = key in self._entries
+        else:
+            current = file_signature(path)
+            valid = current is not None and current.matches(entry.signature)
+
+        with self._lock:
+            current_entry = self._entries.get(key)
+            if not valid:
+                # Leave a fresher entry stored concurrently in place
+                if current_entry is entry:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            if current_entry is not None:
+                self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def store(self, path: str, variant: Hashable, value: Any, signature: Optional[FileSignature], weight: int = 0):
+        """
+        Cache a value computed after taking signature.
+
+        Args:
+            path: Resolved file path
+            variant: See lookup()
+            value: Value to cache
+            signature: Signature from file_signature() taken before the value was computed
+            weight: Cost counted against max_weight
+        """
+        if signature is None:
+            return
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        if signature.watcher is None and time.time_ns() - signature.mtime_ns < RACY_WINDOW_SECONDS * 1e9:
+            return
+
+        key = (path, variant)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(signature, value, weight)
+            self._variants.setdefault(path, set()).add(variant)
+            self._weight += weight
+            while len(self._entries) > self.max_entries or (
+                self.max_weight is not None and self._weight > self.max_weight
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop the entries for a file, or every entry if path is None."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._variants.clear()
+                self._weight = 0
+                return
+            for variant in list(self._variants.get(path, ())):
+                self._remove((path, variant))
+
+    def stats(self) -> dict[str, int]:
+        """Entry count, total weight and hit/miss counters."""
+        return {"entries": len(self._entries), "weight": self._weight, "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, key: tuple[str, Hashable]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._weight -= entry.weight
+        variants = self._variants.get(key[0])
+        if variants is not None:
+            variants.discard(key[1])
+            if not variants:
+                del self._variants[key[0]]
+
+    def _on_change(self, path: Optional[str], structural: bool) -> None:
+        self.invalidate(path)
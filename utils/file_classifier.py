@@ -0,0 +1,145 @@
+"""
+Cheap content classification for directory expansion
+
+Extension filtering lets a lot of noise through: JSON fixtures, minified
+bundles saved as .js, lockfiles in .json/.yaml form, generated protobuf or
+OpenAPI clients, and binaries with misleading extensions. Embedding them costs
+I/O and tens of thousands of tokens without helping the model.
+
+classify_file() looks at the file name and the first CLASSIFY_SAMPLE_BYTES of
+content and returns a short category for files that should not be embedded
+when they were only picked up by expanding a directory. Files a user names
+explicitly are never classified away.
+"""
+
+import os
+import re
+from typing import Optional
+
+# Bytes read from the start of each file for classification
+CLASSIFY_SAMPLE_BYTES = 8 * 1024
+
+# Fraction of non-text bytes above which a sample is treated as binary
+BINARY_RATIO_THRESHOLD = 0.30
+
+# Line-length thresholds for minified content: a very long line in a sample
+# whose lines are long on average (short files with one long string are fine)
+MINIFIED_MAX_LINE_LENGTH = 1_000
+MINIFIED_AVERAGE_LINE_LENGTH = 300
+
+# Dependency lockfiles, matched by exact file name
+LOCKFILE_NAMES = {
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lockb",
+    "poetry.lock",
+    "Pipfile.lock",
+    "pdm.lock",
+    "uv.lock",
+    "Cargo.lock",
+    "composer.lock",
+    "Gemfile.lock",
+    "go.sum",
+    "Podfile.lock",
+    "packages.lock.json",
+}
+
+# File name suffixes of minified or derived assets
+MINIFIED_SUFFIXES = (".min.js", ".min.css", ".min.mjs", ".bundle.js", ".js.map", ".css.map")
+
+# Header lines that code generators put at the top of their output. Only
+# comment lines before the first line of code are checked, so hand-written
+# files that merely mention "do not edit" are not affected.
+GENERATED_HEADER_PATTERNS = (
+    re.compile(rb"@generated\b"),
+    re.compile(rb"^Code generated .* DO NOT EDIT\.$"),
+    re.compile(rb"^Generated by the protocol buffer compiler\.\s+DO NOT EDIT!"),
+    re.compile(rb"^<auto-generated\b"),
+)
+
+# Prefixes of comment lines that may carry a generator header
+_COMMENT_PREFIXES = (b"#", b"//", b"/*", b"*", b"--", b";", b"<!--", b"%")
+
+# Bytes considered text: printable ASCII plus common whitespace, and anything
+# >= 0x80 (UTF-8 multibyte sequences)
+_TEXT_BYTES = bytes(range(0x20, 0x7F)) + b"\t\n\r\f\b"
+
+# Category descriptions used in skip notes
+CLASSIFICATION_REASONS = {
+    "binary": "binary content",
+    "lockfile": "dependency lockfile",
+    "minified": "minified or bundled code",
+    "generated": "generated code",
+}
+
+
+def classify_sample(file_name: str, sample: bytes) -> Optional[str]:
+    """
+    Classify a file from its name and a sample of its leading bytes.
+
+    Args:
+        file_name: Base name of the file
+        sample: Leading bytes of the file
+
+    Returns:
+        Optional[str]: "binary", "lockfile", "minified" or "generated", or None for regular source
+    """
+    if file_name in LOCKFILE_NAMES:
+        return "lockfile"
+    if file_name.lower().endswith(MINIFIED_SUFFIXES):
+        return "minified"
+    if not sample:
+        return None
+
+    if b"\0" in sample:
+        return "binary"
+    non_text = sum(1 for byte in sample if byte < 0x80 and byte not in _TEXT_BYTES)
+    if non_text / len(sample) > BINARY_RATIO_THRESHOLD:
+        return "binary"
+
+    lines = sample.split(b"\n")
+    # The last line of a truncated sample may be cut short; it still counts toward the maximum
+    if max(len(line) for line in lines) > MINIFIED_MAX_LINE_LENGTH:
+        if len(sample) / len(lines) > MINIFIED_AVERAGE_LINE_LENGTH:
+            return "minified"
+
+    if _has_generated_header(sample[:1024]):
+        return "generated"
+
+    return None
+
+
+def _has_generated_header(head: bytes) -> bool:
+    """Whether the leading comment lines of a sample carry a code generator header."""
+    for raw_line in head.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        prefix = next((prefix for prefix in _COMMENT_PREFIXES if line.startswith(prefix)), None)
+        if prefix is None:
+            # First line of code: generator headers come before it
+            return False
+        text = line[len(prefix) :].strip().rstrip(b"*/->").strip()
+        if any(pattern.search(text) for pattern in GENERATED_HEADER_PATTERNS):
+            return True
+    return False
+
+
+def classify_file(file_path: str) -> Optional[str]:
+    """
+    Classify a file by reading only its first few KB.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Optional[str]: Category (see classify_sample), or None for regular source or unreadable files
+    """
+    try:
+        with open(file_path, "rb") as f:
+            sample = f.read(CLASSIFY_SAMPLE_BYTES)
+    except OSError:
+        return None
+    return classify_sample(os.path.basename(file_path), sample)
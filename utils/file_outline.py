@@ -0,0 +1,124 @@
+"""
+Signature outlines for files too large to embed
+
+When a file is over the size limit or doesn't fit the remaining token budget,
+embedding nothing throws away useful context. An outline - the file's
+signatures and top-level symbols with their line numbers - costs a small
+fraction of the tokens and tells the model where to look; it can then ask for
+a line range (``/abs/path.py:120-340``) to see the code itself.
+
+The parser is a line scanner with a handful of language-agnostic patterns. It
+reads the file in bounded chunks, so even multi-gigabyte generated files are
+never loaded into memory, and very long lines are only inspected up to
+OUTLINE_LINE_PREFIX_BYTES.
+"""
+
+import re
+from dataclasses import dataclass
+
+# Only the start of each line is inspected; the rest of a long line is skipped without decoding
+OUTLINE_LINE_PREFIX_BYTES = 512
+
+# Maximum number of symbols in an outline
+MAX_OUTLINE_ENTRIES = 400
+
+# Symbols indented deeper than this are nested implementation details, not API surface
+MAX_OUTLINE_INDENT = 8
+
+# Patterns for declarations across the languages in CODE_EXTENSIONS
+OUTLINE_PATTERNS = [
+    # Python, Ruby
+    re.compile(r"^\s*(async\s+def|def|class|module)\s+\w"),
+    # JavaScript / TypeScript
+    re.compile(
+        r"^\s*(export\s+)?(default\s+)?(declare\s+)?(abstract\s+)?(async\s+)?(function\*?|class|interface|enum)\s"
+    ),
+    re.compile(r"^\s*(export\s+)?(type\s+\w+\s*(<[^>]*>)?\s*=|(const|let)\s+\w+\s*=\s*(async\s*)?(\(|function))"),
+    # Go
+    re.compile(r"^(func|type)\s"),
+    # Rust
+    re.compile(r"^\s*(pub(\([\w:]+\))?\s+)?(async\s+)?(unsafe\s+)?(fn|struct|enum|trait|impl|mod|type)\b"),
+    # Java, C#, Kotlin, Swift, Scala, PHP
+    re.compile(
+        r"^\s*((public|private|protected|internal|static|final|abstract|override|open|sealed|data|partial)\s+)*"
+        r"(class|interface|enum|record|struct|object|trait|fun|func|function|protocol|extension)\s+\w"
+    ),
+    re.compile(r"^\s*(public|private|protected|internal)\s+[\w<>\[\],.?\s]*\w+\s*\("),
+    # C / C++ function definitions at column 0
+    re.compile(r"^[A-Za-z_][\w\s\*&:<>,]*[\s\*&]\**~?\w+\s*\([^;]*$"),
+    # Shell functions
+    re.compile(r"^\s*(function\s+)?[\w-]+\s*\(\)\s*\{"),
+    # SQL definitions
+    re.compile(r"^\s*create\s+(or\s+replace\s+)?(table|view|function|procedure|index|trigger)\b", re.IGNORECASE),
+    # Markdown headings
+    re.compile(r"^#{1,6}\s"),
+]
+
+
+@dataclass
+class FileOutline:
+    """
+    Outline of a file.
+
+    Attributes:
+        entries: (line number, declaration text) pairs in file order
+        total_lines: Number of lines in the file
+        truncated: True if more symbols were found than MAX_OUTLINE_ENTRIES
+    """
+
+    entries: list[tuple[int, str]]
+    total_lines: int
+    truncated: bool = False
+
+    def render(self) -> str:
+        """Render the outline as numbered lines."""
+        lines = [f"{line_number:>6}: {text}" for line_number, text in self.entries]
+        if self.truncated:
+            lines.append(f"  ... outline truncated after {len(self.entries)} symbols")
+        return "\n".join(lines)
+
+
+def _is_declaration(text: str) -> bool:
+    indent = len(text) - len(text.lstrip(" \t"))
+    if indent > MAX_OUTLINE_INDENT or not text.strip():
+        return False
+    return any(pattern.match(text) for pattern in OUTLINE_PATTERNS)
+
+
+def extract_outline(file_path: str, max_entries: int = MAX_OUTLINE_ENTRIES) -> FileOutline:
+    """
+    Extract declarations from a file by streaming it line by line.
+
+    Args:
+        file_path: Path to the file
+        max_entries: Maximum number of symbols to collect
+
+    Returns:
+        FileOutline: Declarations with line numbers
+
+    Raises:
+        OSError: If the file can't be read
+    """
+    entries: list[tuple[int, str]] = []
+    truncated = False
+    line_number = 0
+    at_line_start = True
+
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.readline(OUTLINE_LINE_PREFIX_BYTES)
+            if not chunk:
+                break
+            if at_line_start:
+                line_number += 1
+                if not truncated:
+                    text = chunk.decode("utf-8", errors="replace").rstrip("\r\n")
+                    if _is_declaration(text):
+                        if len(entries) < max_entries:
+                            entries.append((line_number, text.rstrip()))
+                        else:
+                            truncated = True
+            # A chunk without a newline is the prefix of a long line; skip the rest of it
+            at_line_start = chunk.endswith(b"\n")
+
+    return FileOutline(entries=entries, total_lines=line_number, truncated=truncated)
@@ -0,0 +1,241 @@
+"""
+Relevance ranking for directory expansion
+
+When a request names a directory whose files don't all fit the token budget,
+read_files used to embed files in sorted-path order and drop whatever came
+last. This module ranks the expanded files against the request text instead,
+using a small in-memory BM25 index over each file's path and the identifiers
+near the top of the file, and then packs the budget greedily by relevance per
+token.
+
+Everything here is offline and lexical: no embeddings, no network. The index
+is built per request from at most IDENTIFIER_SCAN_BYTES of each file, which is
+cheap compared to reading the files that end up in the prompt.
+"""
+
+import logging
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the start of each file to collect identifiers for the index
+IDENTIFIER_SCAN_BYTES = 32 * 1024
+
+# BM25 parameters (standard values)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Path terms describe the whole file, so they count more than a single identifier occurrence
+PATH_TERM_WEIGHT = 3
+
+# Token floor used when computing relevance per token, so tiny files don't win on size alone
+MIN_RANKING_TOKENS = 50
+
+# Words that carry no signal in requests like "review the auth flow in src/"
+STOP_WORDS = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "as",
+    "at",
+    "be",
+    "by",
+    "code",
+    "do",
+    "does",
+    "file",
+    "files",
+    "for",
+    "from",
+    "how",
+    "in",
+    "is",
+    "it",
+    "of",
+    "on",
+    "or",
+    "the",
+    "this",
+    "to",
+    "what",
+    "why",
+    "with",
+}
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase search terms.
+
+    Identifiers are split on snake_case and camelCase boundaries and also kept
+    whole, so "parseConfigFile" matches "parse", "config" and "parseconfigfile".
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        list[str]: Terms in order of appearance
+    """
+    terms = []
+    for word in _WORD_RE.findall(text):
+        lowered = word.lower()
+        parts = [part.lower() for part in _CAMEL_RE.findall(word)]
+        if len(parts) > 1 and len(lowered) > 1 and lowered not in STOP_WORDS:
+            terms.append(lowered)
+        terms.extend(part for part in parts if len(part) > 1 and part not in STOP_WORDS)
+    return terms
+
+
+@dataclass(frozen=True)
+class RankedFile:
+    """A candidate file with its relevance score and estimated token cost."""
+
+    path: str
+    score: float
+    tokens: int
+
+    @property
+    def density(self) -> float:
+        """Relevance per token."""
+        return self.score / max(self.tokens, MIN_RANKING_TOKENS)
+
+
+@dataclass
+class PackingResult:
+    """
+    Outcome of relevance-ranked packing.
+
+    Attributes:
+        selected: Files to embed, in packing order (pinned first, then most relevant per token)
+        dropped: Files left out, mapped to a human-readable reason
+        ranked: All candidates, most relevant per token first
+    """
+
+    selected: list[str]
+    dropped: dict[str, str]
+    ranked: list[RankedFile]
+
+
+def _read_index_text(file_path: str) -> str:
+    """Read the head of a file for identifier extraction."""
+    try:
+        with open(file_path, "rb") as f:
+            return f.read(IDENTIFIER_SCAN_BYTES).decode("utf-8", errors="ignore")
+    except OSError:
+        return ""
+
+
+def _document_terms(file_path: str, root: Optional[str]) -> Counter:
+    """Collect weighted terms for a file from its path and identifiers."""
+    display_path = os.path.relpath(file_path, root) if root else file_path
+    terms = Counter()
+    for term in tokenize(display_path):
+        terms[term] += PATH_TERM_WEIGHT
+    terms.update(tokenize(_read_index_text(file_path)))
+    return terms
+
+
+def rank_files(file_paths: list[str], query: str, token_estimates: dict[str, int]) -> list[RankedFile]:
+    """
+    Rank files against a query with BM25 over path and identifiers.
+
+    Args:
+        file_paths: Candidate files
+        query: Request text (prompt, focus areas)
+        token_estimates: Estimated tokens per file
+
+    Returns:
+        list[RankedFile]: Candidates sorted by relevance per token, then by path order
+    """
+    query_terms = set(tokenize(query))
+    if not file_paths:
+        return []
+
+    root = os.path.commonpath(file_paths) if len(file_paths) > 1 else os.path.dirname(file_paths[0])
+    documents = [_document_terms(path, root) for path in file_paths]
+    lengths = [sum(doc.values()) for doc in documents]
+    average_length = (sum(lengths) / len(lengths)) or 1
+
+    document_frequency = Counter()
+    for doc in documents:
+        document_frequency.update(term for term in query_terms if term in doc)
+
+    total = len(documents)
+    ranked = []
+    for path, doc, length in zip(file_paths, documents, lengths):
+        score = 0.0
+        for term in query_terms:
+            frequency = doc.get(term, 0)
+            if not frequency:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        ranked.append(RankedFile(path=path, score=score, tokens=token_estimates.get(path, 0)))
+
+    order = {path: index for index, path in enumerate(file_paths)}
+    ranked.sort(key=lambda item: (-item.density, order[item.path]))
+    return ranked
+
+
+def pack_files_by_relevance(
+    file_paths: list[str],
+    query: str,
+    available_tokens: int,
+    token_estimates: dict[str, int],
+    pinned: Optional[set[str]] = None,
+) -> PackingResult:
+    """
+    Choose which files to embed when they don't all fit the budget.
+
+    Files the user named explicitly (pinned) are packed first in their original
+    order; the rest are packed greedily by relevance per token. The selection is
+    returned in packing order so that, if the size estimates turn out low, the
+    files cut at read time are the least relevant ones.
+
+    Args:
+        file_paths: Expanded candidate files, in original order
+        query: Request text to rank against
+        available_tokens: Token budget for file contents
+        token_estimates: Estimated tokens per file
+        pinned: Files named directly in the request
+
+    Returns:
+        PackingResult: Selected and dropped files with reasons
+    """
+    pinned = pinned or set()
+    ranked = rank_files(file_paths, query, token_estimates)
+    candidates = [path for path in file_paths if path in pinned] + [
+        item.path for item in ranked if item.path not in pinned
+    ]
+    scores = {item.path: item.score for item in ranked}
+
+    selected = []
+    dropped = {}
+    remaining = available_tokens
+    for path in candidates:
+        tokens = token_estimates.get(path, 0)
+        if tokens <= remaining:
+            selected.append(path)
+            remaining -= tokens
+        elif path in pinned:
+            dropped[path] = f"requested file too large for remaining budget (~{tokens:,} tokens)"
+        elif scores[path] > 0:
+            dropped[path] = f"lower relevance per token (score {scores[path]:.2f}, ~{tokens:,} tokens)"
+        else:
+            dropped[path] = f"no match for request terms (~{tokens:,} tokens)"
+
+    logger.debug(
+        f"[FILES] Relevance packing kept {len(selected)}/{len(file_paths)} files, {available_tokens - remaining:,} tokens"
+    )
+    return PackingResult(selected=selected, dropped=dropped, ranked=ranked)
@@ -0,0 +1,284 @@
+"""
+Memory-bounded file reading
+
+Reading a file with ``open(...).read()`` and then wrapping it in the
+"--- BEGIN FILE ---" envelope holds three copies at the peak: the raw bytes,
+the decoded text and the formatted envelope. With large files and parallel
+requests that adds up quickly.
+
+read_text() copies only the selected byte ranges - the head, the tail, or
+windows around lines matching a pattern - straight into a single buffer that
+already contains the envelope's header and footer. That buffer is decoded
+once, so the peak is one buffer plus the returned string. Contiguous head and
+tail reads go directly from the file into the buffer with readinto(); pattern
+searches run over an mmap of the file, so nothing outside the matched windows
+is copied onto the heap. Reads stop at a byte cap (or a token cap, converted
+with the same ~4 bytes/token ratio estimate_tokens uses).
+"""
+
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional, Union
+
+# Bytes per token assumed when converting a token cap to a byte cap (matches estimate_tokens)
+BYTES_PER_TOKEN = 4
+
+# Lines of context kept around each pattern match
+DEFAULT_CONTEXT_LINES = 3
+
+# Patterns that mark interesting lines in logs
+LOG_ERROR_PATTERNS = (
+    r"error",
+    r"exception",
+    r"traceback",
+    r"fatal",
+    r"panic",
+    r"critical",
+    r"fail(ed|ure)?",
+    r"\bat [\w.$]+\(",  # Java / JS stack frames
+)
+
+# Separator placed between non-adjacent pattern windows
+WINDOW_SEPARATOR = b"\n...\n"
+
+
+@dataclass
+class StreamedText:
+    """
+    Result of a capped read.
+
+    Attributes:
+        text: Decoded text, including the header and footer if any were given
+        bytes_read: Bytes of file content included
+        total_bytes: Size of the file
+        truncated: True if content was left out because of the cap or mode
+        matches: Number of pattern matches found (pattern mode only)
+    """
+
+    text: str
+    bytes_read: int
+    total_bytes: int
+    truncated: bool
+    matches: int = 0
+
+
+def _byte_cap(max_bytes: Optional[int], max_tokens: Optional[int], total_bytes: int) -> int:
+    caps = [total_bytes]
+    if max_bytes is not None:
+        caps.append(max(0, max_bytes))
+    if max_tokens is not None:
+        caps.append(max(0, max_tokens * BYTES_PER_TOKEN))
+    return min(caps)
+
+
+def _line_start(data, position: int, lines_before: int) -> int:
+    """Offset of the start of the line lines_before lines above the one containing position."""
+    start = position
+    for _ in range(lines_before + 1):
+        newline = data.rfind(b"\n", 0, start)
+        if newline < 0:
+            return 0
+        start = newline
+    return start + 1
+
+
+def _line_end(data, position: int, lines_after: int, size: int) -> int:
+    """Offset just past the end of the line lines_after lines below the one containing position."""
+    end = position
+    for _ in range(lines_after + 1):
+        newline = data.find(b"\n", end)
+        if newline < 0:
+            return size
+        end = newline + 1
+    return end
+
+
+def _pattern_windows(
+    data, size: int, patterns, context_lines: int, cap: int
+) -> tuple[list[tuple[int, int]], int, bool]:
+    """Collect merged line windows around matches, up to cap bytes."""
+    regex = re.compile(b"|".join(f"(?:{pattern})".encode() for pattern in patterns), re.IGNORECASE)
+    windows: list[tuple[int, int]] = []
+    used = 0
+    matches = 0
+    truncated = False
+
+    for match in regex.finditer(data):
+        if windows and match.start() < windows[-1][1]:
+            # Already inside the previous window
+            matches += 1
+            continue
+        matches += 1
+        start = _line_start(data, match.start(), context_lines)
+        end = _line_end(data, match.start(), context_lines, size)
+
+        if windows and start <= windows[-1][1]:
+            previous_start, previous_end = windows[-1]
+            added = end - previous_end
+            if used + added > cap:
+                truncated = True
+                break
+            windows[-1] = (previous_start, end)
+            used += added
+            continue
+
+        if used + (end - start) + len(WINDOW_SEPARATOR) > cap:
+            truncated = True
+            break
+        windows.append((start, end))
+        used += end - start + len(WINDOW_SEPARATOR)
+
+    return windows, matches, truncated
+
+
+def _assemble(header: bytes, data, ranges: list[tuple[int, int]], footer: bytes, separator: bytes = b"") -> str:
+    """Copy ranges of a mapped file into one buffer between header and footer and decode it once."""
+    separators = separator * max(0, len(ranges) - 1)
+    total = len(header) + sum(end - start for start, end in ranges) + len(separators) + len(footer)
+    buffer = bytearray(total)
+    position = len(header)
+    buffer[:position] = header
+
+    with memoryview(buffer) as view, memoryview(data) as source:
+        for index, (start, end) in enumerate(ranges):
+            if index and separator:
+                view[position : position + len(separator)] = separator
+                position += len(separator)
+            view[position : position + end - start] = source[start:end]
+            position += end - start
+        view[position:] = footer
+        return str(view, "utf-8", "replace")
+
+
+def _read_range_into_envelope(
+    f, header: bytes, start: int, end: int, footer: bytes, trim_head: bool, trim_tail: bool
+) -> tuple[str, int]:
+    """
+    Read [start, end) of a file directly into an envelope buffer and decode it once.
+
+    trim_head drops a partial first line; trim_tail drops a partial last line.
+    One byte before start is read when trimming the head, to tell whether start
+    already falls on a line boundary.
+
+    Returns:
+        tuple[str, int]: (text, bytes of file content included)
+    """
+    read_from = start - 1 if trim_head and start > 0 else start
+    length = end - read_from
+    buffer = bytearray(len(header) + length + len(footer))
+    buffer[: len(header)] = header
+
+    with memoryview(buffer) as view:
+        f.seek(read_from)
+        filled = 0
+        while filled < length:
+            count = f.readinto(view[len(header) + filled : len(header) + length])
+            if not count:
+                break
+            filled += count
+
+        content_start = len(header)
+        content_end = len(header) + filled
+        if trim_head and read_from < start:
+            newline = buffer.find(b"\n", content_start, content_end)
+            content_start = newline + 1 if newline >= 0 else content_start + 1
+        if trim_tail:
+            newline = buffer.rfind(b"\n", content_start, content_end)
+            content_end = newline + 1 if newline >= 0 else content_end
+
+        if content_start > len(header):
+            # Shift the kept content left so it directly follows the header
+            view[len(header) : len(header) + content_end - content_start] = view[content_start:content_end]
+            content_end -= content_start - len(header)
+            content_start = len(header)
+        view[content_end : content_end + len(footer)] = footer
+        return str(view[: content_end + len(footer)], "utf-8", "replace"), content_end - content_start
+
+
+def read_text(
+    path: Union[str, os.PathLike],
+    *,
+    mode: str = "head",
+    max_bytes: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    patterns: Optional[tuple[str, ...]] = None,
+    context_lines: int = DEFAULT_CONTEXT_LINES,
+    header: str = "",
+    footer: str = "",
+) -> StreamedText:
+    """
+    Read part of a file into a formatted envelope with bounded memory.
+
+    Modes:
+        head: from the start of the file up to the cap
+        tail: the last cap bytes, starting at a line boundary
+        pattern: windows of context_lines around lines matching any of patterns
+            (case-insensitive regular expressions), up to the cap
+
+    When the cap cuts content in head or tail mode, the cut is moved to the
+    nearest line boundary so no partial line is returned.
+
+    Args:
+        path: File to read
+        mode: "head", "tail" or "pattern"
+        max_bytes: Maximum bytes of file content to include
+        max_tokens: Maximum estimated tokens of file content to include
+        patterns: Regular expressions for pattern mode (defaults to LOG_ERROR_PATTERNS)
+        context_lines: Lines of context around each match in pattern mode
+        header: Text placed before the content
+        footer: Text placed after the content
+
+    Returns:
+        StreamedText: The envelope text and what was read
+
+    Raises:
+        OSError: If the file can't be opened
+        ValueError: If mode is unknown
+    """
+    if mode not in ("head", "tail", "pattern"):
+        raise ValueError(f"Unknown read mode: {mode}")
+
+    header_bytes = header.encode("utf-8")
+    footer_bytes = footer.encode("utf-8")
+
+    with open(path, "rb") as f:
+        total_bytes = os.fstat(f.fileno()).st_size
+        if total_bytes == 0:
+            return StreamedText(text=header + footer, bytes_read=0, total_bytes=0, truncated=False)
+
+        cap = _byte_cap(max_bytes, max_tokens, total_bytes)
+
+        if mode == "pattern":
+            # Scan the mapping so only the matched windows are ever copied onto the heap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                windows, matches, truncated = _pattern_windows(
+                    data, total_bytes, patterns or LOG_ERROR_PATTERNS, context_lines, cap
+                )
+                text = _assemble(header_bytes, data, windows, footer_bytes, WINDOW_SEPARATOR)
+            bytes_read = sum(end - start for start, end in windows)
+            return StreamedText(
+                text=text,
+                bytes_read=bytes_read,
+                total_bytes=total_bytes,
+                truncated=truncated or bytes_read < total_bytes,
+                matches=matches,
+            )
+
+        # Head and tail are contiguous, so they are read straight into the envelope buffer
+        truncated = cap < total_bytes
+        if mode == "head":
+            start, end = 0, cap
+        else:
+            start, end = total_bytes - cap, total_bytes
+        text, bytes_read = _read_range_into_envelope(
+            f,
+            header_bytes,
+            start,
+            end,
+            footer_bytes,
+            trim_head=truncated and mode == "tail",
+            trim_tail=truncated and mode == "head",
+        )
+        return StreamedText(text=text, bytes_read=bytes_read, total_bytes=total_bytes, truncated=truncated)
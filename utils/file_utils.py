@@ -18,12 +18,26 @@ Security Model:
 - Symbolic links are resolved to ensure they stay within bounds
 """
 
+import hashlib
 import logging
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 
+from .execution_context import check_cancelled
+from .file_cache import FileCache, file_signature
+from .file_classifier import CLASSIFICATION_REASONS, classify_file
+from .file_outline import FileOutline, extract_outline
+from .file_ranking import pack_files_by_relevance
+from .file_reader import read_text
+from .file_watcher import add_invalidation_listener
+from .token_accounting import TokenAccounting
 from .token_utils import MAX_CONTEXT_TOKENS, estimate_tokens
+from .workspace_index import TEXT_CLASSIFICATION, get_workspace_index
 
 logger = logging.getLogger(__name__)
 
@@ -82,6 +96,9 @@ if WORKSPACE_ROOT:
             f"Please set WORKSPACE_ROOT to a specific project directory."
         )
 
+# The workspace root is resolved once at startup rather than on every path translation
+REAL_WORKSPACE_ROOT = Path(os.path.realpath(WORKSPACE_ROOT)) if WORKSPACE_ROOT and WORKSPACE_ROOT.strip() else None
+
 # Get project root from environment or use current directory
 # This defines the sandbox directory where file access is allowed
 #
@@ -218,9 +235,9 @@ def translate_path_for_environment(path_str: str) -> str:
         return path_str
 
     try:
-        # Use os.path.realpath for security - it resolves symlinks completely
-        # This prevents symlink attacks that could escape the workspace
-        real_workspace_root = Path(os.path.realpath(WORKSPACE_ROOT))
+        # The workspace root was resolved with os.path.realpath at startup, which
+        # resolves symlinks completely and prevents symlink attacks that could escape the workspace
+        real_workspace_root = REAL_WORKSPACE_ROOT
         # For the host path, we can't use realpath if it doesn't exist in the container
         # So we'll use Path().resolve(strict=False) instead
         real_host_path = Path(path_str).resolve(strict=False)
@@ -254,7 +271,86 @@ def translate_path_for_environment(path_str: str) -> str:
         return f"/inaccessible/translation/error{path_str}"
 
 
+# Cache of validated path resolutions. A path is typically resolved several times
+# per request (directory expansion, reading, prompt files), and each resolution
+# costs an lstat per path component. Only successful resolutions are cached,
+# keyed on the input path and the sandbox configuration, and entries expire after
+# a short TTL or when invalidate_path_cache() bumps the generation (e.g. from a
+# filesystem watcher), so a symlink retargeted outside the sandbox is caught.
+PATH_CACHE_MAX_ENTRIES = 4096
+PATH_CACHE_TTL_SECONDS = 5.0
+_path_cache: OrderedDict[tuple[str, str, str, str], tuple[int, float, Path]] = OrderedDict()
+_path_cache_generation = 0
+_path_cache_lock = threading.Lock()
+
+
+def invalidate_path_cache() -> None:
+    """Drop all cached path resolutions, e.g. after the filesystem changed."""
+    global _path_cache_generation
+    with _path_cache_lock:
+        _path_cache_generation += 1
+        _path_cache.clear()
+
+
+def _on_file_change(path: Optional[str], structural: bool) -> None:
+    """File watcher listener: created, removed or renamed entries can change how paths resolve."""
+    if structural:
+        invalidate_path_cache()
+
+
+add_invalidation_listener(_on_file_change)
+
+# Formatted file contents and size-based token estimates. Conversation history
+# re-reads every referenced file on each turn, so unchanged files are served
+# from here; entries are validated by stat, or by the file watcher when enabled.
+CONTENT_CACHE_MAX_CHARS = 32 * 1024 * 1024
+_content_cache = FileCache("content", max_entries=4096, max_weight=CONTENT_CACHE_MAX_CHARS)
+_token_cache = FileCache("tokens", max_entries=65_536)
+
+
+def get_file_cache_stats() -> dict[str, dict[str, int]]:
+    """Entry counts and hit rates of the file content and token caches."""
+    return {"content": _content_cache.stats(), "tokens": _token_cache.stats()}
+
+
 def resolve_and_validate_path(path_str: str) -> Path:
+    """
+    Resolve and validate a path, reusing a recent validated resolution if there is one.
+
+    Security semantics are those of _resolve_and_validate_path_uncached: errors are
+    never cached, so a rejected path is re-checked (and re-logged) every time.
+
+    Args:
+        path_str: Path string (must be absolute)
+
+    Returns:
+        Resolved Path object that is guaranteed to be within PROJECT_ROOT
+
+    Raises:
+        ValueError: If path is not absolute or otherwise invalid
+        PermissionError: If path is outside allowed directory
+    """
+    key = (path_str, str(PROJECT_ROOT), WORKSPACE_ROOT or "", str(CONTAINER_WORKSPACE))
+    with _path_cache_lock:
+        generation = _path_cache_generation
+        entry = _path_cache.get(key)
+        if entry and entry[0] == generation and time.monotonic() - entry[1] < PATH_CACHE_TTL_SECONDS:
+            _path_cache.move_to_end(key)
+            return entry[2]
+
+    resolved_path = _resolve_and_validate_path_uncached(path_str)
+
+    with _path_cache_lock:
+        # Don't store a resolution that raced with an invalidation
+        if generation == _path_cache_generation:
+            _path_cache[key] = (generation, time.monotonic(), resolved_path)
+            _path_cache.move_to_end(key)
+            while len(_path_cache) > PATH_CACHE_MAX_ENTRIES:
+                _path_cache.popitem(last=False)
+    return resolved_path
+
+
+def _resolve_and_validate_path_uncached(path_str: str) -> Path:
     """
     Resolves, translates, and validates a path against security policies.
 
@@ -326,17 +422,222 @@ def translate_file_paths(file_paths: Optional[list[str]]) -> Optional[list[str]]
     return [translate_path_for_environment(path) for path in file_paths]
 
 
-def expand_paths(paths: list[str], extensions: Optional[set[str]] = None) -> list[str]:
+# Ceilings for directory expansion. Expansion stops early once either is reached
+# so that pointing a tool at a huge tree can't stall the request.
+MAX_EXPANDED_FILES = 10_000
+MAX_EXPANDED_BYTES = 200 * 1024 * 1024
+
+
+class _ExpansionLimits:
+    """Tracks files and bytes collected during expansion against the ceilings."""
+
+    def __init__(self, max_files: Optional[int], max_bytes: Optional[int]):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.files = 0
+        self.bytes = 0
+        self.exceeded = False
+
+    def add(self, size: int) -> bool:
+        """Count a file; returns False (and marks the limits exceeded) if it doesn't fit."""
+        if (self.max_files is not None and self.files + 1 > self.max_files) or (
+            self.max_bytes is not None and self.bytes + size > self.max_bytes
+        ):
+            self.exceeded = True
+            return False
+        self.files += 1
+        self.bytes += size
+        return True
+
+
+def _find_git_worktree(directory: Path) -> Optional[Path]:
+    """Return the root of the git worktree containing directory, if any."""
+    for candidate in (directory, *directory.parents):
+        if (candidate / ".git").exists():
+            return candidate
+    return None
+
+
+def _is_excluded_relative_path(relative_parts: tuple[str, ...]) -> bool:
+    """Apply the hidden-file and EXCLUDED_DIRS rules to a path relative to the expanded directory."""
+    if any(part.startswith(".") for part in relative_parts):
+        return True
+    return any(part in EXCLUDED_DIRS for part in relative_parts[:-1])
+
+
+def _list_git_files(directory: Path) -> Optional[list[str]]:
+    """
+    List files under a directory using git's index and ignore rules.
+
+    Returns tracked files plus untracked files that aren't ignored by
+    .gitignore, .git/info/exclude or the global excludes file, relative to
+    directory. Returns None if directory isn't inside a git worktree or git
+    fails, so the caller can fall back to walking the filesystem.
+    """
+    from .git_utils import run_git_command
+
+    if _find_git_worktree(directory) is None:
+        return None
+
+    success, output = run_git_command(str(directory), ["ls-files", "-z", "--cached", "--others", "--exclude-standard"])
+    if not success:
+        logger.debug(f"[FILES] git ls-files failed in {directory}, falling back to directory walk: {output.strip()}")
+        return None
+
+    # --cached and --others can both report the same path during merges
+    return sorted({entry for entry in output.split("\0") if entry})
+
+
+def _classify_indexed(file_path: str, stat_result: os.stat_result) -> Optional[str]:
+    """Classify a file, answering from the workspace index when it has the current version."""
+    index = get_workspace_index()
+    if index is not None:
+        record = index.lookup(file_path, stat_result.st_size, stat_result.st_mtime_ns)
+        if record is not None and record.classification is not None:
+            return None if record.classification == TEXT_CLASSIFICATION else record.classification
+
+    category = classify_file(file_path)
+    if index is not None:
+        index.record(
+            file_path,
+            stat_result.st_size,
+            stat_result.st_mtime_ns,
+            classification=category or TEXT_CLASSIFICATION,
+        )
+    return category
+
+
+def _is_noise_file(file_path: str, stat_result: os.stat_result, excluded: Optional[dict[str, str]]) -> bool:
+    """Classify a file found by directory expansion, recording it in excluded if it shouldn't be embedded."""
+    if excluded is None:
+        return False
+    category = _classify_indexed(file_path, stat_result)
+    if category is None:
+        return False
+    excluded[file_path] = CLASSIFICATION_REASONS[category]
+    return True
+
+
+def _expand_directory_with_git(
+    directory: Path,
+    relative_files: list[str],
+    extensions: set[str],
+    limits: _ExpansionLimits,
+    seen: set[str],
+    expanded_files: list[str],
+    excluded: Optional[dict[str, str]],
+) -> None:
+    """Add files from a git listing, applying the same filters as the directory walk."""
+    for relative_path in relative_files:
+        relative = Path(relative_path)
+        if _is_excluded_relative_path(relative.parts):
+            continue
+        if extensions and relative.suffix.lower() not in extensions:
+            continue
+
+        file_path = directory / relative
+        full_path = str(file_path)
+        if full_path in seen:
+            continue
+
+        try:
+            stat_result = file_path.stat()
+        except OSError:
+            # Deleted from the worktree but still in the index
+            continue
+        if not os.path.isfile(full_path):
+            # Submodules are listed as gitlinks
+            continue
+        if _is_noise_file(full_path, stat_result, excluded):
+            continue
+
+        if not limits.add(stat_result.st_size):
+            return
+        expanded_files.append(full_path)
+        seen.add(full_path)
+
+
+def _expand_directory_with_scandir(
+    directory: Path,
+    extensions: set[str],
+    limits: _ExpansionLimits,
+    seen: set[str],
+    expanded_files: list[str],
+    excluded: Optional[dict[str, str]],
+) -> None:
+    """Walk a directory iteratively with os.scandir, skipping hidden and excluded directories."""
+    pending = [str(directory)]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.debug(f"[FILES] Cannot scan {current}: {type(e).__name__}: {e}")
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            # Skip hidden files and directories (e.g., .git, .DS_Store, .gitignore)
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    # Prevent descending into node_modules, __pycache__, build output, etc.
+                    if entry.name not in EXCLUDED_DIRS:
+                        subdirectories.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                if extensions and os.path.splitext(entry.name)[1].lower() not in extensions:
+                    continue
+                if entry.path in seen:
+                    continue
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            if _is_noise_file(entry.path, stat_result, excluded):
+                continue
+
+            if not limits.add(stat_result.st_size):
+                return
+            expanded_files.append(entry.path)
+            seen.add(entry.path)
+
+        # Depth-first in name order; reversed so the stack pops them alphabetically
+        pending.extend(reversed(subdirectories))
+
+
+def expand_paths(
+    paths: list[str],
+    extensions: Optional[set[str]] = None,
+    max_files: Optional[int] = MAX_EXPANDED_FILES,
+    max_bytes: Optional[int] = MAX_EXPANDED_BYTES,
+    skip_generated: bool = True,
+    excluded: Optional[dict[str, str]] = None,
+) -> list[str]:
     """
     Expand paths to individual files, handling both files and directories.
 
-    This function recursively walks directories to find all matching files.
-    It automatically filters out hidden files and common non-code directories
-    like __pycache__ to avoid including generated or system files.
+    Directories inside a git worktree are listed with
+    ``git ls-files --cached --others --exclude-standard``, so .gitignored build
+    output and vendored trees are never visited. Other directories are walked
+    iteratively with os.scandir. Either way hidden files and common non-code
+    directories like __pycache__ are filtered out, and files found inside
+    directories are classified on their first few KB so that binaries,
+    minified bundles, lockfiles and generated code are left out (files named
+    directly are always kept).
+
+    Expansion stops early, keeping what was collected so far, once max_files
+    files or max_bytes bytes have been gathered.
 
     Args:
         paths: List of file or directory paths (must be absolute)
         extensions: Optional set of file extensions to include (defaults to CODE_EXTENSIONS)
+        max_files: Maximum number of files to collect (None for no limit)
+        max_bytes: Maximum combined size of collected files (None for no limit)
+        skip_generated: Leave out binary, minified, lockfile and generated files found in directories
+        excluded: Optional dict that receives each file left out by classification, mapped to the reason
 
     Returns:
         List of individual file paths, sorted for consistent ordering
@@ -346,8 +647,16 @@ def expand_paths(paths: list[str], extensions: Optional[set[str]] = None) -> lis
 
     expanded_files = []
     seen = set()
+    limits = _ExpansionLimits(max_files, max_bytes)
+    if excluded is None:
+        excluded = {}
+    classified_excluded = excluded if skip_generated else None
 
     for path in paths:
+        if limits.exceeded:
+            break
+        check_cancelled()
+
         try:
             # Validate each path for security before processing
             path_obj = resolve_and_validate_path(path)
@@ -375,30 +684,35 @@ def expand_paths(paths: list[str], extensions: Optional[set[str]] = None) -> lis
         if path_obj.is_file():
             # Add file directly
             if str(path_obj) not in seen:
+                try:
+                    size = path_obj.stat().st_size
+                except OSError:
+                    continue
+                if not limits.add(size):
+                    break
                 expanded_files.append(str(path_obj))
                 seen.add(str(path_obj))
 
         elif path_obj.is_dir():
-            # Walk directory recursively to find all files
-            for root, dirs, files in os.walk(path_obj):
-                # Filter directories in-place to skip hidden and excluded directories
-                # This prevents descending into .git, .venv, __pycache__, node_modules, etc.
-                dirs[:] = [d for d in dirs if not d.startswith(".") and d not in EXCLUDED_DIRS]
-
-                for file in files:
-                    # Skip hidden files (e.g., .DS_Store, .gitignore)
-                    if file.startswith("."):
-                        continue
-
-                    file_path = Path(root) / file
-
-                    # Filter by extension if specified
-                    if not extensions or file_path.suffix.lower() in extensions:
-                        full_path = str(file_path)
-                        # Use set to prevent duplicates
-                        if full_path not in seen:
-                            expanded_files.append(full_path)
-                            seen.add(full_path)
+            git_files = _list_git_files(path_obj)
+            # An empty listing means the directory itself is ignored; walk it since it was asked for explicitly
+            if git_files:
+                logger.debug(f"[FILES] Expanding {path_obj} from git listing ({len(git_files)} entries)")
+                _expand_directory_with_git(
+                    path_obj, git_files, extensions, limits, seen, expanded_files, classified_excluded
+                )
+            else:
+                _expand_directory_with_scandir(path_obj, extensions, limits, seen, expanded_files, classified_excluded)
+
+    if limits.exceeded:
+        logger.warning(
+            f"Directory expansion stopped early after {limits.files:,} files ({limits.bytes:,} bytes); "
+            f"limits are {max_files} files and {max_bytes} bytes. Request a narrower set of paths."
+        )
+
+    index = get_workspace_index()
+    if index is not None:
+        index.flush()
 
     # Sort for consistent ordering across different runs
     # This makes output predictable and easier to debug
@@ -445,6 +759,12 @@ def read_file_content(file_path: str, max_size: int = 1_000_000) -> tuple[str, i
         logger.debug(f"[FILES] Returning error content for {file_path}: {tokens} tokens")
         return content, tokens
 
+    cached = _content_cache.lookup(str(path), (file_path, max_size))
+    if cached is not None:
+        logger.debug(f"[FILES] Content cache hit for {file_path}")
+        return cached
+    signature = file_signature(str(path))
+
     try:
         # Validate file existence and type
         if not path.exists():
@@ -462,25 +782,37 @@ def read_file_content(file_path: str, max_size: int = 1_000_000) -> tuple[str, i
         logger.debug(f"[FILES] File size for {file_path}: {file_size:,} bytes")
         if file_size > max_size:
             logger.debug(f"[FILES] File too large: {file_path} ({file_size:,} > {max_size:,} bytes)")
-            content = f"\n--- FILE TOO LARGE: {file_path} ---\nFile size: {file_size:,} bytes (max: {max_size:,})\n--- END FILE ---\n"
+            content = f"\n--- FILE TOO LARGE: {file_path} ---\nFile size: {file_size:,} bytes (max: {max_size:,})\n"
+            if _is_log_file(path):
+                # Logs have no outline; show the lines around errors, or the end of the log
+                return _read_log_excerpt(path, file_path, content, max_size)
+
+            # Degrade to an outline so the model still sees the file's structure
+            try:
+                content += _format_outline_body(file_path, extract_outline(str(path)))
+            except OSError as e:
+                content += f"Outline unavailable: {e}\n"
+            content += "--- END FILE ---\n"
             return content, estimate_tokens(content)
 
-        # Read the file with UTF-8 encoding, replacing invalid characters
-        # This ensures we can handle files with mixed encodings
-        logger.debug(f"[FILES] Reading file content for {file_path}")
-        with open(path, encoding="utf-8", errors="replace") as f:
-            file_content = f.read()
-
-        logger.debug(f"[FILES] Successfully read {len(file_content)} characters from {file_path}")
-
-        # Format with clear delimiters that help the AI understand file boundaries
-        # Using consistent markers makes it easier for the model to parse
+        # Read the file straight into its envelope, decoding UTF-8 and replacing
+        # invalid characters so files with mixed encodings still work.
         # NOTE: These markers ("--- BEGIN FILE: ... ---") are distinct from git diff markers
         # ("--- BEGIN DIFF: ... ---") to allow AI to distinguish between complete file content
         # vs. partial diff content when files appear in both sections
-        formatted = f"\n--- BEGIN FILE: {file_path} ---\n{file_content}\n--- END FILE: {file_path} ---\n"
+        logger.debug(f"[FILES] Reading file content for {file_path}")
+        header = f"\n--- BEGIN FILE: {file_path} ---\n"
+        footer = f"\n--- END FILE: {file_path} ---\n"
+        formatted = read_text(path, max_bytes=max_size, header=header, footer=footer).text
         tokens = estimate_tokens(formatted)
         logger.debug(f"[FILES] Formatted content for {file_path}: {len(formatted)} chars, {tokens} tokens")
+        index = get_workspace_index()
+        if index is not None and signature is not None:
+            content_tokens = estimate_tokens(formatted[len(header) : len(formatted) - len(footer)])
+            index.record(
+                str(path), signature.size, signature.mtime_ns, token_counts={"estimate_tokens": content_tokens}
+            )
+        _content_cache.store(str(path), (file_path, max_size), (formatted, tokens), signature, weight=len(formatted))
         return formatted, tokens
 
     except Exception as e:
@@ -491,11 +823,374 @@ def read_file_content(file_path: str, max_size: int = 1_000_000) -> tuple[str, i
         return content, tokens
 
 
+# Suffixes of log files, which are excerpted around errors instead of outlined when too large
+LOG_SUFFIXES = {".log", ".out", ".err", ".trace"}
+
+
+def _is_log_file(path: Path) -> bool:
+    """Check for log files, including rotated ones such as app.log.1."""
+    return any(suffix.lower() in LOG_SUFFIXES for suffix in path.suffixes)
+
+
+def _read_log_excerpt(path: Path, file_path: str, header: str, max_size: int) -> tuple[str, int]:
+    """Format an oversized log as windows around error lines, or its tail if there are none."""
+    footer = "--- END FILE ---\n"
+    excerpt = read_text(
+        path,
+        mode="pattern",
+        max_bytes=max_size,
+        header=header + "Showing the lines around errors, exceptions and failures:\n",
+        footer="\n" + footer,
+    )
+    if not excerpt.matches:
+        excerpt = read_text(
+            path,
+            mode="tail",
+            max_bytes=max_size,
+            header=header + f"No error lines found; showing the last {min(max_size, excerpt.total_bytes):,} bytes:\n",
+            footer="\n" + footer,
+        )
+    return excerpt.text, estimate_tokens(excerpt.text)
+
+
+# Line range suffix accepted on file entries: /abs/path.py:120-340 or /abs/path.py:120
+LINE_RANGE_PATTERN = re.compile(r"^(?P<path>.+?):(?P<start>\d+)(?:-(?P<end>\d+))?$")
+
+# Chunk size used when scanning for a line offset
+_LINE_SCAN_CHUNK_BYTES = 64 * 1024
+
+
+def parse_line_range(file_spec: str) -> tuple[str, Optional[tuple[int, int]]]:
+    """
+    Split a file entry into its path and optional line range.
+
+    A suffix is only treated as a range when the entry itself isn't an existing
+    path, so files whose names really end in ":123" keep working.
+
+    Args:
+        file_spec: File entry such as "/abs/path.py" or "/abs/path.py:120-340"
+
+    Returns:
+        tuple: (path, (start_line, end_line)) with 1-based inclusive lines, or (path, None)
+    """
+    match = LINE_RANGE_PATTERN.match(file_spec)
+    if not match or os.path.exists(file_spec):
+        return file_spec, None
+
+    start_line = max(1, int(match.group("start")))
+    end_line = int(match.group("end")) if match.group("end") else start_line
+    return match.group("path"), (start_line, max(start_line, end_line))
+
+
+def _seek_to_line(f, line_number: int) -> bool:
+    """
+    Position a binary file object at the start of a 1-based line number.
+
+    Scans in fixed-size chunks counting newlines, so nothing before the line is
+    decoded or kept in memory.
+
+    Returns:
+        bool: True if the line exists
+    """
+    if line_number <= 1:
+        f.seek(0)
+        return True
+
+    newlines_needed = line_number - 1
+    offset = 0
+    while True:
+        chunk = f.read(_LINE_SCAN_CHUNK_BYTES)
+        if not chunk:
+            return False
+        count = chunk.count(b"\n")
+        if count >= newlines_needed:
+            position = -1
+            for _ in range(newlines_needed):
+                position = chunk.index(b"\n", position + 1)
+            f.seek(offset + position + 1)
+            return bool(f.peek(1)) if hasattr(f, "peek") else True
+        newlines_needed -= count
+        offset += len(chunk)
+
+
+def read_file_range(file_path: str, start_line: int, end_line: int, max_size: int = 1_000_000) -> tuple[str, int]:
+    """
+    Read a line range of a file and format it for inclusion in AI prompts.
+
+    The file is never loaded whole: the start of the range is located by a
+    chunked newline scan, then only the requested lines (up to max_size bytes)
+    are read.
+
+    Args:
+        file_path: Path to file (must be absolute)
+        start_line: First line to include (1-based)
+        end_line: Last line to include (inclusive)
+        max_size: Maximum bytes of the range to include
+
+    Returns:
+        Tuple of (formatted_content, estimated_tokens)
+    """
+    try:
+        path = resolve_and_validate_path(file_path)
+    except (ValueError, PermissionError) as e:
+        content = f"\n--- ERROR ACCESSING FILE: {file_path} ---\nError: {e}\n--- END FILE ---\n"
+        return content, estimate_tokens(content)
+
+    if not path.is_file():
+        content = f"\n--- FILE NOT FOUND: {file_path} ---\nError: File does not exist\n--- END FILE ---\n"
+        return content, estimate_tokens(content)
+
+    try:
+        lines = []
+        size = 0
+        last_line = start_line - 1
+        truncated = False
+        with open(path, "rb") as f:
+            if _seek_to_line(f, start_line):
+                for line_number in range(start_line, end_line + 1):
+                    line = f.readline(max_size - size + 1)
+                    if not line:
+                        break
+                    if size + len(line) > max_size:
+                        truncated = True
+                        break
+                    lines.append(line)
+                    size += len(line)
+                    last_line = line_number
+    except Exception as e:
+        content = f"\n--- ERROR READING FILE: {file_path} ---\nError: {e}\n--- END FILE ---\n"
+        return content, estimate_tokens(content)
+
+    if last_line < start_line:
+        content = (
+            f"\n--- BEGIN FILE: {file_path} (lines {start_line}-{end_line}) ---\n"
+            f"(file has fewer than {start_line} lines)\n--- END FILE: {file_path} ---\n"
+        )
+        return content, estimate_tokens(content)
+
+    body = b"".join(lines).decode("utf-8", errors="replace")
+    note = f"\n[range truncated at {max_size:,} bytes]" if truncated else ""
+    content = (
+        f"\n--- BEGIN FILE: {file_path} (lines {start_line}-{last_line}) ---\n"
+        f"{body}{note}\n--- END FILE: {file_path} ---\n"
+    )
+    tokens = estimate_tokens(content)
+    logger.debug(f"[FILES] Read lines {start_line}-{last_line} of {file_path}: {tokens} tokens")
+    return content, tokens
+
+
+def _format_outline_body(file_path: str, outline: FileOutline) -> str:
+    """Describe a file by its outline, for use inside a file envelope."""
+    if not outline.entries:
+        return f"No declarations found in its {outline.total_lines:,} lines.\n"
+
+    return (
+        f"Outline of its {outline.total_lines:,} lines (signatures and top-level symbols with line numbers). "
+        f"To see code, request a line range such as {file_path}:START-END.\n"
+        f"{outline.render()}\n"
+    )
+
+
+def read_file_outline(file_path: str, reason: str) -> tuple[str, int]:
+    """
+    Format a file as an outline instead of its full content.
+
+    Args:
+        file_path: Path to file (must be absolute)
+        reason: Why the file isn't embedded in full
+
+    Returns:
+        Tuple of (formatted_outline, estimated_tokens); ("", 0) if the file has
+        no recognizable declarations, since an empty outline isn't worth embedding
+    """
+    try:
+        path = resolve_and_validate_path(file_path)
+        outline = extract_outline(str(path))
+    except (ValueError, PermissionError, OSError) as e:
+        logger.debug(f"[FILES] No outline for {file_path}: {type(e).__name__}: {e}")
+        return "", 0
+
+    if not outline.entries:
+        return "", 0
+
+    content = (
+        f"\n--- BEGIN FILE OUTLINE: {file_path} ---\n{reason}.\n"
+        f"{_format_outline_body(file_path, outline)}--- END FILE OUTLINE: {file_path} ---\n"
+    )
+    return content, estimate_tokens(content)
+
+
+def read_file_entry(file_spec: str) -> tuple[str, int]:
+    """
+    Read a file entry, which may carry a line range suffix.
+
+    Args:
+        file_spec: "/abs/path.py" or "/abs/path.py:120-340"
+
+    Returns:
+        Tuple of (formatted_content, estimated_tokens)
+    """
+    file_path, line_range = parse_line_range(file_spec)
+    if line_range is None:
+        return read_file_content(file_path)
+    return read_file_range(file_path, *line_range)
+
+
+def file_content_hash(file_path: str, max_size: int = 1_000_000) -> Optional[str]:
+    """
+    SHA-256 of a file's raw bytes, from the workspace index when it has the current version.
+
+    Args:
+        file_path: Path to file (must be absolute)
+        max_size: Files larger than this are not hashed
+
+    Returns:
+        Optional[str]: Hex digest, or None if the file can't be read (see read_file_bytes)
+    """
+    try:
+        path = resolve_and_validate_path(file_path)
+        stat_result = path.stat()
+    except (ValueError, PermissionError, OSError):
+        return None
+
+    index = get_workspace_index()
+    record = index.lookup(str(path), stat_result.st_size, stat_result.st_mtime_ns) if index is not None else None
+    if record is not None and record.content_hash is not None:
+        return record.content_hash
+
+    data = read_file_bytes(file_path, max_size)
+    if data is None:
+        return None
+    content_hash = hashlib.sha256(data).hexdigest()
+    if index is not None and len(data) == stat_result.st_size:
+        index.record(str(path), stat_result.st_size, stat_result.st_mtime_ns, content_hash=content_hash)
+    return content_hash
+
+
+def read_file_bytes(file_path: str, max_size: int = 1_000_000) -> Optional[bytes]:
+    """
+    Read a file's raw bytes, e.g. for content hashing.
+
+    Args:
+        file_path: Path to file (must be absolute)
+        max_size: Files larger than this are not read
+
+    Returns:
+        Optional[bytes]: The file's bytes, or None if the path is invalid, not a
+        regular file, too large or unreadable
+    """
+    try:
+        path = resolve_and_validate_path(file_path)
+        if not path.is_file() or path.stat().st_size > max_size:
+            return None
+        return path.read_bytes()
+    except (ValueError, PermissionError, OSError):
+        return None
+
+
+def _estimate_file_tokens(file_path: str) -> int:
+    """
+    Estimate tokens for a file without reading it.
+
+    Uses the count from the workspace index if the file was read in its current
+    version, otherwise its size with the same ~4 chars/token ratio.
+    """
+    cached = _token_cache.lookup(file_path)
+    if cached is not None:
+        return cached
+    signature = file_signature(file_path)
+    if signature is None:
+        return 0
+    # A count measured when the file was last read beats the size-based estimate
+    index = get_workspace_index()
+    record = index.lookup(file_path, signature.size, signature.mtime_ns) if index is not None else None
+    tokens = record.token_counts.get("estimate_tokens") if record is not None else None
+    if tokens is None:
+        tokens = signature.size // 4
+    _token_cache.store(file_path, None, tokens, signature)
+    return tokens
+
+
+def estimate_files_tokens(paths: list[str]) -> int:
+    """
+    Estimate tokens needed to embed files and directories without reading them.
+
+    Directories are expanded the same way read_files expands them and each
+    file is measured from its size, so this is cheap enough to run before
+    deciding how to split a token budget.
+
+    Args:
+        paths: List of file or directory paths (must be absolute)
+
+    Returns:
+        int: Estimated tokens for all files the paths expand to
+    """
+    return sum(_estimate_file_tokens(file_path) for file_path in expand_paths(paths))
+
+
+def _pack_by_relevance(
+    requested_paths: list[str],
+    all_files: list[str],
+    query: str,
+    available_tokens: int,
+    accounting: Optional[TokenAccounting],
+    skip_reasons: dict[str, str],
+) -> list[str]:
+    """
+    Narrow expanded files to the most relevant ones that fit the budget.
+
+    Files are only re-ranked when their estimated total exceeds the budget;
+    otherwise the expanded list is returned unchanged. Dropped files are added
+    to skip_reasons (and accounting) with the reason they were left out.
+
+    Args:
+        requested_paths: Paths as given in the request (explicit files are kept first)
+        all_files: Expanded files in path order
+        query: Request text to rank against
+        available_tokens: Token budget left for files
+        accounting: Optional TokenAccounting to record dropped files
+        skip_reasons: Receives dropped files mapped to the reason
+
+    Returns:
+        list[str]: Files to read, most important first
+    """
+    estimates = {file_path: _estimate_file_tokens(file_path) for file_path in all_files}
+    if sum(estimates.values()) <= available_tokens:
+        return all_files
+
+    pinned = set(expand_paths([path for path in requested_paths if os.path.isfile(path)]))
+    packing = pack_files_by_relevance(all_files, query, available_tokens, estimates, pinned=pinned)
+    logger.debug(f"[FILES] Relevance ranking dropped {len(packing.dropped)} of {len(all_files)} files")
+
+    skip_reasons.update(packing.dropped)
+    if accounting is not None:
+        for dropped_path in packing.dropped:
+            accounting.record_skipped_file(dropped_path, estimates[dropped_path])
+    return packing.selected
+
+
+def _record_embedded_file(file_path: str, formatted: str, embedded_hashes: dict[str, str]) -> None:
+    """Snapshot the content of a file embedded by read_file_content and record its hash."""
+    from .conversation_memory import store_file_snapshot
+
+    header = f"\n--- BEGIN FILE: {file_path} ---\n"
+    footer = f"\n--- END FILE: {file_path} ---\n"
+    if not (formatted.startswith(header) and formatted.endswith(footer)):
+        # Error and too-large notices carry no file content
+        return
+    content_hash = store_file_snapshot(formatted[len(header) : len(formatted) - len(footer)])
+    if content_hash is not None:
+        embedded_hashes[file_path] = content_hash
+
+
 def read_files(
     file_paths: list[str],
     code: Optional[str] = None,
     max_tokens: Optional[int] = None,
     reserve_tokens: int = 50_000,
+    accounting: Optional[TokenAccounting] = None,
+    relevance_query: Optional[str] = None,
+    embedded_hashes: Optional[dict[str, str]] = None,
 ) -> str:
     """
     Read multiple files and optional direct code with smart token management.
@@ -510,6 +1205,11 @@ def read_files(
         code: Optional direct code to include (prioritized over files)
         max_tokens: Maximum tokens to use (defaults to MAX_CONTEXT_TOKENS)
         reserve_tokens: Tokens to reserve for prompt and response (default 50K)
+        accounting: Optional TokenAccounting that records tokens per embedded and skipped file
+        relevance_query: Optional request text; when the expanded files don't all fit,
+            they are ranked against it and packed by relevance per token instead of path order
+        embedded_hashes: Optional dict that receives the content hash of each file embedded
+            in full, whose content is kept as a snapshot for later turns to diff against
 
     Returns:
         str: All file contents formatted for AI consumption
@@ -527,6 +1227,8 @@ def read_files(
     available_tokens = max_tokens - reserve_tokens
 
     files_skipped = []
+    skip_reasons: dict[str, str] = {}
+    files_excluded: dict[str, str] = {}
 
     # Priority 1: Handle direct code if provided
     # Direct code is prioritized because it's explicitly provided by the user
@@ -539,40 +1241,94 @@ def read_files(
             total_tokens += code_tokens
             available_tokens -= code_tokens
 
-    # Priority 2: Process file paths
-    if file_paths:
+    # Priority 2: Line ranges - explicit, narrow requests
+    plain_paths = []
+    for file_spec in file_paths or []:
+        if parse_line_range(file_spec)[1] is None:
+            plain_paths.append(file_spec)
+            continue
+
+        file_content, file_tokens = read_file_entry(file_spec)
+        if total_tokens + file_tokens <= available_tokens:
+            content_parts.append(file_content)
+            total_tokens += file_tokens
+            if accounting is not None:
+                accounting.record_file(file_spec, file_tokens)
+        else:
+            files_skipped.append(file_spec)
+            skip_reasons[file_spec] = f"line range too large for remaining budget (~{file_tokens:,} tokens)"
+            if accounting is not None:
+                accounting.record_skipped_file(file_spec, file_tokens)
+
+    # Priority 3: Process file paths
+    if plain_paths:
         # Expand directories to get all individual files
-        logger.debug(f"[FILES] Expanding {len(file_paths)} file paths")
-        all_files = expand_paths(file_paths)
+        logger.debug(f"[FILES] Expanding {len(plain_paths)} file paths")
+        all_files = expand_paths(plain_paths, excluded=files_excluded)
         logger.debug(f"[FILES] After expansion: {len(all_files)} individual files")
 
-        if not all_files and file_paths:
+        if not all_files:
             # No files found but paths were provided
             logger.debug("[FILES] No files found from provided paths")
-            content_parts.append(f"\n--- NO FILES FOUND ---\nProvided paths: {', '.join(file_paths)}\n--- END ---\n")
+            content_parts.append(f"\n--- NO FILES FOUND ---\nProvided paths: {', '.join(plain_paths)}\n--- END ---\n")
         else:
+            if relevance_query and len(all_files) > 1:
+                all_files = _pack_by_relevance(
+                    plain_paths, all_files, relevance_query, available_tokens - total_tokens, accounting, skip_reasons
+                )
+                files_skipped.extend(skip_reasons)
+
             # Read files sequentially until token limit is reached
             logger.debug(f"[FILES] Reading {len(all_files)} files with token budget {available_tokens:,}")
             for i, file_path in enumerate(all_files):
+                check_cancelled()
                 if total_tokens >= available_tokens:
                     logger.debug(f"[FILES] Token budget exhausted, skipping remaining {len(all_files) - i} files")
                     files_skipped.extend(all_files[i:])
+                    skip_reasons.update(dict.fromkeys(all_files[i:], "token budget exhausted"))
+                    if accounting is not None:
+                        for skipped_path in all_files[i:]:
+                            accounting.record_skipped_file(skipped_path, _estimate_file_tokens(skipped_path))
                     break
 
-                file_content, file_tokens = read_file_content(file_path)
+                # Don't read a file whose size alone rules it out
+                estimated_tokens = _estimate_file_tokens(file_path)
+                if estimated_tokens > available_tokens - total_tokens:
+                    file_content, file_tokens = None, estimated_tokens
+                else:
+                    file_content, file_tokens = read_file_content(file_path)
                 logger.debug(f"[FILES] File {file_path}: {file_tokens:,} tokens")
 
                 # Check if adding this file would exceed limit
-                if total_tokens + file_tokens <= available_tokens:
+                if file_content is not None and total_tokens + file_tokens <= available_tokens:
                     content_parts.append(file_content)
                     total_tokens += file_tokens
+                    if accounting is not None:
+                        accounting.record_file(file_path, file_tokens)
+                    if embedded_hashes is not None:
+                        _record_embedded_file(file_path, file_content, embedded_hashes)
                     logger.debug(f"[FILES] Added file {file_path}, total tokens: {total_tokens:,}")
+                    continue
+
+                # Degrade to an outline if that fits
+                outline_content, outline_tokens = read_file_outline(
+                    file_path, f"The full file (~{file_tokens:,} tokens) does not fit the remaining token budget"
+                )
+                if outline_content and total_tokens + outline_tokens <= available_tokens:
+                    content_parts.append(outline_content)
+                    total_tokens += outline_tokens
+                    if accounting is not None:
+                        accounting.record_file(file_path, outline_tokens)
+                    logger.debug(f"[FILES] Added outline of {file_path} ({outline_tokens:,} tokens)")
                 else:
                     # File too large for remaining budget
                     logger.debug(
                         f"[FILES] File {file_path} too large for remaining budget ({file_tokens:,} tokens, {available_tokens - total_tokens:,} remaining)"
                     )
                     files_skipped.append(file_path)
+                    skip_reasons[file_path] = f"too large for remaining budget (~{file_tokens:,} tokens)"
+                    if accounting is not None:
+                        accounting.record_skipped_file(file_path, file_tokens)
 
     # Add informative note about skipped files to help users understand
     # what was omitted and why
@@ -581,13 +1337,31 @@ def read_files(
         skip_note = "\n\n--- SKIPPED FILES (TOKEN LIMIT) ---\n"
         skip_note += f"Total skipped: {len(files_skipped)}\n"
         # Show first 10 skipped files as examples
-        for _i, file_path in enumerate(files_skipped[:10]):
-            skip_note += f"  - {file_path}\n"
+        for file_path in files_skipped[:10]:
+            reason = skip_reasons.get(file_path)
+            skip_note += f"  - {file_path} ({reason})\n" if reason else f"  - {file_path}\n"
         if len(files_skipped) > 10:
             skip_note += f"  ... and {len(files_skipped) - 10} more\n"
         skip_note += "--- END SKIPPED FILES ---\n"
         content_parts.append(skip_note)
 
+    # Files left out of directory expansion because they aren't useful source
+    if files_excluded:
+        logger.debug(f"[FILES] {len(files_excluded)} files excluded as binary/generated")
+        exclude_note = "\n\n--- EXCLUDED FILES (BINARY/GENERATED) ---\n"
+        exclude_note += f"Total excluded: {len(files_excluded)}\n"
+        for file_path, reason in list(files_excluded.items())[:10]:
+            exclude_note += f"  - {file_path} ({reason})\n"
+        if len(files_excluded) > 10:
+            exclude_note += f"  ... and {len(files_excluded) - 10} more\n"
+        exclude_note += "Name a file directly to include it anyway.\n"
+        exclude_note += "--- END EXCLUDED FILES ---\n"
+        content_parts.append(exclude_note)
+
+    index = get_workspace_index()
+    if index is not None:
+        index.flush()
+
     result = "\n\n".join(content_parts) if content_parts else ""
     logger.debug(f"[FILES] read_files complete: {len(result)} chars, {total_tokens:,} tokens used")
     return result
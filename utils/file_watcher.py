@@ -0,0 +1,356 @@
+"""
+Optional inotify watcher that keeps the file caches fresh without stat calls
+
+The path, content and token caches in file_utils validate entries with a stat
+call on every lookup. Across thousands of files per turn those syscalls add up.
+When the watcher is enabled (FILE_WATCHER=true, Linux only) it watches every
+directory under the sandbox roots with inotify. Cache entries stored for files
+in watched directories are then trusted until an event says the file changed.
+
+The watcher has no thread of its own processing events: the kernel queues them
+and drain() reads the queue with one non-blocking read just before a cache
+entry is trusted, so a change made right before a request is never missed. A
+background thread only adds the initial watches. When the queue overflows, every
+cache is flushed. Directories beyond the watch limit are simply not covered, and
+entries for their files keep using stat validation.
+
+Listeners registered with add_invalidation_listener() receive the changed path,
+or None when everything should be dropped, and whether the change affects
+directory structure (creation, deletion, renames), which can change how other
+paths resolve.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import sys
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+# Events that add, remove or rename directory entries
+STRUCTURE_EVENTS = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+# Default cap on watched directories, kept well below the usual kernel limit
+DEFAULT_MAX_WATCHES = 8192
+
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+Listener = Callable[[Optional[str], bool], None]
+_listeners: list[Listener] = []
+
+
+def add_invalidation_listener(listener: Listener) -> None:
+    """
+    Register a callback for file changes.
+
+    Args:
+        listener: Called with (path, structural); path is None when all cached
+            state should be dropped
+    """
+    _listeners.append(listener)
+
+
+def _notify(path: Optional[str], structural: bool) -> None:
+    for listener in _listeners:
+        try:
+            listener(path, structural)
+        except Exception as e:
+            logger.warning(f"File watcher listener failed: {type(e).__name__}: {e}")
+
+
+def _kernel_watch_limit() -> Optional[int]:
+    try:
+        with open("/proc/sys/fs/inotify/max_user_watches") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class FileWatcher:
+    """
+    inotify watches over the directories under a set of roots.
+
+    Args:
+        roots: Directories to watch recursively (must be resolved paths)
+        excluded_dirs: Directory names not to descend into
+        max_watches: Maximum number of directories to watch
+    """
+
+    def __init__(self, roots: list[str], excluded_dirs: frozenset[str] = frozenset(), max_watches: int = 0):
+        self.roots = [str(root) for root in roots]
+        self.excluded_dirs = excluded_dirs
+        kernel_limit = _kernel_watch_limit()
+        limits = [limit for limit in (max_watches or DEFAULT_MAX_WATCHES, kernel_limit) if limit]
+        self.max_watches = min(limits)
+
+        self._fd: Optional[int] = None
+        self._libc = None
+        self._lock = threading.RLock()
+        self._paths_by_wd: dict[int, str] = {}
+        self._wds_by_path: dict[str, int] = {}
+
+        self.events = 0
+        self.overflows = 0
+        self.watch_limit_hits = 0
+        self.invalidations = 0
+
+    @property
+    def active(self) -> bool:
+        return self._fd is not None
+
+    def start(self, background: bool = True) -> bool:
+        """
+        Open the inotify instance and add watches for the roots.
+
+        Args:
+            background: Add the initial watches in a daemon thread
+
+        Returns:
+            bool: False if inotify is unavailable on this platform
+        """
+        if not sys.platform.startswith("linux"):
+            logger.info("File watcher disabled: inotify is only available on Linux")
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logger.info(f"File watcher disabled: {type(e).__name__}: {e}")
+            return False
+        if fd < 0:
+            logger.info(f"File watcher disabled: inotify_init1 failed ({os.strerror(ctypes.get_errno())})")
+            return False
+
+        self._libc = libc
+        self._fd = fd
+        if background:
+            threading.Thread(target=self._watch_roots, name="file-watcher-setup", daemon=True).start()
+        else:
+            self._watch_roots()
+        return True
+
+    def close(self) -> None:
+        """Stop watching; all paths become uncovered."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = None
+            self._paths_by_wd.clear()
+            self._wds_by_path.clear()
+
+    def covers(self, path: str) -> bool:
+        """Whether changes to the file at path are reported (its directory is watched)."""
+        return self._fd is not None and os.path.dirname(path) in self._wds_by_path
+
+    def stats(self) -> dict[str, int]:
+        """Counters for monitoring."""
+        return {
+            "active": self.active,
+            "watched_directories": len(self._wds_by_path),
+            "max_watches": self.max_watches,
+            "events": self.events,
+            "overflows": self.overflows,
+            "watch_limit_hits": self.watch_limit_hits,
+            "invalidations": self.invalidations,
+        }
+
+    def _watch_roots(self) -> None:
+        for root in self.roots:
+            self._watch_tree(root)
+        logger.info(f"File watcher watching {len(self._wds_by_path):,} directories")
+
+    def _add_watch(self, directory: str) -> bool:
+        with self._lock:
+            if self._fd is None:
+                return False
+            if directory in self._wds_by_path:
+                return True
+            if len(self._wds_by_path) >= self.max_watches:
+                self.watch_limit_hits += 1
+                return False
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    self.watch_limit_hits += 1
+                return False
+            self._paths_by_wd[wd] = directory
+            self._wds_by_path[directory] = wd
+            return True
+
+    def _watch_tree(self, root: str) -> None:
+        """Watch root and the directories below it, iteratively and without following symlinks."""
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            if not self._add_watch(directory):
+                if self.watch_limit_hits:
+                    logger.info(f"File watcher reached its limit of {self.max_watches:,} directories")
+                    return
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name in self.excluded_dirs or entry.name.startswith("."):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+            except OSError:
+                continue
+
+    def _forget(self, wd: int) -> None:
+        with self._lock:
+            directory = self._paths_by_wd.pop(wd, None)
+            if directory is not None:
+                self._wds_by_path.pop(directory, None)
+
+    def _forget_tree(self, directory: str) -> None:
+        """Stop covering a directory that moved away, and everything below it."""
+        prefix = directory + os.sep
+        with self._lock:
+            for path in [path for path in self._wds_by_path if path == directory or path.startswith(prefix)]:
+                wd = self._wds_by_path.pop(path)
+                self._paths_by_wd.pop(wd, None)
+                if self._fd is not None:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+
+    def drain(self) -> int:
+        """
+        Process all queued events and notify listeners.
+
+        Returns:
+            int: Number of events processed
+        """
+        processed = 0
+        with self._lock:
+            while self._fd is not None:
+                try:
+                    buffer = os.read(self._fd, _READ_SIZE)
+                except BlockingIOError:
+                    break
+                except OSError as e:
+                    logger.warning(f"File watcher read failed, disabling: {e}")
+                    self.close()
+                    _notify(None, True)
+                    break
+                offset = 0
+                while offset + _EVENT_HEADER.size <= len(buffer):
+                    wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                    name_bytes = buffer[offset + _EVENT_HEADER.size : offset + _EVENT_HEADER.size + length]
+                    offset += _EVENT_HEADER.size + length
+                    processed += 1
+                    self._handle_event(wd, mask, os.fsdecode(name_bytes.rstrip(b"\0")))
+        self.events += processed
+        return processed
+
+    def _handle_event(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost; nothing cached can be trusted
+            self.overflows += 1
+            self.invalidations += 1
+            _notify(None, True)
+            return
+        if mask & IN_IGNORED:
+            self._forget(wd)
+            return
+
+        directory = self._paths_by_wd.get(wd)
+        if directory is None:
+            return
+        path = os.path.join(directory, name) if name else directory
+        structural = bool(mask & STRUCTURE_EVENTS)
+
+        if mask & IN_ISDIR and mask & (IN_MOVED_FROM | IN_DELETE):
+            self._forget_tree(path)
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self._forget_tree(directory)
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            self._watch_tree(path)
+
+        self.invalidations += 1
+        if mask & IN_ISDIR or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # Everything below a moved or removed directory changed path
+            _notify(None, True)
+        else:
+            _notify(path, structural)
+
+
+_watcher: Optional[FileWatcher] = None
+
+
+def get_file_watcher() -> Optional[FileWatcher]:
+    """Return the running watcher, or None if it is disabled."""
+    return _watcher if _watcher is not None and _watcher.active else None
+
+
+def start_file_watcher(
+    roots: list[str], excluded_dirs: frozenset[str] = frozenset(), max_watches: int = 0, background: bool = True
+) -> Optional[FileWatcher]:
+    """
+    Start the process-wide watcher over the sandbox roots.
+
+    Args:
+        roots: Directories to watch recursively
+        excluded_dirs: Directory names not to descend into
+        max_watches: Maximum number of directories to watch (0 for the default)
+        background: Add the initial watches in a daemon thread
+
+    Returns:
+        Optional[FileWatcher]: The watcher, or None if inotify is unavailable
+    """
+    global _watcher
+    stop_file_watcher()
+    watcher = FileWatcher(roots, excluded_dirs, max_watches)
+    if not watcher.start(background=background):
+        return None
+    _watcher = watcher
+    return watcher
+
+
+def stop_file_watcher() -> None:
+    """Stop the process-wide watcher; caches fall back to stat validation."""
+    global _watcher
+    if _watcher is not None:
+        _watcher.close()
+        _watcher = None
+        _notify(None, True)
+
+
+def get_file_watcher_stats() -> dict[str, int]:
+    """Counters of the running watcher, or {"active": False} if it is disabled."""
+    watcher = get_file_watcher()
+    return watcher.stats() if watcher else {"active": False}
@@ -0,0 +1,262 @@
+"""
+Persistent git cat-file workers for reading blobs at arbitrary refs
+
+Reading a file as it exists at a ref with ``git show <ref>:<path>`` forks a
+new git process per file. For compare_to reviews that attach the full before
+and after versions of every changed file, that process churn dominates.
+
+A CatFileWorker keeps one ``git cat-file --batch`` process per repository
+and sends it one object name per line; git answers each with a header and
+the object's bytes. Workers live in a small process-wide pool: at most
+MAX_CAT_FILE_WORKERS repositories have a worker at once (least recently used
+ones are closed first), and workers idle for CAT_FILE_IDLE_SECONDS are closed
+by a background reaper.
+
+Only ``<ref>:<path>`` names should be read through a worker. git loads the
+index once per process, so ``:<path>`` (index) lookups could return stale
+content from a long-lived worker.
+"""
+
+import atexit
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Repositories with a live worker at once
+MAX_CAT_FILE_WORKERS = 4
+
+# Workers unused for this long are closed
+CAT_FILE_IDLE_SECONDS = 60.0
+
+# Bytes skipped per read when discarding an object that is too large
+_DISCARD_CHUNK = 64 * 1024
+
+
+class CatFileWorker:
+    """
+    One long-lived ``git cat-file --batch`` process for a repository.
+
+    Args:
+        repo_path: Path to the git repository (working directory)
+    """
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self.last_used = time.monotonic()
+        self.reads = 0
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def read(self, name: str, max_bytes: Optional[int] = None) -> Optional[bytes]:
+        """
+        Read an object's content.
+
+        Args:
+            name: Object name, e.g. "HEAD:src/app.py" or "main~1:README.md"
+            max_bytes: Return None for objects larger than this
+
+        Returns:
+            Optional[bytes]: Object content, or None if it is missing, ambiguous,
+                not a blob, or larger than max_bytes
+
+        Raises:
+            OSError: If the worker process died
+        """
+        if "\n" in name:
+            return None
+        with self._lock:
+            self.last_used = time.monotonic()
+            self.reads += 1
+            stdin, stdout = self._process.stdin, self._process.stdout
+            try:
+                stdin.write(name.encode("utf-8") + b"\n")
+                stdin.flush()
+                header = stdout.readline()
+            except (BrokenPipeError, ValueError) as e:
+                raise OSError(f"git cat-file worker for {self.repo_path} is gone") from e
+            if not header:
+                raise OSError(f"git cat-file worker for {self.repo_path} exited")
+
+            # "<oid> <type> <size>", or "<name> missing" / "<name> ambiguous"
+            parts = header.split()
+            if len(parts) != 3 or not parts[2].isdigit():
+                return None
+            object_type, size = parts[1], int(parts[2])
+
+            if object_type != b"blob" or (max_bytes is not None and size > max_bytes):
+                # The content still has to be consumed to keep the stream in sync
+                remaining = size + 1
+                while remaining:
+                    chunk = stdout.read(min(remaining, _DISCARD_CHUNK))
+                    if not chunk:
+                        raise OSError(f"git cat-file worker for {self.repo_path} exited")
+                    remaining -= len(chunk)
+                return None
+
+            content = stdout.read(size)
+            stdout.read(1)  # Trailing newline after the content
+            if len(content) != size:
+                raise OSError(f"git cat-file worker for {self.repo_path} exited")
+            return content
+
+    def close(self) -> None:
+        with self._lock:
+            if self._process.stdin:
+                try:
+                    self._process.stdin.close()
+                except OSError:
+                    pass
+            try:
+                self._process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            if self._process.stdout:
+                self._process.stdout.close()
+
+
+class CatFilePool:
+    """
+    Process-wide cache of CatFileWorkers, one per repository.
+
+    Args:
+        max_workers: Maximum number of live workers
+        idle_seconds: Close workers unused for this long
+    """
+
+    def __init__(self, max_workers: int = MAX_CAT_FILE_WORKERS, idle_seconds: float = CAT_FILE_IDLE_SECONDS):
+        self.max_workers = max_workers
+        self.idle_seconds = idle_seconds
+        self.started = 0
+        self._workers: OrderedDict[str, CatFileWorker] = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Timer] = None
+
+    def read(self, repo_path: str, name: str, max_bytes: Optional[int] = None) -> Optional[bytes]:
+        """
+        Read an object through the repository's worker, starting one if needed.
+
+        A worker that died is replaced and the read retried once.
+
+        Returns:
+            Optional[bytes]: See CatFileWorker.read(); also None if git can't be started
+        """
+        for attempt in range(2):
+            worker = self._worker(repo_path)
+            if worker is None:
+                return None
+            try:
+                return worker.read(name, max_bytes)
+            except OSError as e:
+                logger.debug(f"[GIT] cat-file worker failed ({e}), restarting" if attempt == 0 else str(e))
+                self._discard(repo_path, worker)
+        return None
+
+    def close(self) -> None:
+        """Close every worker."""
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        for worker in workers:
+            worker.close()
+
+    def stats(self) -> dict[str, int]:
+        return {"workers": len(self._workers), "started": self.started}
+
+    def _worker(self, repo_path: str) -> Optional[CatFileWorker]:
+        repo_path = os.path.abspath(repo_path)
+        evicted = []
+        with self._lock:
+            worker = self._workers.get(repo_path)
+            if worker is not None and worker.alive:
+                self._workers.move_to_end(repo_path)
+                return worker
+            if worker is not None:
+                evicted.append(self._workers.pop(repo_path))
+            try:
+                worker = CatFileWorker(repo_path)
+            except OSError as e:
+                logger.debug(f"[GIT] Could not start git cat-file in {repo_path}: {e}")
+                return None
+            self.started += 1
+            self._workers[repo_path] = worker
+            while len(self._workers) > self.max_workers:
+                evicted.append(self._workers.popitem(last=False)[1])
+            self._schedule_reaper()
+        for old in evicted:
+            old.close()
+        return worker
+
+    def _discard(self, repo_path: str, worker: CatFileWorker) -> None:
+        repo_path = os.path.abspath(repo_path)
+        with self._lock:
+            if self._workers.get(repo_path) is worker:
+                del self._workers[repo_path]
+        worker.close()
+
+    def _schedule_reaper(self) -> None:
+        # Called with self._lock held
+        if self._reaper is None and self._workers:
+            self._reaper = threading.Timer(self.idle_seconds / 2, self._reap)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            self._reaper = None
+            idle = [path for path, worker in self._workers.items() if worker.last_used < cutoff]
+            closed = [self._workers.pop(path) for path in idle]
+            self._schedule_reaper()
+        for worker in closed:
+            worker.close()
+        if closed:
+            logger.debug(f"[GIT] Closed {len(closed)} idle cat-file workers")
+
+
+_pool = CatFilePool()
+atexit.register(_pool.close)
+
+
+def read_blob(repo_path: str, ref: str, path: str, max_bytes: Optional[int] = None) -> Optional[str]:
+    """
+    Read a file as it exists at a ref, without starting a git process per file.
+
+    Args:
+        repo_path: Path to the git repository
+        ref: Commit-ish, e.g. "HEAD", "main" or an oid
+        path: File path relative to the repository root
+        max_bytes: Return None for files larger than this
+
+    Returns:
+        Optional[str]: The content decoded as UTF-8, or None if the file doesn't
+            exist at ref, is too large, or looks binary
+    """
+    content = _pool.read(repo_path, f"{ref}:{path}", max_bytes)
+    if content is None or b"\0" in content[:8192]:
+        return None
+    return content.decode("utf-8", "replace")
+
+
+def get_cat_file_pool() -> CatFilePool:
+    """Return the process-wide worker pool."""
+    return _pool
@@ -6,10 +6,11 @@ enabling tools to work with version control information. It handles
 repository discovery, status checking, and diff generation.
 
 Key Features:
-- Recursive repository discovery with depth limits
+- Iterative repository discovery with depth and count limits, cached per root
 - Safe command execution with timeouts
 - Comprehensive status information extraction
 - Support for staged and unstaged changes
+- Streaming diff reading that stops once a token budget is used up
 
 Security Considerations:
 - All git commands are run with timeouts to prevent hanging
@@ -17,8 +18,22 @@ Security Considerations:
 - Error handling for permission-denied scenarios
 """
 
+import codecs
+import hashlib
+import os
+import re
 import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Optional
+
+from .execution_context import RequestCancelledError, check_cancelled, current_execution_context, time_remaining
+from .file_cache import RACY_WINDOW_SECONDS
+from .file_watcher import add_invalidation_listener
 
 # Directories to ignore when searching for git repositories
 # These are typically build artifacts, dependencies, or cache directories
@@ -36,23 +51,62 @@ IGNORED_DIRS = {
 }
 
 
-def find_git_repositories(start_path: str, max_depth: int = 5) -> list[str]:
+# Upper bound on repositories returned by one discovery, so pointing a tool at
+# a home directory doesn't crawl the whole tree
+DEFAULT_MAX_REPOSITORIES = 100
+
+# Limit for a single git command
+GIT_COMMAND_TIMEOUT_SECONDS = 30
+
+# How often a waiting git command checks whether its request was cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+# How long discovery results are reused for the same root and depth
+DISCOVERY_CACHE_TTL_SECONDS = 60.0
+
+_discovery_cache: dict[tuple[str, int, int], tuple[float, list[str]]] = {}
+_discovery_cache_lock = threading.Lock()
+
+
+def clear_repository_cache() -> None:
+    """Forget cached repository discovery results."""
+    with _discovery_cache_lock:
+        _discovery_cache.clear()
+
+
+def _on_file_change(path: Optional[str], structural: bool) -> None:
+    # Repositories appear or disappear only through directory structure changes
+    if structural:
+        clear_repository_cache()
+
+
+add_invalidation_listener(_on_file_change)
+
+
+def find_git_repositories(
+    start_path: str, max_depth: int = 5, max_repositories: int = DEFAULT_MAX_REPOSITORIES
+) -> list[str]:
     """
-    Recursively find all git repositories starting from the given path.
+    Find all git repositories starting from the given path.
+
+    This function walks the directory tree breadth-first looking for .git
+    directories, which indicate the root of a git repository. It uses
+    os.scandir() so directory entries are classified from the d_type the
+    kernel returns, without a stat call per child. Hidden directories and
+    IGNORED_DIRS are pruned, symlinked directories are not followed, and the
+    walk stops once max_repositories have been found (shallowest first).
 
-    This function walks the directory tree looking for .git directories,
-    which indicate the root of a git repository. It respects depth limits
-    to prevent excessive recursion in deep directory structures.
+    Results are cached per (root, depth, limit) for DISCOVERY_CACHE_TTL_SECONDS,
+    and dropped early when the file watcher reports a structural change.
 
     Args:
         start_path: Directory to start searching from (must be absolute)
         max_depth: Maximum depth to search (default 5 prevents excessive recursion)
+        max_repositories: Stop after finding this many repositories
 
     Returns:
         List of absolute paths to git repositories, sorted alphabetically
     """
-    repositories = []
-
     try:
         # Create Path object - no need to resolve yet since the path might be
         # a translated Docker path that doesn't exist on the host
@@ -63,42 +117,58 @@ def find_git_repositories(start_path: str, max_depth: int = 5) -> list[str]:
             return []
 
         # Check if the path exists before trying to walk it
-        if not start_path.exists():
+        if not start_path.is_dir():
             return []
 
     except Exception:
         # If there's any issue with the path, return empty list
         return []
 
-    def _find_repos(current_path: Path, current_depth: int):
-        # Stop recursion if we've reached maximum depth
-        if current_depth > max_depth:
-            return
+    cache_key = (str(start_path), max_depth, max_repositories)
+    with _discovery_cache_lock:
+        cached = _discovery_cache.get(cache_key)
+    if cached is not None and time.monotonic() - cached[0] < DISCOVERY_CACHE_TTL_SECONDS:
+        return list(cached[1])
 
+    repositories = []
+    pending = deque([(str(start_path), 0)])
+    while pending and len(repositories) < max_repositories:
+        current_path, current_depth = pending.popleft()
+        subdirectories = []
+        is_repository = False
         try:
-            # Check if current directory contains a .git directory
-            git_dir = current_path / ".git"
-            if git_dir.exists() and git_dir.is_dir():
-                repositories.append(str(current_path))
-                # Don't search inside git repositories for nested repos
-                # This prevents finding submodules which should be handled separately
-                return
-
-            # Search subdirectories for more repositories
-            for item in current_path.iterdir():
-                if item.is_dir() and not item.name.startswith("."):
-                    # Skip common non-code directories to improve performance
-                    if item.name in IGNORED_DIRS:
+            with os.scandir(current_path) as entries:
+                for entry in entries:
+                    if entry.name == ".git":
+                        # .git is a directory in a repository root; a .git file marks a
+                        # submodule or linked worktree, which are handled separately
+                        is_repository = entry.is_dir()
+                        if is_repository:
+                            break
                         continue
-                    _find_repos(item, current_depth + 1)
-
-        except PermissionError:
-            # Skip directories we don't have permission to read
+                    if current_depth >= max_depth:
+                        continue
+                    if entry.name.startswith(".") or entry.name in IGNORED_DIRS:
+                        # Skip hidden and common non-code directories to improve performance
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+        except OSError:
+            # Skip directories we can't read (permissions, removed during the walk)
             # This is common for system directories or other users' files
-            pass
+            continue
 
-    _find_repos(start_path, 0)
-    return sorted(repositories)
+        if is_repository:
+            repositories.append(current_path)
+            # Don't search inside git repositories for nested repos
+            # This prevents finding submodules which should be handled separately
+            continue
+        pending.extend((path, current_depth + 1) for path in sorted(subdirectories))
+
+    repositories.sort()
+    with _discovery_cache_lock:
+        _discovery_cache[cache_key] = (time.monotonic(), repositories)
+    return list(repositories)
 
 
 def run_git_command(repo_path: str, command: list[str]) -> tuple[bool, str]:
@@ -106,7 +176,9 @@ def run_git_command(repo_path: str, command: list[str]) -> tuple[bool, str]:
     Run a git command in the specified repository.
 
     This function provides a safe way to execute git commands with:
-    - Timeout protection (30 seconds) to prevent hanging
+    - Timeout protection (GIT_COMMAND_TIMEOUT_SECONDS, or the request's
+      deadline if sooner) to prevent hanging
+    - The process killed as soon as the request is cancelled
     - Proper error handling and output capture
     - Working directory context management
 
@@ -118,28 +190,35 @@ def run_git_command(repo_path: str, command: list[str]) -> tuple[bool, str]:
         Tuple of (success, output/error)
         - success: True if command returned 0, False otherwise
         - output/error: stdout if successful, stderr or error message if failed
+
+    Raises:
+        RequestCancelledError: If the running request was cancelled or passed its deadline
     """
     # Verify the repository path exists before trying to use it
     if not Path(repo_path).exists():
         return False, f"Repository path does not exist: {repo_path}"
 
+    check_cancelled()
     try:
         # Execute git command with safety measures
-        result = subprocess.run(
+        process = subprocess.Popen(
             ["git"] + command,
             cwd=repo_path,  # Run in repository directory
-            capture_output=True,  # Capture stdout and stderr
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,  # Return strings instead of bytes
-            timeout=30,  # Prevent hanging on slow operations
         )
+        stdout, stderr = _communicate(process, time_remaining(GIT_COMMAND_TIMEOUT_SECONDS))
 
-        if result.returncode == 0:
-            return True, result.stdout
+        if process.returncode == 0:
+            return True, stdout
         else:
-            return False, result.stderr
+            return False, stderr
 
     except subprocess.TimeoutExpired:
-        return False, "Command timed out after 30 seconds"
+        return False, f"Command timed out after {GIT_COMMAND_TIMEOUT_SECONDS} seconds"
+    except RequestCancelledError:
+        raise
     except FileNotFoundError as e:
         # This can happen if git is not installed or repo_path issues
         return False, f"Git command failed - path not found: {str(e)}"
@@ -147,17 +226,121 @@ def run_git_command(repo_path: str, command: list[str]) -> tuple[bool, str]:
         return False, f"Git command failed: {str(e)}"
 
 
+def _communicate(process: subprocess.Popen, timeout: float) -> tuple[str, str]:
+    """
+    Collect a process's output, killing it on timeout or when the running request is cancelled.
+
+    Raises:
+        subprocess.TimeoutExpired: If the process ran longer than timeout
+        RequestCancelledError: If the running request was cancelled or passed its deadline
+    """
+    end = time.monotonic() + timeout
+    while True:
+        try:
+            return process.communicate(timeout=max(0.0, min(CANCEL_POLL_SECONDS, end - time.monotonic())))
+        except subprocess.TimeoutExpired:
+            try:
+                check_cancelled()
+                if time.monotonic() < end:
+                    continue
+            except RequestCancelledError:
+                process.kill()
+                process.communicate()
+                raise
+            process.kill()
+            process.communicate()
+            raise
+
+
+def parse_porcelain_v2(output: str) -> dict[str, any]:
+    """
+    Parse the output of ``git status --porcelain=v2 --branch -z``.
+
+    Records are NUL-terminated and paths are never quoted, so file names
+    containing spaces, newlines or " -> " come through intact. Rename and copy
+    records carry the original path as an extra NUL-separated field.
+
+    Args:
+        output: Raw command output
+
+    Returns:
+        Dictionary in the format returned by get_git_status()
+    """
+    status = {
+        "branch": "",
+        "upstream": "",
+        "ahead": 0,
+        "behind": 0,
+        "staged_files": [],
+        "unstaged_files": [],
+        "untracked_files": [],
+        "renamed_files": [],
+    }
+
+    fields = output.split("\0")
+    index = 0
+    while index < len(fields):
+        record = fields[index]
+        index += 1
+        if not record:
+            continue
+
+        kind = record[0]
+        if kind == "#":
+            # Branch headers: "# branch.<key> <value>"
+            _, key, value = (record.split(" ", 2) + ["", ""])[:3]
+            if key == "branch.head" and value != "(detached)":
+                status["branch"] = value
+            elif key == "branch.upstream":
+                status["upstream"] = value
+            elif key == "branch.ab":
+                ahead, behind = value.split(" ")
+                status["ahead"] = int(ahead.lstrip("+"))
+                status["behind"] = int(behind.lstrip("-"))
+        elif kind == "1":
+            # 1 XY sub mH mI mW hH hI path
+            parts = record.split(" ", 8)
+            _add_changed_path(status, parts[1], parts[8])
+        elif kind == "2":
+            # 2 XY sub mH mI mW hH hI Xscore path, followed by the original path
+            parts = record.split(" ", 9)
+            original = fields[index] if index < len(fields) else ""
+            index += 1
+            _add_changed_path(status, parts[1], parts[9])
+            status["renamed_files"].append((original, parts[9]))
+        elif kind == "u":
+            # u XY sub m1 m2 m3 mW h1 h2 h3 path - unmerged, needs resolving in the working tree
+            parts = record.split(" ", 10)
+            status["unstaged_files"].append(parts[10])
+        elif kind == "?":
+            status["untracked_files"].append(record[2:])
+        # "!" (ignored) records are only emitted with --ignored
+
+    return status
+
+
+def _add_changed_path(status: dict[str, any], xy: str, path: str) -> None:
+    """Sort a changed entry into staged/unstaged lists by its XY code ("." = unchanged)."""
+    # X: index vs HEAD - M=modified, T=type changed, A=added, D=deleted, R=renamed, C=copied
+    if xy[0] in "MTADRC":
+        status["staged_files"].append(path)
+    # Y: working tree vs index
+    if xy[1] in "MTD":
+        status["unstaged_files"].append(path)
+
+
 def get_git_status(repo_path: str) -> dict[str, any]:
     """
     Get comprehensive git status information for a repository.
 
     This function gathers various pieces of repository state including:
-    - Current branch name
+    - Current branch name and upstream
     - Commits ahead/behind upstream
-    - Lists of staged, unstaged, and untracked files
+    - Lists of staged, unstaged, untracked and renamed files
 
-    The function is resilient to repositories without remotes or
-    in detached HEAD state.
+    Everything comes from a single ``git status --porcelain=v2 --branch -z``
+    call. The function is resilient to repositories without remotes or in
+    detached HEAD state.
 
     Args:
         repo_path: Path to the git repository
@@ -165,76 +348,469 @@ def get_git_status(repo_path: str) -> dict[str, any]:
     Returns:
         Dictionary with status information:
         - branch: Current branch name (empty if detached)
+        - upstream: Upstream branch (empty if none is set)
         - ahead: Number of commits ahead of upstream
         - behind: Number of commits behind upstream
-        - staged_files: List of files with staged changes
-        - unstaged_files: List of files with unstaged changes
+        - staged_files: List of files with staged changes (new path for renames)
+        - unstaged_files: List of files with unstaged changes or merge conflicts
         - untracked_files: List of untracked files
+        - renamed_files: List of (old_path, new_path) for staged renames and copies
     """
-    # Initialize status structure with default values
-    status = {
-        "branch": "",
-        "ahead": 0,
-        "behind": 0,
-        "staged_files": [],
-        "unstaged_files": [],
-        "untracked_files": [],
-    }
+    success, output = run_git_command(repo_path, ["status", "--porcelain=v2", "--branch", "-z"])
+    if not success:
+        return parse_porcelain_v2("")
+    return parse_porcelain_v2(output)
+
+
+# Seconds a streamed diff may run before git is stopped (matches run_git_command)
+DIFF_TIMEOUT_SECONDS = 30
+
+# Characters per token assumed while streaming (matches estimate_tokens)
+_CHARS_PER_TOKEN = 4
+
+# Output discarded (as a multiple of the budget) before git is stopped
+_DIFF_DISCARD_FACTOR = 4
+
+# Header lines kept for a file whose diff is being skipped, enough to find its path
+_MAX_HEADER_LINES = 8
+
+
+@dataclass
+class FileDiff:
+    """
+    One file's section of a git diff.
+
+    Attributes:
+        path: Path of the file (the new path for renames)
+        text: The section, starting at its "diff --git" line
+        tokens: Estimated tokens of text
+    """
+
+    path: str
+    text: str
+    tokens: int
+
+
+@dataclass
+class DiffStream:
+    """
+    Result of stream_git_diff().
+
+    Attributes:
+        success: False if git could not be run or failed
+        files: File diffs that fit within the budget, in git's output order
+        truncated_files: Files whose diff was left out because it did not fit
+        complete: True if git's output was read to the end; when False, files
+            after the last one in files/truncated_files were never seen
+        error: Error message when success is False
+    """
+
+    success: bool
+    files: list[FileDiff] = field(default_factory=list)
+    truncated_files: list[str] = field(default_factory=list)
+    complete: bool = True
+    error: str = ""
+
+
+def _unquote_git_path(path: str) -> str:
+    """Undo git's C-style quoting of paths with special characters."""
+    if len(path) >= 2 and path[0] == path[-1] == '"':
+        return codecs.escape_decode(path[1:-1].encode("utf-8"))[0].decode("utf-8", "replace")
+    return path
+
+
+def _diff_section_path(header: list[str]) -> str:
+    """Find the file path in the header lines of one diff section."""
+    for prefix, strip in (("+++ ", "b/"), ("--- ", "a/"), ("rename to ", ""), ("copy to ", "")):
+        for line in header:
+            if line.startswith(prefix):
+                # git appends a tab to ---/+++ names containing spaces
+                name = _unquote_git_path(line[len(prefix) :].rstrip("\n").rstrip("\t"))
+                if name == "/dev/null":
+                    continue
+                return name[len(strip) :] if strip and name.startswith(strip) else name
+
+    # Binary or mode-only changes: "diff --git a/<path> b/<path>", both halves equal
+    names = header[0][len("diff --git ") :].rstrip("\n")
+    if names.startswith('"'):
+        closing = names.index('"', 1) if '"' in names[1:] else len(names) - 1
+        return _unquote_git_path(names[: closing + 1])[2:]
+    return names[2 : 2 + (len(names) - 5) // 2]
+
+
+# Diff results kept for re-runs on an unchanged repository
+DIFF_CACHE_MAX_ENTRIES = 32
+
+_diff_cache: OrderedDict[tuple, DiffStream] = OrderedDict()
+_diff_cache_lock = threading.Lock()
 
-    # Get current branch name (empty if in detached HEAD state)
-    success, branch = run_git_command(repo_path, ["branch", "--show-current"])
-    if success:
-        status["branch"] = branch.strip()
-
-    # Get ahead/behind information relative to upstream branch
-    if status["branch"]:
-        success, ahead_behind = run_git_command(
-            repo_path,
-            [
-                "rev-list",
-                "--count",
-                "--left-right",
-                f"{status['branch']}@{{upstream}}...HEAD",
-            ],
+
+def clear_diff_cache() -> None:
+    """Forget cached diff results."""
+    with _diff_cache_lock:
+        _diff_cache.clear()
+
+
+def _stat_signature(path: str) -> Optional[tuple[int, int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino, stat.st_ctime_ns)
+
+
+def repository_state_key(repo_path: str, changed_files: list[str], refs: tuple[str, ...] = ()) -> Optional[tuple]:
+    """
+    Describe the repository state a diff depends on, without reading file contents.
+
+    The key combines the HEAD oid, the oids refs resolve to, the index file's
+    stat signature and the stat signatures of the changed paths in the working
+    tree. Any commit, checkout, staging operation or edit to a changed file
+    produces a different key; edits to other files show up as a different
+    changed_files list.
+
+    Args:
+        repo_path: Path to the git repository
+        changed_files: Paths the diff covers, relative to repo_path
+        refs: Additional revisions the diff depends on
+
+    Returns:
+        Optional[tuple]: The key, or None if the state can't be pinned down
+            (unborn HEAD, unknown ref, or a file modified too recently to
+            tell later writes apart by stat)
+    """
+    success, output = run_git_command(repo_path, ["rev-parse", "--git-dir", "HEAD", *refs])
+    if not success:
+        return None
+    git_dir, *oids = output.splitlines()
+    if len(oids) != len(refs) + 1:
+        return None
+
+    signatures = [_stat_signature(os.path.join(repo_path, git_dir, "index"))]
+    signatures.extend(_stat_signature(os.path.join(repo_path, path)) for path in changed_files)
+    racy_after = time.time_ns() - RACY_WINDOW_SECONDS * 1e9
+    if any(signature and signature[0] > racy_after for signature in signatures):
+        return None
+    return (tuple(oids), tuple(changed_files), tuple(signatures))
+
+
+def stream_git_diff(
+    repo_path: str,
+    command: list[str],
+    max_tokens: int,
+    file_overhead_tokens: int = 0,
+    changed_files: Optional[list[str]] = None,
+    refs: tuple[str, ...] = (),
+    order: Optional[list[str]] = None,
+) -> DiffStream:
+    """
+    Run a git diff command and read its output incrementally within a token budget.
+
+    Output is split into per-file sections at "diff --git" lines and counted as
+    it arrives (~4 characters per token, like estimate_tokens). A section that
+    would not fit in the remaining budget is discarded as it streams, so it is
+    never held in memory, and later files that still fit are kept. git is
+    stopped once no further file can fit, or once the discarded output reaches
+    four times the budget, so memory and wall time are bounded by the budget
+    rather than by the size of the diff.
+
+    When changed_files is given, results are cached on the repository state
+    (see repository_state_key()), so re-running the same diff on an unchanged
+    tree returns the previous result without starting git diff.
+
+    Args:
+        repo_path: Path to the git repository (working directory)
+        command: Git diff command as a list of arguments (excluding 'git' itself)
+        max_tokens: Token budget for the included sections
+        file_overhead_tokens: Tokens the caller adds per included file (e.g. headers)
+        changed_files: Paths the command covers (from --name-only), enables caching
+        refs: Revisions named in command, e.g. the compare_to ref
+        order: Paths in the order their sections should be produced (files not
+            listed follow in git's order), so the budget goes to them first
+
+    Returns:
+        DiffStream: Included file diffs, skipped files and whether output was complete
+
+    Raises:
+        RequestCancelledError: If the running request was cancelled (git is killed)
+    """
+
+    def read() -> DiffStream:
+        return _read_diff_stream(repo_path, command, max_tokens, file_overhead_tokens, order)
+
+    if changed_files is None:
+        return read()
+    extra = (max_tokens, file_overhead_tokens, tuple(order or ()))
+    return _cached_diff_result(repo_path, command, changed_files, refs, extra, read)
+
+
+def _cached_diff_result(
+    repo_path: str, command: list[str], changed_files: list[str], refs: tuple[str, ...], extra: tuple, compute
+):
+    """Return compute()'s result for a diff command, cached on repository state when it succeeds."""
+    state = repository_state_key(repo_path, changed_files, refs)
+    cache_key = (repo_path, tuple(command), extra, state) if state else None
+    if cache_key is not None:
+        with _diff_cache_lock:
+            cached = _diff_cache.get(cache_key)
+            if cached is not None:
+                _diff_cache.move_to_end(cache_key)
+                return cached
+
+    result = compute()
+    if cache_key is not None and result is not None and getattr(result, "success", True):
+        with _diff_cache_lock:
+            _diff_cache[cache_key] = result
+            while len(_diff_cache) > DIFF_CACHE_MAX_ENTRIES:
+                _diff_cache.popitem(last=False)
+    return result
+
+
+def _escape_order_pattern(path: str) -> str:
+    """Escape a path for use as an exact-match pattern in a git orderfile."""
+    for special in "\\*?[":
+        path = path.replace(special, "\\" + special)
+    # Lines starting with "#" would be comments
+    return "\\" + path if path.startswith("#") else path
+
+
+def _read_diff_stream(
+    repo_path: str, command: list[str], max_tokens: int, file_overhead_tokens: int, order: Optional[list[str]] = None
+) -> DiffStream:
+    """Run git diff and split its output within the budget (see stream_git_diff())."""
+    if not Path(repo_path).exists():
+        return DiffStream(success=False, error=f"Repository path does not exist: {repo_path}")
+
+    order_file = None
+    if order:
+        # Orderfile patterns are line-based, so paths containing newlines keep git's order
+        order_file = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".order", delete=False)
+        with order_file:
+            order_file.writelines(_escape_order_pattern(path) + "\n" for path in order if "\n" not in path)
+        command = command[:1] + [f"-O{order_file.name}"] + command[1:]
+
+    # stderr goes to a file so a chatty git can't block on a full pipe while stdout is read
+    stderr = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(
+            ["git", "-c", "core.quotePath=false"] + command,
+            cwd=repo_path,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
         )
-        if success:
-            if ahead_behind.strip():
-                parts = ahead_behind.strip().split()
-                if len(parts) == 2:
-                    status["behind"] = int(parts[0])
-                    status["ahead"] = int(parts[1])
-        # Note: This will fail gracefully if branch has no upstream set
-
-    # Get file status using porcelain format for machine parsing
-    # Format: XY filename where X=staged status, Y=unstaged status
-    success, status_output = run_git_command(repo_path, ["status", "--porcelain"])
-    if success:
-        for line in status_output.strip().split("\n"):
-            if not line:
+    except OSError as e:
+        stderr.close()
+        if order_file is not None:
+            os.unlink(order_file.name)
+        return DiffStream(success=False, error=f"Git command failed: {str(e)}")
+
+    timer = threading.Timer(time_remaining(DIFF_TIMEOUT_SECONDS), process.kill)
+    timer.start()
+    context = current_execution_context()
+
+    result = DiffStream(success=True)
+    remaining = max_tokens
+    discarded_chars = 0
+    header: list[str] = []
+    body: list[str] = []
+    chars = 0
+    skipping = False
+
+    def finish_section() -> None:
+        nonlocal remaining
+        if not header:
+            return
+        path = _diff_section_path(header)
+        if skipping:
+            result.truncated_files.append(path)
+            return
+        text = "".join(header + body)
+        tokens = len(text) // _CHARS_PER_TOKEN
+        result.files.append(FileDiff(path=path, text=text, tokens=tokens))
+        remaining -= tokens + file_overhead_tokens
+
+    try:
+        for raw_line in process.stdout:
+            line = raw_line.decode("utf-8", "replace")
+            if line.startswith("diff --git "):
+                finish_section()
+                header, body, chars, skipping = [line], [], len(line), False
+                if context is not None and context.cancelled:
+                    # Stop git; the request is abandoned and check_cancelled() below raises
+                    result.complete = False
+                    break
+                if (
+                    remaining <= file_overhead_tokens
+                    or discarded_chars >= max_tokens * _CHARS_PER_TOKEN * _DIFF_DISCARD_FACTOR
+                ):
+                    # Nothing more can fit; don't make git produce the rest
+                    skipping = True
+                    result.complete = False
+                    break
+                continue
+            if not header:
                 continue
 
-            status_code = line[:2]  # Two-character status code
-            path_info = line[3:]  # Filename (after space)
-
-            # Parse staged changes (first character of status code)
-            if status_code[0] == "R":
-                # Special handling for renamed files
-                # Format is "old_path -> new_path"
-                if " -> " in path_info:
-                    _, new_path = path_info.split(" -> ", 1)
-                    status["staged_files"].append(new_path)
-                else:
-                    status["staged_files"].append(path_info)
-            elif status_code[0] in ["M", "A", "D", "C"]:
-                # M=modified, A=added, D=deleted, C=copied
-                status["staged_files"].append(path_info)
-
-            # Parse unstaged changes (second character of status code)
-            if status_code[1] in ["M", "D"]:
-                # M=modified, D=deleted in working tree
-                status["unstaged_files"].append(path_info)
-            elif status_code == "??":
-                # Untracked files have special marker "??"
-                status["untracked_files"].append(path_info)
+            chars += len(line)
+            if skipping:
+                discarded_chars += len(line)
+                if len(header) < _MAX_HEADER_LINES and not line.startswith("@@"):
+                    header.append(line)
+                continue
+            if line.startswith("@@") or body or len(header) >= _MAX_HEADER_LINES:
+                body.append(line)
+            else:
+                header.append(line)
+            if chars // _CHARS_PER_TOKEN + file_overhead_tokens > remaining:
+                # Too large for what's left: drop what was buffered and skip to the next file
+                skipping = True
+                discarded_chars += chars
+                body = []
+        else:
+            finish_section()
+            header = []
+    finally:
+        if not result.complete:
+            process.kill()
+            if header:
+                result.truncated_files.append(_diff_section_path(header))
+        process.stdout.close()
+        returncode = process.wait()
+        timer.cancel()
+        stderr.seek(0)
+        error = stderr.read().decode("utf-8", "replace")
+        stderr.close()
+        if order_file is not None:
+            os.unlink(order_file.name)
+
+    if result.complete and returncode != 0:
+        timed_out = returncode < 0
+        return DiffStream(
+            success=False,
+            error=f"Command timed out after {DIFF_TIMEOUT_SECONDS} seconds" if timed_out else error,
+        )
+    check_cancelled()
+    return result
+
 
-    return status
+@dataclass
+class DiffStat:
+    """
+    Changed line counts for one file, from git diff --numstat.
+
+    Attributes:
+        path: Path of the file (the new path for renames)
+        added: Lines added, or None for binary files
+        deleted: Lines deleted, or None for binary files
+    """
+
+    path: str
+    added: Optional[int]
+    deleted: Optional[int]
+
+    @property
+    def changed_lines(self) -> int:
+        return (self.added or 0) + (self.deleted or 0)
+
+    def summary(self) -> str:
+        """One-line summary in the spirit of git diff --stat."""
+        if self.added is None:
+            return f"{self.path} | binary"
+        return f"{self.path} | +{self.added} -{self.deleted}"
+
+
+def parse_numstat(output: str) -> list[DiffStat]:
+    """
+    Parse the output of ``git diff --numstat -z``.
+
+    Renames and copies have an empty path field followed by the old and new
+    paths as separate NUL-terminated fields.
+    """
+    stats = []
+    fields = output.split("\0")
+    index = 0
+    while index < len(fields):
+        record = fields[index]
+        index += 1
+        if not record:
+            continue
+        added, deleted, path = record.split("\t", 2)
+        if not path:
+            # Rename: old path, then new path
+            path = fields[index + 1] if index + 1 < len(fields) else ""
+            index += 2
+        stats.append(
+            DiffStat(
+                path=path,
+                added=None if added == "-" else int(added),
+                deleted=None if deleted == "-" else int(deleted),
+            )
+        )
+    return stats
+
+
+def git_diff_numstat(
+    repo_path: str, command: list[str], changed_files: Optional[list[str]] = None, refs: tuple[str, ...] = ()
+) -> Optional[list[DiffStat]]:
+    """
+    Get per-file changed line counts for a git diff command.
+
+    Cached on repository state like stream_git_diff() when changed_files is given.
+
+    Args:
+        repo_path: Path to the git repository
+        command: Git diff command (without --numstat)
+        changed_files: Paths the command covers, enables caching
+        refs: Revisions named in command
+
+    Returns:
+        Optional[list[DiffStat]]: Counts per file, or None if git failed
+    """
+
+    def read() -> Optional[list[DiffStat]]:
+        success, output = run_git_command(repo_path, command + ["--numstat", "-z"])
+        return parse_numstat(output) if success else None
+
+    if changed_files is None:
+        return read()
+    return _cached_diff_result(repo_path, command + ["--numstat"], changed_files, refs, (), read)
+
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def split_diff_hunks(diff_text: str) -> tuple[str, list[str]]:
+    """
+    Split one file's diff section into its header and hunks.
+
+    Args:
+        diff_text: A section starting at its "diff --git" line (see FileDiff.text)
+
+    Returns:
+        tuple[str, list[str]]: (header lines before the first hunk, hunk texts
+            each starting with its "@@" line); binary and mode-only changes have
+            no hunks
+    """
+    parts = re.split(r"(?m)^(?=@@ )", diff_text)
+    return parts[0], parts[1:]
+
+
+def hunk_hash(repo_path: str, file_path: str, hunk: str) -> str:
+    """
+    Identify a diff hunk independently of where it sits in the file.
+
+    The line numbers in the "@@" header are left out, so a hunk keeps its hash
+    when edits elsewhere in the file shift it up or down.
+
+    Args:
+        repo_path: Repository containing the file
+        file_path: Path of the file in the repository
+        hunk: Hunk text (or a whole section for changes without hunks)
+
+    Returns:
+        str: Hex digest
+    """
+    content = _HUNK_HEADER.sub("@@", hunk, count=1)
+    digest = hashlib.sha256(f"{repo_path}\0{file_path}\0".encode())
+    digest.update(content.encode("utf-8", "replace"))
+    return digest.hexdigest()[:32]
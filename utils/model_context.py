@@ -7,7 +7,7 @@ being used, not global constants.
 """
 
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Optional
 
 from config import DEFAULT_MODEL
@@ -31,6 +31,180 @@ class TokenAllocation:
         """Tokens available for the actual prompt after allocations."""
         return self.content_tokens - self.file_tokens - self.history_tokens
 
+    @classmethod
+    def for_capacity(cls, total_tokens: int, reserved_for_response: Optional[int] = None) -> "TokenAllocation":
+        """
+        Calculate the baseline allocation for a model context window.
+
+        Args:
+            total_tokens: Model context window size
+            reserved_for_response: Override response token reservation
+
+        Returns:
+            TokenAllocation with the baseline ratios applied
+        """
+        if total_tokens < 300_000:
+            # Smaller context models (O3): Conservative allocation
+            content_ratio = 0.6  # 60% for content
+            response_ratio = 0.4  # 40% for response
+            file_ratio = 0.3  # 30% of content for files
+            history_ratio = 0.5  # 50% of content for history
+        else:
+            # Larger context models (Gemini): More generous allocation
+            content_ratio = 0.8  # 80% for content
+            response_ratio = 0.2  # 20% for response
+            file_ratio = 0.4  # 40% of content for files
+            history_ratio = 0.4  # 40% of content for history
+
+        content_tokens = int(total_tokens * content_ratio)
+        if reserved_for_response is not None:
+            response_tokens = reserved_for_response
+        else:
+            response_tokens = int(total_tokens * response_ratio)
+
+        return cls(
+            total_tokens=total_tokens,
+            content_tokens=content_tokens,
+            response_tokens=response_tokens,
+            file_tokens=int(content_tokens * file_ratio),
+            history_tokens=int(content_tokens * history_ratio),
+        )
+
+
+# Segments that share the content budget, highest priority first. The new
+# request always comes first; files named in this request outrank old history.
+BUDGET_SEGMENTS = ("new_content", "files", "history")
+
+
+@dataclass(frozen=True)
+class TokenBudgetPlan:
+    """
+    Distribution of the content budget across prompt segments.
+
+    Each segment is first guaranteed its baseline share from TokenAllocation
+    (or its demand, if smaller). Whatever the segments did not need is then
+    handed out in BUDGET_SEGMENTS order to segments whose demand exceeds their
+    baseline share. A demand of None means "unknown": the segment can absorb
+    any budget left over.
+
+    Attributes:
+        content_tokens: Total content budget being distributed
+        demands: Measured demand per segment (None if unknown)
+        baseline: Baseline share per segment from the fixed ratios
+        allocations: Tokens granted per segment
+    """
+
+    content_tokens: int
+    demands: dict[str, Optional[int]] = field(default_factory=dict)
+    baseline: dict[str, int] = field(default_factory=dict)
+    allocations: dict[str, int] = field(default_factory=dict)
+
+    def allocation(self, segment: str) -> int:
+        """Tokens granted to a segment."""
+        return self.allocations.get(segment, 0)
+
+    @property
+    def unallocated(self) -> int:
+        """Budget not granted to any segment."""
+        return max(0, self.content_tokens - sum(self.allocations.values()))
+
+    def settle(self, segment: str, used_tokens: int) -> "TokenBudgetPlan":
+        """
+        Record a segment's actual usage and redistribute what it didn't use.
+
+        The segment is pinned to the tokens it actually used; the freed budget is
+        offered to the other segments in priority order, up to their demand.
+
+        Args:
+            segment: Segment whose usage is now known
+            used_tokens: Tokens the segment actually consumed
+
+        Returns:
+            TokenBudgetPlan: A new plan with the segment settled
+        """
+        allocations = dict(self.allocations)
+        demands = dict(self.demands)
+        used_tokens = max(0, min(used_tokens, allocations.get(segment, 0)))
+        allocations[segment] = used_tokens
+        demands[segment] = used_tokens
+
+        spare = self.content_tokens - sum(allocations.values())
+        for name in BUDGET_SEGMENTS:
+            if spare <= 0:
+                break
+            if name == segment:
+                continue
+            demand = demands.get(name)
+            wanted = spare if demand is None else max(0, demand - allocations.get(name, 0))
+            grant = min(wanted, spare)
+            allocations[name] = allocations.get(name, 0) + grant
+            spare -= grant
+
+        return TokenBudgetPlan(
+            content_tokens=self.content_tokens,
+            demands=demands,
+            baseline=dict(self.baseline),
+            allocations=allocations,
+        )
+
+    def to_metadata(self) -> dict[str, Any]:
+        """Format the plan for ToolOutput.metadata."""
+        return {
+            "content_tokens": self.content_tokens,
+            "demands": dict(self.demands),
+            "baseline": dict(self.baseline),
+            "allocations": dict(self.allocations),
+            "unallocated": self.unallocated,
+        }
+
+
+def plan_token_budget(allocation: TokenAllocation, demands: dict[str, Optional[int]]) -> TokenBudgetPlan:
+    """
+    Distribute the content budget by priority and measured demand.
+
+    The plan is a pure function of its inputs, so the same allocation and
+    demands always produce the same plan.
+
+    Args:
+        allocation: Baseline allocation for the model
+        demands: Estimated tokens wanted per segment (see BUDGET_SEGMENTS);
+            missing or None entries are treated as unknown
+
+    Returns:
+        TokenBudgetPlan: The allocation plan
+    """
+    content_tokens = allocation.content_tokens
+    baseline = {
+        "new_content": max(0, content_tokens - allocation.file_tokens - allocation.history_tokens),
+        "files": allocation.file_tokens,
+        "history": allocation.history_tokens,
+    }
+    demands = {name: demands.get(name) for name in BUDGET_SEGMENTS}
+    allocations = dict.fromkeys(BUDGET_SEGMENTS, 0)
+
+    # First pass: every segment gets its baseline share, or its demand if that is smaller
+    remaining = content_tokens
+    for name in BUDGET_SEGMENTS:
+        demand = demands[name]
+        grant = baseline[name] if demand is None else min(baseline[name], max(0, demand))
+        grant = min(grant, remaining)
+        allocations[name] = grant
+        remaining -= grant
+
+    # Second pass: hand out what was left unused, by priority, to segments that want more
+    for name in BUDGET_SEGMENTS:
+        if remaining <= 0:
+            break
+        demand = demands[name]
+        wanted = remaining if demand is None else max(0, demand - allocations[name])
+        grant = min(wanted, remaining)
+        allocations[name] += grant
+        remaining -= grant
+
+    plan = TokenBudgetPlan(content_tokens=content_tokens, demands=demands, baseline=baseline, allocations=allocations)
+    logger.debug(f"Token budget plan: demands={demands} allocations={allocations}")
+    return plan
+
 
 class ModelContext:
     """
@@ -72,50 +246,29 @@ class ModelContext:
         Returns:
             TokenAllocation with calculated budgets
         """
-        total_tokens = self.capabilities.max_tokens
-
-        # Dynamic allocation based on model capacity
-        if total_tokens < 300_000:
-            # Smaller context models (O3): Conservative allocation
-            content_ratio = 0.6  # 60% for content
-            response_ratio = 0.4  # 40% for response
-            file_ratio = 0.3  # 30% of content for files
-            history_ratio = 0.5  # 50% of content for history
-        else:
-            # Larger context models (Gemini): More generous allocation
-            content_ratio = 0.8  # 80% for content
-            response_ratio = 0.2  # 20% for response
-            file_ratio = 0.4  # 40% of content for files
-            history_ratio = 0.4  # 40% of content for history
-
-        # Calculate allocations
-        content_tokens = int(total_tokens * content_ratio)
-        if reserved_for_response is not None:
-            response_tokens = reserved_for_response
-        else:
-            response_tokens = int(total_tokens * response_ratio)
-
-        # Sub-allocations within content budget
-        file_tokens = int(content_tokens * file_ratio)
-        history_tokens = int(content_tokens * history_ratio)
-
-        allocation = TokenAllocation(
-            total_tokens=total_tokens,
-            content_tokens=content_tokens,
-            response_tokens=response_tokens,
-            file_tokens=file_tokens,
-            history_tokens=history_tokens,
-        )
+        allocation = TokenAllocation.for_capacity(self.capabilities.max_tokens, reserved_for_response)
 
         logger.debug(f"Token allocation for {self.model_name}:")
         logger.debug(f"  Total: {allocation.total_tokens:,}")
-        logger.debug(f"  Content: {allocation.content_tokens:,} ({content_ratio:.0%})")
-        logger.debug(f"  Response: {allocation.response_tokens:,} ({response_ratio:.0%})")
-        logger.debug(f"  Files: {allocation.file_tokens:,} ({file_ratio:.0%} of content)")
-        logger.debug(f"  History: {allocation.history_tokens:,} ({history_ratio:.0%} of content)")
+        logger.debug(f"  Content: {allocation.content_tokens:,}")
+        logger.debug(f"  Response: {allocation.response_tokens:,}")
+        logger.debug(f"  Files: {allocation.file_tokens:,}")
+        logger.debug(f"  History: {allocation.history_tokens:,}")
 
         return allocation
 
+    def plan_token_budget(self, demands: dict[str, Optional[int]]) -> TokenBudgetPlan:
+        """
+        Distribute this model's content budget by segment demand.
+
+        Args:
+            demands: Estimated tokens wanted per segment (see BUDGET_SEGMENTS)
+
+        Returns:
+            TokenBudgetPlan: The allocation plan
+        """
+        return plan_token_budget(self.calculate_token_allocation(), demands)
+
     def estimate_tokens(self, text: str) -> int:
         """
         Estimate token count for text using model-specific tokenizer.
@@ -0,0 +1,104 @@
+"""
+Segment-based prompt assembly
+
+Tool prompts are built from several large pieces: embedded file contents,
+conversation history, the user's request and a handful of instruction blocks.
+Concatenating those pieces with f-strings at every layer produced several full
+copies of multi-megabyte prompts per request.
+
+PromptBuilder collects the pieces as named segments instead. Each segment is
+token-estimated once when it is added, so the per-segment breakdown is available
+without touching the final payload, and the prompt string itself is materialized
+exactly once - at the provider boundary - by a single join.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from .token_utils import estimate_tokens
+
+
+@dataclass(frozen=True)
+class PromptSegment:
+    """A named piece of a prompt with its estimated token count."""
+
+    name: str
+    text: str
+    tokens: int
+
+
+class PromptBuilder:
+    """
+    Collects named prompt segments and materializes them once.
+
+    Segments are joined in insertion order with no implicit separator, so
+    callers control whitespace exactly as they would in an f-string. Segment
+    names do not need to be unique; repeated names are summed in the token
+    breakdown.
+    """
+
+    def __init__(self):
+        self._segments: list[PromptSegment] = []
+        self._built: Optional[str] = None
+
+    def add(self, name: str, text: Optional[str]) -> "PromptBuilder":
+        """
+        Append a segment to the prompt.
+
+        Empty or None text is ignored so optional sections can be added
+        unconditionally.
+
+        Args:
+            name: Segment name used for token accounting (e.g. "files", "user_request")
+            text: Segment text
+
+        Returns:
+            PromptBuilder: self, to allow chaining
+        """
+        if text:
+            self._segments.append(PromptSegment(name=name, text=text, tokens=estimate_tokens(text)))
+            self._built = None
+        return self
+
+    @property
+    def segments(self) -> list[PromptSegment]:
+        """Segments in prompt order."""
+        return list(self._segments)
+
+    @property
+    def total_tokens(self) -> int:
+        """Estimated tokens across all segments."""
+        return sum(segment.tokens for segment in self._segments)
+
+    def token_breakdown(self) -> dict[str, int]:
+        """
+        Get estimated tokens per segment name.
+
+        Returns:
+            dict[str, int]: Segment name to estimated tokens, in first-seen order
+        """
+        breakdown: dict[str, int] = {}
+        for segment in self._segments:
+            breakdown[segment.name] = breakdown.get(segment.name, 0) + segment.tokens
+        return breakdown
+
+    def build(self) -> str:
+        """
+        Materialize the prompt.
+
+        The result is cached until another segment is added, so repeated calls
+        (e.g. a provider retry) do not copy the payload again.
+
+        Returns:
+            str: The complete prompt text
+        """
+        if self._built is None:
+            self._built = "".join(segment.text for segment in self._segments)
+        return self._built
+
+    def __len__(self) -> int:
+        """Length of the materialized prompt in characters, without building it."""
+        return sum(len(segment.text) for segment in self._segments)
+
+    def __str__(self) -> str:
+        return self.build()
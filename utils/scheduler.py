@@ -0,0 +1,282 @@
+"""
+Admission control and priority scheduling for tool calls
+
+Every tool call used to start as soon as it arrived. A burst of analyze calls
+on large directories could hold several prompts' worth of file content in
+memory at once while a quick chat waited behind them for the event loop and the
+provider connections. The ToolScheduler sits in front of tool dispatch:
+
+- at most ``max_concurrency`` calls run at once
+- each call is weighted by its estimated prompt size in tokens, and calls are
+  only admitted while the running calls' weights fit in ``capacity_tokens``
+  (a call heavier than the whole capacity still runs, alone)
+- interactive tools (chat) are admitted before batch tools (analyze,
+  codereview, precommit, ...); within a class calls are admitted in arrival
+  order, and a waiting call that doesn't fit yet is not overtaken by later
+  calls of its class
+- ``reserved_interactive`` slots are held back for interactive tools, so a
+  chat doesn't wait behind long batch calls that fill every other slot
+- a call that waits longer than ``queue_timeout`` seconds fails with
+  QueueTimeoutError instead of running late
+
+A call abandoned at its deadline or by a client cancel returns right away, but
+its worker thread may keep running until it reaches a cancellation check or its
+provider request times out. Such workers are passed to track_abandoned() and
+keep counting against max_concurrency until they finish, so repeated cancels
+can't push the real number of running pipelines past the limit.
+
+Queue depth, running calls and recent wait times are reported by stats() and
+shown by get_version, which (like get_token_usage) is answered by the server
+itself without going through the scheduler.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from stat import S_ISDIR
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tools a user is typically waiting on; admitted ahead of batch tools
+INTERACTIVE_TOOLS = frozenset({"chat"})
+
+INTERACTIVE_PRIORITY = 0
+BATCH_PRIORITY = 1
+
+# Weight of a directory argument, whose size isn't known until it is expanded.
+# Matches the fallback file budget, which caps what a directory can contribute.
+DIRECTORY_WEIGHT_TOKENS = 100_000
+
+# Number of recent wait times kept for stats
+WAIT_SAMPLES = 256
+
+
+class QueueTimeoutError(TimeoutError):
+    """Raised when a tool call waits longer than the queue timeout to be admitted."""
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    tool_name: str = field(compare=False)
+    weight: int = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+def estimate_request_tokens(arguments: dict[str, Any]) -> int:
+    """
+    Estimate how many tokens of content a tool call will hold while it runs.
+
+    String arguments count in full; each entry in ``files`` (and precommit's
+    ``path``) counts with its size on disk, or DIRECTORY_WEIGHT_TOKENS for a
+    directory. Nothing is read, so the estimate costs one stat per path.
+
+    Args:
+        arguments: Raw tool arguments from the client
+
+    Returns:
+        int: Estimated tokens
+    """
+    from .file_utils import translate_path_for_environment
+
+    chars = sum(len(value) for value in arguments.values() if isinstance(value, str))
+    paths = [path for path in arguments.get("files") or [] if isinstance(path, str)]
+    if isinstance(arguments.get("path"), str):
+        paths.append(arguments["path"])
+
+    tokens = chars // 4
+    for path in paths:
+        try:
+            stat = os.stat(translate_path_for_environment(path))
+        except (OSError, ValueError):
+            continue
+        tokens += DIRECTORY_WEIGHT_TOKENS if S_ISDIR(stat.st_mode) else stat.st_size // 4
+    return tokens
+
+
+class ToolScheduler:
+    """
+    Admits tool calls by priority, within a concurrency limit and a token budget.
+
+    Args:
+        max_concurrency: Maximum number of calls running at once
+        capacity_tokens: Maximum combined estimated weight of running calls
+        queue_timeout: Seconds a call may wait for admission, or None to wait indefinitely
+        interactive_tools: Tool names admitted ahead of all others
+        reserved_interactive: Slots batch tools may not take; at most max_concurrency - 1
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        capacity_tokens: int,
+        queue_timeout: Optional[float],
+        interactive_tools: frozenset[str] = INTERACTIVE_TOOLS,
+        reserved_interactive: int = 1,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.reserved_interactive = min(max(0, reserved_interactive), self.max_concurrency - 1)
+        self.capacity_tokens = max(1, capacity_tokens)
+        self.queue_timeout = queue_timeout
+        self.interactive_tools = interactive_tools
+        self.running = 0
+        self.running_batch = 0
+        self.abandoned = 0
+        self.tokens_in_use = 0
+        self.admitted = 0
+        self.timeouts = 0
+        self._queue: list[_Waiter] = []
+        self._sequence = itertools.count()
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    def priority(self, tool_name: str) -> int:
+        return INTERACTIVE_PRIORITY if tool_name in self.interactive_tools else BATCH_PRIORITY
+
+    @asynccontextmanager
+    async def admit(self, tool_name: str, weight: int) -> AsyncIterator[float]:
+        """
+        Wait until the call may run, and hold its slot for the duration of the block.
+
+        Args:
+            tool_name: Tool being called, which decides its priority
+            weight: Estimated tokens, see estimate_request_tokens()
+
+        Yields:
+            float: Seconds spent waiting in the queue
+
+        Raises:
+            QueueTimeoutError: If the call wasn't admitted within queue_timeout
+        """
+        weight = min(max(0, weight), self.capacity_tokens)
+        priority = self.priority(tool_name)
+        waited = await self._acquire(tool_name, priority, weight)
+        try:
+            yield waited
+        finally:
+            self._release(priority, weight)
+
+    def track_abandoned(self, worker: asyncio.Future) -> None:
+        """
+        Count a worker whose call was abandoned against the concurrency limit until it finishes.
+
+        Call this before leaving the call's admit() block, so the slot it frees
+        isn't handed out while the worker still runs.
+
+        Args:
+            worker: Future of the worker running the abandoned call
+        """
+        if worker.done():
+            return
+        self.abandoned += 1
+        worker.add_done_callback(self._finish_abandoned)
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth per class, running calls, and recent wait times in milliseconds."""
+        waits = sorted(self._waits)
+        interactive = sum(1 for waiter in self._queue if waiter.priority == INTERACTIVE_PRIORITY)
+        return {
+            "running": self.running,
+            "running_batch": self.running_batch,
+            "abandoned": self.abandoned,
+            "max_concurrency": self.max_concurrency,
+            "reserved_interactive": self.reserved_interactive,
+            "tokens_in_use": self.tokens_in_use,
+            "capacity_tokens": self.capacity_tokens,
+            "queued": len(self._queue),
+            "queued_interactive": interactive,
+            "queued_batch": len(self._queue) - interactive,
+            "admitted": self.admitted,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
+
+    async def _acquire(self, tool_name: str, priority: int, weight: int) -> float:
+        if not self._queue and self._fits(priority, weight):
+            self._grant(priority, weight, 0.0)
+            return 0.0
+
+        waiter = _Waiter(
+            priority,
+            next(self._sequence),
+            tool_name,
+            weight,
+            time.monotonic(),
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._queue, waiter)
+        # A higher-priority call may be admissible right away even though others are waiting
+        self._dispatch()
+        logger.debug(f"[SCHEDULER] {tool_name} queued ({len(self._queue)} waiting, {self.running} running)")
+
+        try:
+            return await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as the wait ended; hand the slot back
+                self._release(priority, weight)
+            else:
+                self._remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise QueueTimeoutError(
+                    f"{tool_name} waited {self.queue_timeout:g}s without being admitted "
+                    f"({self.running} calls running, {len(self._queue)} waiting)"
+                ) from None
+            raise
+
+    def _fits(self, priority: int, weight: int) -> bool:
+        if self.running + self.abandoned >= self.max_concurrency:
+            return False
+        if priority == BATCH_PRIORITY and self.running_batch >= self.max_concurrency - self.reserved_interactive:
+            return False
+        return self.running == 0 or self.tokens_in_use + weight <= self.capacity_tokens
+
+    def _grant(self, priority: int, weight: int, waited: float) -> None:
+        self.running += 1
+        if priority == BATCH_PRIORITY:
+            self.running_batch += 1
+        self.tokens_in_use += weight
+        self.admitted += 1
+        self._waits.append(waited)
+
+    def _release(self, priority: int, weight: int) -> None:
+        self.running -= 1
+        if priority == BATCH_PRIORITY:
+            self.running_batch -= 1
+        self.tokens_in_use -= weight
+        self._dispatch()
+
+    def _finish_abandoned(self, _worker: asyncio.Future) -> None:
+        self.abandoned -= 1
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if not self._fits(head.priority, head.weight):
+                break
+            heapq.heappop(self._queue)
+            waited = time.monotonic() - head.enqueued
+            self._grant(head.priority, head.weight, waited)
+            head.future.set_result(waited)
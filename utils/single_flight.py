@@ -0,0 +1,130 @@
+"""
+Single-flight coalescing of identical in-flight tool calls
+
+Clients sometimes send the same request twice within seconds, e.g. a retry
+after a slow response. Both calls used to run the full pipeline and pay for two
+model calls. SingleFlight runs one pipeline per key: a call whose key matches a
+pipeline still in flight waits for that pipeline and gets the same result.
+
+The pipeline runs in its own task, so it isn't tied to the request that started
+it. Cancelling one waiter leaves the pipeline running for the others. When no
+waiters are left, the pipeline is cancelled.
+
+request_fingerprint() builds the key from the tool name, the normalized
+arguments and the content hashes of the files they name. Requests that
+continue a conversation thread get no key and always run on their own, since
+each one adds turns to its thread.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections.abc import Awaitable, Hashable
+from dataclasses import dataclass
+from stat import S_ISDIR
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def request_fingerprint(tool_name: str, arguments: dict[str, Any]) -> Optional[str]:
+    """
+    Key identifying requests that produce the same result.
+
+    Files in ``files`` contribute the SHA-256 of their content (or their size
+    and mtime if too large to hash). Directories, and precommit's repository
+    ``path``, contribute their path only: a joining request arrives while the
+    first is still reading the same tree.
+
+    Args:
+        tool_name: Tool being called
+        arguments: Raw arguments from the client
+
+    Returns:
+        Optional[str]: Hex digest, or None if the request must not be coalesced
+    """
+    from .file_utils import file_content_hash, parse_line_range, translate_path_for_environment
+
+    if arguments.get("continuation_id"):
+        return None
+
+    # deadline_seconds stays in the key: a shared pipeline runs under the deadline of
+    # the call that started it, so only calls with the same deadline may share one
+    normalized = {key: value for key, value in arguments.items() if not key.startswith("_") and value is not None}
+    file_states = []
+    for file_spec in normalized.get("files") or []:
+        if not isinstance(file_spec, str):
+            continue
+        path = parse_line_range(file_spec)[0]
+        try:
+            stat_result = os.stat(translate_path_for_environment(path))
+        except (OSError, ValueError):
+            file_states.append("missing")
+            continue
+        if S_ISDIR(stat_result.st_mode):
+            file_states.append("directory")
+        else:
+            file_states.append(file_content_hash(path) or f"{stat_result.st_size}:{stat_result.st_mtime_ns}")
+
+    payload = json.dumps([tool_name, normalized, file_states], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one pipeline per key at a time and shares its result with every caller.
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.joined = 0
+        self._flights: dict[Hashable, _Flight] = {}
+
+    async def run(self, key: Hashable, pipeline: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        Run pipeline, or wait for the one already running under key.
+
+        Args:
+            key: Identifies equivalent calls
+            pipeline: Starts the work when no call with this key is in flight
+
+        Returns:
+            tuple: (result, whether this call joined a pipeline started by another)
+        """
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(pipeline()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+            self.started += 1
+        else:
+            self.joined += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), joined
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                # This caller went away; stop the pipeline once nobody is waiting for it
+                flight.waiters -= 1
+                if flight.waiters == 0:
+                    flight.task.cancel()
+            raise
+
+    def stats(self) -> dict[str, int]:
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Retrieve the outcome so an exception nobody awaited isn't reported as lost
+            flight.task.exception()
@@ -0,0 +1,157 @@
+"""
+Per-request token accounting
+
+This module records where the context budget of each tool call goes: the
+system prompt, reconstructed conversation history, each embedded file, files
+that were skipped for lack of budget, and the remaining new content. The
+estimates are combined with the token usage reported by the provider and
+returned in ToolOutput.metadata["token_usage"].
+
+Every completed request is also added to a bounded, in-process rolling window
+so that aggregate numbers can be queried through the get_token_usage server
+tool. These figures are what allocation ratios should be tuned against.
+"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# Number of recent requests kept for the rolling aggregate
+TOKEN_USAGE_WINDOW = 500
+
+# Provider usage keys that are aggregated when present
+PROVIDER_USAGE_KEYS = ("input_tokens", "output_tokens", "thinking_tokens", "total_tokens")
+
+
+@dataclass
+class TokenAccounting:
+    """
+    Token breakdown for a single tool request.
+
+    Attributes:
+        system_prompt_tokens: Estimated tokens in the system prompt
+        history_tokens: Estimated tokens of reconstructed conversation history
+        file_tokens: Estimated tokens per embedded file, in embedding order
+        skipped_file_tokens: Estimated tokens per file skipped due to the token budget
+        prompt_tokens: Estimated tokens of the complete user prompt sent to the provider
+        provider_usage: Token usage reported by the provider
+        budget_plan: Content budget plan the request was assembled under, if any
+    """
+
+    system_prompt_tokens: int = 0
+    history_tokens: int = 0
+    file_tokens: dict[str, int] = field(default_factory=dict)
+    skipped_file_tokens: dict[str, int] = field(default_factory=dict)
+    prompt_tokens: int = 0
+    provider_usage: dict[str, int] = field(default_factory=dict)
+    budget_plan: Optional[dict[str, Any]] = None
+
+    def record_file(self, file_path: str, tokens: int) -> None:
+        """Record a file embedded in the prompt."""
+        self.file_tokens[file_path] = self.file_tokens.get(file_path, 0) + tokens
+
+    def record_skipped_file(self, file_path: str, tokens: int) -> None:
+        """Record a file that was skipped because it did not fit the budget."""
+        self.skipped_file_tokens[file_path] = tokens
+
+    def record_provider_usage(self, usage: Any) -> None:
+        """Record provider-reported usage, ignoring anything that isn't a plain dict of ints."""
+        if not isinstance(usage, dict):
+            return
+        self.provider_usage = {key: value for key, value in usage.items() if isinstance(value, int)}
+
+    @property
+    def total_file_tokens(self) -> int:
+        return sum(self.file_tokens.values())
+
+    @property
+    def new_content_tokens(self) -> int:
+        """Prompt tokens that are neither history nor embedded files (the request and instructions)."""
+        return max(0, self.prompt_tokens - self.history_tokens - self.total_file_tokens)
+
+    def to_metadata(self) -> dict[str, Any]:
+        """
+        Format the breakdown for ToolOutput.metadata.
+
+        Returns:
+            dict: JSON-serializable breakdown with "estimated", "provider" and "budget_plan" sections
+        """
+        return {
+            "estimated": {
+                "system_prompt": self.system_prompt_tokens,
+                "history": self.history_tokens,
+                "files": dict(self.file_tokens),
+                "files_total": self.total_file_tokens,
+                "skipped_files": dict(self.skipped_file_tokens),
+                "skipped_files_total": sum(self.skipped_file_tokens.values()),
+                "new_content": self.new_content_tokens,
+                "total_input": self.system_prompt_tokens + self.prompt_tokens,
+            },
+            "provider": dict(self.provider_usage),
+            "budget_plan": self.budget_plan,
+        }
+
+
+_usage_window: deque = deque(maxlen=TOKEN_USAGE_WINDOW)
+_usage_lock = threading.Lock()
+
+
+def record_token_usage(tool_name: str, model_name: Optional[str], accounting: TokenAccounting) -> None:
+    """
+    Add a completed request to the rolling aggregate.
+
+    Args:
+        tool_name: Tool that handled the request
+        model_name: Model the request was sent to
+        accounting: Breakdown for the request
+    """
+    entry = {
+        "tool_name": tool_name,
+        "model_name": model_name or "unknown",
+        "system_prompt": accounting.system_prompt_tokens,
+        "history": accounting.history_tokens,
+        "files": accounting.total_file_tokens,
+        "skipped_files": sum(accounting.skipped_file_tokens.values()),
+        "new_content": accounting.new_content_tokens,
+        **{key: accounting.provider_usage.get(key, 0) for key in PROVIDER_USAGE_KEYS},
+    }
+    with _usage_lock:
+        _usage_window.append(entry)
+
+
+def get_token_usage_summary() -> dict[str, Any]:
+    """
+    Summarize the rolling window of recorded requests.
+
+    Returns:
+        dict: Window size, request count, and per-tool and overall totals and averages
+    """
+    with _usage_lock:
+        entries = list(_usage_window)
+
+    def _summarize(items: list[dict[str, Any]]) -> dict[str, Any]:
+        fields = ["system_prompt", "history", "files", "skipped_files", "new_content", *PROVIDER_USAGE_KEYS]
+        totals = {name: sum(item[name] for item in items) for name in fields}
+        count = len(items)
+        return {
+            "requests": count,
+            "totals": totals,
+            "averages": {name: (totals[name] // count if count else 0) for name in fields},
+        }
+
+    by_tool: dict[str, list[dict[str, Any]]] = {}
+    for entry in entries:
+        by_tool.setdefault(entry["tool_name"], []).append(entry)
+
+    return {
+        "window_size": TOKEN_USAGE_WINDOW,
+        "overall": _summarize(entries),
+        "by_tool": {tool_name: _summarize(items) for tool_name, items in sorted(by_tool.items())},
+    }
+
+
+def reset_token_usage() -> None:
+    """Clear the rolling aggregate (mainly for testing)."""
+    with _usage_lock:
+        _usage_window.clear()
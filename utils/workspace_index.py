@@ -0,0 +1,274 @@
+"""
+Persistent workspace metadata index
+
+Directory expansion classifies every file it finds by reading its first few
+KB, token estimates and change detection need file contents too, and none of
+that survived the server process - Claude starts a fresh server.py for every
+session. This module keeps per-file metadata in a SQLite database under the
+cache directory:
+
+- path, size and mtime (the freshness key)
+- content hash (SHA-256 of the raw bytes)
+- token counts per tokenizer (e.g. "estimate_tokens" for the len/4 estimate)
+- classification ("text", or a category from file_classifier)
+
+A row is only used while the file's size and mtime still match; when they
+don't, the stale metadata is dropped and rebuilt on the next read, so the index
+refreshes incrementally as files are touched. Callers still stat files (that's
+how freshness is checked), but no longer open them.
+
+The database location is ZEN_CACHE_DIR, or $XDG_CACHE_HOME/zen-mcp-server
+(~/.cache/zen-mcp-server). Set WORKSPACE_INDEX=false to disable it. If the
+database can't be opened the index is disabled for the process and everything
+works as before.
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .file_cache import RACY_WINDOW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "workspace-index.sqlite3"
+INDEX_SCHEMA_VERSION = 1
+
+# Writes are buffered and committed in batches of this size
+INDEX_FLUSH_BATCH = 500
+
+# Classification recorded for regular text files
+TEXT_CLASSIFICATION = "text"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT,
+    classification TEXT
+);
+CREATE TABLE IF NOT EXISTS token_counts (
+    path TEXT NOT NULL,
+    tokenizer TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (path, tokenizer)
+);
+"""
+
+
+@dataclass
+class FileRecord:
+    """
+    Indexed metadata for one file version.
+
+    Attributes:
+        path: Resolved file path
+        size: Size in bytes when indexed
+        mtime_ns: Modification time when indexed
+        content_hash: SHA-256 of the raw bytes, if known
+        classification: "text" or a file_classifier category, if known
+        token_counts: Token count per tokenizer name
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: Optional[str] = None
+    classification: Optional[str] = None
+    token_counts: dict[str, int] = field(default_factory=dict)
+
+
+def default_cache_dir() -> Path:
+    """Directory for persistent caches."""
+    configured = os.environ.get("ZEN_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "zen-mcp-server"
+
+
+class WorkspaceIndex:
+    """
+    SQLite-backed per-file metadata, keyed on path and validated by size and mtime.
+
+    Args:
+        db_path: Database file; created with its parent directory if missing
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Several server processes may share the file; WAL lets readers proceed during writes
+        self._conn = sqlite3.connect(str(self.db_path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS token_counts;")
+            self._conn.execute(f"PRAGMA user_version={INDEX_SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending: dict[str, FileRecord] = {}
+
+    def lookup(self, path: str, size: int, mtime_ns: int) -> Optional[FileRecord]:
+        """
+        Return indexed metadata if it describes the file's current version.
+
+        Args:
+            path: Resolved file path
+            size: Current size from stat
+            mtime_ns: Current modification time from stat
+
+        Returns:
+            Optional[FileRecord]: The record, or None if the file isn't indexed or changed
+        """
+        with self._lock:
+            record = self._pending.get(path)
+            if record is None:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, content_hash, classification FROM files WHERE path = ?", (path,)
+                ).fetchone()
+                if row is None:
+                    return None
+                record = FileRecord(path, *row)
+                if (record.size, record.mtime_ns) == (size, mtime_ns):
+                    record.token_counts = dict(
+                        self._conn.execute("SELECT tokenizer, tokens FROM token_counts WHERE path = ?", (path,))
+                    )
+        if (record.size, record.mtime_ns) != (size, mtime_ns):
+            return None
+        return record
+
+    def record(
+        self,
+        path: str,
+        size: int,
+        mtime_ns: int,
+        *,
+        content_hash: Optional[str] = None,
+        classification: Optional[str] = None,
+        token_counts: Optional[dict[str, int]] = None,
+    ) -> None:
+        """
+        Merge metadata for a file version into the index.
+
+        Fields that are None are kept from the existing record if it describes
+        the same version; a record for an older version is replaced. Files
+        modified within RACY_WINDOW_SECONDS are not recorded, since a second
+        write in the same timestamp tick would go unnoticed.
+
+        Args:
+            path: Resolved file path
+            size: Size from the stat taken before the metadata was computed
+            mtime_ns: Modification time from that stat
+            content_hash: SHA-256 of the raw bytes
+            classification: "text" or a file_classifier category
+            token_counts: Token counts per tokenizer
+        """
+        if time.time_ns() - mtime_ns < RACY_WINDOW_SECONDS * 1e9:
+            return
+        existing = self.lookup(path, size, mtime_ns)
+        record = FileRecord(path, size, mtime_ns)
+        if existing is not None:
+            record.content_hash = existing.content_hash
+            record.classification = existing.classification
+            record.token_counts = dict(existing.token_counts)
+        record.content_hash = content_hash or record.content_hash
+        record.classification = classification or record.classification
+        record.token_counts.update(token_counts or {})
+
+        with self._lock:
+            self._pending[path] = record
+            should_flush = len(self._pending) >= INDEX_FLUSH_BATCH
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit buffered records in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            records = list(self._pending.values())
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash, classification) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(r.path, r.size, r.mtime_ns, r.content_hash, r.classification) for r in records],
+                )
+                self._conn.executemany("DELETE FROM token_counts WHERE path = ?", [(r.path,) for r in records])
+                self._conn.executemany(
+                    "INSERT INTO token_counts (path, tokenizer, tokens) VALUES (?, ?, ?)",
+                    [(r.path, name, tokens) for r in records for name, tokens in r.token_counts.items()],
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.debug(f"[INDEX] Failed to write {len(records)} records: {type(e).__name__}: {e}")
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+            self._pending.clear()
+
+    def forget(self, path: str) -> None:
+        """Remove a file from the index."""
+        with self._lock:
+            self._pending.pop(path, None)
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM token_counts WHERE path = ?", (path,))
+
+    def count(self) -> int:
+        """Number of indexed files (after flushing buffered records)."""
+        self.flush()
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+_index: Optional[WorkspaceIndex] = None
+_index_disabled = False
+_index_lock = threading.Lock()
+
+
+def get_workspace_index() -> Optional[WorkspaceIndex]:
+    """
+    Return the process-wide index, opening it on first use.
+
+    Returns:
+        Optional[WorkspaceIndex]: The index, or None if disabled or unavailable
+    """
+    global _index, _index_disabled
+    if _index is not None or _index_disabled:
+        return _index
+    with _index_lock:
+        if _index is None and not _index_disabled:
+            if os.environ.get("WORKSPACE_INDEX", "true").lower() == "false":
+                _index_disabled = True
+                return None
+            db_path = default_cache_dir() / INDEX_FILE_NAME
+            try:
+                _index = WorkspaceIndex(db_path)
+                atexit.register(close_workspace_index)
+                logger.debug(f"[INDEX] Opened workspace index at {db_path}")
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Workspace index unavailable at {db_path}: {type(e).__name__}: {e}")
+                _index_disabled = True
+    return _index
+
+
+def close_workspace_index() -> None:
+    """Flush and close the process-wide index; it is reopened on next use."""
+    global _index, _index_disabled
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+        _index = None
+        _index_disabled = False